@@ -1,6 +1,5 @@
 """Module principal de l'API"""
 from fastapi import APIRouter, FastAPI, Depends, Request, HTTPException, status
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import time
@@ -9,6 +8,7 @@ from typing import Callable
 from backend.api.endpoints import analysis, generation, reports, models, healthcheck
 from backend.core.config import get_settings
 from backend.core.errors import BaseServiceError, FileProcessingError, ResourceNotFoundError
+from backend.utils.json_utils import FastJSONResponse
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -47,7 +47,8 @@ def create_app() -> FastAPI:
         version=settings.VERSION,
         docs_url="/docs",
         redoc_url="/redoc",
-        openapi_url=f"{settings.API_V1_STR}/openapi.json"
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        default_response_class=FastJSONResponse
     )
     
     # Configuration CORS
@@ -70,7 +71,7 @@ def create_app() -> FastAPI:
         logger.error(f"Exception non gérée [{error_id}]: {str(exc)}", exc_info=exc)
         
         if isinstance(exc, BaseServiceError):
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=exc.status_code,
                 content={
                     "error_id": error_id,
@@ -80,7 +81,7 @@ def create_app() -> FastAPI:
                 }
             )
         
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "error_id": error_id,
@@ -1,19 +1,25 @@
 # Analysis endpoints
-from fastapi import APIRouter, UploadFile, File, Form, Depends, BackgroundTasks, HTTPException, status, Query
+from fastapi import APIRouter, UploadFile, File, Form, Depends, BackgroundTasks, HTTPException, status, Query, Request, Header
 from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 import time
 import uuid
+import asyncio
+import mimetypes
 import os
 import logging
 from datetime import datetime
 
 from backend.core.config import get_settings
 from backend.models.schemas import (
-    AnomalyResponse, AnalysisRequest, AnalysisJobStatus, FileUploadResponse, PaginationParams
+    AnomalyResponse, AnalysisRequest, AnalysisJobStatus, FileUploadResponse, PaginationParams,
+    ChunkedUploadRequest, ChunkedUploadStatus, BatchAnalysisRequest, BatchAnalysisStatus
 )
 from backend.services.analysis_service import AnalysisService, get_analysis_service
+from backend.services.batch_service import BatchAnalysisService, get_batch_service
+from backend.services.upload_service import ChunkedUploadService, get_upload_service, MAX_CHUNK_SIZE
 from backend.utils.file_handling import save_upload_file, validate_file
+from backend.utils.json_utils import parse_fields, streaming_json_response
 from backend.core.errors import FileProcessingError, ResourceNotFoundError
 
 logger = logging.getLogger(__name__)
@@ -25,10 +31,14 @@ settings = get_settings()
 async def upload_file(
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
+    preparse: Optional[bool] = Form(None),
     analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """
     Endpoint pour uploader un fichier (FEC ou Excel).
+    
+    Si preparse est vrai (par défaut PREPARSE_ON_UPLOAD), le fichier est parsé et ses
+    caractéristiques calculées en tâche de fond: l'analyse n'aura plus qu'à calculer les scores.
     """
     start_time = time.time()
     
@@ -62,7 +72,8 @@ async def upload_file(
             filename=file.filename,
             file_path=file_path,
             file_size=file_size,
-            description=description
+            description=description,
+            preparse=preparse
         )
         
         logger.info(f"Fichier {file.filename} uploadé avec succès, ID: {file_id}, taille: {file_size} octets")
@@ -87,6 +98,107 @@ async def upload_file(
         )
 
 
+@router.post("/uploads", response_model=ChunkedUploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_chunked_upload(
+    upload_request: ChunkedUploadRequest,
+    upload_service: ChunkedUploadService = Depends(get_upload_service)
+):
+    """
+    Ouvre un upload par morceaux pour un fichier volumineux.
+    
+    Les morceaux sont ensuite envoyés (dans n'importe quel ordre, en parallèle)
+    par PUT /uploads/{upload_id}/chunks/{index}, puis l'upload est terminé par
+    POST /uploads/{upload_id}/complete.
+    """
+    return await asyncio.to_thread(
+        upload_service.create_upload,
+        upload_request.filename,
+        upload_request.total_size,
+        upload_request.chunk_size,
+        upload_request.sha256,
+        upload_request.description
+    )
+
+
+@router.get("/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+async def get_chunked_upload(
+    upload_id: str,
+    upload_service: ChunkedUploadService = Depends(get_upload_service)
+):
+    """
+    Récupère l'état d'un upload par morceaux (morceaux reçus), pour reprendre un upload interrompu.
+    """
+    return await asyncio.to_thread(upload_service.get_upload, upload_id)
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}", response_model=ChunkedUploadStatus)
+async def put_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256"),
+    upload_service: ChunkedUploadService = Depends(get_upload_service)
+):
+    """
+    Envoie un morceau d'un upload (corps brut), avec son empreinte SHA-256 dans l'en-tête X-Chunk-SHA256.
+    """
+    data = bytearray()
+    async for block in request.stream():
+        data.extend(block)
+        if len(data) > MAX_CHUNK_SIZE:
+            raise FileProcessingError(
+                message=f"Morceau supérieur à la taille maximale de {MAX_CHUNK_SIZE} octets",
+                details={"max_size": MAX_CHUNK_SIZE}
+            )
+    
+    return await asyncio.to_thread(upload_service.write_chunk, upload_id, index, bytes(data), chunk_sha256)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileUploadResponse)
+async def complete_chunked_upload(
+    upload_id: str,
+    upload_service: ChunkedUploadService = Depends(get_upload_service),
+    analysis_service: AnalysisService = Depends(get_analysis_service)
+):
+    """
+    Termine un upload par morceaux: vérifie le fichier complet et l'enregistre comme un fichier uploadé.
+    """
+    upload, file_id, file_path = await asyncio.to_thread(upload_service.complete_upload, upload_id)
+    
+    await analysis_service.register_file(
+        file_id=file_id,
+        filename=upload["filename"],
+        file_path=file_path,
+        file_size=upload["total_size"],
+        description=upload["description"],
+        sha256=upload["sha256"]
+    )
+    
+    logger.info(f"Fichier {upload['filename']} uploadé par morceaux, ID: {file_id}, taille: {upload['total_size']} octets")
+    
+    return FileUploadResponse(
+        file_id=file_id,
+        filename=upload["filename"],
+        size_bytes=upload["total_size"],
+        upload_timestamp=datetime.now(),
+        content_type=mimetypes.guess_type(upload["filename"])[0] or "application/octet-stream",
+        status="uploaded",
+        message=f"Fichier uploadé avec succès ({upload['chunk_count']} morceaux)"
+    )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_chunked_upload(
+    upload_id: str,
+    upload_service: ChunkedUploadService = Depends(get_upload_service)
+):
+    """
+    Abandonne un upload par morceaux et supprime les morceaux reçus.
+    """
+    await asyncio.to_thread(upload_service.abort_upload, upload_id)
+    return None
+
+
 @router.post("/start", response_model=AnalysisJobStatus)
 async def start_analysis(
     analysis_request: AnalysisRequest,
@@ -128,6 +240,56 @@ async def start_analysis(
         )
 
 
+@router.post("/batches", response_model=BatchAnalysisStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_batch_analysis(
+    batch_request: BatchAnalysisRequest,
+    batch_service: BatchAnalysisService = Depends(get_batch_service)
+):
+    """
+    Démarre l'analyse d'un lot de fichiers (liste d'identifiants ou motif glob des noms).
+    
+    Les fichiers sont répartis équitablement entre les lots dans le pool de workers
+    des lots (BATCH_WORKERS), avec les modèles chargés une seule fois.
+    """
+    batch_status = await asyncio.to_thread(
+        batch_service.create_batch,
+        file_ids=batch_request.file_ids,
+        pattern=batch_request.pattern,
+        analysis_type=batch_request.analysis_type,
+        options=batch_request.options
+    )
+    logger.info(f"Analyse par lot démarrée, batch ID: {batch_status.batch_id}")
+    return batch_status
+
+
+@router.get("/batches/{batch_id}", response_model=BatchAnalysisStatus)
+async def get_batch_analysis_status(
+    batch_id: str,
+    batch_service: BatchAnalysisService = Depends(get_batch_service)
+):
+    """
+    Récupère la progression globale d'un lot et, une fois terminé, sa synthèse consolidée.
+    """
+    batch_status = await asyncio.to_thread(batch_service.get_batch, batch_id)
+    if batch_status is None:
+        raise ResourceNotFoundError("Lot d'analyse", batch_id)
+    return batch_status
+
+
+@router.delete("/batches/{batch_id}", response_model=BatchAnalysisStatus)
+async def cancel_batch_analysis(
+    batch_id: str,
+    batch_service: BatchAnalysisService = Depends(get_batch_service)
+):
+    """
+    Annule les analyses d'un lot encore en attente (les fichiers en cours vont jusqu'au bout).
+    """
+    batch_status = await asyncio.to_thread(batch_service.cancel_batch, batch_id)
+    if batch_status is None:
+        raise ResourceNotFoundError("Lot d'analyse", batch_id)
+    return batch_status
+
+
 @router.get("/status/{job_id}", response_model=AnalysisJobStatus)
 async def get_analysis_status(
     job_id: str,
@@ -156,13 +318,27 @@ async def get_analysis_status(
 @router.get("/results/{file_id}", response_model=AnomalyResponse)
 async def get_analysis_results(
     file_id: str,
+    page: int = Query(1, ge=1, description="Numéro de page des anomalies (commence à 1)"),
+    page_size: int = Query(100, ge=1, le=1000, description="Nombre d'anomalies par page"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="Toutes les anomalies en flux (JSON ou NDJSON)"),
+    fields: Optional[str] = Query(None, description="Champs des anomalies à conserver en flux, séparés par des virgules"),
     analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """
     Récupère les résultats d'analyse pour un fichier spécifique.
+    
+    Les anomalies sont paginées; anomaly_count donne le nombre total. Avec le
+    paramètre format, l'ensemble des anomalies est transmis en flux (transfert
+    par morceaux, mémoire constante) et page/page_size sont ignorés.
     """
     try:
-        results = await analysis_service.get_analysis_results(file_id)
+        if format is not None:
+            chunks = analysis_service.iter_analysis_results(file_id, fmt=format, fields=parse_fields(fields))
+            if chunks is None:
+                raise ResourceNotFoundError("Résultats d'analyse", file_id)
+            return streaming_json_response(chunks, format)
+        
+        results = await analysis_service.get_analysis_results(file_id, page=page, page_size=page_size)
         if not results:
             raise ResourceNotFoundError("Résultats d'analyse", file_id)
         
@@ -202,6 +378,22 @@ async def list_files(
         )
 
 
+@router.get("/files/{file_id}/preparse")
+async def get_preparse_status(
+    file_id: str,
+    analysis_service: AnalysisService = Depends(get_analysis_service)
+):
+    """
+    Récupère l'état de la préparation d'un fichier (nombre de lignes et statistiques une fois terminée).
+    """
+    metadata = await analysis_service.get_file_metadata(file_id)
+    if metadata is None:
+        raise ResourceNotFoundError("Fichier", file_id)
+    if "preparse" not in metadata:
+        raise ResourceNotFoundError("Préparation du fichier", file_id)
+    return metadata["preparse"]
+
+
 @router.delete("/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file(
     file_id: str,
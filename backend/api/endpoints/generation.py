@@ -1,31 +1,43 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Dict, Any, Optional
 import logging
 from pydantic import BaseModel, Field
 
 from backend.services.generation_service import GenerationService, get_generation_service
+from backend.models.generation_engine import list_scenarios
+from backend.utils.json_utils import parse_fields, streaming_json_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class GenerationRequest(BaseModel):
     """Modèle pour une requête de génération"""
-    count: int = Field(default=1000, ge=10, le=10000, description="Nombre d'écritures à générer")
+    count: int = Field(default=1000, ge=10, le=20_000_000, description="Nombre d'écritures à générer")
     anomaly_rate: float = Field(default=0.05, ge=0, le=1, description="Taux d'anomalies à introduire")
     start_date: Optional[str] = Field(None, description="Date de début (YYYY-MM-DD)")
     end_date: Optional[str] = Field(None, description="Date de fin (YYYY-MM-DD)")
     company_name: Optional[str] = Field(None, description="Nom de l'entreprise")
+    seed: Optional[int] = Field(None, ge=0, description="Graine de génération (reproductible si définie)")
+    analyze: bool = Field(default=True, description="Analyser les écritures générées")
+    scenario: str = Field(default="standard", description="Scénario de génération (journaux et profil d'anomalies)")
     options: Optional[Dict[str, Any]] = Field(None, description="Options supplémentaires")
 
 class GenerationResponse(BaseModel):
     """Modèle pour une réponse de génération"""
     generation_id: str
-    count: int
-    anomaly_count: int
-    csv_path: str
-    result_path: str
-    duration_ms: float
-    generated_at: str
+    status: str
+    message: str
+
+class GenerationStatusResponse(BaseModel):
+    """Modèle pour le statut d'une génération"""
+    generation_id: str
+    status: str
+    progress: Optional[float] = None
+    step: Optional[str] = None
+    message: Optional[str] = None
+    lines: Optional[int] = None
+    anomaly_count: Optional[int] = None
+    error: Optional[str] = None
 
 @router.post("/generate", response_model=GenerationResponse)
 async def generate_fec_data(
@@ -33,7 +45,7 @@ async def generate_fec_data(
     generation_service: GenerationService = Depends(get_generation_service)
 ):
     """
-    Génère des données FEC et les analyse pour détecter des anomalies
+    Lance la génération de données FEC et leur analyse en tâche de fond
     """
     try:
         # Préparer les options
@@ -44,54 +56,106 @@ async def generate_fec_data(
             options["end_date"] = request.end_date
         if request.company_name:
             options["company_name"] = request.company_name
+        if request.seed is not None:
+            options["seed"] = request.seed
+        options["analyze"] = request.analyze
+        options["scenario"] = request.scenario
         
-        # Générer et analyser
-        result = await generation_service.generate_and_analyze(
+        generation_id = generation_service.start_generation(
             count=request.count,
             anomaly_rate=request.anomaly_rate,
             options=options
         )
         
-        # Ne pas retourner le résultat d'analyse complet dans la réponse
-        return {
-            "generation_id": result["generation_id"],
-            "count": result["count"],
-            "anomaly_count": result["anomaly_count"],
-            "csv_path": result["csv_path"],
-            "result_path": result["result_path"],
-            "duration_ms": result["duration_ms"],
-            "generated_at": result["generated_at"]
-        }
+        return GenerationResponse(
+            generation_id=generation_id,
+            status="started",
+            message=f"Génération de {request.count} écritures lancée"
+        )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la génération: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération: {str(e)}")
 
+@router.get("/scenarios")
+async def get_generation_scenarios():
+    """
+    Liste les scénarios de génération disponibles
+    """
+    return [
+        {
+            "name": scenario.name,
+            "description": scenario.description,
+            "entry_mix": scenario.entry_mix,
+            "anomaly_profile": scenario.anomaly_profile
+        }
+        for scenario in list_scenarios()
+    ]
+
+@router.get("/status/{generation_id}", response_model=GenerationStatusResponse)
+async def get_generation_status(
+    generation_id: str,
+    generation_service: GenerationService = Depends(get_generation_service)
+):
+    """
+    Récupère l'état d'avancement d'une génération
+    """
+    state = generation_service.get_status(generation_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Génération non trouvée pour l'ID {generation_id}")
+    
+    return GenerationStatusResponse(
+        generation_id=generation_id,
+        status=state.get("status", "unknown"),
+        progress=state.get("progress"),
+        step=state.get("step"),
+        message=state.get("message"),
+        lines=state.get("lines"),
+        anomaly_count=state.get("anomaly_count"),
+        error=state.get("error")
+    )
+
+@router.post("/{generation_id}/cancel")
+async def cancel_generation(
+    generation_id: str,
+    generation_service: GenerationService = Depends(get_generation_service)
+):
+    """
+    Annule une génération en cours
+    """
+    if generation_service.get_status(generation_id) is None:
+        raise HTTPException(status_code=404, detail=f"Génération non trouvée pour l'ID {generation_id}")
+    
+    if not generation_service.cancel_generation(generation_id):
+        raise HTTPException(status_code=409, detail=f"La génération {generation_id} n'est pas en cours")
+    
+    return {"generation_id": generation_id, "status": "cancelling"}
+
 @router.get("/results/{generation_id}")
 async def get_generation_results(
     generation_id: str,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="Document JSON complet ou NDJSON (une anomalie par ligne)"),
+    fields: Optional[str] = Query(None, description="Champs des anomalies à conserver, séparés par des virgules"),
     generation_service: GenerationService = Depends(get_generation_service)
 ):
     """
     Récupère les résultats d'une génération précédente
+    
+    Les résultats sont transmis en flux (transfert par morceaux), sans charger
+    l'ensemble des anomalies en mémoire.
     """
     try:
-        # Vérifier si le fichier de résultats existe
-        import os
-        from backend.core.config import get_settings
-        settings = get_settings()
+        chunks = generation_service.iter_results(generation_id, fmt=format, fields=parse_fields(fields))
         
-        result_path = os.path.join(settings.DATA_DIR, "generated", f"results_{generation_id}.json")
-        
-        if not os.path.exists(result_path):
+        if chunks is None:
+            state = generation_service.get_status(generation_id)
+            if state is not None and state.get("status") in ("initializing", "pending", "running"):
+                raise HTTPException(status_code=409, detail=f"Génération {generation_id} en cours")
             raise HTTPException(status_code=404, detail=f"Résultats non trouvés pour l'ID {generation_id}")
         
-        # Charger et retourner les résultats
-        import json
-        with open(result_path, "r", encoding="utf-8") as f:
-            results = json.load(f)
-        
-        return results
+        return streaming_json_response(chunks, format)
         
     except Exception as e:
         if isinstance(e, HTTPException):
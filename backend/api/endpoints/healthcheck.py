@@ -9,6 +9,7 @@ from pydantic import BaseModel
 from backend.core.config import get_settings
 from backend.training.model_registry import get_model_registry
 from backend.models.trained_detector import get_trained_detector
+from backend.services.retention_service import get_retention_service
 from backend.utils.os_utils import get_disk_usage
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ class HealthCheckResponse(BaseModel):
     environment: str
     model_info: Dict[str, Any]
     disk_usage: Dict[str, Any]
+    retention: Dict[str, Any] = {}
 
 @router.get("/health", response_model=HealthCheckResponse)
 async def health_check():
@@ -47,7 +49,8 @@ async def health_check():
                 "active_version": active_model["version"] if active_model else None,
                 "model_count": len(registry.list_models())
             },
-            disk_usage=disk_stats
+            disk_usage=disk_stats,
+            retention=get_retention_service().get_stats()
         )
         
     except Exception as e:
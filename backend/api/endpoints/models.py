@@ -1,15 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Query
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Dict, Any, Optional, Literal
 import logging
-import sys  # Ajout de l'import manquant pour sys.executable
 import os
-import uuid
-import subprocess
 from pydantic import BaseModel, Field
 from datetime import datetime
 
 from backend.training.model_registry import get_model_registry, ModelRegistry
 from backend.models.trained_detector import get_trained_detector, TrainedDetector
+from backend.training.pipeline import TrainingOptions
+from backend.services.training_service import TrainingService, get_training_service
 from backend.core.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -46,10 +45,16 @@ class ModelActivationResponse(BaseModel):
 
 class TrainingRequest(BaseModel):
     """Requête pour lancer un entraînement de modèle"""
-    num_sets: int = Field(default=10, ge=1, le=50, description="Nombre de jeux de données à générer")
+    num_sets: int = Field(default=10, ge=0, le=50, description="Nombre de jeux de données à générer")
     entries_per_set: int = Field(default=500, ge=100, le=5000, description="Nombre d'entrées par jeu")
     description: Optional[str] = Field(None, description="Description du modèle")
     activate: bool = Field(default=True, description="Activer le modèle après entraînement")
+    mode: Literal["full", "incremental"] = Field(default="full", description="Entraînement complet ou incrémental")
+    base_version: Optional[str] = Field(None, description="Version de départ en mode incrémental (défaut: modèle actif)")
+    warm_start: bool = Field(default=True, description="Ajouter des arbres au modèle de base plutôt que le réentraîner")
+    extra_estimators: int = Field(default=50, ge=1, le=500, description="Nombre d'arbres ajoutés par modèle")
+    include_uploads: bool = Field(default=True, description="Inclure les fichiers uploadés déjà analysés")
+    seed: Optional[int] = Field(None, ge=0, description="Graine des données synthétiques (génération reproductible)")
 
 
 class TrainingResponse(BaseModel):
@@ -66,6 +71,8 @@ class TrainingStatusResponse(BaseModel):
     last_logs: str
     log_file: str
     progress: Optional[float] = None
+    step: Optional[str] = None
+    message: Optional[str] = None
 
 
 @router.get("/list", response_model=ModelList)
@@ -187,122 +194,39 @@ async def get_active_model(
 @router.post("/train", response_model=TrainingResponse)
 async def train_model(
     request: TrainingRequest,
-    background_tasks: BackgroundTasks
+    training_service: TrainingService = Depends(get_training_service)
 ):
     """
     Lance un entraînement de modèle en arrière-plan.
     
-    Cette fonction exécute un script d'entraînement qui peut prendre du temps à s'exécuter.
-    Le traitement est donc fait de manière asynchrone en arrière-plan.
+    L'entraînement est exécuté dans le pool de workers de l'API, sans lancer
+    de nouvel interpréteur. La progression de chaque étape (génération des
+    données, extraction des caractéristiques, entraînement de chaque modèle,
+    évaluation, enregistrement) est consultable via /training-status.
     
     Args:
         request: Paramètres pour l'entraînement du modèle
-        background_tasks: Tâches à exécuter en arrière-plan
+        training_service: Service d'entraînement
         
     Returns:
         Identifiant du job d'entraînement et statut initial
     """
     try:
-        # Générer un ID unique pour le job
-        job_id = str(uuid.uuid4())
-        
-        # Préparer le répertoire pour les logs
-        log_dir = os.path.join(settings.DATA_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"train_{job_id}.log")
-        status_file = os.path.join(log_dir, f"train_{job_id}_status.json")
-        
-        # Initialiser le fichier de statut
-        import json
-        with open(status_file, "w", encoding="utf-8") as f:
-            json.dump({
-                "job_id": job_id,
-                "status": "initializing",
-                "progress": 0,
-                "message": "Initialisation de l'entraînement",
-                "start_time": datetime.now().isoformat()
-            }, f, indent=2)
-        
-        # Préparer la commande d'entraînement
-        script_path = os.path.join(settings.PROJECT_ROOT, "scripts", "train_detector.py")
-        cmd = [
-            sys.executable,
-            script_path,
-            "--num-sets", str(request.num_sets),
-            "--entries-per-set", str(request.entries_per_set),
-            "--evaluate"
-        ]
-        
-        if request.activate:
-            cmd.append("--activate")
-        
-        if request.description:
-            cmd.extend(["--description", request.description])
-        
-        # Fonction à exécuter en arrière-plan
-        async def run_training():
-            try:
-                # Mise à jour du statut
-                with open(status_file, "r", encoding="utf-8") as f:
-                    status_data = json.load(f)
-                
-                status_data["status"] = "running"
-                status_data["progress"] = 10
-                status_data["message"] = "Entraînement en cours..."
-                
-                with open(status_file, "w", encoding="utf-8") as f:
-                    json.dump(status_data, f, indent=2)
-                
-                # Exécuter le processus d'entraînement
-                with open(log_file, "w", encoding="utf-8") as f:
-                    process = subprocess.Popen(
-                        cmd,
-                        stdout=f,
-                        stderr=subprocess.STDOUT,
-                        text=True
-                    )
-                    
-                    # Attendre la fin du processus
-                    returncode = process.wait()
-                
-                # Mettre à jour le statut final
-                with open(status_file, "r", encoding="utf-8") as f:
-                    status_data = json.load(f)
-                
-                status_data["end_time"] = datetime.now().isoformat()
-                
-                if returncode == 0:
-                    status_data["status"] = "completed"
-                    status_data["message"] = "Entraînement terminé avec succès"
-                    status_data["progress"] = 100
-                else:
-                    status_data["status"] = "failed"
-                    status_data["message"] = f"Échec de l'entraînement (code {returncode})"
-                    status_data["progress"] = 100
-                
-                with open(status_file, "w", encoding="utf-8") as f:
-                    json.dump(status_data, f, indent=2)
-                
-                logger.info(f"Entraînement terminé avec code de sortie {returncode}")
-                
-            except Exception as e:
-                logger.error(f"Erreur pendant l'exécution de l'entraînement: {str(e)}", exc_info=True)
-                
-                # Mettre à jour le statut en cas d'erreur
-                try:
-                    with open(status_file, "w", encoding="utf-8") as f:
-                        json.dump({
-                            "job_id": job_id,
-                            "status": "failed",
-                            "progress": 100,
-                            "message": f"Erreur: {str(e)}",
-                            "end_time": datetime.now().isoformat()
-                        }, f, indent=2)
-                except:
-                    pass
-        
-        # Lancer en arrière-plan
-        background_tasks.add_task(run_training)
+        options = TrainingOptions(
+            num_sets=request.num_sets,
+            entries_per_set=request.entries_per_set,
+            evaluate=True,
+            description=request.description,
+            activate=request.activate,
+            command_line="POST /models/train",
+            mode=request.mode,
+            base_version=request.base_version,
+            warm_start=request.warm_start,
+            extra_estimators=request.extra_estimators,
+            include_uploads=request.include_uploads,
+            seed=request.seed
+        )
+        job_id = training_service.start_training(options)
         
         return TrainingResponse(
             job_id=job_id,
@@ -318,8 +242,40 @@ async def train_model(
         )
 
 
+@router.post("/training/{job_id}/cancel", response_model=TrainingResponse)
+async def cancel_training(
+    job_id: str,
+    training_service: TrainingService = Depends(get_training_service)
+):
+    """
+    Demande l'annulation d'un entraînement en cours
+    
+    L'entraînement s'interrompt à la fin de l'étape en cours.
+    """
+    if training_service.get_status(job_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Aucun entraînement trouvé avec l'ID {job_id}"
+        )
+    
+    if not training_service.cancel_training(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"L'entraînement {job_id} n'est pas en cours"
+        )
+    
+    return TrainingResponse(
+        job_id=job_id,
+        status="cancelling",
+        message="Annulation de l'entraînement demandée"
+    )
+
+
 @router.get("/training-status/{job_id}", response_model=TrainingStatusResponse)
-async def get_training_status(job_id: str):
+async def get_training_status(
+    job_id: str,
+    training_service: TrainingService = Depends(get_training_service)
+):
     """
     Vérifie le statut d'un entraînement en cours
     
@@ -330,21 +286,15 @@ async def get_training_status(job_id: str):
         État actuel de l'entraînement et dernières entrées du log
     """
     try:
-        # Vérifier le fichier de statut
-        status_file = os.path.join(settings.DATA_DIR, "logs", f"train_{job_id}_status.json")
-        log_file = os.path.join(settings.DATA_DIR, "logs", f"train_{job_id}.log")
+        status_data = training_service.get_status(job_id)
+        log_file = training_service.get_log_file(job_id)
         
-        if not os.path.exists(status_file):
+        if status_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Aucun entraînement trouvé avec l'ID {job_id}"
             )
         
-        # Lire le statut
-        import json
-        with open(status_file, "r", encoding="utf-8") as f:
-            status_data = json.load(f)
-        
         # Lire les dernières lignes du log
         last_lines = ""
         if os.path.exists(log_file):
@@ -357,6 +307,8 @@ async def get_training_status(job_id: str):
             "job_id": job_id,
             "status": status_data.get("status", "unknown"),
             "progress": status_data.get("progress", 0),
+            "step": status_data.get("step"),
+            "message": status_data.get("message"),
             "last_logs": last_lines,
             "log_file": log_file
         }
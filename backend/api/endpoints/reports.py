@@ -1,274 +1,142 @@
 """Endpoints pour la génération et la gestion des rapports"""
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Response, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
+import hashlib
 import logging
-import uuid
+from collections import Counter
 
 from backend.models.schemas import ReportRequest, ReportResponse, ReportType, ReportFormat
-from backend.core.config import get_settings
 from backend.core.errors import ResourceNotFoundError
+from backend.core.jobs import JobContext, get_report_job_manager
 from backend.services.analysis_service import AnalysisService, get_analysis_service
+from backend.services.report_renderer import render_report, report_columns
+from backend.services.report_service import ReportService, get_report_service
+from backend.utils.file_handling import DOWNLOAD_CHUNK_SIZE, etag_matches, parse_range_header
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-settings = get_settings()
 
-# Répertoire pour les rapports générés
-REPORTS_DIR = os.path.join(settings.DATA_DIR, "reports")
-os.makedirs(REPORTS_DIR, exist_ok=True)
 
-
-async def generate_report_file(
-    report_id: str,
-    file_id: str,
-    report_type: ReportType,
-    report_format: ReportFormat,
-    options: Dict[str, Any],
-    analysis_service: AnalysisService
+def generate_report_file(
+    ctx: JobContext,
+    report: Dict[str, Any],
+    analysis_service: AnalysisService,
+    report_service: ReportService
 ):
     """
-    Génère un fichier de rapport en arrière-plan
+    Génère un fichier de rapport dans le pool de workers des rapports
     
     Args:
-        report_id: Identifiant du rapport
-        file_id: Identifiant du fichier analysé
-        report_type: Type de rapport
-        report_format: Format du rapport
-        options: Options spécifiques
+        ctx: Contexte de la tâche
+        report: Métadonnées du rapport à générer
         analysis_service: Service d'analyse
+        report_service: Service des rapports
     """
+    report_id = report["report_id"]
+    file_id = report["file_id"]
+    report_type = ReportType(report["report_type"])
+    report_format = ReportFormat(report["format"])
+    options = report["options"]
+    
     try:
-        # Récupérer les résultats d'analyse
-        results = await analysis_service.get_analysis_results(file_id)
-        if not results:
-            logger.error(f"Résultats d'analyse introuvables pour le fichier {file_id}")
-            return
+        # Récupérer le récapitulatif de l'analyse
+        summary = analysis_service.get_results_summary(file_id)
+        if not summary:
+            raise ResourceNotFoundError("Résultats d'analyse", file_id)
         
-        # Déterminer le chemin du rapport
-        report_file = os.path.join(REPORTS_DIR, f"{report_id}.{report_format.lower()}")
+        # Répartition par type (seul le champ type est décodé)
+        summary["anomaly_types"] = dict(Counter(
+            anomaly["type"] for anomaly in analysis_service.iter_anomalies(file_id, fields=["type"])
+        ))
+        ctx.check_cancelled()
         
-        # Créer le contenu du rapport selon le format et le type
-        if report_format == ReportFormat.PDF:
-            await generate_pdf_report(report_file, results, report_type, options)
-        elif report_format == ReportFormat.EXCEL:
-            await generate_excel_report(report_file, results, report_type, options)
-        elif report_format == ReportFormat.CSV:
-            await generate_csv_report(report_file, results, report_type, options)
-        elif report_format == ReportFormat.JSON:
-            await generate_json_report(report_file, results, report_type, options)
-        elif report_format == ReportFormat.HTML:
-            await generate_html_report(report_file, results, report_type, options)
-        else:
-            logger.error(f"Format de rapport non supporté: {report_format}")
-            return
+        # Les anomalies sont lues et écrites une à une, projetées sur les colonnes du rapport
+        fields = None if report_format == ReportFormat.JSON else [
+            field for field, _ in report_columns(report_type, options)
+        ]
+        anomalies = analysis_service.iter_anomalies(file_id, fields=fields)
+        file_size = render_report(report["file_path"], report_format, report_type, summary, anomalies, options)
+        report_service.blobs.put_file(report_service.report_key(report), report["file_path"])
             
-        logger.info(f"Rapport {report_id} généré avec succès au format {report_format}")
+        logger.info(f"Rapport {report_id} généré avec succès au format {report_format.value}")
         
-        # Mettre à jour les métadonnées du rapport pour indiquer qu'il est prêt
-        update_report_metadata(report_id, {
+        # Mettre à jour l'index pour indiquer que le rapport est prêt
+        report_service.update_report(report_id, {
             "status": "completed",
-            "file_size": os.path.getsize(report_file),
+            "file_size": file_size,
             "completed_at": datetime.now().isoformat()
         })
         
     except Exception as e:
         logger.error(f"Erreur lors de la génération du rapport {report_id}: {e}", exc_info=e)
-        update_report_metadata(report_id, {
+        report_service.update_report(report_id, {
             "status": "failed",
             "error": str(e)
         })
-
-
-async def generate_pdf_report(file_path: str, results: Any, report_type: ReportType, options: Dict[str, Any]):
-    """Génère un rapport au format PDF"""
-    # Implémentation factice pour l'instant
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"Contenu du rapport PDF pour le type {report_type}\n")
-        f.write(f"Anomalies trouvées: {results.anomaly_count}\n")
-
-
-async def generate_excel_report(file_path: str, results: Any, report_type: ReportType, options: Dict[str, Any]):
-    """Génère un rapport au format Excel"""
-    # Implémentation factice pour l'instant
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"Contenu du rapport Excel pour le type {report_type}\n")
-        f.write(f"Anomalies trouvées: {results.anomaly_count}\n")
-
-
-async def generate_csv_report(file_path: str, results: Any, report_type: ReportType, options: Dict[str, Any]):
-    """Génère un rapport au format CSV"""
-    # Implémentation factice pour l'instant
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"type,description,confidence,lines\n")
-        for anomaly in results.anomalies:
-            f.write(f"{anomaly.type},{anomaly.description},{anomaly.confidence_score},{','.join(map(str, anomaly.line_numbers))}\n")
-
-
-async def generate_json_report(file_path: str, results: Any, report_type: ReportType, options: Dict[str, Any]):
-    """Génère un rapport au format JSON"""
-    import json
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(results.dict(), f, indent=2, default=str)
-
-
-async def generate_html_report(file_path: str, results: Any, report_type: ReportType, options: Dict[str, Any]):
-    """Génère un rapport au format HTML"""
-    # Implémentation factice pour l'instant
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write("<html><head><title>Rapport d'analyse</title></head><body>\n")
-        f.write(f"<h1>Rapport d'analyse - {report_type}</h1>\n")
-        f.write(f"<p>Fichier: {results.filename}</p>\n")
-        f.write(f"<p>Total des écritures: {results.total_entries}</p>\n")
-        f.write(f"<p>Anomalies détectées: {results.anomaly_count}</p>\n")
-        f.write("<h2>Liste des anomalies</h2><ul>\n")
-        for anomaly in results.anomalies:
-            f.write(f"<li>{anomaly.type}: {anomaly.description} (confiance: {anomaly.confidence_score:.2%})</li>\n")
-        f.write("</ul></body></html>\n")
-
-
-def create_report_metadata(
-    report_id: str,
-    file_id: str,
-    report_type: ReportType,
-    report_format: ReportFormat,
-    options: Dict[str, Any]
-) -> Dict[str, Any]:
-    """
-    Crée les métadonnées du rapport
+        return
     
-    Args:
-        report_id: Identifiant du rapport
-        file_id: Identifiant du fichier analysé
-        report_type: Type de rapport
-        report_format: Format du rapport
-        options: Options spécifiques
-    
-    Returns:
-        Métadonnées du rapport
-    """
-    now = datetime.now()
-    expires_at = now + timedelta(days=30)  # Les rapports expirent après 30 jours
-    
-    metadata = {
-        "report_id": report_id,
-        "file_id": file_id,
-        "report_type": report_type.value,
-        "format": report_format.value,
-        "options": options,
-        "status": "pending",
-        "created_at": now.isoformat(),
-        "expires_at": expires_at.isoformat(),
-        "file_path": os.path.join(REPORTS_DIR, f"{report_id}.{report_format.value.lower()}"),
-        "url": f"/api/v1/reports/download/{report_id}"
-    }
-    
-    # Sauvegarder les métadonnées
-    metadata_path = os.path.join(REPORTS_DIR, f"{report_id}_meta.json")
-    import json
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    
-    return metadata
-
-
-def update_report_metadata(report_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Met à jour les métadonnées d'un rapport
-    
-    Args:
-        report_id: Identifiant du rapport
-        updates: Mises à jour à appliquer
-    
-    Returns:
-        Métadonnées mises à jour
-    """
-    metadata_path = os.path.join(REPORTS_DIR, f"{report_id}_meta.json")
-    
-    # Charger les métadonnées actuelles
-    import json
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-    
-    # Appliquer les mises à jour
-    metadata.update(updates)
-    
-    # Sauvegarder les métadonnées mises à jour
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    
-    return metadata
+    report_service.evict_reports()
 
 
-def get_report_metadata(report_id: str) -> Optional[Dict[str, Any]]:
-    """
-    Récupère les métadonnées d'un rapport
-    
-    Args:
-        report_id: Identifiant du rapport
-    
-    Returns:
-        Métadonnées du rapport ou None si introuvable
-    """
-    metadata_path = os.path.join(REPORTS_DIR, f"{report_id}_meta.json")
-    
-    if not os.path.exists(metadata_path):
-        return None
-    
-    import json
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def to_report_response(report: Dict[str, Any]) -> ReportResponse:
+    """Construit la réponse API à partir des métadonnées d'un rapport"""
+    return ReportResponse(
+        report_id=report["report_id"],
+        file_id=report["file_id"],
+        report_type=ReportType(report["report_type"]),
+        format=ReportFormat(report["format"]),
+        url=report["url"],
+        created_at=datetime.fromisoformat(report["created_at"]),
+        expires_at=datetime.fromisoformat(report["expires_at"]) if report.get("expires_at") else None,
+        size_bytes=report.get("file_size")  # Absent tant que le rapport n'est pas prêt
+    )
 
 
 @router.post("/generate", response_model=ReportResponse)
 async def generate_report(
     request: ReportRequest,
-    background_tasks: BackgroundTasks,
-    analysis_service: AnalysisService = Depends(get_analysis_service)
+    analysis_service: AnalysisService = Depends(get_analysis_service),
+    report_service: ReportService = Depends(get_report_service)
 ):
     """
     Génère un rapport à partir des résultats d'analyse
+    
+    Une demande identique à un rapport existant (mêmes résultats d'analyse,
+    type, format et options) renvoie ce rapport, qu'il soit terminé ou en
+    cours de génération.
     """
     try:
         # Vérifier si le fichier a été analysé
-        if not await analysis_service.get_analysis_results(request.file_id):
+        result_version = analysis_service.get_results_version(request.file_id)
+        if result_version is None:
             raise ResourceNotFoundError("Résultats d'analyse", request.file_id)
         
-        # Créer un ID pour le rapport
-        report_id = str(uuid.uuid4())
-        
-        # Créer les métadonnées du rapport
-        metadata = create_report_metadata(
-            report_id=report_id,
+        # Réutiliser un rapport identique, ou enregistrer un nouveau rapport
+        report, render = report_service.create_report(
             file_id=request.file_id,
+            result_version=result_version,
             report_type=request.report_type,
             report_format=request.format,
             options=request.options
         )
         
-        # Générer le rapport en arrière-plan
-        background_tasks.add_task(
-            generate_report_file,
-            report_id=report_id,
-            file_id=request.file_id,
-            report_type=request.report_type,
-            report_format=request.format,
-            options=request.options,
-            analysis_service=analysis_service
-        )
+        if render:
+            # Générer le rapport dans le pool de workers des rapports
+            get_report_job_manager().submit(
+                f"report-{report['report_id']}",
+                generate_report_file,
+                report,
+                analysis_service,
+                report_service
+            )
+        else:
+            logger.info(f"Rapport {report['report_id']} réutilisé pour le fichier {request.file_id} "
+                        f"({report['status']})")
         
         # Renvoyer une réponse immédiate
-        return ReportResponse(
-            report_id=report_id,
-            file_id=request.file_id,
-            report_type=request.report_type,
-            format=request.format,
-            url=metadata["url"],
-            created_at=datetime.fromisoformat(metadata["created_at"]),
-            expires_at=datetime.fromisoformat(metadata["expires_at"]),
-            size_bytes=None  # Pas encore disponible
-        )
+        return to_report_response(report)
         
     except Exception as e:
         if isinstance(e, ResourceNotFoundError):
@@ -278,12 +146,15 @@ async def generate_report(
 
 
 @router.get("/status/{report_id}")
-async def get_report_status(report_id: str):
+async def get_report_status(
+    report_id: str,
+    report_service: ReportService = Depends(get_report_service)
+):
     """
     Récupère le statut d'un rapport
     """
     try:
-        metadata = get_report_metadata(report_id)
+        metadata = report_service.get_report(report_id)
         if not metadata:
             raise ResourceNotFoundError("Rapport", report_id)
         
@@ -303,14 +174,40 @@ async def get_report_status(report_id: str):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du statut: {str(e)}")
 
 
+# Types de contenu des rapports par format
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "json": "application/json",
+    "html": "text/html"
+}
+
+
+def report_etag(report: Dict[str, Any]) -> str:
+    """ETag d'un rapport terminé, dérivé de ses métadonnées (un rapport n'est jamais réécrit)"""
+    digest = hashlib.sha1(
+        f"{report['report_id']}:{report.get('file_size')}:{report.get('completed_at')}".encode("utf-8")
+    ).hexdigest()
+    return f'"{digest[:20]}"'
+
+
 @router.get("/download/{report_id}")
-async def download_report(report_id: str):
+async def download_report(
+    report_id: str,
+    request: Request,
+    report_service: ReportService = Depends(get_report_service)
+):
     """
     Télécharge un rapport
+    
+    Le fichier est envoyé par morceaux. Les requêtes Range (reprise d'un
+    téléchargement) et If-None-Match (cache du navigateur ou d'un proxy)
+    sont prises en charge.
     """
     try:
         # Vérifier si le rapport existe
-        metadata = get_report_metadata(report_id)
+        metadata = report_service.get_report(report_id)
         if not metadata:
             raise ResourceNotFoundError("Rapport", report_id)
         
@@ -318,32 +215,57 @@ async def download_report(report_id: str):
         if metadata["status"] != "completed":
             raise HTTPException(status_code=404, detail=f"Le rapport {report_id} n'est pas encore prêt")
         
-        # Déterminer le chemin du fichier
-        file_path = metadata["file_path"]
-        if not os.path.exists(file_path):
+        # Localiser le fichier dans le stockage
+        blobs = report_service.blobs
+        report_key = report_service.report_key(metadata)
+        info = blobs.stat(report_key)
+        if info is None:
             raise ResourceNotFoundError("Fichier de rapport", report_id)
+        file_size = info.size
         
-        # Déterminer le type de contenu
-        content_type_map = {
-            "pdf": "application/pdf",
-            "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            "csv": "text/csv",
-            "json": "application/json",
-            "html": "text/html"
+        # En-têtes de cache, valables jusqu'à l'expiration du rapport
+        etag = report_etag(metadata)
+        max_age = max(0, int((datetime.fromisoformat(metadata["expires_at"]) - datetime.now()).total_seconds()))
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={max_age}",
+            "Accept-Ranges": "bytes"
         }
-        content_type = content_type_map.get(metadata["format"].lower(), "application/octet-stream")
         
-        # Lire le fichier et le renvoyer
-        with open(file_path, "rb") as f:
-            content = f.read()
-            
+        # Le client possède déjà cette version du rapport
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
         # Construire le nom de fichier de téléchargement
         filename = f"report_{report_id}_{metadata['report_type']}.{metadata['format'].lower()}"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        content_type = CONTENT_TYPES.get(metadata["format"].lower(), "application/octet-stream")
+        
+        # Intervalle demandé (ignoré si If-Range désigne une autre version)
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_range_header(request.headers.get("range"), file_size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{file_size}"})
+        
+        if byte_range is None:
+            headers["Content-Length"] = str(file_size)
+            return StreamingResponse(
+                blobs.stream(report_key, chunk_size=DOWNLOAD_CHUNK_SIZE),
+                media_type=content_type,
+                headers=headers
+            )
         
-        return Response(
-            content=content,
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            blobs.stream(report_key, start=start, length=end - start + 1, chunk_size=DOWNLOAD_CHUNK_SIZE),
+            status_code=206,
             media_type=content_type,
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            headers=headers
         )
         
     except Exception as e:
@@ -356,52 +278,22 @@ async def download_report(report_id: str):
 @router.get("/list", response_model=List[ReportResponse])
 async def list_reports(
     file_id: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="Filtre par statut (pending, completed, failed)"),
     page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100)
+    page_size: int = Query(20, ge=1, le=100),
+    report_service: ReportService = Depends(get_report_service)
 ):
     """
-    Liste les rapports disponibles avec pagination
+    Liste les rapports disponibles avec pagination, du plus récent au plus ancien
     """
     try:
-        reports = []
-        
-        # Charger tous les fichiers de métadonnées
-        for filename in os.listdir(REPORTS_DIR):
-            if not filename.endswith("_meta.json"):
-                continue
-            
-            # Charger les métadonnées
-            with open(os.path.join(REPORTS_DIR, filename), "r", encoding="utf-8") as f:
-                import json
-                metadata = json.load(f)
-            
-            # Filtrer par file_id si spécifié
-            if file_id and metadata["file_id"] != file_id:
-                continue
-            
-            # Convertir les chaînes ISO en objets datetime
-            created_at = datetime.fromisoformat(metadata["created_at"])
-            expires_at = datetime.fromisoformat(metadata["expires_at"]) if "expires_at" in metadata else None
-            
-            reports.append(ReportResponse(
-                report_id=metadata["report_id"],
-                file_id=metadata["file_id"],
-                report_type=ReportType(metadata["report_type"]),
-                format=ReportFormat(metadata["format"]),
-                url=metadata["url"],
-                created_at=created_at,
-                expires_at=expires_at,
-                size_bytes=metadata.get("file_size")
-            ))
-        
-        # Trier par date de création (plus récent en premier)
-        reports.sort(key=lambda r: r.created_at, reverse=True)
-        
-        # Pagination
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        
-        return reports[start_idx:end_idx]
+        reports = report_service.list_reports(
+            file_id=file_id,
+            status=status,
+            limit=page_size,
+            offset=(page - 1) * page_size
+        )
+        return [to_report_response(report) for report in reports]
         
     except Exception as e:
         logger.error(f"Erreur lors de la liste des rapports: {e}", exc_info=e)
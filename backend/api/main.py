@@ -13,6 +13,8 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 from backend.api.api import create_app
 from backend.api.endpoints import analysis, reports, generation, models, healthcheck
 from backend.core.config import get_settings
+from backend.core.jobs import get_batch_job_manager, get_job_manager
+from backend.services.retention_service import get_retention_service
 
 # Configuration du logging
 logging.basicConfig(
@@ -56,8 +58,21 @@ async def startup_event():
     os.makedirs(os.path.join(settings.DATA_DIR, "reports"), exist_ok=True)
     os.makedirs(os.path.join(settings.DATA_DIR, "logs"), exist_ok=True)
     
+    # Nettoyage périodique des données selon les politiques de rétention
+    if settings.RETENTION_ENABLED:
+        get_retention_service().start()
+    
     logger.info(f"Application {settings.APP_NAME} démarrée avec succès en mode {settings.ENV}")
 
+# À l'arrêt de l'application
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Exécuté à l'arrêt de l'application"""
+    # Annuler les tâches de fond encore en cours
+    get_job_manager().shutdown(wait=False)
+    get_batch_job_manager().shutdown(wait=False)
+    get_retention_service().stop()
+
 # Point d'entrée pour uvicorn
 if __name__ == "__main__":
     import uvicorn
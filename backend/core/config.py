@@ -2,7 +2,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
-from typing import List
+from typing import Any, Dict, List, Optional
 
 class Settings(BaseSettings):
     """Configuration de l'application basée sur les variables d'environnement"""
@@ -23,9 +23,76 @@ class Settings(BaseSettings):
     
     # Fichiers
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100 MB
+    CHUNKED_UPLOAD_MAX_SIZE: int = 20 * 1024 * 1024 * 1024  # 20 GB par upload par morceaux
+    CHUNKED_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # Taille des morceaux par défaut
+    CHUNKED_UPLOAD_TTL_HOURS: int = 24  # Durée de vie d'un upload par morceaux inachevé
     DATA_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
     PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    
+    STORAGE_SHARD_LEVELS: int = 2  # Niveaux de sous-répertoires des données (0: organisation à plat)
+
+    # Stockage des données ("local": fichiers sous DATA_DIR, "s3": bucket compatible S3)
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = "audit-tool"
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None  # Serveur compatible S3 (MinIO, moto_server...)
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PART_SIZE: int = 8 * 1024 * 1024  # Taille des parties transférées en parallèle
+    S3_MAX_CONCURRENCY: int = 8  # Nombre de parties transférées simultanément
+
+    # Tâches de fond
+    JOB_WORKERS: int = 2  # Nombre de tâches longues exécutées simultanément
+    REPORT_WORKERS: int = 2  # Nombre de rapports rendus simultanément
+    JOB_HISTORY_TTL_SECONDS: int = 3600  # Durée pendant laquelle l'état d'une tâche terminée reste en mémoire
+    JOB_HISTORY_MAX: int = 1000  # Nombre maximal de tâches terminées gardées en mémoire par pool
+
+    # Préparation des fichiers à l'upload (parsing et caractéristiques en tâche de fond)
+    PREPARSE_ON_UPLOAD: bool = False  # Valeur par défaut, modifiable pour chaque upload
+    PREPARSE_WORKERS: int = 1  # Nombre de fichiers préparés simultanément
+    PREPARSE_NICE: int = 10  # Baisse de priorité des threads de préparation (Unix)
+
+    # Analyses par lot (plusieurs fichiers, modèles partagés)
+    BATCH_WORKERS: int = 2  # Nombre de fichiers d'un lot analysés simultanément
+    BATCH_MAX_FILES: int = 1000  # Nombre maximal de fichiers par lot
+
+    # Index des empreintes d'écritures entre fichiers (doublons et flux intragroupe)
+    FINGERPRINT_INDEX_ENABLED: bool = True
+    FINGERPRINT_MAX_SEGMENTS: int = 8  # Segments triés au-delà desquels les plus petits sont fusionnés
+    INTERCOMPANY_ACCOUNT_PREFIXES: List[str] = ["451"]  # Comptes des flux intragroupe (451 Groupe)
+
+    # Analyse incrémentale des FEC cumulés (seules les écritures nouvelles ou modifiées sont analysées),
+    # demandée analyse par analyse (options incremental ou base_file_id)
+    INCREMENTAL_ANALYSIS_ENABLED: bool = True  # Enregistrer les empreintes de référence de chaque analyse
+    INCREMENTAL_MIN_OVERLAP: float = 0.8  # Part minimale des écritures précédentes retrouvées
+
+    # Rapports
+    REPORT_TTL_DAYS: int = 30  # Durée de conservation des rapports générés
+    REPORT_CACHE_MAX_SIZE: int = 1024 * 1024 * 1024  # 1 GB de rapports en cache
+
+    # Rétention des données (par catégorie: âge maximal en jours, taille totale, nombre d'éléments)
+    # Désactivée par défaut. Une fois activée (RETENTION_ENABLED=true), les FEC uploadés et
+    # les résultats d'analyse ne sont jamais supprimés tant que leur politique est vide; pour
+    # les inclure, la définir dans .env, par exemple:
+    # RETENTION_POLICIES='{"uploads": {"max_age_days": 90, "max_size": 21474836480},
+    #                      "results": {"max_age_days": 90}, ...}'
+    # (la variable remplace tout le dictionnaire: reprendre les autres catégories)
+    RETENTION_ENABLED: bool = False
+    RETENTION_INTERVAL: int = 3600  # Secondes entre deux passes de nettoyage
+    RETENTION_BATCH_SIZE: int = 200  # Suppressions maximales par catégorie et par passe
+    RETENTION_POLICIES: Dict[str, Dict[str, Any]] = {
+        "uploads": {},
+        "results": {},
+        "jobs": {"max_age_days": 30, "max_count": 10000},
+        "reports": {"max_count": 5000},
+        "generated": {"max_age_days": 7, "max_size": 5 * 1024 * 1024 * 1024},
+        "logs": {"max_age_days": 30, "max_count": 1000},
+        "stats": {"max_age_days": 90, "max_size": 50 * 1024 * 1024},
+    }
+
+    # Entraînement
+    CORPUS_CACHE_MAX_SIZE: int = 500 * 1024 * 1024  # 500 MB de corpus synthétiques en cache
+
     class Config:
         """Configuration Pydantic"""
         env_file = ".env"
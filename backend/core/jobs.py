@@ -0,0 +1,316 @@
+"""
+Gestion des tâches de fond exécutées dans un pool de workers.
+Les tâches reçoivent un contexte qui leur permet de publier leur progression
+et de vérifier si une annulation a été demandée.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from backend.core.config import get_settings
+from backend.utils.os_utils import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class JobCancelledError(Exception):
+    """Levée dans une tâche lorsque son annulation a été demandée"""
+
+
+class JobContext:
+    """Contexte transmis à une tâche en cours d'exécution"""
+
+    def __init__(self, job_id: str, on_update: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialise le contexte d'une tâche
+
+        Args:
+            job_id: Identifiant de la tâche
+            on_update: Fonction appelée à chaque mise à jour de l'état
+        """
+        self.job_id = job_id
+        self.state: Dict[str, Any] = {
+            "job_id": job_id,
+            "status": "pending",
+            "progress": 0,
+            "step": None,
+            "message": "",
+            "start_time": None,
+            "end_time": None,
+        }
+        self._on_update = on_update
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Indique si l'annulation de la tâche a été demandée"""
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Demande l'annulation de la tâche"""
+        self._cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        """
+        Interrompt la tâche si son annulation a été demandée
+
+        Raises:
+            JobCancelledError: Si la tâche a été annulée
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelledError(f"Tâche {self.job_id} annulée")
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None,
+               step: Optional[str] = None, **extra: Any) -> None:
+        """
+        Met à jour l'état de la tâche et le publie
+
+        Args:
+            progress: Progression (0-100)
+            message: Message lisible décrivant l'étape en cours
+            step: Identifiant court de l'étape en cours
+            **extra: Champs supplémentaires à enregistrer dans l'état
+        """
+        with self._lock:
+            if progress is not None:
+                self.state["progress"] = round(max(0.0, min(100.0, float(progress))), 2)
+            if message is not None:
+                self.state["message"] = message
+            if step is not None:
+                self.state["step"] = step
+            self.state.update(extra)
+            snapshot = dict(self.state)
+
+        if self._on_update:
+            try:
+                self._on_update(snapshot)
+            except Exception as e:
+                logger.error(f"Erreur lors de la publication de l'état de la tâche {self.job_id}: {str(e)}")
+
+
+class JobManager:
+    """Pool de workers exécutant les tâches longues hors de la boucle asyncio"""
+
+    def __init__(self, max_workers: int = 2, name: str = "job", nice: int = 0):
+        """
+        Initialise le gestionnaire de tâches
+
+        Args:
+            max_workers: Nombre maximal de tâches exécutées simultanément
+            name: Préfixe des threads du pool
+            nice: Baisse de priorité appliquée une fois à chaque thread du pool (Unix)
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name,
+            initializer=lower_thread_priority if nice > 0 else None, initargs=(nice,)
+        )
+        self._jobs: Dict[str, JobContext] = {}
+        self._futures: Dict[str, Future] = {}
+        # Tâches terminées (date de fin), oubliées après JOB_HISTORY_TTL_SECONDS ou au-delà
+        # de JOB_HISTORY_MAX: leur état reste disponible dans les fichiers de statut persistés
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        # Réentrant: la publication de l'état initial a lieu sous ce verrou
+        self._lock = threading.RLock()
+
+    def submit(self, job_id: str, func: Callable[..., Any], *args: Any,
+               on_update: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs: Any) -> Future:
+        """
+        Soumet une tâche au pool
+
+        La fonction est appelée avec le contexte de la tâche comme premier argument.
+
+        Args:
+            job_id: Identifiant unique de la tâche
+            func: Fonction à exécuter
+            on_update: Fonction appelée à chaque mise à jour de l'état
+            *args, **kwargs: Arguments transmis à la fonction
+
+        Returns:
+            Future représentant l'exécution de la tâche
+        """
+        ctx = JobContext(job_id, on_update=on_update)
+        with self._lock:
+            self._prune()
+            existing = self._futures.get(job_id)
+            if existing is not None and not existing.done():
+                raise ValueError(f"Une tâche avec l'identifiant {job_id} est déjà en cours")
+
+            # État initial publié avant que le worker ne puisse le remplacer
+            ctx.update(progress=0, message="En attente d'un worker", status="pending")
+            future = self._executor.submit(self._run, ctx, func, args, kwargs)
+            self._jobs[job_id] = ctx
+            self._futures[job_id] = future
+            self._finished.pop(job_id, None)
+        future.add_done_callback(lambda done: self._mark_finished(job_id, done))
+        return future
+
+    def _mark_finished(self, job_id: str, future: Future) -> None:
+        """Enregistre la fin d'une tâche et oublie les tâches terminées trop anciennes"""
+        with self._lock:
+            if self._futures.get(job_id) is future:
+                self._finished[job_id] = time.monotonic()
+                self._finished.move_to_end(job_id)
+            self._prune()
+
+    def _prune(self) -> None:
+        """Oublie les tâches terminées depuis plus de JOB_HISTORY_TTL_SECONDS ou au-delà de JOB_HISTORY_MAX"""
+        expiry = time.monotonic() - settings.JOB_HISTORY_TTL_SECONDS
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > expiry and len(self._finished) <= settings.JOB_HISTORY_MAX:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+
+    def _run(self, ctx: JobContext, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Exécute une tâche en gérant son cycle de vie"""
+        if ctx.cancelled:
+            ctx.update(status="cancelled", message="Tâche annulée avant son démarrage",
+                       end_time=datetime.now().isoformat())
+            raise JobCancelledError(f"Tâche {ctx.job_id} annulée")
+
+        ctx.update(status="running", start_time=datetime.now().isoformat())
+        try:
+            result = func(ctx, *args, **kwargs)
+        except JobCancelledError:
+            logger.info(f"Tâche {ctx.job_id} annulée")
+            ctx.update(status="cancelled", message="Tâche annulée", end_time=datetime.now().isoformat())
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de l'exécution de la tâche {ctx.job_id}: {str(e)}", exc_info=True)
+            ctx.update(status="failed", progress=100, message=f"Erreur: {str(e)}",
+                       end_time=datetime.now().isoformat())
+            raise
+
+        ctx.update(status="completed", progress=100, end_time=datetime.now().isoformat())
+        return result
+
+    async def run(self, job_id: str, func: Callable[..., Any], *args: Any,
+                  on_update: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs: Any) -> Any:
+        """
+        Soumet une tâche et attend son résultat sans bloquer la boucle asyncio
+
+        Returns:
+            Résultat de la fonction exécutée
+        """
+        future = self.submit(job_id, func, *args, on_update=on_update, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Demande l'annulation d'une tâche
+
+        Args:
+            job_id: Identifiant de la tâche
+
+        Returns:
+            True si la tâche existe et n'était pas terminée
+        """
+        with self._lock:
+            ctx = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if ctx is None or future is None or future.done():
+            return False
+        ctx.cancel()
+        return True
+
+    def get_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère l'état courant d'une tâche connue de ce processus
+
+        Args:
+            job_id: Identifiant de la tâche
+
+        Returns:
+            Copie de l'état de la tâche ou None si inconnue
+        """
+        with self._lock:
+            ctx = self._jobs.get(job_id)
+        return dict(ctx.state) if ctx else None
+
+    def is_running(self, job_id: str) -> bool:
+        """Indique si une tâche est en attente ou en cours d'exécution"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    async def wait(self, job_id: str) -> Any:
+        """
+        Attend la fin d'une tâche sans bloquer la boucle asyncio
+
+        Args:
+            job_id: Identifiant de la tâche
+
+        Returns:
+            Résultat de la tâche, ou None si elle est inconnue, a échoué ou a été annulée
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception:
+            return None
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Annule les tâches en cours et arrête le pool"""
+        with self._lock:
+            contexts = list(self._jobs.values())
+        for ctx in contexts:
+            ctx.cancel()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache()
+def get_job_manager() -> JobManager:
+    """
+    Récupère l'instance unique du gestionnaire de tâches
+
+    Returns:
+        Instance du gestionnaire de tâches
+    """
+    return JobManager(max_workers=settings.JOB_WORKERS, name="audit-job")
+
+
+@lru_cache()
+def get_report_job_manager() -> JobManager:
+    """
+    Récupère le pool de workers dédié au rendu des rapports
+
+    Returns:
+        Instance du gestionnaire de tâches des rapports
+    """
+    return JobManager(max_workers=settings.REPORT_WORKERS, name="audit-report")
+
+
+@lru_cache()
+def get_preparse_job_manager() -> JobManager:
+    """
+    Récupère le pool de workers dédié à la préparation des fichiers uploadés
+
+    Returns:
+        Instance du gestionnaire de tâches de préparation
+    """
+    return JobManager(max_workers=settings.PREPARSE_WORKERS, name="audit-preparse",
+                      nice=settings.PREPARSE_NICE)
+
+
+@lru_cache()
+def get_batch_job_manager() -> JobManager:
+    """
+    Récupère le pool de workers dédié aux analyses par lot
+
+    Returns:
+        Instance du gestionnaire de tâches des lots
+    """
+    return JobManager(max_workers=settings.BATCH_WORKERS, name="audit-batch")
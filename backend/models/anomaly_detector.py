@@ -8,13 +8,19 @@ import asyncio
 from datetime import datetime
 from functools import lru_cache
 
-from backend.models.schemas import Anomaly, AnomalyType
+import numpy as np
+
+from backend.models.schemas import AnomalyType
+from backend.models.anomaly_records import AnomalyRecord
 from backend.models.trained_detector import get_trained_detector, TrainedDetector
 from backend.core.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Nombre maximal d'anomalies remontées par analyse (les plus sûres)
+MAX_ANOMALIES = 100
+
 
 class AnomalyDetector:
     """
@@ -30,9 +36,25 @@ class AnomalyDetector:
             use_ml: Si True, utilise les modèles ML si disponibles
         """
         self.use_ml = use_ml
-        self._ml_detector = get_trained_detector() if use_ml else None
+        if use_ml:
+            get_trained_detector()
+    
+    @property
+    def _ml_detector(self) -> Optional[TrainedDetector]:
+        """Détecteur du modèle actif (rechargé après l'activation d'un nouveau modèle)"""
+        return get_trained_detector() if self.use_ml else None
+    
+    def detection_settings(self) -> Dict[str, Any]:
+        """
+        Paramètres dont dépendent les anomalies détectées
+        
+        Returns:
+            Version du modèle, seuils des règles et nombre maximal d'anomalies remontées
+        """
+        detector = self._ml_detector or TrainedDetector()
+        return {**detector.detection_settings(), "max_anomalies": MAX_ANOMALIES}
     
-    async def detect_anomalies(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    async def detect_anomalies(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """
         Détecte les anomalies dans les données fournies
         
@@ -66,7 +88,41 @@ class AnomalyDetector:
         
         return result
     
-    async def _detect_with_rules(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    async def detect_anomalies_columns(self,
+                                       columns: Dict[str, np.ndarray],
+                                       line_offset: int = 0,
+                                       features: Optional[Dict[str, Any]] = None,
+                                       limit: bool = True) -> List[AnomalyRecord]:
+        """
+        Détecte les anomalies dans un lot d'écritures au format colonnaire
+        
+        Args:
+            columns: Colonnes des écritures (format de generation_engine / columnar)
+            line_offset: Nombre de lignes précédant ce lot (numéros de ligne globaux)
+            features: Caractéristiques ML déjà extraites de ces colonnes (optionnel)
+            limit: Si False, toutes les anomalies sont renvoyées (sans MAX_ANOMALIES)
+        
+        Returns:
+            Liste d'anomalies détectées
+        """
+        row_count = len(next(iter(columns.values()), []))
+        if row_count == 0:
+            logger.warning("Aucune entrée à analyser pour la détection d'anomalies")
+            return []
+        
+        logger.info(f"Début de la détection d'anomalies sur {row_count} écritures (colonnaire)")
+        start_time = datetime.now()
+        
+        detector = self._ml_detector or TrainedDetector()
+        anomalies = await detector.detect_anomalies_columns(columns, line_offset=line_offset, features=features)
+        result = await self._consolidate_anomalies(anomalies, limit=limit)
+        
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"Détection terminée: {len(result)} anomalies trouvées en {duration:.2f} secondes")
+        
+        return result
+    
+    async def _detect_with_rules(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """
         Méthode de détection basée sur des règles (fallback si ML non disponible)
         
@@ -80,12 +136,13 @@ class AnomalyDetector:
         detector = self._ml_detector or TrainedDetector()
         return await detector.detect_anomalies(entries)
     
-    async def _consolidate_anomalies(self, anomalies: List[Anomaly]) -> List[Anomaly]:
+    async def _consolidate_anomalies(self, anomalies: List[AnomalyRecord], limit: bool = True) -> List[AnomalyRecord]:
         """
         Consolide et filtre les anomalies détectées
         
         Args:
             anomalies: Liste des anomalies brutes détectées
+            limit: Si False, les anomalies sont triées mais pas limitées à MAX_ANOMALIES
             
         Returns:
             Liste des anomalies consolidées
@@ -94,14 +151,14 @@ class AnomalyDetector:
         threshold = 0.3  # Seuil minimal de confiance
         filtered = [a for a in anomalies if a.confidence_score >= threshold]
         
-        # Trier par score de confiance (décroissant)
-        sorted_anomalies = sorted(filtered, key=lambda a: a.confidence_score, reverse=True)
+        # Trier par score de confiance (décroissant), puis par première ligne concernée: à score
+        # égal, les anomalies conservées ne dépendent pas de l'ordre des contrôles (analyse incrémentale)
+        sorted_anomalies = sorted(filtered, key=lambda a: (-a.confidence_score, min(a.line_numbers, default=0)))
         
         # Limiter le nombre total d'anomalies remontées
-        max_anomalies = 100
-        if len(sorted_anomalies) > max_anomalies:
-            logger.info(f"Limitation à {max_anomalies} anomalies sur {len(sorted_anomalies)} détectées")
-            return sorted_anomalies[:max_anomalies]
+        if limit and len(sorted_anomalies) > MAX_ANOMALIES:
+            logger.info(f"Limitation à {MAX_ANOMALIES} anomalies sur {len(sorted_anomalies)} détectées")
+            return sorted_anomalies[:MAX_ANOMALIES]
         
         return sorted_anomalies
 
@@ -0,0 +1,256 @@
+"""
+Représentation compacte des anomalies détectées.
+
+Les détecteurs produisent des AnomalyRecord (classe à __slots__, sans
+validation Pydantic, sans uuid ni horodatage par anomalie). Les résultats sont
+accumulés dans un AnomalyColumnWriter, qui attribue identifiants et
+horodatages par lot et les enregistre au format colonnaire. Les modèles
+Pydantic Anomaly ne sont construits qu'à la frontière de l'API, pour la page
+de résultats demandée (AnomalyColumns.page).
+"""
+import time
+import uuid
+from array import array
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Iterator
+
+import numpy as np
+
+from backend.models.schemas import Anomaly, AnomalyType
+from backend.utils.columnar import save_columns, load_columns
+from backend.utils.json_utils import json_dumps, json_loads
+
+# Codes entiers des types d'anomalies (ordre de l'énumération)
+ANOMALY_TYPES: List[AnomalyType] = list(AnomalyType)
+_TYPE_CODES: Dict[AnomalyType, int] = {anomaly_type: code for code, anomaly_type in enumerate(ANOMALY_TYPES)}
+
+# Séparateur des numéros de ligne dans la colonne line_numbers
+_LINE_SEP = ","
+
+
+def make_anomaly_id(run_id: str, index: int) -> str:
+    """Identifiant d'une anomalie à partir de l'identifiant du lot et de son rang"""
+    return f"anom-{run_id}-{index}"
+
+
+class AnomalyRecord:
+    """Anomalie détectée, sans identifiant ni horodatage"""
+
+    __slots__ = ("type", "description", "confidence_score", "line_numbers", "related_data")
+
+    def __init__(self,
+                 type: AnomalyType,
+                 description: str,
+                 confidence_score: float,
+                 line_numbers: List[int],
+                 related_data: Optional[Dict[str, Any]] = None):
+        self.type = type
+        self.description = description
+        self.confidence_score = float(confidence_score)
+        self.line_numbers = line_numbers
+        self.related_data = related_data
+
+    def __repr__(self) -> str:
+        return (f"AnomalyRecord(type={self.type.value!r}, confidence_score={self.confidence_score:.3f}, "
+                f"line_numbers={self.line_numbers!r})")
+
+    def to_anomaly(self, anomaly_id: str, detected_at: datetime) -> Anomaly:
+        """Construit le modèle Pydantic correspondant"""
+        return Anomaly(
+            id=anomaly_id,
+            type=self.type,
+            description=self.description,
+            confidence_score=min(1.0, max(0.0, self.confidence_score)),
+            line_numbers=self.line_numbers,
+            related_data=self.related_data or {},
+            detected_at=detected_at
+        )
+
+    def to_dict(self, anomaly_id: str, detected_at: datetime) -> Dict[str, Any]:
+        """Dictionnaire JSON-sérialisable équivalent à Anomaly.model_dump(mode="json")"""
+        return {
+            "id": anomaly_id,
+            "type": self.type.value,
+            "description": self.description,
+            "confidence_score": min(1.0, max(0.0, self.confidence_score)),
+            "line_numbers": list(self.line_numbers),
+            "related_data": self.related_data or {},
+            "detected_at": detected_at.isoformat()
+        }
+
+
+class AnomalyColumnWriter:
+    """
+    Accumule des anomalies dans des colonnes en mémoire (ajout uniquement)
+
+    Les identifiants sont dérivés d'un identifiant de lot et du rang de
+    l'anomalie ; l'horodatage est commun à toutes les anomalies d'un même ajout.
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        """
+        Args:
+            run_id: Identifiant du lot d'anomalies (aléatoire si None)
+        """
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._types = array("B")
+        self._confidence = array("d")
+        self._detected_at = array("d")
+        self._first_line = array("q")
+        self._line_numbers: List[str] = []
+        self._descriptions: List[str] = []
+        self._related: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def append(self, record: AnomalyRecord, detected_at: Optional[float] = None) -> None:
+        """
+        Ajoute une anomalie
+
+        Args:
+            record: Anomalie à ajouter
+            detected_at: Horodatage (timestamp Unix, maintenant si None)
+        """
+        self._types.append(_TYPE_CODES[AnomalyType(record.type)])
+        self._confidence.append(record.confidence_score)
+        self._detected_at.append(time.time() if detected_at is None else detected_at)
+        self._first_line.append(record.line_numbers[0] if record.line_numbers else 0)
+        self._line_numbers.append(_LINE_SEP.join(map(str, record.line_numbers)))
+        self._descriptions.append(record.description)
+        self._related.append(json_dumps(record.related_data) if record.related_data else "")
+
+    def extend(self, records: Iterable[AnomalyRecord], detected_at: Optional[float] = None) -> int:
+        """
+        Ajoute un lot d'anomalies détectées ensemble
+
+        Args:
+            records: Anomalies à ajouter
+            detected_at: Horodatage commun (timestamp Unix, maintenant si None)
+
+        Returns:
+            Nombre d'anomalies ajoutées
+        """
+        timestamp = time.time() if detected_at is None else detected_at
+        before = len(self)
+        for record in records:
+            self.append(record, timestamp)
+        return len(self) - before
+
+    def to_columns(self) -> Dict[str, np.ndarray]:
+        """Colonnes des anomalies accumulées"""
+        return {
+            "type": np.frombuffer(self._types, dtype=np.uint8).copy(),
+            "confidence_score": np.frombuffer(self._confidence, dtype=np.float64).copy(),
+            "detected_at": np.frombuffer(self._detected_at, dtype=np.float64).copy(),
+            "first_line": np.frombuffer(self._first_line, dtype=np.int64).copy(),
+            "line_numbers": np.asarray(self._line_numbers, dtype=object),
+            "description": np.asarray(self._descriptions, dtype=object),
+            "related_data": np.asarray(self._related, dtype=object),
+        }
+
+    def view(self) -> "AnomalyColumns":
+        """Vue en lecture (copie) des anomalies accumulées"""
+        return AnomalyColumns(self.to_columns(), {"run_id": self.run_id})
+
+    def save(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Enregistre les anomalies au format colonnaire
+
+        Args:
+            path: Chemin du fichier (.npz)
+            metadata: Métadonnées complémentaires
+
+        Returns:
+            Taille du fichier écrit en octets
+        """
+        meta = {"run_id": self.run_id}
+        meta.update(metadata or {})
+        return save_columns(path, self.to_columns(), metadata=meta)
+
+
+class AnomalyColumns:
+    """Anomalies stockées au format colonnaire, matérialisées à la demande"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], metadata: Optional[Dict[str, Any]] = None):
+        self.columns = columns
+        self.metadata = metadata or {}
+        self.run_id = self.metadata.get("run_id", "")
+
+    @classmethod
+    def load(cls, path: str) -> "AnomalyColumns":
+        """Charge les anomalies d'un fichier colonnaire"""
+        columns, metadata = load_columns(path)
+        return cls(columns, metadata)
+
+    def __len__(self) -> int:
+        return len(self.columns["type"])
+
+    def type_counts(self) -> Dict[str, int]:
+        """Nombre d'anomalies par type"""
+        counts = np.bincount(self.columns["type"], minlength=len(ANOMALY_TYPES))
+        return {ANOMALY_TYPES[code].value: int(n) for code, n in enumerate(counts.tolist()) if n}
+
+    def record(self, index: int) -> AnomalyRecord:
+        """Anomalie de rang index"""
+        lines = str(self.columns["line_numbers"][index])
+        related = str(self.columns["related_data"][index])
+        return AnomalyRecord(
+            type=ANOMALY_TYPES[int(self.columns["type"][index])],
+            description=str(self.columns["description"][index]),
+            confidence_score=float(self.columns["confidence_score"][index]),
+            line_numbers=[int(n) for n in lines.split(_LINE_SEP)] if lines else [],
+            related_data=json_loads(related) if related else {}
+        )
+
+    def _identity(self, index: int):
+        """Identifiant et horodatage de l'anomalie de rang index"""
+        return (make_anomaly_id(self.run_id, index),
+                datetime.fromtimestamp(float(self.columns["detected_at"][index])))
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[Anomaly]:
+        """
+        Construit les modèles Pydantic d'une page d'anomalies
+
+        Args:
+            offset: Rang de la première anomalie
+            limit: Nombre maximal d'anomalies (toutes les suivantes si None)
+
+        Returns:
+            Anomalies de la page
+        """
+        stop = len(self) if limit is None else min(len(self), offset + limit)
+        return [self.record(i).to_anomaly(*self._identity(i)) for i in range(max(0, offset), stop)]
+
+    def iter_dicts(self,
+                   start: int = 0,
+                   stop: Optional[int] = None,
+                   fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt les anomalies sous forme de dictionnaires JSON, sans modèle Pydantic
+
+        Seuls les champs demandés sont décodés (related_data n'est par exemple
+        pas relu s'il ne fait pas partie de la projection).
+
+        Args:
+            start: Rang de la première anomalie
+            stop: Rang de fin exclu (toutes les suivantes si None)
+            fields: Champs à produire (tous ceux du modèle Anomaly si None)
+
+        Yields:
+            Dictionnaires équivalents à Anomaly.model_dump(mode="json")
+        """
+        columns = self.columns
+        getters = {
+            "id": lambda i: make_anomaly_id(self.run_id, i),
+            "type": lambda i: ANOMALY_TYPES[int(columns["type"][i])].value,
+            "description": lambda i: str(columns["description"][i]),
+            "confidence_score": lambda i: min(1.0, max(0.0, float(columns["confidence_score"][i]))),
+            "line_numbers": lambda i: [int(n) for n in str(columns["line_numbers"][i]).split(_LINE_SEP) if n],
+            "related_data": lambda i: json_loads(str(columns["related_data"][i]) or "{}"),
+            "detected_at": lambda i: datetime.fromtimestamp(float(columns["detected_at"][i])).isoformat(),
+        }
+        selected = [(name, getters[name]) for name in (fields or getters) if name in getters]
+        stop = len(self) if stop is None else min(len(self), stop)
+        for i in range(max(0, start), stop):
+            yield {name: getter(i) for name, getter in selected}
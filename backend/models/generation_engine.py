@@ -0,0 +1,762 @@
+"""
+Moteur de génération de données FEC synthétiques.
+
+Le moteur est sans état : chaque génération est décrite par une configuration
+immuable (GenerationConfig) et par un scénario (Scenario) qui fixe la
+répartition des types d'écritures (journaux) et le profil des anomalies
+injectées. Les écritures sont produites directement au format colonnaire
+canonique (CANONICAL_FIELDS), consommable par les détecteurs sans passer par
+un fichier CSV.
+
+Les générateurs historiques (MyFECGenerator, FECGenerator, GeneratorAdapter)
+s'appuient sur ce moteur.
+"""
+import hashlib
+import logging
+from dataclasses import dataclass, field, asdict, replace
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from backend.models.schemas import AnomalyType
+
+logger = logging.getLogger(__name__)
+
+# Champs du format colonnaire canonique, dans l'ordre des colonnes FEC
+CANONICAL_FIELDS = [
+    "journal_code", "journal_lib", "ecr_num", "ecr_date", "compte_num", "compte_lib",
+    "comp_aux_num", "comp_aux_lib", "piece_ref", "piece_date", "ecriture_lib",
+    "debit_montant", "credit_montant", "ecr_lettr", "date_lettr", "valid_date",
+    "montant_devise", "id_devise",
+]
+NUMERIC_FIELDS = ("debit_montant", "credit_montant", "montant_devise")
+
+# --- Données de référence ---
+
+ACCOUNTS = {
+    # Classe 1 - Comptes de capitaux
+    "101000": "Capital",
+    "106100": "Réserve légale",
+    "120000": "Résultat de l'exercice",
+    "164000": "Emprunts auprès des établissements de crédit",
+
+    # Classe 2 - Comptes d'immobilisations
+    "205000": "Logiciels",
+    "213500": "Installations générales",
+    "218300": "Matériel de bureau et informatique",
+    "281830": "Amortissements du matériel de bureau",
+
+    # Classe 4 - Comptes de tiers
+    "401000": "Fournisseurs",
+    "411000": "Clients",
+    "421000": "Personnel - rémunérations dues",
+    "431000": "Sécurité sociale",
+    "445660": "TVA déductible",
+    "445710": "TVA collectée",
+    "455000": "Associés - comptes courants",
+
+    # Classe 5 - Comptes financiers
+    "512000": "Banque",
+    "530000": "Caisse",
+
+    # Classe 6 - Comptes de charges
+    "601000": "Achats de matières premières",
+    "606300": "Fournitures d'entretien et petit équipement",
+    "606400": "Fournitures administratives",
+    "606800": "Autres matières et fournitures",
+    "613200": "Locations immobilières",
+    "615000": "Entretien et réparations",
+    "616000": "Primes d'assurance",
+    "622600": "Honoraires",
+    "623000": "Publicité, publications, relations publiques",
+    "625100": "Voyages et déplacements",
+    "626000": "Frais postaux et de télécommunications",
+    "627000": "Services bancaires",
+    "641100": "Salaires et appointements",
+    "645000": "Charges de sécurité sociale",
+    "681120": "Dotations aux amortissements",
+
+    # Classe 7 - Comptes de produits
+    "701000": "Ventes de produits finis",
+    "706000": "Prestations de services",
+    "708500": "Ports et frais facturés",
+    "764000": "Revenus des titres de placements",
+    "775000": "Produits des cessions d'éléments d'actif",
+}
+
+JOURNALS = {
+    "AC": "Achats",
+    "VE": "Ventes",
+    "BQ": "Banque",
+    "CA": "Caisse",
+    "OD": "Opérations diverses",
+    "AN": "À nouveau"
+}
+
+EXPENSE_DESCRIPTIONS = [
+    "Fournitures de bureau",
+    "Honoraires comptables",
+    "Location bureaux",
+    "Frais de déplacement",
+    "Assurance professionnelle",
+    "Électricité et eau",
+    "Maintenance informatique",
+    "Communication et marketing",
+    "Formation du personnel",
+    "Carburant véhicule société"
+]
+
+SALES_DESCRIPTIONS = [
+    "Facture client",
+    "Prestation de conseil",
+    "Vente de marchandises",
+    "Services professionnels",
+    "Abonnement mensuel",
+    "Maintenance annuelle",
+    "Formation client",
+    "Développement logiciel",
+    "Audit qualité",
+    "Étude de marché"
+]
+
+MISC_OPERATIONS = [
+    "Remboursement de frais",
+    "Acompte fournisseur",
+    "Régularisation",
+    "Dotation aux amortissements",
+    "Opération interne"
+]
+
+BANK_OPERATIONS = ["Règlement client", "Règlement fournisseur"]
+
+CASH_DESCRIPTIONS = [
+    "Remboursement frais",
+    "Achat petites fournitures",
+    "Frais de représentation",
+    "Réception client",
+    "Petite caisse"
+]
+
+# Comptes de charges mouvementés par la caisse
+CASH_EXPENSE_ACCOUNTS = ["625100", "623000", "606400"]
+
+# --- Types d'écritures et d'anomalies ---
+
+# Types d'écritures, dans l'ordre des tables ci-dessous
+ENTRY_KINDS = ("expense", "sales", "salary", "misc", "bank", "cash")
+
+# Types d'anomalies injectables, dans l'ordre utilisé pour le tirage
+ANOMALY_KINDS = (
+    AnomalyType.DUPLICATE_ENTRY,
+    AnomalyType.BALANCE_MISMATCH,
+    AnomalyType.SUSPICIOUS_PATTERN,
+    AnomalyType.DATE_INCONSISTENCY,
+    AnomalyType.MISSING_DATA,
+)
+
+# Par type d'écriture: journal, nombre de lignes, bornes des montants, taux de
+# la seconde ligne (TVA ou charges sociales) et préfixe des pièces
+_KIND_JOURNALS = ["AC", "VE", "OD", "OD", "BQ", "CA"]
+_KIND_LINE_COUNTS = np.array([3, 3, 3, 2, 2, 2])
+_KIND_AMOUNT_LOW = np.array([100.0, 500.0, 2000.0, 100.0, 100.0, 10.0])
+_KIND_AMOUNT_HIGH = np.array([5000.0, 10000.0, 10000.0, 2000.0, 10000.0, 500.0])
+_KIND_SECOND_RATE = np.array([0.2, 0.2, 0.5, 0.0, 0.0, 0.0])
+_KIND_PIECE_PREFIXES = ["FC", "FV", "PAIE", "OD", "BQ", "CA"]
+
+# Montant porté par chaque ligne (0=aucun, 1=base, 2=seconde ligne, 3=total)
+_DEBIT_LAYOUT = np.array([
+    [1, 2, 0],  # achat: charge + TVA déductible
+    [3, 0, 0],  # vente: client
+    [3, 0, 0],  # paie: salaires bruts
+    [1, 0, 0],  # divers
+    [1, 0, 0],  # banque
+    [1, 0, 0],  # caisse
+])
+_CREDIT_LAYOUT = np.array([
+    [0, 0, 3],  # achat: fournisseur
+    [0, 1, 2],  # vente: produit + TVA collectée
+    [0, 2, 1],  # paie: cotisations + net
+    [0, 1, 0],
+    [0, 1, 0],
+    [0, 1, 0],
+])
+
+# Taille des réservoirs de noms de sociétés et de libellés pré-tirés
+POOL_SIZE = 256
+
+
+def derive_seed(seed: int, *parts: Any) -> int:
+    """
+    Dérive une graine indépendante à partir d'une graine de base
+
+    Args:
+        seed: Graine de base
+        parts: Éléments distinguant le flux dérivé (index du jeu, nom, ...)
+
+    Returns:
+        Graine entière sur 32 bits
+    """
+    key = ":".join(str(p) for p in (seed,) + parts)
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:4], "big")
+
+
+def split_generation(start_date: str, end_date: str, count: int, parts: int) -> List[Dict[str, Any]]:
+    """
+    Découpe une génération en lots couvrant des périodes consécutives
+
+    Chaque lot reçoit une sous-période, un nombre d'écritures proportionnel et
+    le numéro de sa première écriture, de sorte que la concaténation des lots
+    reste chronologique et que les numéros d'écriture soient uniques.
+
+    Args:
+        start_date: Date de début (format YYYY-MM-DD)
+        end_date: Date de fin (format YYYY-MM-DD)
+        count: Nombre total d'écritures
+        parts: Nombre de lots souhaité (réduit au nombre de jours de la période)
+
+    Returns:
+        Liste de lots (start_date, end_date, count, first_entry_num)
+    """
+    start = datetime.fromisoformat(start_date)
+    total_days = max(1, (datetime.fromisoformat(end_date) - start).days + 1)
+    parts = max(1, min(parts, total_days, count or 1))
+
+    chunks = []
+    first_entry_num = 1
+    for i in range(parts):
+        first_day = i * total_days // parts
+        last_day = (i + 1) * total_days // parts - 1
+        chunk_count = count // parts + (1 if i < count % parts else 0)
+        chunks.append({
+            "start_date": (start + timedelta(days=first_day)).date().isoformat(),
+            "end_date": (start + timedelta(days=last_day)).date().isoformat(),
+            "count": chunk_count,
+            "first_entry_num": first_entry_num,
+        })
+        first_entry_num += chunk_count
+    return chunks
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Scénario de génération: répartition des écritures et profil d'anomalies
+
+    Les poids n'ont pas besoin d'être normalisés ; un type absent a un poids nul.
+    """
+    name: str
+    description: str = ""
+    entry_mix: Dict[str, float] = field(default_factory=lambda: {
+        "expense": 1.0, "sales": 1.0, "salary": 1.0, "misc": 1.0
+    })
+    anomaly_profile: Dict[str, float] = field(default_factory=lambda: {
+        kind.value: 1.0 for kind in ANOMALY_KINDS
+    })
+
+    def __post_init__(self):
+        for weights, kinds, label in (
+            (self.entry_mix, ENTRY_KINDS, "type d'écriture"),
+            (self.anomaly_profile, [k.value for k in ANOMALY_KINDS], "type d'anomalie"),
+        ):
+            unknown = set(weights) - set(kinds)
+            if unknown:
+                raise ValueError(f"Scénario {self.name}: {label} inconnu ({', '.join(sorted(unknown))})")
+            if any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+                raise ValueError(f"Scénario {self.name}: poids invalides pour les {label}s")
+
+    def entry_weights(self) -> np.ndarray:
+        """Probabilités des types d'écritures (ordre de ENTRY_KINDS)"""
+        weights = np.array([self.entry_mix.get(kind, 0.0) for kind in ENTRY_KINDS])
+        return weights / weights.sum()
+
+    def anomaly_weights(self) -> np.ndarray:
+        """Probabilités des types d'anomalies (ordre de ANOMALY_KINDS)"""
+        weights = np.array([self.anomaly_profile.get(kind.value, 0.0) for kind in ANOMALY_KINDS])
+        return weights / weights.sum()
+
+
+_SCENARIOS: Dict[str, Scenario] = {}
+
+
+def register_scenario(scenario: Scenario) -> Scenario:
+    """
+    Enregistre un scénario de génération (remplace un scénario de même nom)
+
+    Args:
+        scenario: Scénario à enregistrer
+
+    Returns:
+        Le scénario enregistré
+    """
+    _SCENARIOS[scenario.name] = scenario
+    return scenario
+
+
+def get_scenario(name: str) -> Scenario:
+    """
+    Récupère un scénario enregistré
+
+    Args:
+        name: Nom du scénario
+
+    Returns:
+        Scénario correspondant
+
+    Raises:
+        ValueError: Si le scénario est inconnu
+    """
+    try:
+        return _SCENARIOS[name]
+    except KeyError:
+        raise ValueError(f"Scénario de génération inconnu: {name} "
+                         f"(disponibles: {', '.join(sorted(_SCENARIOS))})")
+
+
+def list_scenarios() -> List[Scenario]:
+    """Liste les scénarios enregistrés"""
+    return list(_SCENARIOS.values())
+
+
+register_scenario(Scenario(
+    name="standard",
+    description="Achats, ventes, paie et opérations diverses en proportions égales"
+))
+register_scenario(Scenario(
+    name="ledger",
+    description="Grand livre complet: achats, ventes, banque, caisse et opérations diverses",
+    entry_mix={"expense": 1.0, "sales": 1.0, "bank": 1.0, "misc": 1.0, "cash": 2.0}
+))
+register_scenario(Scenario(
+    name="retail",
+    description="Commerce de détail: ventes et caisse majoritaires",
+    entry_mix={"sales": 4.0, "cash": 3.0, "expense": 2.0, "bank": 1.0, "salary": 0.5},
+    anomaly_profile={
+        AnomalyType.DUPLICATE_ENTRY.value: 1.0,
+        AnomalyType.BALANCE_MISMATCH.value: 1.0,
+        AnomalyType.SUSPICIOUS_PATTERN.value: 2.0,
+        AnomalyType.DATE_INCONSISTENCY.value: 1.0,
+        AnomalyType.MISSING_DATA.value: 2.0,
+    }
+))
+register_scenario(Scenario(
+    name="fraud",
+    description="Profil d'anomalies orienté fraude: montants ronds, weekends et doublons",
+    anomaly_profile={
+        AnomalyType.DUPLICATE_ENTRY.value: 2.0,
+        AnomalyType.BALANCE_MISMATCH.value: 1.0,
+        AnomalyType.SUSPICIOUS_PATTERN.value: 3.0,
+        AnomalyType.DATE_INCONSISTENCY.value: 3.0,
+        AnomalyType.MISSING_DATA.value: 0.5,
+    }
+))
+
+
+@dataclass(frozen=True)
+class GenerationConfig:
+    """
+    Paramètres immuables d'une génération
+
+    Une configuration n'est jamais modifiée : les variantes (lots, fragments,
+    autre graine) sont obtenues avec derive().
+    """
+    company_name: str = "EMPRESA_TEST"
+    start_date: str = "2023-01-01"
+    end_date: str = "2023-12-31"
+    count: int = 1000
+    anomaly_rate: float = 0.05
+    seed: Optional[int] = None
+    scenario: str = "standard"
+    first_entry_num: int = 1
+
+    def __post_init__(self):
+        # Limiter le taux entre 0 et 1
+        object.__setattr__(self, "anomaly_rate", max(0.0, min(1.0, float(self.anomaly_rate))))
+        if self.count < 0:
+            raise ValueError("Le nombre d'écritures doit être positif")
+        if datetime.fromisoformat(self.end_date) < datetime.fromisoformat(self.start_date):
+            raise ValueError("La date de fin doit être postérieure à la date de début")
+        get_scenario(self.scenario)
+
+    def derive(self, **changes: Any) -> "GenerationConfig":
+        """Retourne une copie de la configuration avec les champs modifiés"""
+        return replace(self, **changes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dictionnaire JSON-sérialisable de la configuration"""
+        return asdict(self)
+
+    def split(self, parts: int, stream: str = "chunk") -> List["GenerationConfig"]:
+        """
+        Découpe la génération en configurations de lots consécutifs
+
+        Chaque lot a sa propre sous-période, une plage de numéros d'écriture
+        disjointe et une graine dérivée de la graine globale.
+
+        Args:
+            parts: Nombre de lots souhaité
+            stream: Nom du flux utilisé pour dériver les graines des lots
+
+        Returns:
+            Configurations des lots
+        """
+        return [
+            replace(
+                self,
+                start_date=chunk["start_date"],
+                end_date=chunk["end_date"],
+                count=chunk["count"],
+                first_entry_num=self.first_entry_num + chunk["first_entry_num"] - 1,
+                seed=None if self.seed is None else derive_seed(self.seed, stream, i)
+            )
+            for i, chunk in enumerate(split_generation(self.start_date, self.end_date, self.count, parts))
+        ]
+
+
+class GenerationEngine:
+    """Moteur de génération colonnaire, sans état et partageable entre threads"""
+
+    def generate(self, config: GenerationConfig) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Génère les écritures d'une configuration et y injecte les anomalies
+
+        Args:
+            config: Configuration de la génération
+
+        Returns:
+            Tuple (colonnes, étiquettes des lignes)
+        """
+        return self.inject_anomalies(self.generate_columns(config), config)
+
+    def iter_batches(self,
+                     config: GenerationConfig,
+                     batch_size: int,
+                     stream: str = "chunk") -> Iterator[Tuple[GenerationConfig, Dict[str, np.ndarray], np.ndarray]]:
+        """
+        Génère les écritures par lots consécutifs
+
+        Args:
+            config: Configuration de la génération complète
+            batch_size: Nombre d'écritures visé par lot
+            stream: Nom du flux utilisé pour dériver les graines des lots
+
+        Yields:
+            Tuples (configuration du lot, colonnes, étiquettes)
+        """
+        parts = max(1, -(-config.count // max(1, batch_size)))
+        for chunk in config.split(parts, stream=stream):
+            columns, labels = self.generate(chunk)
+            yield chunk, columns, labels
+
+    def generate_columns(self, config: GenerationConfig) -> Dict[str, np.ndarray]:
+        """
+        Génère des écritures en masse au format colonnaire
+
+        Les types d'écritures (tirés selon le scénario), montants, dates et
+        comptes sont tirés sous forme de tableaux NumPy ; les noms de sociétés
+        et les libellés proviennent de réservoirs pré-tirés. Chaque écriture
+        (ecr_num) est équilibrée et les achats/ventes comportent une ligne de TVA.
+
+        Args:
+            config: Configuration de la génération
+
+        Returns:
+            Colonnes indexées par nom de champ (une valeur par ligne d'écriture)
+        """
+        count = config.count
+        scenario = get_scenario(config.scenario)
+        rng = np.random.default_rng(config.seed)
+        faker = Faker('fr_FR')
+        if config.seed is not None:
+            faker.seed_instance(config.seed)
+        start_date = datetime.fromisoformat(config.start_date)
+        end_date = datetime.fromisoformat(config.end_date)
+
+        # --- Types d'écritures (ordre de ENTRY_KINDS) ---
+        kinds = rng.choice(len(ENTRY_KINDS), count, p=scenario.entry_weights())
+        line_counts = _KIND_LINE_COUNTS[kinds]
+        txn = np.repeat(np.arange(count), line_counts)
+        starts = np.cumsum(line_counts) - line_counts
+        pos = np.arange(len(txn)) - starts[txn]
+        line_kinds = kinds[txn]
+
+        # --- Dates (triées pour suivre l'ordre chronologique du journal) ---
+        date_range = (end_date - start_date).days
+        days = np.datetime64(start_date.date(), 'D') + np.sort(rng.integers(0, date_range + 1, count))
+        months = days.astype('datetime64[M]')
+        hours = rng.integers(8, 18, count)
+        minutes = rng.integers(0, 60, count)
+
+        # Paie: le 28 du mois à 14h
+        salary = kinds == 2
+        days = np.where(salary, months.astype('datetime64[D]') + 27, days)
+        hours = np.where(salary, 14, hours)
+        stamps = days.astype('datetime64[m]') + (hours * 60 + minutes).astype('timedelta64[m]')
+        dates = np.datetime_as_string(stamps.astype('datetime64[s]')).astype(object)
+
+        # --- Montants ---
+        base = np.round(rng.uniform(_KIND_AMOUNT_LOW[kinds], _KIND_AMOUNT_HIGH[kinds]), 2)
+        second = np.round(base * _KIND_SECOND_RATE[kinds], 2)
+        amounts = np.stack([np.zeros(count), base, second, base + second], axis=1)
+
+        # --- Comptes ---
+        codes = np.array(list(ACCOUNTS.keys()), dtype=object)
+        account_labels = np.array(list(ACCOUNTS.values()), dtype=object)
+        index = {code: i for i, code in enumerate(codes)}
+        expense_accounts = np.array([i for i, c in enumerate(codes) if c.startswith("6")])
+        revenue_accounts = np.array([i for i, c in enumerate(codes) if c.startswith("7")])
+        cash_accounts = np.array([index[c] for c in CASH_EXPENSE_ACCOUNTS])
+
+        accounts = np.array([
+            [0, index["445660"], index["401000"]],
+            [index["411000"], 0, index["445710"]],
+            [index["641100"], index["431000"], index["421000"]],
+            [0, 0, 0],
+            [index["512000"], index["411000"], 0],
+            [0, index["530000"], 0],
+        ])[kinds]
+        accounts[kinds == 0, 0] = expense_accounts[rng.integers(0, len(expense_accounts), count)][kinds == 0]
+        accounts[kinds == 1, 1] = revenue_accounts[rng.integers(0, len(revenue_accounts), count)][kinds == 1]
+        misc = kinds == 3
+        misc_debit = rng.integers(0, len(codes), count)
+        misc_credit = rng.integers(0, len(codes) - 1, count)
+        misc_credit += misc_credit >= misc_debit  # Compte de crédit différent du débit
+        accounts[misc, 0] = misc_debit[misc]
+        accounts[misc, 1] = misc_credit[misc]
+        # Banque: encaissement client (512/411) ou règlement fournisseur (401/512)
+        payment = (kinds == 4) & (rng.random(count) < 0.5)
+        accounts[payment, 0] = index["401000"]
+        accounts[payment, 1] = index["512000"]
+        accounts[kinds == 5, 0] = cash_accounts[rng.integers(0, len(cash_accounts), count)][kinds == 5]
+        line_accounts = accounts[txn, pos]
+
+        # --- Tiers et libellés pré-tirés ---
+        companies = np.array([faker.company() for _ in range(POOL_SIZE)], dtype=object)
+        company_codes = np.array([c[:10] for c in companies], dtype=object)
+        phrases = [faker.bs() for _ in range(POOL_SIZE)]
+
+        month_start = np.datetime64(start_date.date(), 'M')
+        month_count = int((np.datetime64(end_date.date(), 'M') - month_start).astype(int)) + 1
+        salary_labels = [
+            f"Salaires {(month_start + m).astype('datetime64[D]').astype(datetime).strftime('%B %Y')}"
+            for m in range(month_count)
+        ]
+
+        vocabulary = (
+            [f"{d} - {c}" for d in EXPENSE_DESCRIPTIONS for c in companies] +
+            [f"{d} - {c}" for d in SALES_DESCRIPTIONS for c in companies] +
+            [f"{o} - {b}" for o in MISC_OPERATIONS for b in phrases] +
+            [f"{o} - {c}" for o in BANK_OPERATIONS for c in companies] +
+            CASH_DESCRIPTIONS +
+            salary_labels
+        )
+        vocabulary = np.array(vocabulary, dtype=object)
+        sales_offset = len(EXPENSE_DESCRIPTIONS) * POOL_SIZE
+        misc_offset = sales_offset + len(SALES_DESCRIPTIONS) * POOL_SIZE
+        bank_offset = misc_offset + len(MISC_OPERATIONS) * POOL_SIZE
+        cash_offset = bank_offset + len(BANK_OPERATIONS) * POOL_SIZE
+        salary_offset = cash_offset + len(CASH_DESCRIPTIONS)
+
+        company = rng.integers(0, POOL_SIZE, count)
+        labels = np.select(
+            [kinds == 0, kinds == 1, kinds == 3, kinds == 4, kinds == 5],
+            [
+                rng.integers(0, len(EXPENSE_DESCRIPTIONS), count) * POOL_SIZE + company,
+                sales_offset + rng.integers(0, len(SALES_DESCRIPTIONS), count) * POOL_SIZE + company,
+                misc_offset + rng.integers(0, len(MISC_OPERATIONS), count) * POOL_SIZE + rng.integers(0, POOL_SIZE, count),
+                bank_offset + payment * POOL_SIZE + company,
+                cash_offset + rng.integers(0, len(CASH_DESCRIPTIONS), count),
+            ],
+            default=salary_offset + (months - month_start).astype(int)
+        )
+
+        line_payment = payment[txn]
+        party_line = (
+            ((line_kinds == 0) & (pos == 2)) |
+            ((line_kinds == 1) & (pos == 0)) |
+            ((line_kinds == 4) & (pos == np.where(line_payment, 0, 1)))
+        )
+        empty = np.full(len(txn), "", dtype=object)
+
+        # --- Numéros d'écriture et pièces ---
+        journal_codes = np.array(_KIND_JOURNALS, dtype=object)[kinds]
+        first = config.first_entry_num
+        ecr_nums = np.array([f"{j}{n}" for j, n in zip(journal_codes.tolist(), range(first, first + count))], dtype=object)
+
+        piece_numbers = rng.integers(0, 1_000_000, count)
+        piece_refs = np.array([
+            f"PAIE{d[5:7]}{d[:4]}" if k == 2 else f"{_KIND_PIECE_PREFIXES[k]}{n}"
+            for k, n, d in zip(kinds.tolist(), piece_numbers.tolist(), dates.tolist())
+        ], dtype=object)
+
+        journal_labels = np.array([JOURNALS[j] for j in _KIND_JOURNALS], dtype=object)[kinds]
+        line_dates = dates[txn]
+
+        columns = {
+            "journal_code": journal_codes[txn],
+            "journal_lib": journal_labels[txn],
+            "ecr_num": ecr_nums[txn],
+            "ecr_date": line_dates,
+            "compte_num": codes[line_accounts],
+            "compte_lib": account_labels[line_accounts],
+            "comp_aux_num": np.where(party_line, company_codes[company[txn]], empty),
+            "comp_aux_lib": np.where(party_line, companies[company[txn]], empty),
+            "piece_ref": piece_refs[txn],
+            "piece_date": line_dates,
+            "ecriture_lib": vocabulary[labels[txn]],
+            "debit_montant": amounts[txn, _DEBIT_LAYOUT[line_kinds, pos]],
+            "credit_montant": amounts[txn, _CREDIT_LAYOUT[line_kinds, pos]],
+            "ecr_lettr": empty,
+            "date_lettr": empty,
+            "valid_date": empty,
+            "montant_devise": np.zeros(len(txn)),
+            "id_devise": np.full(len(txn), "EUR", dtype=object),
+        }
+
+        logger.info(f"Généré {len(txn)} lignes en masse ({count} écritures, scénario {scenario.name})")
+        return columns
+
+    def inject_anomalies(self,
+                         columns: Dict[str, np.ndarray],
+                         config: GenerationConfig) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Introduit des anomalies dans des écritures au format colonnaire
+
+        Les lignes sont tirées en une fois, leur type d'anomalie suivant le
+        profil du scénario, puis chaque type est appliqué par lot. Les lignes
+        d'une même écriture sont retrouvées grâce à un index ecr_num -> lignes
+        calculé une seule fois, et les doublons sont ajoutés en fin de colonnes.
+
+        Args:
+            columns: Colonnes produites par generate_columns (non modifiées)
+            config: Configuration de la génération (taux, graine, scénario)
+
+        Returns:
+            Tuple (colonnes avec anomalies, étiquettes des lignes)
+        """
+        row_count = len(columns["ecr_num"])
+        num_anomalies = min(int(row_count * config.anomaly_rate), row_count)
+        labels = np.full(row_count, "", dtype=object)
+
+        if num_anomalies == 0:
+            return columns, labels
+
+        logger.info(f"Introduction de {num_anomalies} anomalies")
+        rng = np.random.default_rng(None if config.seed is None else derive_seed(config.seed, "anomalies"))
+
+        rows = rng.choice(row_count, num_anomalies, replace=False)
+        kinds = rng.choice(len(ANOMALY_KINDS), num_anomalies, p=get_scenario(config.scenario).anomaly_weights())
+
+        original = dict(columns)
+        columns = dict(columns)
+
+        def writable(name: str) -> np.ndarray:
+            """Copie une colonne avant sa première modification"""
+            if columns[name] is original[name]:
+                columns[name] = np.array(columns[name], copy=True)
+            return columns[name]
+
+        # --- Déséquilibre: modifier une ligne de la même écriture ---
+        selected = rows[kinds == 1]
+        if len(selected):
+            codes, _ = pd.factorize(original["ecr_num"])
+            order = np.argsort(codes, kind="stable")
+            sizes = np.bincount(codes)
+            group_starts = np.cumsum(sizes) - sizes
+            groups = codes[selected]
+            selected = selected[sizes[groups] >= 2]
+            groups = codes[selected]
+            targets = order[group_starts[groups] + (rng.random(len(selected)) * sizes[groups]).astype(np.int64)]
+
+            factors = rng.uniform(1.05, 1.2, len(targets))
+            debit = writable("debit_montant")
+            credit = writable("credit_montant")
+            on_debit = debit[targets] > 0
+            on_credit = ~on_debit & (credit[targets] > 0)
+            debit[targets[on_debit]] = np.round(debit[targets[on_debit]] * factors[on_debit], 2)
+            credit[targets[on_credit]] = np.round(credit[targets[on_credit]] * factors[on_credit], 2)
+            labels[targets[on_debit | on_credit]] = AnomalyType.BALANCE_MISMATCH.value
+
+        # --- Montants ronds ---
+        selected = rows[kinds == 2]
+        if len(selected):
+            round_amounts = np.array([1000, 2000, 5000, 10000, 20000, 50000, 100000])
+            mentions = np.array(["Paiement", "Versement", "Règlement", "Avance", "Acompte"], dtype=object)
+            amount_idx = rng.integers(0, len(round_amounts), len(selected))
+            amounts = round_amounts[amount_idx].astype(np.float64)
+            on_debit = rng.random(len(selected)) < 0.5
+
+            debit = writable("debit_montant")
+            credit = writable("credit_montant")
+            debit[selected] = np.where(on_debit, amounts, 0.0)
+            credit[selected] = np.where(on_debit, 0.0, amounts)
+
+            label_pool = np.array([f"{m} - {a} EUR" for m in mentions for a in round_amounts], dtype=object)
+            mention_idx = rng.integers(0, len(mentions), len(selected))
+            writable("ecriture_lib")[selected] = label_pool[mention_idx * len(round_amounts) + amount_idx]
+            labels[selected] = AnomalyType.SUSPICIOUS_PATTERN.value
+
+        # --- Transactions de weekend à heure inhabituelle ---
+        selected = rows[kinds == 3]
+        if len(selected):
+            stamps = np.array(original["ecr_date"][selected], dtype="datetime64[m]")
+            days = stamps.astype("datetime64[D]")
+            weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 était un jeudi
+            shift = (5 - weekday) % 7
+            shift += (shift != 0) & (rng.random(len(selected)) < 0.5)
+            hours = np.array([1, 2, 3, 4, 22, 23])[rng.integers(0, 6, len(selected))]
+            minutes = rng.integers(0, 60, len(selected))
+            new_stamps = (days + shift).astype("datetime64[m]") + (hours * 60 + minutes).astype("timedelta64[m]")
+            writable("ecr_date")[selected] = np.datetime_as_string(new_stamps.astype("datetime64[s]")).astype(object)
+            labels[selected] = AnomalyType.DATE_INCONSISTENCY.value
+
+        # --- Données manquantes: vider 1 ou 2 champs ---
+        selected = rows[kinds == 4]
+        if len(selected):
+            fields = ['compte_num', 'compte_lib', 'ecriture_lib', 'piece_ref', 'piece_date']
+            first = rng.integers(0, len(fields), len(selected))
+            second = (first + rng.integers(1, len(fields), len(selected))) % len(fields)
+            has_second = rng.random(len(selected)) < 0.5
+            for f, name in enumerate(fields):
+                mask = (first == f) | (has_second & (second == f))
+                if mask.any():
+                    writable(name)[selected[mask]] = ""
+            labels[selected] = AnomalyType.MISSING_DATA.value
+
+        # --- Doublons, ajoutés après la sélection ---
+        selected = rows[kinds == 0]
+        if len(selected):
+            duplicates = {name: values[selected] for name, values in columns.items()}
+
+            # Écarts de quelques centimes sur les montants
+            shifted = rng.random(len(selected)) < 0.3
+            deltas = np.array([-0.01, 0.01, -0.1, 0.1])[rng.integers(0, 4, len(selected))]
+            for name in ("debit_montant", "credit_montant"):
+                values = duplicates[name]
+                values[:] = np.where(shifted & (values > 0), values + deltas, values)
+
+            # Décalage d'un jour de la date
+            moved = rng.random(len(selected)) < 0.3
+            if moved.any():
+                stamps = np.array(duplicates["ecr_date"][moved], dtype="datetime64[s]")
+                stamps += rng.choice([-1, 1], int(moved.sum())).astype("timedelta64[D]")
+                duplicates["ecr_date"][moved] = np.datetime_as_string(stamps).astype(object)
+
+            columns = {name: np.concatenate([values, duplicates[name]]) for name, values in columns.items()}
+            labels = np.concatenate([labels, np.full(len(selected), AnomalyType.DUPLICATE_ENTRY.value, dtype=object)])
+
+        return columns, labels
+
+
+@lru_cache()
+def get_generation_engine() -> GenerationEngine:
+    """
+    Récupère l'instance unique du moteur de génération
+
+    Returns:
+        Instance du moteur de génération
+    """
+    return GenerationEngine()
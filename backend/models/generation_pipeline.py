@@ -0,0 +1,174 @@
+"""
+Pipeline génération -> détection d'anomalies sans aller-retour CSV.
+
+Les lots produits par le moteur de génération sont transmis directement au
+détecteur au format colonnaire, pendant que le fichier CSV est écrit en
+parallèle par un thread dédié (BackgroundCSVWriter). Aucune liste de
+dictionnaires n'est construite.
+
+Chaque lot est analysé séparément; les doublons entre les dernières lignes
+d'un lot et les premières du suivant sont recherchés à part, comme l'aurait
+fait une analyse du CSV complet.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Iterator, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+from backend.models.generation_engine import GenerationConfig, get_generation_engine
+from backend.models.anomaly_records import AnomalyRecord
+from backend.models.trained_detector import (
+    DUPLICATE_WINDOW, duplicate_anomalies, duplicate_keys, find_duplicate_pairs
+)
+from backend.utils.background_writer import BackgroundCSVWriter
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'écritures générées et analysées par lot
+DEFAULT_BATCH_SIZE = 50_000
+
+
+@dataclass
+class GenerationBatch:
+    """Lot produit par le pipeline"""
+    index: int
+    batch_count: int
+    config: GenerationConfig
+    line_offset: int  # Nombre de lignes des lots précédents
+    columns: Dict[str, np.ndarray]
+    labels: np.ndarray  # Vérité terrain des anomalies injectées
+    anomalies: List[AnomalyRecord]  # Anomalies détectées (numéros de ligne globaux)
+
+    @property
+    def line_count(self) -> int:
+        """Nombre de lignes du lot"""
+        return len(self.labels)
+
+
+def _duplicate_fields(columns: Dict[str, np.ndarray], start: int, stop: int, line_offset: int) -> Dict[str, np.ndarray]:
+    """Champs comparés par la recherche de doublons pour les lignes start:stop d'un lot"""
+    count = max(0, stop - start)
+
+    def text(name: str) -> np.ndarray:
+        values = columns[name][start:stop] if name in columns else [""] * count
+        return pd.Series(values, dtype=object).fillna("").astype(str).to_numpy(dtype=object)
+
+    def number(name: str) -> np.ndarray:
+        values = columns[name][start:stop] if name in columns else np.zeros(count)
+        return pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    return {
+        "line": np.arange(start, start + count) + line_offset + 1,
+        "date": text("ecr_date"),
+        "account": text("compte_num"),
+        "journal": text("journal_code"),
+        "label": text("ecriture_lib"),
+        "amount": np.maximum(number("debit_montant"), number("credit_montant")),
+    }
+
+
+def boundary_duplicates(previous: Dict[str, np.ndarray], current: Dict[str, np.ndarray],
+                        threshold: float) -> List[AnomalyRecord]:
+    """
+    Doublons entre les dernières lignes d'un lot et les premières du lot suivant
+
+    Args:
+        previous: Champs des DUPLICATE_WINDOW - 1 dernières lignes du lot précédent (_duplicate_fields)
+        current: Champs des DUPLICATE_WINDOW - 1 premières lignes du lot courant
+        threshold: Seuil de similarité du détecteur
+
+    Returns:
+        Anomalies DUPLICATE_ENTRY des paires à cheval sur les deux lots
+    """
+    split = len(previous["line"])
+    if not split or not len(current["line"]):
+        return []
+    joined = {name: np.concatenate([previous[name], current[name]]) for name in previous}
+    keys = duplicate_keys(joined["date"], joined["account"], joined["journal"], joined["label"])
+    pairs = find_duplicate_pairs(joined["amount"], keys, threshold, rows=np.arange(split),
+                                 keep=lambda i, j: j >= split)
+    return duplicate_anomalies(pairs, joined["line"], joined["account"],
+                               pd.Series(joined["date"], dtype=object).str[:8].to_numpy(dtype=object),
+                               joined["amount"], joined["label"])
+
+
+def generate_and_detect(config: GenerationConfig,
+                        csv_file: Optional[TextIO] = None,
+                        detector=None,
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        sep: str = '|') -> Iterator[GenerationBatch]:
+    """
+    Génère les écritures par lots, les analyse et écrit le CSV en parallèle
+
+    Le CSV est complet lorsque l'itération se termine normalement ; si elle
+    est interrompue (exception, annulation, fermeture du générateur), le thread
+    d'écriture est arrêté sans écrire les lots restants. Utiliser
+    contextlib.closing pour garantir cet arrêt.
+
+    Args:
+        config: Configuration de la génération complète
+        csv_file: Fichier texte ouvert en écriture (pas de CSV si None)
+        detector: Détecteur exposant detect_anomalies_columns (pas d'analyse si None)
+        batch_size: Nombre d'écritures par lot
+        sep: Séparateur du CSV
+
+    Yields:
+        Lots générés et analysés (les doublons avec le lot précédent sont
+        ajoutés aux anomalies du lot)
+    """
+    engine = get_generation_engine()
+    chunks = config.split(max(1, -(-config.count // max(1, batch_size))))
+    writer = BackgroundCSVWriter(csv_file, sep=sep) if csv_file is not None else None
+    loop = asyncio.new_event_loop() if detector is not None else None
+    completed = False
+    threshold = detector.detection_settings()["threshold_duplicate_similarity"] if detector is not None else None
+    tail = None  # Dernières lignes du lot précédent, comparées au début du lot courant
+
+    try:
+        line_offset = 0
+        for i, chunk in enumerate(chunks):
+            columns, labels = engine.generate(chunk)
+
+            # L'écriture du lot se fait pendant la détection
+            if writer is not None:
+                writer.write(columns)
+
+            anomalies = []
+            if detector is not None:
+                anomalies = loop.run_until_complete(
+                    detector.detect_anomalies_columns(columns, line_offset=line_offset)
+                )
+                if tail is not None:
+                    anomalies += boundary_duplicates(
+                        tail, _duplicate_fields(columns, 0, DUPLICATE_WINDOW - 1, line_offset), threshold
+                    )
+                last = _duplicate_fields(columns, max(0, len(labels) - DUPLICATE_WINDOW + 1), len(labels), line_offset)
+                if tail is not None and len(labels) < DUPLICATE_WINDOW - 1:
+                    # Lot plus court que la fenêtre: garder aussi la fin des lots précédents
+                    last = {name: np.concatenate([tail[name], last[name]])[-(DUPLICATE_WINDOW - 1):] for name in last}
+                tail = last
+
+            yield GenerationBatch(
+                index=i,
+                batch_count=len(chunks),
+                config=chunk,
+                line_offset=line_offset,
+                columns=columns,
+                labels=labels,
+                anomalies=anomalies
+            )
+            line_offset += len(labels)
+
+        if writer is not None:
+            writer.close()
+            logger.info(f"CSV écrit en arrière-plan: {writer.rows_written} lignes en {writer.write_time:.2f} s")
+        completed = True
+
+    finally:
+        if writer is not None and not completed:
+            writer.abort()
+        if loop is not None:
+            loop.close()
@@ -1,91 +1,118 @@
+import csv
+import os
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
-from backend.models.my_fec_generator import get_my_fec_generator
-from backend.utils.json_utils import json_dump
+import numpy as np
+
+from backend.models.generation_engine import GenerationConfig, GenerationEngine, get_generation_engine
+from backend.utils.columnar import columns_to_entries
 
 logger = logging.getLogger(__name__)
 
 class GeneratorAdapter:
     """
-    Adaptateur pour le générateur FEC personnalisé.
-    Cette classe s'assure que le générateur FEC est compatible avec l'interface du système.
+    Adaptateur pour le moteur de génération FEC.
+    Chaque requête construit sa propre configuration immuable : des appels
+    concurrents avec des options différentes ne partagent aucun état modifiable.
     """
-    
-    def __init__(self):
-        self.generator = get_my_fec_generator()
-        logger.info("GeneratorAdapter initialisé avec le générateur FEC personnalisé")
-    
+
+    def __init__(self, engine: Optional[GenerationEngine] = None):
+        self.engine = engine or get_generation_engine()
+        logger.info("GeneratorAdapter initialisé avec le moteur de génération")
+
+    def build_config(self, count: int = 1000, options: Optional[Dict[str, Any]] = None) -> GenerationConfig:
+        """
+        Construit la configuration d'une requête de génération
+
+        Args:
+            count: Nombre d'écritures à générer
+            options: Options de la requête (période, taux d'anomalies, entreprise, graine, scénario)
+
+        Returns:
+            Configuration immuable de la génération
+        """
+        options = options or {}
+        params = {"count": count}
+        for key in ("company_name", "seed", "scenario"):
+            if options.get(key) is not None:
+                params[key] = options[key]
+        for key in ("start_date", "end_date"):
+            if key in options:
+                value = self._parse_date(options[key])
+                if value is not None:
+                    params[key] = value
+        if "anomaly_rate" in options:
+            params["anomaly_rate"] = float(options["anomaly_rate"])
+        return GenerationConfig(**params)
+
+    async def generate_columns(self,
+                               count: int = 1000,
+                               options: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Génère des écritures au format colonnaire canonique
+
+        Args:
+            count: Nombre d'écritures à générer
+            options: Options supplémentaires pour la génération
+
+        Returns:
+            Tuple (colonnes, étiquettes d'anomalies des lignes)
+        """
+        config = self.build_config(count, options)
+        logger.info(f"Génération de {count} écritures comptables (scénario {config.scenario})")
+        # La génération est exécutée hors de la boucle d'événements
+        return await asyncio.to_thread(self.engine.generate, config)
+
     async def generate_entries(self, count: int = 1000, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
-        Génère des écritures comptables en utilisant le générateur personnalisé
-        
+        Génère des écritures comptables en utilisant le moteur de génération
+
         Args:
             count: Nombre d'écritures à générer
             options: Options supplémentaires pour la génération
-            
+
         Returns:
             Liste des écritures générées
         """
-        options = options or {}
-        
-        # Configurer le générateur avec les options fournies
-        self._configure_generator(options)
-        
-        # Générer les écritures
-        logger.info(f"Génération de {count} écritures comptables")
-        entries = self.generator.generate_entries(count=count)
+        columns, _ = await self.generate_columns(count, options)
+        entries = columns_to_entries(columns)
         logger.info(f"{len(entries)} écritures générées")
-        
-        # Permet d'utiliser la fonction dans un contexte asynchrone
-        await asyncio.sleep(0)
-        
         return entries
-    
-    def _configure_generator(self, options: Dict[str, Any]) -> None:
-        """Configure le générateur avec les options fournies"""
-        # Définir la période
-        if "start_date" in options:
-            self.generator.start_date = self._parse_date(options["start_date"])
-        
-        if "end_date" in options:
-            self.generator.end_date = self._parse_date(options["end_date"])
-        
-        # Taux d'anomalies
-        if "anomaly_rate" in options:
-            self.generator.anomaly_rate = float(options["anomaly_rate"])
-        
-        # Informations sur l'entreprise
-        if "company_name" in options:
-            self.generator.company_name = options["company_name"]
-        
-        if "siren" in options:
-            self.generator.siren = options["siren"]
-    
-    def _parse_date(self, date_value):
-        """Convertit une chaîne de date en objet datetime"""
+
+    def _parse_date(self, date_value) -> Optional[str]:
+        """Normalise une date au format YYYY-MM-DD"""
+        if isinstance(date_value, datetime):
+            return date_value.date().isoformat()
         if isinstance(date_value, str):
             try:
-                return datetime.strptime(date_value, "%Y-%m-%d")
+                return datetime.strptime(date_value, "%Y-%m-%d").date().isoformat()
             except ValueError:
                 logger.warning(f"Format de date invalide: {date_value}, utilisation de la valeur par défaut")
-        return date_value
+        return None
 
     async def save_to_file(self, entries: List[Dict[str, Any]], output_path: str) -> str:
         """
         Sauvegarde les écritures générées dans un fichier
-        
+
         Args:
             entries: Liste des écritures à sauvegarder
             output_path: Chemin du fichier de sortie
-            
+
         Returns:
             Chemin du fichier créé
         """
-        # Utiliser la méthode de sauvegarde du générateur
-        return self.generator.save_to_csv(entries, output_path)
+        def write() -> str:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=list(entries[0].keys()), delimiter='|')
+                writer.writeheader()
+                writer.writerows(entries)
+            return output_path
+
+        return await asyncio.to_thread(write)
 
 # Singleton pour accéder à l'adaptateur
 _generator_adapter = None
@@ -1,31 +1,45 @@
 """
 Module pour générer des données FEC factices.
+
+La génération en masse est déléguée au moteur colonnaire (generation_engine) ;
+le mode ligne à ligne est conservé comme implémentation de référence.
 """
 import random
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
-import uuid
-import json
-import os
-import pandas as pd
+import numpy as np
 from faker import Faker
 
 from backend.models.schemas import AnomalyType
 from backend.core.config import get_settings
+from backend.models.generation_engine import (
+    ACCOUNTS, JOURNALS, EXPENSE_DESCRIPTIONS, SALES_DESCRIPTIONS, MISC_OPERATIONS,
+    BANK_OPERATIONS, CASH_DESCRIPTIONS, CASH_EXPENSE_ACCOUNTS, ENTRY_KINDS, ANOMALY_KINDS,
+    GenerationConfig, derive_seed, split_generation, get_scenario, get_generation_engine
+)
+from backend.utils.columnar import columns_to_entries
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+
+
 class MyFECGenerator:
     """Générateur de données FEC (Fichier des Ecritures Comptables)"""
     
+    # Version de l'algorithme de génération, à incrémenter à chaque modification
+    # qui change les écritures produites pour une même graine
+    GENERATOR_VERSION = "3"
+    
     def __init__(self, 
                 company_name: str = "EMPRESA_TEST", 
                 start_date: str = "2023-01-01",
                 end_date: str = "2023-12-31",
                 transaction_count: int = 1000,
-                anomaly_rate: float = 0.05):
+                anomaly_rate: float = 0.05,
+                seed: Optional[int] = None,
+                scenario: str = "standard"):
         """
         Initialise le générateur de données FEC
         
@@ -35,8 +49,15 @@ class MyFECGenerator:
             end_date: Date de fin pour les écritures (format YYYY-MM-DD)
             transaction_count: Nombre d'écritures à générer
             anomaly_rate: Taux d'anomalies à introduire (0.0 - 1.0)
+            seed: Graine aléatoire (génération reproductible si définie)
+            scenario: Scénario de génération (répartition des journaux et des anomalies)
         """
+        self.seed = seed
+        self.scenario = get_scenario(scenario).name
+        self.random = random.Random(seed)
         self.faker = Faker('fr_FR')
+        if seed is not None:
+            self.faker.seed_instance(seed)
         self.company_name = company_name
         self.start_date = datetime.fromisoformat(start_date)
         self.end_date = datetime.fromisoformat(end_date)
@@ -46,106 +67,67 @@ class MyFECGenerator:
         # Charger les données de référence
         self._load_reference_data()
     
-    def _load_reference_data(self):
-        """Charge les données de référence pour la génération"""
-        self.accounts = {
-            # Classe 1 - Comptes de capitaux
-            "101000": "Capital",
-            "106100": "Réserve légale",
-            "120000": "Résultat de l'exercice",
-            "164000": "Emprunts auprès des établissements de crédit",
-            
-            # Classe 2 - Comptes d'immobilisations
-            "205000": "Logiciels",
-            "213500": "Installations générales",
-            "218300": "Matériel de bureau et informatique",
-            "281830": "Amortissements du matériel de bureau",
-            
-            # Classe 4 - Comptes de tiers
-            "401000": "Fournisseurs",
-            "411000": "Clients",
-            "421000": "Personnel - rémunérations dues",
-            "431000": "Sécurité sociale",
-            "445660": "TVA déductible",
-            "445710": "TVA collectée",
-            "455000": "Associés - comptes courants",
-            
-            # Classe 5 - Comptes financiers
-            "512000": "Banque",
-            "530000": "Caisse",
-            
-            # Classe 6 - Comptes de charges
-            "601000": "Achats de matières premières",
-            "606300": "Fournitures d'entretien et petit équipement",
-            "606400": "Fournitures administratives",
-            "606800": "Autres matières et fournitures",
-            "613200": "Locations immobilières",
-            "615000": "Entretien et réparations",
-            "616000": "Primes d'assurance",
-            "622600": "Honoraires",
-            "623000": "Publicité, publications, relations publiques",
-            "625100": "Voyages et déplacements",
-            "626000": "Frais postaux et de télécommunications",
-            "627000": "Services bancaires",
-            "641100": "Salaires et appointements",
-            "645000": "Charges de sécurité sociale",
-            "681120": "Dotations aux amortissements",
-            
-            # Classe 7 - Comptes de produits
-            "701000": "Ventes de produits finis",
-            "706000": "Prestations de services",
-            "708500": "Ports et frais facturés",
-            "764000": "Revenus des titres de placements",
-            "775000": "Produits des cessions d'éléments d'actif",
-        }
+    def get_params(self) -> Dict[str, Any]:
+        """
+        Paramètres déterminant les écritures générées (hors graine)
         
-        self.journals = {
-            "AC": "Achats",
-            "VE": "Ventes",
-            "BQ": "Banque",
-            "CA": "Caisse",
-            "OD": "Opérations diverses",
-            "AN": "À nouveau"
+        Returns:
+            Dictionnaire JSON-sérialisable des paramètres
+        """
+        return {
+            "generator": type(self).__name__,
+            "generator_version": self.GENERATOR_VERSION,
+            "company_name": self.company_name,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "transaction_count": self.transaction_count,
+            "anomaly_rate": self.anomaly_rate,
+            "scenario": self.scenario,
         }
-        
-        self.expense_descriptions = [
-            "Fournitures de bureau",
-            "Honoraires comptables",
-            "Location bureaux",
-            "Frais de déplacement",
-            "Assurance professionnelle",
-            "Électricité et eau",
-            "Maintenance informatique",
-            "Communication et marketing",
-            "Formation du personnel",
-            "Carburant véhicule société"
-        ]
-        
-        self.sales_descriptions = [
-            "Facture client",
-            "Prestation de conseil",
-            "Vente de marchandises",
-            "Services professionnels",
-            "Abonnement mensuel",
-            "Maintenance annuelle",
-            "Formation client",
-            "Développement logiciel",
-            "Audit qualité",
-            "Étude de marché"
-        ]
     
-    def generate_entries(self, count: Optional[int] = None) -> List[Dict[str, Any]]:
+    def _load_reference_data(self):
+        """Charge les données de référence pour la génération"""
+        self.accounts = dict(ACCOUNTS)
+        self.journals = dict(JOURNALS)
+        self.expense_descriptions = list(EXPENSE_DESCRIPTIONS)
+        self.sales_descriptions = list(SALES_DESCRIPTIONS)
+        self.misc_operations = list(MISC_OPERATIONS)
+        self.cash_descriptions = list(CASH_DESCRIPTIONS)
+    
+    def generate_entries(self, count: Optional[int] = None, bulk: bool = False) -> List[Dict[str, Any]]:
         """
         Génère un ensemble d'écritures comptables
         
         Args:
             count: Nombre d'écritures à générer (utilise transaction_count si None)
+            bulk: Utiliser la génération vectorisée (voir generate_columns)
             
         Returns:
             Liste des écritures générées
         """
+        entries, _ = self.generate_labeled_entries(count, bulk=bulk)
+        return entries
+    
+    def generate_labeled_entries(self,
+                                 count: Optional[int] = None,
+                                 bulk: bool = False) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Génère un ensemble d'écritures comptables avec la vérité terrain des anomalies
+        
+        Args:
+            count: Nombre d'écritures à générer (utilise transaction_count si None)
+            bulk: Utiliser la génération vectorisée (voir generate_columns)
+            
+        Returns:
+            Tuple (écritures, étiquettes) où l'étiquette de chaque ligne est le
+            type d'anomalie injecté (valeur de AnomalyType) ou "" pour une ligne normale
+        """
         if count is None:
             count = self.transaction_count
+        
+        if bulk:
+            columns, labels = self.inject_anomalies(self.generate_columns(count))
+            return columns_to_entries(columns), labels
             
         entries = []
         
@@ -156,18 +138,21 @@ class MyFECGenerator:
         current_date = self.start_date
         entry_num = 1
         
+        # Répartition des types d'écritures selon le scénario
+        kind_weights = get_scenario(self.scenario).entry_weights().tolist()
+        
         # Répartir le nombre d'écritures sur l'intervalle de temps
         entries_per_day = max(1, count // (date_range or 1))
         remaining_entries = count
         
         while current_date <= self.end_date and remaining_entries > 0:
             # Nombre d'écritures pour ce jour
-            day_entries = min(entries_per_day + random.randint(-2, 2), remaining_entries)
+            day_entries = min(entries_per_day + self.random.randint(-2, 2), remaining_entries)
             
             # Générer les écritures du jour
             for _ in range(day_entries):
                 # Choisir aléatoirement un type d'écriture
-                entry_type = random.choice(["expense", "sales", "salary", "misc"])
+                entry_type = self.random.choices(ENTRY_KINDS, weights=kind_weights)[0]
                 
                 if entry_type == "expense":
                     new_entries = self._generate_expense_entry(current_date, entry_num)
@@ -175,6 +160,10 @@ class MyFECGenerator:
                     new_entries = self._generate_sales_entry(current_date, entry_num)
                 elif entry_type == "salary":
                     new_entries = self._generate_salary_entry(current_date, entry_num)
+                elif entry_type == "bank":
+                    new_entries = self._generate_bank_entry(current_date, entry_num)
+                elif entry_type == "cash":
+                    new_entries = self._generate_cash_entry(current_date, entry_num)
                 else:
                     new_entries = self._generate_misc_entry(current_date, entry_num)
                 
@@ -186,35 +175,81 @@ class MyFECGenerator:
             current_date += timedelta(days=1)
         
         # Introduire des anomalies selon le taux défini
-        if self.anomaly_rate > 0:
-            self._introduce_anomalies(entries)
+        labels = self._introduce_anomalies(entries)
         
         logger.info(f"Généré {len(entries)} écritures au total")
-        return entries
+        return entries, labels
+    
+    def get_config(self, count: Optional[int] = None, first_entry_num: int = 1) -> GenerationConfig:
+        """
+        Configuration immuable du moteur de génération correspondant à ce générateur
+        
+        Args:
+            count: Nombre d'écritures (utilise transaction_count si None)
+            first_entry_num: Numéro de la première écriture
+            
+        Returns:
+            Configuration de génération
+        """
+        return GenerationConfig(
+            company_name=self.company_name,
+            start_date=self.start_date.date().isoformat(),
+            end_date=self.end_date.date().isoformat(),
+            count=self.transaction_count if count is None else count,
+            anomaly_rate=self.anomaly_rate,
+            seed=self.seed,
+            scenario=self.scenario,
+            first_entry_num=first_entry_num
+        )
+    
+    def generate_columns(self, count: Optional[int] = None, first_entry_num: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Génère des écritures en masse au format colonnaire (voir GenerationEngine.generate_columns)
+        
+        Args:
+            count: Nombre d'écritures à générer (utilise transaction_count si None)
+            first_entry_num: Numéro de la première écriture (pour enchaîner plusieurs lots)
+            
+        Returns:
+            Colonnes indexées par nom de champ (une valeur par ligne d'écriture)
+        """
+        return get_generation_engine().generate_columns(self.get_config(count, first_entry_num))
+    
+    def inject_anomalies(self, columns: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Introduit des anomalies dans des écritures au format colonnaire (voir GenerationEngine.inject_anomalies)
+        
+        Args:
+            columns: Colonnes produites par generate_columns (non modifiées)
+            
+        Returns:
+            Tuple (colonnes avec anomalies, étiquettes des lignes)
+        """
+        return get_generation_engine().inject_anomalies(columns, self.get_config())
     
     def _generate_expense_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
         """Génère une écriture de dépense"""
         # Montant de la dépense
-        amount = round(random.uniform(100, 5000), 2)
+        amount = round(self.random.uniform(100, 5000), 2)
         tva_amount = round(amount * 0.2, 2)
         total_amount = amount + tva_amount
         
         # Libellé de la dépense
-        description = random.choice(self.expense_descriptions)
+        description = self.random.choice(self.expense_descriptions)
         supplier = self.faker.company()
         lib = f"{description} - {supplier}"
         
         # Date de l'écriture
         entry_date = date.replace(
-            hour=random.randint(8, 17),
-            minute=random.randint(0, 59)
+            hour=self.random.randint(8, 17),
+            minute=self.random.randint(0, 59)
         )
         
         # Générer les lignes d'écriture
         entries = []
         
         # 1. Débit du compte de charges
-        expense_account = random.choice(list(k for k in self.accounts.keys() if k.startswith("6")))
+        expense_account = self.random.choice(list(k for k in self.accounts.keys() if k.startswith("6")))
         entries.append({
             "journal_code": "AC",
             "journal_lib": self.journals["AC"],
@@ -285,19 +320,19 @@ class MyFECGenerator:
     def _generate_sales_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
         """Génère une écriture de vente"""
         # Montant de la vente
-        amount = round(random.uniform(500, 10000), 2)
+        amount = round(self.random.uniform(500, 10000), 2)
         tva_amount = round(amount * 0.2, 2)
         total_amount = amount + tva_amount
         
         # Libellé de la vente
-        description = random.choice(self.sales_descriptions)
+        description = self.random.choice(self.sales_descriptions)
         customer = self.faker.company()
         lib = f"{description} - {customer}"
         
         # Date de l'écriture
         entry_date = date.replace(
-            hour=random.randint(8, 17),
-            minute=random.randint(0, 59)
+            hour=self.random.randint(8, 17),
+            minute=self.random.randint(0, 59)
         )
         
         # Générer les lignes d'écriture
@@ -326,7 +361,7 @@ class MyFECGenerator:
         })
         
         # 2. Crédit du compte de produits
-        revenue_account = random.choice(list(k for k in self.accounts.keys() if k.startswith("7")))
+        revenue_account = self.random.choice(list(k for k in self.accounts.keys() if k.startswith("7")))
         entries.append({
             "journal_code": "VE",
             "journal_lib": self.journals["VE"],
@@ -375,7 +410,7 @@ class MyFECGenerator:
     def _generate_salary_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
         """Génère une écriture de paie"""
         # Montant des salaires
-        net_amount = round(random.uniform(2000, 10000), 2)
+        net_amount = round(self.random.uniform(2000, 10000), 2)
         charges_amount = round(net_amount * 0.5, 2)
         total_amount = net_amount + charges_amount
         
@@ -383,7 +418,7 @@ class MyFECGenerator:
         lib = f"Salaires {date.strftime('%B %Y')}"
         
         # Date de l'écriture (fin du mois)
-        entry_date = date.replace(day=28, hour=14, minute=random.randint(0, 59))
+        entry_date = date.replace(day=28, hour=14, minute=self.random.randint(0, 59))
         
         # Générer les lignes d'écriture
         entries = []
@@ -459,24 +494,22 @@ class MyFECGenerator:
     def _generate_misc_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
         """Génère une écriture diverse"""
         # Montant
-        amount = round(random.uniform(100, 2000), 2)
+        amount = round(self.random.uniform(100, 2000), 2)
         
         # Type d'opération
-        operation_types = ["Remboursement de frais", "Acompte fournisseur", "Régularisation", 
-                          "Dotation aux amortissements", "Opération interne"]
-        operation = random.choice(operation_types)
+        operation = self.random.choice(self.misc_operations)
         lib = f"{operation} - {self.faker.bs()}"
         
         # Date de l'écriture
         entry_date = date.replace(
-            hour=random.randint(8, 17),
-            minute=random.randint(0, 59)
+            hour=self.random.randint(8, 17),
+            minute=self.random.randint(0, 59)
         )
         
         # Comptes à utiliser
         accounts = list(self.accounts.keys())
-        debit_account = random.choice(accounts)
-        credit_account = random.choice([a for a in accounts if a != debit_account])
+        debit_account = self.random.choice(accounts)
+        credit_account = self.random.choice([a for a in accounts if a != debit_account])
         
         # Générer les lignes d'écriture
         entries = []
@@ -527,100 +560,199 @@ class MyFECGenerator:
         
         return entries
     
-    def _introduce_anomalies(self, entries: List[Dict[str, Any]]) -> None:
-        """Introduit des anomalies dans les écritures générées"""
+    def _make_line(self, journal: str, entry_num: int, entry_date: datetime, account: str,
+                   piece_ref: str, lib: str, debit: float, credit: float,
+                   party: str = "") -> Dict[str, Any]:
+        """Construit une ligne d'écriture au format canonique"""
+        return {
+            "journal_code": journal,
+            "journal_lib": self.journals[journal],
+            "ecr_num": f"{journal}{entry_num}",
+            "ecr_date": entry_date.isoformat(),
+            "compte_num": account,
+            "compte_lib": self.accounts.get(account, ""),
+            "comp_aux_num": party[:10],
+            "comp_aux_lib": party,
+            "piece_ref": piece_ref,
+            "piece_date": entry_date.isoformat(),
+            "ecriture_lib": lib,
+            "debit_montant": debit,
+            "credit_montant": credit,
+            "ecr_lettr": "",
+            "date_lettr": "",
+            "valid_date": "",
+            "montant_devise": 0,
+            "id_devise": "EUR",
+        }
+    
+    def _generate_bank_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
+        """Génère un encaissement client ou un règlement fournisseur"""
+        amount = round(self.random.uniform(100, 10000), 2)
+        company = self.faker.company()
+        entry_date = date.replace(
+            hour=self.random.randint(8, 17),
+            minute=self.random.randint(0, 59)
+        )
+        piece_ref = f"BQ{self.faker.random_number(digits=6)}"
+        
+        if self.random.random() < 0.5:
+            # Encaissement: débit banque / crédit client
+            lib = f"{BANK_OPERATIONS[0]} - {company}"
+            return [
+                self._make_line("BQ", entry_num, entry_date, "512000", piece_ref, lib, amount, 0),
+                self._make_line("BQ", entry_num, entry_date, "411000", piece_ref, lib, 0, amount, company),
+            ]
+        
+        # Règlement: débit fournisseur / crédit banque
+        lib = f"{BANK_OPERATIONS[1]} - {company}"
+        return [
+            self._make_line("BQ", entry_num, entry_date, "401000", piece_ref, lib, amount, 0, company),
+            self._make_line("BQ", entry_num, entry_date, "512000", piece_ref, lib, 0, amount),
+        ]
+    
+    def _generate_cash_entry(self, date: datetime, entry_num: int) -> List[Dict[str, Any]]:
+        """Génère une dépense de caisse"""
+        amount = round(self.random.uniform(10, 500), 2)
+        lib = self.random.choice(self.cash_descriptions)
+        entry_date = date.replace(
+            hour=self.random.randint(8, 17),
+            minute=self.random.randint(0, 59)
+        )
+        piece_ref = f"CA{self.faker.random_number(digits=6)}"
+        account = self.random.choice(CASH_EXPENSE_ACCOUNTS)
+        
+        return [
+            self._make_line("CA", entry_num, entry_date, account, piece_ref, lib, amount, 0),
+            self._make_line("CA", entry_num, entry_date, "530000", piece_ref, lib, 0, amount),
+        ]
+    
+    def _introduce_anomalies(self, entries: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Introduit des anomalies dans les écritures générées
+        
+        Les lignes de chaque écriture sont indexées une seule fois par ecr_num et
+        les doublons ne sont ajoutés qu'après la sélection des lignes, ce qui
+        rend l'injection linéaire en nombre de lignes.
+        
+        Args:
+            entries: Écritures à modifier (les doublons sont ajoutés en fin de liste)
+            
+        Returns:
+            Étiquettes des lignes (type d'anomalie ou "")
+        """
         num_anomalies = int(len(entries) * self.anomaly_rate)
+        labels = np.full(len(entries), "", dtype=object)
         
         if num_anomalies == 0:
-            return
+            return labels
         
         logger.info(f"Introduction de {num_anomalies} anomalies")
         
-        # Types d'anomalies
-        anomaly_types = [
-            self._introduce_duplicate_entry,
-            self._introduce_unbalanced_entry,
-            self._introduce_round_amount,
-            self._introduce_weekend_transaction,
-            self._introduce_missing_data
-        ]
+        # Index des lignes par numéro d'écriture
+        groups: Dict[str, List[int]] = {}
+        for i, entry in enumerate(entries):
+            ecr_num = entry.get('ecr_num')
+            if ecr_num:
+                groups.setdefault(ecr_num, []).append(i)
+        
+        # Types d'anomalies, pondérés selon le profil du scénario
+        anomaly_weights = get_scenario(self.scenario).anomaly_weights().tolist()
         
         # Sélectionner des entrées aléatoires pour introduire des anomalies
-        entries_indices = random.sample(range(len(entries)), min(num_anomalies, len(entries)))
+        entries_indices = self.random.sample(range(len(entries)), min(num_anomalies, len(entries)))
+        duplicates = []
         
         for idx in entries_indices:
             # Choisir un type d'anomalie
-            anomaly_func = random.choice(anomaly_types)
-            anomaly_func(entries, idx)
-    
-    def _introduce_duplicate_entry(self, entries: List[Dict[str, Any]], idx: int) -> None:
-        """Introduit une entrée dupliquée"""
-        if idx >= len(entries):
-            return
+            anomaly_type = self.random.choices(ANOMALY_KINDS, weights=anomaly_weights)[0]
+            
+            if anomaly_type == AnomalyType.DUPLICATE_ENTRY:
+                duplicates.append(self._introduce_duplicate_entry(entries, idx))
+                continue
             
+            if anomaly_type == AnomalyType.BALANCE_MISMATCH:
+                modified = self._introduce_unbalanced_entry(entries, idx, groups)
+            elif anomaly_type == AnomalyType.SUSPICIOUS_PATTERN:
+                modified = self._introduce_round_amount(entries, idx)
+            elif anomaly_type == AnomalyType.DATE_INCONSISTENCY:
+                modified = self._introduce_weekend_transaction(entries, idx)
+            else:
+                modified = self._introduce_missing_data(entries, idx)
+            
+            if modified is not None:
+                labels[modified] = anomaly_type.value
+        
+        # Ajout des doublons en une fois, après la sélection
+        entries.extend(duplicates)
+        labels = np.concatenate([labels, np.full(len(duplicates), AnomalyType.DUPLICATE_ENTRY.value, dtype=object)])
+        
+        return labels
+    
+    def _introduce_duplicate_entry(self, entries: List[Dict[str, Any]], idx: int) -> Dict[str, Any]:
+        """Crée une copie légèrement modifiée d'une entrée (à ajouter par l'appelant)"""
         # Copier l'entrée
         entry = entries[idx].copy()
         
         # Légèrement modifier pour simuler une erreur de saisie
-        if random.random() < 0.3:
+        if self.random.random() < 0.3:
             # Changer légèrement le montant (différence de quelques centimes)
             if entry.get('debit_montant', 0) > 0:
-                entry['debit_montant'] += random.choice([-0.01, 0.01, -0.1, 0.1])
+                entry['debit_montant'] += self.random.choice([-0.01, 0.01, -0.1, 0.1])
             if entry.get('credit_montant', 0) > 0:
-                entry['credit_montant'] += random.choice([-0.01, 0.01, -0.1, 0.1])
+                entry['credit_montant'] += self.random.choice([-0.01, 0.01, -0.1, 0.1])
         
-        if random.random() < 0.3:
+        if self.random.random() < 0.3:
             # Changer légèrement la date
             if 'ecr_date' in entry:
                 date_obj = datetime.fromisoformat(entry['ecr_date'])
-                date_obj += timedelta(days=random.choice([-1, 1]))
+                date_obj += timedelta(days=self.random.choice([-1, 1]))
                 entry['ecr_date'] = date_obj.isoformat()
         
-        # Ajouter la copie modifiée à la liste des entrées
-        entries.append(entry)
         logger.debug(f"Anomalie ajoutée: Entrée dupliquée (original: ligne {idx+1})")
+        return entry
     
-    def _introduce_unbalanced_entry(self, entries: List[Dict[str, Any]], idx: int) -> None:
+    def _introduce_unbalanced_entry(self,
+                                    entries: List[Dict[str, Any]],
+                                    idx: int,
+                                    groups: Dict[str, List[int]]) -> Optional[int]:
         """Introduit un déséquilibre dans une écriture comptable"""
-        if idx >= len(entries):
-            return
-            
         # Récupérer le numéro d'écriture
         ecr_num = entries[idx].get('ecr_num')
         if not ecr_num:
-            return
+            return None
             
-        # Trouver toutes les entrées avec ce numéro d'écriture
-        related_entries = [i for i, e in enumerate(entries) if e.get('ecr_num') == ecr_num]
+        # Lignes de la même écriture
+        related_entries = groups.get(ecr_num, [])
         if len(related_entries) < 2:
-            return
+            return None
         
         # Choisir une entrée à modifier
-        entry_idx = random.choice(related_entries)
+        entry_idx = self.random.choice(related_entries)
         
         # Modifier le montant pour introduire un déséquilibre
         if entries[entry_idx].get('debit_montant', 0) > 0:
             entries[entry_idx]['debit_montant'] = round(entries[entry_idx]['debit_montant'] * 
-                                                      random.uniform(1.05, 1.2), 2)
+                                                      self.random.uniform(1.05, 1.2), 2)
         elif entries[entry_idx].get('credit_montant', 0) > 0:
             entries[entry_idx]['credit_montant'] = round(entries[entry_idx]['credit_montant'] * 
-                                                       random.uniform(1.05, 1.2), 2)
+                                                       self.random.uniform(1.05, 1.2), 2)
+        else:
+            return None
         
         logger.debug(f"Anomalie ajoutée: Écriture déséquilibrée (écriture: {ecr_num})")
+        return entry_idx
     
-    def _introduce_round_amount(self, entries: List[Dict[str, Any]], idx: int) -> None:
+    def _introduce_round_amount(self, entries: List[Dict[str, Any]], idx: int) -> Optional[int]:
         """Introduit un montant suspicieusement rond"""
-        if idx >= len(entries):
-            return
-            
+
         # Montants ronds suspects
         round_amounts = [1000, 2000, 5000, 10000, 20000, 50000, 100000]
         
         # Choisir un montant rond
-        amount = random.choice(round_amounts)
+        amount = self.random.choice(round_amounts)
         
         # Modifier l'entrée
-        if random.random() < 0.5 and 'debit_montant' in entries[idx]:
+        if self.random.random() < 0.5 and 'debit_montant' in entries[idx]:
             entries[idx]['debit_montant'] = amount
             if 'credit_montant' in entries[idx]:
                 entries[idx]['credit_montant'] = 0
@@ -631,31 +763,29 @@ class MyFECGenerator:
                     entries[idx]['debit_montant'] = 0
         
         # Ajouter une mention dans le libellé
-        mention = random.choice(["Paiement", "Versement", "Règlement", "Avance", "Acompte"])
+        mention = self.random.choice(["Paiement", "Versement", "Règlement", "Avance", "Acompte"])
         entries[idx]['ecriture_lib'] = f"{mention} - {amount} EUR"
         
         logger.debug(f"Anomalie ajoutée: Montant rond suspect ({amount} EUR) à la ligne {idx+1}")
+        return idx
     
-    def _introduce_weekend_transaction(self, entries: List[Dict[str, Any]], idx: int) -> None:
+    def _introduce_weekend_transaction(self, entries: List[Dict[str, Any]], idx: int) -> Optional[int]:
         """Introduit une transaction effectuée pendant le weekend"""
-        if idx >= len(entries):
-            return
-            
         # Vérifier que l'entrée a une date
         if 'ecr_date' not in entries[idx]:
-            return
+            return None
             
         # Convertir la chaîne de date en objet datetime
         try:
             date_obj = datetime.fromisoformat(entries[idx]['ecr_date'])
         except ValueError:
-            return
+            return None
         
         # Trouver le prochain samedi ou dimanche
         days_to_add = (5 - date_obj.weekday()) % 7  # Distance jusqu'à samedi
         if days_to_add == 0:  # C'est déjà un samedi
             days_to_add = 0
-        elif random.random() < 0.5:  # 50% de chance pour un dimanche
+        elif self.random.random() < 0.5:  # 50% de chance pour un dimanche
             days_to_add += 1
         
         # Modifier la date pour un weekend
@@ -663,26 +793,24 @@ class MyFECGenerator:
         
         # Définir une heure non conventionnelle
         new_date = new_date.replace(
-            hour=random.choice([1, 2, 3, 4, 22, 23]),
-            minute=random.randint(0, 59)
+            hour=self.random.choice([1, 2, 3, 4, 22, 23]),
+            minute=self.random.randint(0, 59)
         )
         
         # Mettre à jour la date de l'écriture
         entries[idx]['ecr_date'] = new_date.isoformat()
         
         logger.debug(f"Anomalie ajoutée: Transaction de weekend ({new_date.strftime('%A %H:%M')}) à la ligne {idx+1}")
+        return idx
     
-    def _introduce_missing_data(self, entries: List[Dict[str, Any]], idx: int) -> None:
+    def _introduce_missing_data(self, entries: List[Dict[str, Any]], idx: int) -> Optional[int]:
         """Introduit des données manquantes dans une entrée"""
-        if idx >= len(entries):
-            return
-            
         # Champs potentiels à vider
         possible_fields = ['compte_num', 'compte_lib', 'ecriture_lib', 'piece_ref', 'piece_date']
         
         # Choisir aléatoirement 1 ou 2 champs à vider
-        num_fields = random.randint(1, 2)
-        fields_to_empty = random.sample([f for f in possible_fields if f in entries[idx]], 
+        num_fields = self.random.randint(1, 2)
+        fields_to_empty = self.random.sample([f for f in possible_fields if f in entries[idx]], 
                                        min(num_fields, len(possible_fields)))
         
         # Vider les champs choisis
@@ -690,4 +818,21 @@ class MyFECGenerator:
             entries[idx][field] = ""
         
         logger.debug(f"Anomalie ajoutée: Données manquantes ({', '.join(fields_to_empty)}) à la ligne {idx+1}")
+        return idx
+
+
 
+def get_my_fec_generator(**kwargs: Any) -> MyFECGenerator:
+    """
+    Crée un générateur FEC personnalisé
+    
+    Chaque appel retourne une nouvelle instance : les paramètres d'un appelant
+    ne peuvent pas modifier ceux d'un autre.
+    
+    Args:
+        kwargs: Paramètres de MyFECGenerator
+        
+    Returns:
+        Nouvelle instance du générateur
+    """
+    return MyFECGenerator(**kwargs)
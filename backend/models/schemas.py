@@ -18,6 +18,8 @@ class AnomalyType(str, Enum):
     BALANCE_MISMATCH = "balance_mismatch"
     UNUSUAL_ACCOUNT_ACTIVITY = "unusual_account_activity"
     OTHER = "other"
+    CROSS_FILE_DUPLICATE = "cross_file_duplicate"
+    UNMATCHED_INTERCOMPANY = "unmatched_intercompany"
 
 
 class AnalysisType(str, Enum):
@@ -115,6 +117,42 @@ class AnalysisRequest(BaseModel):
     options: Dict[str, Any] = Field(default_factory=dict, description="Options d'analyse")
 
 
+class BatchAnalysisRequest(BaseModel):
+    """Requête pour lancer l'analyse d'un lot de fichiers"""
+    file_ids: Optional[List[str]] = Field(None, description="Identifiants des fichiers à analyser")
+    pattern: Optional[str] = Field(None, description="Motif (glob) des noms des fichiers uploadés à analyser, ex: FEC_2023*.txt")
+    analysis_type: AnalysisType = Field(default=AnalysisType.STANDARD, description="Type d'analyse")
+    options: Dict[str, Any] = Field(default_factory=dict, description="Options d'analyse")
+
+
+class BatchFileStatus(BaseModel):
+    """Statut de l'analyse d'un fichier d'un lot"""
+    file_id: str = Field(..., description="Identifiant du fichier")
+    filename: Optional[str] = Field(None, description="Nom du fichier")
+    status: AnalysisStatus = Field(..., description="Statut de l'analyse du fichier")
+    progress: float = Field(0, ge=0, le=100, description="Progression (0-100%)")
+    total_entries: Optional[int] = Field(None, description="Nombre d'écritures analysées")
+    anomaly_count: Optional[int] = Field(None, description="Nombre d'anomalies détectées")
+    processing_time_ms: Optional[int] = Field(None, description="Durée de l'analyse en millisecondes")
+    error: Optional[str] = Field(None, description="Message d'erreur (si échec)")
+
+
+class BatchAnalysisStatus(BaseModel):
+    """Statut d'une analyse par lot"""
+    batch_id: str = Field(..., description="Identifiant unique du lot")
+    status: AnalysisStatus = Field(..., description="Statut du lot")
+    analysis_type: AnalysisType = Field(..., description="Type d'analyse")
+    progress: float = Field(..., ge=0, le=100, description="Progression globale (0-100%)")
+    file_count: int = Field(..., description="Nombre de fichiers du lot")
+    completed_files: int = Field(0, description="Nombre de fichiers analysés")
+    failed_files: int = Field(0, description="Nombre de fichiers en échec")
+    created_at: datetime = Field(..., description="Date de création")
+    started_at: Optional[datetime] = Field(None, description="Date de début")
+    completed_at: Optional[datetime] = Field(None, description="Date de fin")
+    files: List[BatchFileStatus] = Field(default_factory=list, description="Statut de chaque fichier")
+    summary: Optional[Dict[str, Any]] = Field(None, description="Synthèse consolidée des fichiers analysés et débit")
+
+
 class FileUploadResponse(BaseModel):
     """Réponse après upload d'un fichier"""
     file_id: str = Field(..., description="Identifiant unique du fichier")
@@ -126,6 +164,30 @@ class FileUploadResponse(BaseModel):
     message: Optional[str] = Field(None, description="Message supplémentaire")
 
 
+class ChunkedUploadRequest(BaseModel):
+    """Requête d'ouverture d'un upload par morceaux"""
+    filename: str = Field(..., description="Nom du fichier")
+    total_size: int = Field(..., gt=0, description="Taille totale du fichier en octets")
+    chunk_size: Optional[int] = Field(None, gt=0, description="Taille des morceaux en octets (hors dernier morceau)")
+    sha256: Optional[str] = Field(None, description="Empreinte SHA-256 du fichier complet, vérifiée à la fin")
+    description: Optional[str] = Field(None, description="Description du fichier")
+
+
+class ChunkedUploadStatus(BaseModel):
+    """État d'un upload par morceaux"""
+    upload_id: str = Field(..., description="Identifiant de l'upload")
+    filename: str = Field(..., description="Nom du fichier")
+    total_size: int = Field(..., description="Taille totale du fichier en octets")
+    chunk_size: int = Field(..., description="Taille des morceaux en octets (hors dernier morceau)")
+    chunk_count: int = Field(..., description="Nombre de morceaux")
+    received_chunks: List[int] = Field(default_factory=list, description="Numéros des morceaux reçus")
+    received_bytes: int = Field(0, description="Octets reçus")
+    status: str = Field(..., description="Statut de l'upload (uploading, completed)")
+    file_id: Optional[str] = Field(None, description="Identifiant du fichier une fois l'upload terminé")
+    created_at: datetime = Field(..., description="Date d'ouverture de l'upload")
+    expires_at: datetime = Field(..., description="Date d'expiration de l'upload inachevé")
+
+
 class PaginationParams(BaseModel):
     """Paramètres de pagination"""
     page: int = Field(1, ge=1, description="Numéro de page (commence à 1)")
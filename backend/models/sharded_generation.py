@@ -0,0 +1,159 @@
+"""
+Génération parallèle de données FEC réparties en fragments (shards).
+
+La période et le nombre d'écritures sont découpés en fragments générés dans un
+pool de processus. Chaque fragment dispose de son propre flux aléatoire (graine
+dérivée de la graine globale) et d'une plage de numéros d'écriture disjointe,
+ce qui garantit l'unicité des ecr_num et la reproductibilité du résultat quel
+que soit le nombre de processus.
+"""
+import os
+import shutil
+import random
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+
+import pandas as pd
+
+from backend.models.generation_engine import GenerationConfig, get_generation_engine
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'écritures visé par fragment lorsque le nombre de fragments n'est pas imposé
+DEFAULT_SHARD_SIZE = 250_000
+
+
+def _generate_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Génère un fragment et l'écrit dans son propre fichier CSV
+
+    Exécutée dans un processus du pool: la fonction ne dépend que de ses
+    arguments.
+
+    Args:
+        shard: Description du fragment (configuration de génération, chemin)
+
+    Returns:
+        Récapitulatif du fragment (chemin, lignes, anomalies injectées)
+    """
+    config = GenerationConfig(**shard["config"])
+    columns, labels = get_generation_engine().generate(config)
+
+    pd.DataFrame(columns).to_csv(shard["path"], sep='|', index=False, encoding='utf-8')
+
+    return {
+        "index": shard["index"],
+        "path": shard["path"],
+        "start_date": config.start_date,
+        "end_date": config.end_date,
+        "first_entry_num": config.first_entry_num,
+        "entries": config.count,
+        "lines": len(labels),
+        "injected_anomalies": int((labels != "").sum()),
+    }
+
+
+def _concatenate(parts: List[str], output_path: str) -> None:
+    """Concatène des CSV partageant le même en-tête en un seul fichier"""
+    with open(output_path, "wb") as output:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                header = f.readline()
+                if i == 0:
+                    output.write(header)
+                shutil.copyfileobj(f, output, 1024 * 1024)
+
+
+def generate_sharded(output_path: str,
+                     count: int,
+                     start_date: str = "2023-01-01",
+                     end_date: str = "2023-12-31",
+                     anomaly_rate: float = 0.05,
+                     company_name: str = "EMPRESA_TEST",
+                     seed: Optional[int] = None,
+                     scenario: str = "standard",
+                     shards: Optional[int] = None,
+                     workers: Optional[int] = None,
+                     partitioned: bool = False) -> Dict[str, Any]:
+    """
+    Génère un jeu de données FEC en parallèle
+
+    Args:
+        output_path: Fichier CSV de sortie (ou préfixe des fichiers partitionnés)
+        count: Nombre total d'écritures
+        start_date: Date de début (format YYYY-MM-DD)
+        end_date: Date de fin (format YYYY-MM-DD)
+        anomaly_rate: Taux d'anomalies à introduire
+        company_name: Nom de l'entreprise
+        seed: Graine globale (tirée au hasard si absente)
+        scenario: Scénario de génération
+        shards: Nombre de fragments (par défaut un fragment par DEFAULT_SHARD_SIZE écritures)
+        workers: Nombre de processus (par défaut le nombre de cœurs)
+        partitioned: Conserver un fichier par fragment au lieu de les concaténer
+
+    Returns:
+        Récapitulatif de la génération (fichiers, lignes, durée, fragments)
+    """
+    start_time = time.time()
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    if shards is None:
+        shards = max(1, -(-count // DEFAULT_SHARD_SIZE))
+    workers = workers or os.cpu_count() or 1
+
+    output_path = os.path.abspath(output_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    base, extension = os.path.splitext(output_path)
+
+    config = GenerationConfig(
+        company_name=company_name,
+        start_date=start_date,
+        end_date=end_date,
+        count=count,
+        anomaly_rate=anomaly_rate,
+        seed=seed,
+        scenario=scenario
+    )
+    plan = [
+        {
+            "index": i,
+            "config": shard_config.to_dict(),
+            "path": f"{base}.part{i:04d}{extension or '.csv'}",
+        }
+        for i, shard_config in enumerate(config.split(shards, stream="shard"))
+    ]
+
+    logger.info(f"Génération de {count} écritures en {len(plan)} fragments sur {workers} processus")
+
+    if workers == 1 or len(plan) == 1:
+        results = [_generate_shard(shard) for shard in plan]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(plan))) as pool:
+            results = list(pool.map(_generate_shard, plan))
+
+    parts = [result["path"] for result in results]
+    if partitioned:
+        files = parts
+    else:
+        _concatenate(parts, output_path)
+        for part in parts:
+            os.remove(part)
+        files = [output_path]
+
+    duration = time.time() - start_time
+    lines = sum(result["lines"] for result in results)
+    logger.info(f"{lines} lignes générées en {duration:.2f} s ({lines / duration:.0f} lignes/s)")
+
+    return {
+        "files": files,
+        "seed": seed,
+        "scenario": scenario,
+        "entries": count,
+        "lines": lines,
+        "injected_anomalies": sum(result["injected_anomalies"] for result in results),
+        "workers": workers,
+        "duration_s": duration,
+        "shards": results,
+    }
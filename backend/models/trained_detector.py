@@ -4,14 +4,15 @@ Ce module utilise les modèles de ML pour détecter les anomalies.
 """
 import os
 import logging
-import uuid
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime
 import numpy as np
+import pandas as pd
 from functools import lru_cache
 import joblib  # Import ajouté pour résoudre l'erreur
 
-from backend.models.schemas import Anomaly, AnomalyType
+from backend.models.schemas import AnomalyType
+from backend.models.anomaly_records import AnomalyRecord
 from backend.training.train_detector import AnomalyDetectorTrainer
 from backend.core.config import get_settings
 from backend.training.model_registry import get_model_registry
@@ -19,6 +20,111 @@ from backend.training.model_registry import get_model_registry
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Fenêtre de la recherche de doublons: chaque ligne est comparée aux 99 suivantes
+DUPLICATE_WINDOW = 100
+
+
+def duplicate_keys(date: Sequence[str], account: Sequence[str], journal: Sequence[str],
+                   label: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Codes des champs comparés par la recherche de doublons
+
+    Args:
+        date, account, journal, label: Date, compte, journal et libellé de chaque ligne (texte)
+
+    Returns:
+        Codes du jour (8 premiers caractères de la date), du compte, du journal
+        et du début du libellé (20 caractères)
+    """
+    return {
+        "date": pd.factorize(pd.Series(date, dtype=object).str[:8])[0],
+        "account": pd.factorize(pd.Series(account, dtype=object))[0],
+        "journal": pd.factorize(pd.Series(journal, dtype=object))[0],
+        "label": pd.factorize(pd.Series(label, dtype=object).str[:20])[0],
+    }
+
+
+def find_duplicate_pairs(amount: np.ndarray,
+                         keys: Dict[str, np.ndarray],
+                         threshold: float,
+                         rows: Optional[np.ndarray] = None,
+                         keep: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None) -> List[Tuple[int, int, float]]:
+    """
+    Paires de lignes similaires distantes de moins de DUPLICATE_WINDOW lignes
+
+    Score: montant à 1 centime près 0.5, même jour 0.2, même compte 0.15,
+    même journal 0.1, même début de libellé 0.05.
+
+    Args:
+        amount: Montant de chaque ligne
+        keys: Codes retournés par duplicate_keys
+        threshold: Score minimal d'une paire
+        rows: Premières lignes des paires comparées, triées (toutes par défaut)
+        keep: Filtre des paires (i, j) à comparer (masque booléen)
+
+    Returns:
+        Liste de tuples (ligne i, ligne j, score), i < j
+    """
+    row_count = len(amount)
+    rows = np.arange(row_count) if rows is None else np.asarray(rows)
+    pairs = []
+    for offset in range(1, DUPLICATE_WINDOW):
+        i = rows[rows + offset < row_count]
+        if not len(i):
+            break
+        j = i + offset
+        if keep is not None:
+            mask = keep(i, j)
+            i, j = i[mask], j[mask]
+        score = np.zeros(len(i))
+        score += np.where(np.abs(amount[i] - amount[j]) < 0.01, 0.5, 0.0)
+        score += np.where(keys["date"][i] == keys["date"][j], 0.2, 0.0)
+        score += np.where(keys["account"][i] == keys["account"][j], 0.15, 0.0)
+        score += np.where(keys["journal"][i] == keys["journal"][j], 0.1, 0.0)
+        score += np.where(keys["label"][i] == keys["label"][j], 0.05, 0.0)
+        matches = np.flatnonzero(score >= threshold)
+        pairs.extend(zip(i[matches].tolist(), j[matches].tolist(), score[matches].tolist()))
+    return pairs
+
+
+def duplicate_anomalies(pairs: List[Tuple[int, int, float]],
+                        lines: np.ndarray,
+                        account: Sequence[str],
+                        date: Sequence[str],
+                        amount: np.ndarray,
+                        label: Sequence[str]) -> List[AnomalyRecord]:
+    """
+    Anomalies des paires trouvées par find_duplicate_pairs
+
+    Args:
+        pairs: Paires (i, j, score)
+        lines: Numéro de ligne (dans le fichier) de chaque position
+        account, date, amount, label: Compte, jour, montant et libellé de chaque position
+
+    Returns:
+        Anomalies DUPLICATE_ENTRY, dans l'ordre des paires
+    """
+    def entry(idx: int) -> Dict[str, Any]:
+        return {
+            "line": int(lines[idx]),
+            "compte": account[idx],
+            "date": date[idx],
+            "montant": float(amount[idx]),
+            "libelle": label[idx]
+        }
+
+    return [AnomalyRecord(
+        type=AnomalyType.DUPLICATE_ENTRY,
+        description="Écriture potentiellement dupliquée",
+        confidence_score=similarity_score,
+        line_numbers=[int(lines[idx1]), int(lines[idx2])],
+        related_data={
+            "first_entry": entry(idx1),
+            "second_entry": entry(idx2),
+            "similarity_score": similarity_score
+        }
+    ) for idx1, idx2, similarity_score in sorted(pairs)]
+
 
 class TrainedDetector:
     """Détecteur d'anomalies utilisant les modèles entraînés ML"""
@@ -85,7 +191,7 @@ class TrainedDetector:
             self.working_hours = (8, 19)
             self.suspicious_round_amounts = [100, 500, 1000, 5000, 10000]
     
-    async def detect_anomalies(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    async def detect_anomalies(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """
         Détecte les anomalies dans les données fournies
         
@@ -116,6 +222,261 @@ class TrainedDetector:
         
         return anomalies
     
+    async def detect_anomalies_columns(self,
+                                       columns: Dict[str, np.ndarray],
+                                       line_offset: int = 0,
+                                       features: Optional[Dict[str, pd.DataFrame]] = None) -> List[AnomalyRecord]:
+        """
+        Détecte les anomalies dans des écritures au format colonnaire
+        
+        Équivalent vectorisé de detect_anomalies : les règles et les modèles sont
+        appliqués sur les colonnes et seules les lignes signalées sont lues.
+        
+        Args:
+            columns: Colonnes des écritures (format de generation_engine / columnar)
+            line_offset: Nombre de lignes précédant ce lot (numéros de ligne globaux)
+            features: Caractéristiques déjà extraites de ces colonnes (seul le score reste à calculer)
+        
+        Returns:
+            Liste d'anomalies détectées
+        """
+        start_time = datetime.now()
+        row_count = len(columns["ecr_num"]) if "ecr_num" in columns else len(next(iter(columns.values()), []))
+        
+        if self._use_ml_models:
+            anomalies = self._detect_columns_with_ml(columns, line_offset, features)
+        else:
+            anomalies = self._detect_columns_with_rules(columns, line_offset)
+        
+        execution_time = (datetime.now() - start_time).total_seconds()
+        self._log_detection_stats(row_count, len(anomalies), execution_time)
+        
+        return anomalies
+    
+    def _detect_columns_with_ml(self,
+                                columns: Dict[str, np.ndarray],
+                                line_offset: int,
+                                features: Optional[Dict[str, pd.DataFrame]] = None) -> List[AnomalyRecord]:
+        """Détecte les anomalies d'écritures colonnaires en utilisant les modèles ML"""
+        try:
+            if features is None:
+                features = self.trainer._extract_column_features(columns)
+            anomalies = []
+            
+            for name, model in self.trainer.models.items():
+                X = self.trainer.scalers[name].transform(features[name])
+                predictions = model.predict(X)
+                scores = model.score_samples(X)
+                
+                if name == "amount":
+                    anomaly_type = AnomalyType.SUSPICIOUS_PATTERN
+                    description = "Montant suspect détecté par ML"
+                elif name == "date_patterns":
+                    anomaly_type = AnomalyType.DATE_INCONSISTENCY
+                    description = "Schéma temporel inhabituel détecté par ML"
+                else:  # balance
+                    anomaly_type = AnomalyType.BALANCE_MISMATCH
+                    description = "Déséquilibre inhabituel détecté par ML"
+                
+                for idx in np.flatnonzero(predictions == -1).tolist():
+                    score = scores[idx]
+                    anomalies.append(AnomalyRecord(
+                        type=anomaly_type,
+                        description=description,
+                        confidence_score=1.0 - np.exp(score),
+                        line_numbers=[line_offset + idx + 1],
+                        related_data={
+                            "model": name,
+                            "model_version": self.model_version,
+                            "score": float(score),
+                            "entry_preview": {
+                                k: str(columns[k][idx]) for k in ['journal_code', 'compte_num', 'ecriture_lib']
+                                if k in columns
+                            }
+                        }
+                    ))
+            
+            logger.info(f"Détection ML terminée: {len(anomalies)} anomalies trouvées")
+            return anomalies
+        
+        except Exception as e:
+            logger.error(f"Erreur lors de la détection ML: {str(e)}. Utilisation du détecteur basé sur des règles.")
+            return self._detect_columns_with_rules(columns, line_offset)
+    
+    def detection_settings(self) -> Dict[str, Any]:
+        """
+        Paramètres dont dépendent les anomalies détectées
+        
+        Returns:
+            Version du modèle ML utilisé (None pour les règles seules) et seuils des règles
+        """
+        # Règles par défaut si le détecteur a été initialisé avec des modèles ML
+        return {
+            "model_version": self.model_version if self._use_ml_models else None,
+            "suspicious_round_amounts": list(getattr(self, "suspicious_round_amounts", [100, 500, 1000, 5000, 10000])),
+            "threshold_round_amount": getattr(self, "threshold_round_amount", 0.01),
+            "threshold_duplicate_similarity": getattr(self, "threshold_duplicate_similarity", 0.9),
+            "working_days": list(getattr(self, "working_days", [0, 1, 2, 3, 4])),
+            "working_hours": list(getattr(self, "working_hours", (8, 19))),
+        }
+    
+    def _detect_columns_with_rules(self, columns: Dict[str, np.ndarray], line_offset: int) -> List[AnomalyRecord]:
+        """
+        Applique les règles de _detect_with_rules sur des colonnes
+        
+        Les anomalies sont retournées dans le même ordre que la version ligne à
+        ligne: contrôles par ligne, puis doublons, puis déséquilibres.
+        """
+        rules = self.detection_settings()
+        suspicious_round_amounts = rules["suspicious_round_amounts"]
+        threshold_round_amount = rules["threshold_round_amount"]
+        threshold_duplicate = rules["threshold_duplicate_similarity"]
+        working_days = rules["working_days"]
+        working_hours = rules["working_hours"]
+        
+        row_count = len(columns["ecr_num"]) if "ecr_num" in columns else len(next(iter(columns.values()), []))
+        if row_count == 0:
+            return []
+        empty = np.full(row_count, "", dtype=object)
+        text = {
+            name: pd.Series(columns[name] if name in columns else empty, dtype=object).fillna("").astype(str).to_numpy(dtype=object)
+            for name in ("journal_code", "ecr_num", "compte_num", "ecriture_lib")
+        }
+        debit = pd.to_numeric(pd.Series(columns.get("debit_montant", np.zeros(row_count))), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        credit = pd.to_numeric(pd.Series(columns.get("credit_montant", np.zeros(row_count))), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        amount = np.maximum(debit, credit)
+        line = np.arange(row_count) + line_offset + 1
+        
+        per_line = []  # (ligne, ordre du contrôle, anomalie)
+        
+        # --- Montants ronds ---
+        is_exact = np.zeros(row_count, dtype=bool)
+        for round_amount in suspicious_round_amounts:
+            is_exact |= np.abs(amount - round_amount) < 0.01
+        decimal_part = amount - np.trunc(amount)
+        is_almost = (decimal_part < threshold_round_amount) | (decimal_part > 1 - threshold_round_amount)
+        for idx in np.flatnonzero((is_exact | is_almost) & (amount >= 1000)).tolist():
+            per_line.append((idx, 0, AnomalyRecord(
+                type=AnomalyType.SUSPICIOUS_PATTERN,
+                description=f"Montant suspicieusement rond: {float(amount[idx])}",
+                confidence_score=0.8 if is_exact[idx] else 0.6,
+                line_numbers=[int(line[idx])],
+                related_data={
+                    "amount": float(amount[idx]),
+                    "is_exact_round": bool(is_exact[idx]),
+                    "journal_code": text["journal_code"][idx],
+                    "ecriture_lib": text["ecriture_lib"][idx]
+                }
+            )))
+        
+        # --- Weekends et heures inhabituelles ---
+        if "ecr_date" in columns:
+            raw_dates = pd.Series(columns["ecr_date"], dtype=object)
+            dates = pd.to_datetime(raw_dates, format="ISO8601", errors="coerce")
+            retry = dates.isna() & raw_dates.notna()
+            if retry.any():
+                dates[retry] = pd.to_datetime(raw_dates[retry], format="%Y%m%d", errors="coerce")
+            valid = dates.notna().to_numpy()
+            weekday = dates.dt.weekday.fillna(0).to_numpy(dtype=np.int64)
+            hour = dates.dt.hour.fillna(0).to_numpy(dtype=np.int64)
+            is_weekend = valid & ~np.isin(weekday, working_days)
+            is_outside = valid & ~is_weekend & ((hour < working_hours[0]) | (hour > working_hours[1])) & (hour != 0)
+            day_names = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+            
+            for idx in np.flatnonzero(is_weekend | is_outside).tolist():
+                date_iso = dates.iloc[idx].to_pydatetime().isoformat()
+                if is_weekend[idx]:
+                    anomaly = AnomalyRecord(
+                        type=AnomalyType.DATE_INCONSISTENCY,
+                        description=f"Transaction effectuée un weekend ({day_names[weekday[idx]]})",
+                        confidence_score=0.9,
+                        line_numbers=[int(line[idx])],
+                        related_data={
+                            "date": date_iso,
+                            "weekday": int(weekday[idx]),
+                            "journal_code": text["journal_code"][idx],
+                            "ecriture_lib": text["ecriture_lib"][idx]
+                        }
+                    )
+                else:
+                    anomaly = AnomalyRecord(
+                        type=AnomalyType.DATE_INCONSISTENCY,
+                        description=f"Transaction effectuée en dehors des heures de bureau ({hour[idx]}h)",
+                        confidence_score=0.7,
+                        line_numbers=[int(line[idx])],
+                        related_data={
+                            "date": date_iso,
+                            "hour": int(hour[idx]),
+                            "journal_code": text["journal_code"][idx],
+                            "ecriture_lib": text["ecriture_lib"][idx]
+                        }
+                    )
+                per_line.append((idx, 1, anomaly))
+        
+        # --- Données manquantes ---
+        required_fields = ['ecr_date', 'compte_num', 'ecriture_lib']
+        missing = {
+            field: (pd.Series(columns[field], dtype=object).fillna("").astype(str).to_numpy(dtype=object) == "")
+            if field in columns else np.ones(row_count, dtype=bool)
+            for field in required_fields
+        }
+        for idx in np.flatnonzero(np.logical_or.reduce(list(missing.values()))).tolist():
+            missing_fields = [field for field in required_fields if missing[field][idx]]
+            per_line.append((idx, 2, AnomalyRecord(
+                type=AnomalyType.MISSING_DATA,
+                description=f"Données manquantes dans {len(missing_fields)} champ(s) obligatoire(s)",
+                confidence_score=0.95,
+                line_numbers=[int(line[idx])],
+                related_data={
+                    "missing_fields": missing_fields,
+                    "entry_preview": {
+                        k: columns[k][idx] for k in ['journal_code', 'compte_num', 'ecriture_lib'] if k in columns
+                    }
+                }
+            )))
+        
+        per_line.sort(key=lambda item: (item[0], item[1]))
+        anomalies = [anomaly for _, _, anomaly in per_line]
+        
+        # --- Doublons: comparaison avec les 99 lignes suivantes ---
+        dates = pd.Series(columns["ecr_date"] if "ecr_date" in columns else empty, dtype=object).fillna("").astype(str)
+        date_values = dates.str[:8].to_numpy(dtype=object)
+        keys = duplicate_keys(dates, text["compte_num"], text["journal_code"], text["ecriture_lib"])
+        pairs = find_duplicate_pairs(amount, keys, threshold_duplicate)
+        
+        anomalies.extend(duplicate_anomalies(pairs, line, text["compte_num"], date_values, amount, text["ecriture_lib"]))
+        
+        # --- Équilibre des écritures ---
+        has_num = text["ecr_num"] != ""
+        if has_num.any():
+            rows = np.flatnonzero(has_num)
+            codes, uniques = pd.factorize(text["ecr_num"][rows])
+            total_debit = np.bincount(codes, weights=debit[rows], minlength=len(uniques))
+            total_credit = np.bincount(codes, weights=credit[rows], minlength=len(uniques))
+            diff = np.abs(total_debit - total_credit)
+            order = np.argsort(codes, kind="stable")
+            sizes = np.bincount(codes, minlength=len(uniques))
+            starts = np.cumsum(sizes) - sizes
+            
+            for group in np.flatnonzero(diff > 0.01).tolist():
+                group_rows = rows[order[starts[group]:starts[group] + sizes[group]]]
+                anomalies.append(AnomalyRecord(
+                    type=AnomalyType.BALANCE_MISMATCH,
+                    description=f"Déséquilibre entre débit et crédit: {diff[group]:.2f}",
+                    confidence_score=min(0.95, 0.5 + diff[group] / 100),
+                    line_numbers=[int(n) for n in line[group_rows]],
+                    related_data={
+                        "ecr_num": uniques[group],
+                        "total_debit": float(total_debit[group]),
+                        "total_credit": float(total_credit[group]),
+                        "difference": float(diff[group]),
+                        "entries_count": int(sizes[group])
+                    }
+                ))
+        
+        logger.info(f"Détection basée sur des règles terminée: {len(anomalies)} anomalies trouvées")
+        return anomalies
+    
     def _log_detection_stats(self, num_entries: int, num_anomalies: int, execution_time: float):
         """
         Enregistre les statistiques de détection pour suivi des performances
@@ -155,7 +516,7 @@ class TrainedDetector:
         except Exception as e:
             logger.error(f"Erreur lors de l'enregistrement des statistiques: {str(e)}")
     
-    async def _detect_with_ml(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    async def _detect_with_ml(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """Détecte les anomalies en utilisant les modèles ML"""
         try:
             # Extraction des caractéristiques
@@ -190,8 +551,7 @@ class TrainedDetector:
                         confidence = 1.0 - np.exp(score)
                         
                         # Créer l'anomalie
-                        anomaly = Anomaly(
-                            id=str(uuid.uuid4()),
+                        anomaly = AnomalyRecord(
                             type=anomaly_type,
                             description=description,
                             confidence_score=confidence,  
@@ -204,8 +564,7 @@ class TrainedDetector:
                                     k: str(v) for k, v in entry.items() 
                                     if k in ['journal_code', 'compte_num', 'ecriture_lib']
                                 }
-                            },
-                            detected_at=datetime.now()
+                            }
                         )
                         anomalies.append(anomaly)
             
@@ -217,7 +576,7 @@ class TrainedDetector:
             logger.error(f"Erreur lors de la détection ML: {str(e)}. Utilisation du détecteur basé sur des règles.")
             return await self._detect_with_rules(entries)
     
-    async def _detect_with_rules(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    async def _detect_with_rules(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """Analyse les entrées et détecte les anomalies avec des règles prédéfinies"""
         anomalies = []
         
@@ -245,7 +604,7 @@ class TrainedDetector:
         logger.info(f"Détection basée sur des règles terminée: {len(anomalies)} anomalies trouvées")
         return anomalies
     
-    def _check_round_amount(self, entry: Dict[str, Any]) -> Optional[Anomaly]:
+    def _check_round_amount(self, entry: Dict[str, Any]) -> Optional[AnomalyRecord]:
         """Vérifie si le montant est suspicieusement rond"""
         amount = max(float(entry.get('debit_montant', 0)), float(entry.get('credit_montant', 0)))
         
@@ -257,8 +616,7 @@ class TrainedDetector:
         is_almost_round = decimal_part < self.threshold_round_amount or decimal_part > (1 - self.threshold_round_amount)
         
         if (is_exact_round or is_almost_round) and amount >= 1000:
-            return Anomaly(
-                id=str(uuid.uuid4()),
+            return AnomalyRecord(
                 type=AnomalyType.SUSPICIOUS_PATTERN,
                 description=f"Montant suspicieusement rond: {amount}",
                 confidence_score=0.8 if is_exact_round else 0.6,
@@ -268,12 +626,11 @@ class TrainedDetector:
                     "is_exact_round": is_exact_round,
                     "journal_code": entry.get('journal_code', ''),
                     "ecriture_lib": entry.get('ecriture_lib', '')
-                },
-                detected_at=datetime.now()
+                }
             )
         return None
     
-    def _check_weekend_transaction(self, entry: Dict[str, Any]) -> Optional[Anomaly]:
+    def _check_weekend_transaction(self, entry: Dict[str, Any]) -> Optional[AnomalyRecord]:
         """Vérifie si la transaction est faite un weekend ou hors heures de bureau"""
         if 'ecr_date' not in entry:
             return None
@@ -297,8 +654,7 @@ class TrainedDetector:
             is_outside_hours = hour < self.working_hours[0] or hour > self.working_hours[1]
             
             if is_weekend:
-                return Anomaly(
-                    id=str(uuid.uuid4()),
+                return AnomalyRecord(
                     type=AnomalyType.DATE_INCONSISTENCY,
                     description=f"Transaction effectuée un weekend ({['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][weekday]})",
                     confidence_score=0.9,
@@ -308,13 +664,11 @@ class TrainedDetector:
                         "weekday": weekday,
                         "journal_code": entry.get('journal_code', ''),
                         "ecriture_lib": entry.get('ecriture_lib', '')
-                    },
-                    detected_at=datetime.now()
+                    }
                 )
             
             if is_outside_hours and hour != 0:  # Ignorer minuit qui peut être une valeur par défaut
-                return Anomaly(
-                    id=str(uuid.uuid4()),
+                return AnomalyRecord(
                     type=AnomalyType.DATE_INCONSISTENCY,
                     description=f"Transaction effectuée en dehors des heures de bureau ({hour}h)",
                     confidence_score=0.7,
@@ -324,8 +678,7 @@ class TrainedDetector:
                         "hour": hour,
                         "journal_code": entry.get('journal_code', ''),
                         "ecriture_lib": entry.get('ecriture_lib', '')
-                    },
-                    detected_at=datetime.now()
+                    }
                 )
                 
         except Exception as e:
@@ -333,7 +686,7 @@ class TrainedDetector:
         
         return None
     
-    def _check_duplicates(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    def _check_duplicates(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """Détecte les écritures potentiellement dupliquées"""
         anomalies = []
         
@@ -391,8 +744,7 @@ class TrainedDetector:
                 
                 # Si la similarité est supérieure au seuil, c'est un doublon potentiel
                 if similarity_score >= self.threshold_duplicate_similarity:
-                    anomalies.append(Anomaly(
-                        id=str(uuid.uuid4()),
+                    anomalies.append(AnomalyRecord(
                         type=AnomalyType.DUPLICATE_ENTRY,
                         description=f"Écriture potentiellement dupliquée",
                         confidence_score=similarity_score,
@@ -413,13 +765,12 @@ class TrainedDetector:
                                 "libelle": entry2.get('ecriture_lib', '')
                             },
                             "similarity_score": similarity_score
-                        },
-                        detected_at=datetime.now()
+                        }
                     ))
         
         return anomalies
     
-    def _check_balance_mismatch(self, entries: List[Dict[str, Any]]) -> List[Anomaly]:
+    def _check_balance_mismatch(self, entries: List[Dict[str, Any]]) -> List[AnomalyRecord]:
         """Vérifie l'équilibre des écritures comptables"""
         anomalies = []
         
@@ -445,8 +796,7 @@ class TrainedDetector:
             # Si le déséquilibre est significatif
             if diff > 0.01:  # Tolérance pour les erreurs d'arrondi
                 line_numbers = [idx + 1 for idx, _ in entries_with_idx]
-                anomalies.append(Anomaly(
-                    id=str(uuid.uuid4()),
+                anomalies.append(AnomalyRecord(
                     type=AnomalyType.BALANCE_MISMATCH,
                     description=f"Déséquilibre entre débit et crédit: {diff:.2f}",
                     confidence_score=min(0.95, 0.5 + diff / 100),  # Plus le déséquilibre est grand, plus la confiance est élevée
@@ -457,20 +807,18 @@ class TrainedDetector:
                         "total_credit": total_credit,
                         "difference": diff,
                         "entries_count": len(entries_with_idx)
-                    },
-                    detected_at=datetime.now()
+                    }
                 ))
         
         return anomalies
     
-    def _check_missing_data(self, entry: Dict[str, Any]) -> Optional[Anomaly]:
+    def _check_missing_data(self, entry: Dict[str, Any]) -> Optional[AnomalyRecord]:
         """Vérifie les données manquantes dans les champs obligatoires"""
         required_fields = ['ecr_date', 'compte_num', 'ecriture_lib']
         missing_fields = [field for field in required_fields if field not in entry or not entry[field]]
         
         if missing_fields:
-            return Anomaly(
-                id=str(uuid.uuid4()),
+            return AnomalyRecord(
                 type=AnomalyType.MISSING_DATA,
                 description=f"Données manquantes dans {len(missing_fields)} champ(s) obligatoire(s)",
                 confidence_score=0.95,
@@ -478,8 +826,7 @@ class TrainedDetector:
                 related_data={
                     "missing_fields": missing_fields,
                     "entry_preview": {k: v for k, v in entry.items() if k in ['compte_num', 'journal_code', 'ecriture_lib']}
-                },
-                detected_at=datetime.now()
+                }
             )
         return None
 
@@ -2,23 +2,41 @@
 Service pour l'analyse des fichiers FEC et la détection d'anomalies.
 """
 import os
-import json
 import logging
 import asyncio
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 import uuid
 import time
 from functools import lru_cache
 
+import numpy as np
+import pandas as pd
+
 from backend.models.schemas import (
     Anomaly, AnomalyResponse, AnalysisJobStatus, AnalysisType, 
     FileUploadResponse, PaginationParams, AnalysisStatus
 )
 from backend.models.anomaly_detector import AnomalyDetector, get_anomaly_detector
+from backend.models.anomaly_records import AnomalyColumnWriter, AnomalyColumns
 from backend.core.config import get_settings
 from backend.core.errors import ResourceNotFoundError, FileProcessingError
-from backend.utils.file_handling import read_file_content
+from backend.core.jobs import JobCancelledError, JobContext, get_preparse_job_manager
+from backend.training.feature_store import feature_row_count, get_feature_store
+from backend.services.fingerprint_index import cross_file_anomalies, remove_file_fingerprints
+from backend.services.incremental_analysis import (
+    IncrementPlan, build_baseline, boundary_duplicates, carry_over, plan_increment, remap_delta,
+    subset_columns, subset_features
+)
+from backend.training.pipeline import FEC_FIELD_MAPPING, read_upload_entries
+from backend.training.train_detector import AnomalyDetectorTrainer
+from backend.utils.columnar import entries_to_columns, load_columns, row_count, save_columns
+from backend.utils.file_handling import fec_company_id, read_file_content
+from backend.utils.blob_storage import BlobStorage, delete_blobs, get_blob_storage
+from backend.utils.storage import ShardedStore, get_storage
+from backend.utils.json_utils import (
+    json_dumps_bytes, json_loads, project_fields, iter_json_document, iter_ndjson
+)
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -27,25 +45,26 @@ settings = get_settings()
 class AnalysisService:
     """Service d'analyse des fichiers comptables"""
     
-    def __init__(self, anomaly_detector: Optional[AnomalyDetector] = None):
+    def __init__(self,
+                 anomaly_detector: Optional[AnomalyDetector] = None,
+                 blobs: Optional[BlobStorage] = None):
         """
         Initialise le service d'analyse
         
         Args:
             anomaly_detector: Détecteur d'anomalies à utiliser (optionnel)
+            blobs: Stockage des données (par défaut le stockage configuré)
         """
         self.anomaly_detector = anomaly_detector or get_anomaly_detector()
         self.data_dir = settings.DATA_DIR
         
-        # Répertoires spécifiques
-        self.uploads_dir = os.path.join(self.data_dir, "uploads")
-        self.results_dir = os.path.join(self.data_dir, "results")
-        self.jobs_dir = os.path.join(self.data_dir, "jobs")
-        
-        # Créer les répertoires s'ils n'existent pas
-        os.makedirs(self.uploads_dir, exist_ok=True)
-        os.makedirs(self.results_dir, exist_ok=True)
-        os.makedirs(self.jobs_dir, exist_ok=True)
+        # Répertoires spécifiques, découpés en sous-répertoires par identifiant;
+        # les données y sont lues et écrites via le stockage d'objets
+        self.storage = get_storage()
+        self.blobs = blobs or get_blob_storage()
+        self.uploads_dir = self.storage.uploads.base_dir
+        self.results_dir = self.storage.results.base_dir
+        self.jobs_dir = self.storage.jobs.base_dir
         
         # Pour gérer les jobs en cours
         self._running_jobs = {}
@@ -55,7 +74,9 @@ class AnalysisService:
                     filename: str, 
                     file_path: str, 
                     file_size: int, 
-                    description: Optional[str] = None) -> Dict[str, Any]:
+                    description: Optional[str] = None,
+                    sha256: Optional[str] = None,
+                    preparse: Optional[bool] = None) -> Dict[str, Any]:
         """
         Enregistre les métadonnées d'un fichier uploadé
         
@@ -65,6 +86,8 @@ class AnalysisService:
             file_path: Chemin d'accès au fichier
             file_size: Taille du fichier en octets
             description: Description optionnelle du fichier
+            sha256: Empreinte SHA-256 du fichier, si elle est connue
+            preparse: Préparer le fichier en tâche de fond (par défaut PREPARSE_ON_UPLOAD)
         
         Returns:
             Dictionnaire des métadonnées du fichier
@@ -74,21 +97,161 @@ class AnalysisService:
             "file_id": file_id,
             "filename": filename,
             "file_path": file_path,
+            "file_key": self.blobs.key_for(file_path),
             "file_size": file_size,
             "upload_timestamp": datetime.now().isoformat(),
             "description": description or "",
             "status": "uploaded",
             "analyses": []
         }
+        if sha256:
+            file_data["sha256"] = sha256
+        company = fec_company_id(filename)
+        if company:
+            file_data["company"] = company
+        
+        # Préparation en tâche de fond: parsing et caractéristiques avant l'analyse
+        if preparse is None:
+            preparse = settings.PREPARSE_ON_UPLOAD
+        preparse = preparse and not filename.lower().endswith(('.xlsx', '.xls'))
+        if preparse:
+            file_data["preparse"] = {"status": "pending"}
         
         # Enregistrer les métadonnées
-        metadata_path = os.path.join(self.uploads_dir, f"{file_id}_meta.json")
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, indent=2, ensure_ascii=False)
+        self._write_json(self._meta_key(file_id), file_data)
+        
+        if preparse:
+            self.schedule_preparse(file_id)
         
         logger.info(f"Métadonnées du fichier {file_id} enregistrées")
         return file_data
     
+    def schedule_preparse(self, file_id: str) -> bool:
+        """
+        Lance la préparation d'un fichier importé dans le pool de préparation
+        
+        Args:
+            file_id: Identifiant du fichier
+            
+        Returns:
+            True si la tâche a été soumise, False si elle est déjà en cours
+        """
+        try:
+            get_preparse_job_manager().submit(_preparse_job_id(file_id), self.preparse_file, file_id)
+        except ValueError:
+            return False
+        logger.info(f"Préparation du fichier {file_id} planifiée")
+        return True
+    
+    def preparse_file(self, ctx: JobContext, file_id: str) -> Dict[str, Any]:
+        """
+        Prépare un fichier importé pour l'analyse (tâche de fond de priorité basse)
+        
+        Le fichier est parsé dans le cache colonnaire, les matrices de
+        caractéristiques de AnomalyDetectorTrainer sont calculées et mises en
+        cache (source upload_<file_id>, partagée avec l'entraînement), puis le
+        nombre de lignes et des statistiques sont enregistrés dans les
+        métadonnées. Une analyse lancée ensuite n'a plus qu'à calculer les scores.
+        
+        Args:
+            ctx: Contexte de la tâche
+            file_id: Identifiant du fichier
+            
+        Returns:
+            État de la préparation enregistré dans les métadonnées
+        """
+        start_time = time.time()
+        
+        metadata = self._read_json(self._meta_key(file_id))
+        if metadata is None:
+            raise ResourceNotFoundError("Fichier", file_id)
+        
+        try:
+            ctx.update(progress=5, step="fetch", message="Récupération du fichier")
+            file_path = self._fetch_upload(metadata)
+            ctx.check_cancelled()
+            
+            ctx.update(progress=10, step="parse", message="Parsing du fichier")
+            columns = entries_to_columns(read_upload_entries(file_path))
+            parsed_key = self._parsed_key(file_id)
+            parsed_path = self.blobs.local_path(parsed_key)
+            os.makedirs(os.path.dirname(parsed_path), exist_ok=True)
+            save_columns(parsed_path, columns, metadata={"file_id": file_id})
+            self.blobs.put_file(parsed_key, parsed_path)
+            ctx.check_cancelled()
+            
+            ctx.update(progress=60, step="features", message="Calcul des caractéristiques")
+            features = AnomalyDetectorTrainer()._extract_column_features(columns)
+            get_feature_store().save(f"upload_{file_id}", features,
+                                     {"file_id": file_id, "filename": metadata.get("filename")})
+            
+            preparse = {
+                "status": "completed",
+                "row_count": row_count(columns),
+                "stats": _entry_stats(columns),
+                "duration_ms": int((time.time() - start_time) * 1000),
+                "completed_at": datetime.now().isoformat()
+            }
+        except JobCancelledError:
+            self._update_preparse(file_id, {"status": "cancelled"})
+            raise
+        except Exception as e:
+            self._update_preparse(file_id, {"status": "failed", "error": str(e)})
+            raise
+        
+        self._update_preparse(file_id, preparse)
+        logger.info(f"Fichier {file_id} préparé: {preparse['row_count']} lignes en {preparse['duration_ms']} ms")
+        return preparse
+    
+    def _update_preparse(self, file_id: str, preparse: Dict[str, Any]) -> None:
+        """Enregistre l'état de la préparation dans les métadonnées (relues juste avant)"""
+        meta_key = self._meta_key(file_id)
+        metadata = self._read_json(meta_key)
+        if metadata is None:
+            return
+        metadata["preparse"] = preparse
+        self._write_json(meta_key, metadata)
+    
+    async def _await_preparse(self, file_id: str) -> None:
+        """
+        Attend la fin de la préparation d'un fichier si elle est en cours
+        
+        Une préparation encore en attente d'un worker est annulée: l'analyse
+        parse alors le fichier elle-même plutôt que d'attendre son tour.
+        """
+        manager = get_preparse_job_manager()
+        job_id = _preparse_job_id(file_id)
+        if not manager.is_running(job_id):
+            return
+        
+        state = manager.get_state(job_id) or {}
+        if state.get("status") == "pending" and manager.cancel(job_id):
+            self._update_preparse(file_id, {"status": "cancelled"})
+            return
+        
+        logger.info(f"Attente de la préparation du fichier {file_id}")
+        await manager.wait(job_id)
+    
+    def _load_preparsed(self, file_id: str, metadata: Dict[str, Any]) -> Optional[Tuple[Dict[str, np.ndarray], Optional[Dict[str, pd.DataFrame]]]]:
+        """
+        Charge les écritures et les caractéristiques préparées d'un fichier
+        
+        Returns:
+            Tuple (colonnes, caractéristiques ou None), ou None si le fichier n'a pas été préparé
+        """
+        if (metadata.get("preparse") or {}).get("status") != "completed":
+            return None
+        try:
+            columns, _ = load_columns(self.blobs.fetch(self._parsed_key(file_id)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Écritures préparées du fichier {file_id} illisibles: {str(e)}")
+            return None
+        
+        features = get_feature_store().load(f"upload_{file_id}")
+        if features is not None and feature_row_count(features) != row_count(columns):
+            features = None
+        return columns, features
+    
     async def file_exists(self, file_id: str) -> bool:
         """
         Vérifie si un fichier existe
@@ -99,8 +262,7 @@ class AnalysisService:
         Returns:
             True si le fichier existe, False sinon
         """
-        metadata_path = os.path.join(self.uploads_dir, f"{file_id}_meta.json")
-        return os.path.exists(metadata_path)
+        return self.blobs.exists(self._meta_key(file_id))
     
     async def get_file_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -112,13 +274,7 @@ class AnalysisService:
         Returns:
             Métadonnées du fichier ou None si introuvable
         """
-        metadata_path = os.path.join(self.uploads_dir, f"{file_id}_meta.json")
-        
-        if not os.path.exists(metadata_path):
-            return None
-        
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return self._read_json(self._meta_key(file_id))
     
     async def create_analysis_job(self, 
                           file_id: str, 
@@ -158,9 +314,7 @@ class AnalysisService:
         }
         
         # Enregistrer les données de la tâche
-        job_path = os.path.join(self.jobs_dir, f"{job_id}.json")
-        with open(job_path, "w", encoding="utf-8") as f:
-            json.dump(job_data, f, indent=2, ensure_ascii=False)
+        self._write_json(self._job_key(job_id), job_data)
         
         logger.info(f"Tâche d'analyse {job_id} créée pour le fichier {file_id}")
         
@@ -187,102 +341,40 @@ class AnalysisService:
             Statut final de la tâche
         """
         # Récupérer les données de la tâche
-        job_path = os.path.join(self.jobs_dir, f"{job_id}.json")
+        job_key = self._job_key(job_id)
+        job_data = self._read_json(job_key)
         
-        if not os.path.exists(job_path):
+        if job_data is None:
             raise ResourceNotFoundError("Tâche d'analyse", job_id)
         
-        with open(job_path, "r", encoding="utf-8") as f:
-            job_data = json.load(f)
-        
         # Mettre à jour le statut
         job_data["status"] = "processing"
         job_data["started_at"] = datetime.now().isoformat()
         
         # Sauvegarder l'état initial
-        with open(job_path, "w", encoding="utf-8") as f:
-            json.dump(job_data, f, indent=2, ensure_ascii=False)
+        self._write_json(job_key, job_data)
+        
+        def on_progress(progress: int, **extra: Any) -> None:
+            job_data.update(extra)
+            job_data["progress"] = progress
+            self._write_json(job_key, job_data)
         
         try:
-            # Récupérer les métadonnées du fichier
-            file_id = job_data["file_id"]
-            metadata = await self.get_file_metadata(file_id)
-            
-            if not metadata:
-                raise ResourceNotFoundError("Fichier", file_id)
-            
-            file_path = metadata["file_path"]
-            
-            # Mettre à jour la progression
-            job_data["progress"] = 10
-            with open(job_path, "w", encoding="utf-8") as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
-            
-            # Charger le contenu du fichier
-            logger.info(f"Chargement du fichier {file_path}")
-            entries = await read_file_content(file_path)
-            
-            # Mettre à jour la progression
-            job_data["progress"] = 30
-            with open(job_path, "w", encoding="utf-8") as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
-            
-            # Détecter les anomalies
-            logger.info(f"Détection d'anomalies sur {len(entries)} entrées")
-            
-            # Mettre à jour la progression
-            job_data["progress"] = 50
-            with open(job_path, "w", encoding="utf-8") as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
-            
-            # Effectuer la détection
-            detector = get_anomaly_detector()
-            anomalies = await detector.detect_anomalies(entries)
-            
-            # Mettre à jour la progression
-            job_data["progress"] = 80
-            with open(job_path, "w", encoding="utf-8") as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
-            
-            # Créer le résultat
-            result = AnomalyResponse(
-                file_id=file_id,
-                filename=metadata["filename"],
-                total_entries=len(entries),
-                anomaly_count=len(anomalies),
-                anomalies=anomalies,
-                analysis_timestamp=datetime.now(),
-                processing_time_ms=int((datetime.now() - datetime.fromisoformat(job_data["started_at"])).total_seconds() * 1000)
+            summary = await self.analyse_file(
+                job_data["file_id"],
+                run_id=job_id,
+                analysis_type=job_data["analysis_type"],
+                on_progress=on_progress,
+                options=job_data.get("options")
             )
             
-            # Sauvegarder le résultat
-            result_path = os.path.join(self.results_dir, f"{file_id}.json")
-            with open(result_path, "w", encoding="utf-8") as f:
-                # Correction ici: d'abord convertir en dict puis utiliser json.dump
-                import json
-                result_dict = result.model_dump()
-                json.dump(result_dict, f, indent=2, ensure_ascii=False)
-            
             # Mettre à jour le statut de la tâche
             job_data["status"] = "completed"
             job_data["completed_at"] = datetime.now().isoformat()
-            job_data["result_path"] = result_path
+            job_data["result_path"] = self.blobs.local_path(self._result_key(job_data["file_id"]))
             job_data["progress"] = 100
             
-            # Ajouter l'analyse aux métadonnées du fichier
-            metadata["analyses"].append({
-                "job_id": job_id,
-                "analysis_type": job_data["analysis_type"],
-                "timestamp": datetime.now().isoformat(),
-                "anomaly_count": len(anomalies)
-            })
-            
-            # Mettre à jour les métadonnées du fichier
-            metadata_path = os.path.join(self.uploads_dir, f"{file_id}_meta.json")
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Analyse {job_id} terminée: {len(anomalies)} anomalies détectées")
+            logger.info(f"Analyse {job_id} terminée: {summary['anomaly_count']} anomalies détectées")
             
         except Exception as e:
             # En cas d'erreur, mettre à jour le statut
@@ -292,11 +384,305 @@ class AnalysisService:
         
         finally:
             # Sauvegarder l'état final
-            with open(job_path, "w", encoding="utf-8") as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
+            self._write_json(job_key, job_data)
         
         return await self.get_analysis_job_status(job_id)
     
+    async def analyse_file(self,
+                           file_id: str,
+                           run_id: str,
+                           analysis_type: str,
+                           on_progress: Optional[Callable[..., None]] = None,
+                           analysis_info: Optional[Dict[str, Any]] = None,
+                           options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyse un fichier et enregistre ses résultats
+        
+        Utilisé par les tâches d'analyse unitaires comme par les lots: le
+        détecteur (et ses modèles) est partagé par toutes les analyses du processus.
+        
+        Args:
+            file_id: Identifiant du fichier
+            run_id: Identifiant de l'exécution (tâche ou lot) enregistré avec les anomalies
+            analysis_type: Type d'analyse
+            on_progress: Fonction appelée avec la progression (0-100) et des champs à enregistrer
+            analysis_info: Champs de l'entrée ajoutée à metadata["analyses"] (par défaut {"job_id": run_id})
+            options: Options d'analyse (incremental: True pour reprendre l'analyse de la dernière
+                     version du fichier de la même société, base_file_id: version à reprendre)
+            
+        Returns:
+            Récapitulatif de l'analyse (nombre d'entrées, d'anomalies, anomalies par type, durée)
+        """
+        start_time = datetime.now()
+        progress = on_progress or (lambda progress, **extra: None)
+        options = options or {}
+        
+        # Récupérer les métadonnées du fichier
+        metadata = await self.get_file_metadata(file_id)
+        
+        if not metadata:
+            raise ResourceNotFoundError("Fichier", file_id)
+        
+        # Attendre une préparation en cours, puis utiliser ses résultats s'ils existent
+        await self._await_preparse(file_id)
+        metadata = await self.get_file_metadata(file_id) or metadata
+        preparsed = await asyncio.to_thread(self._load_preparsed, file_id, metadata)
+        detector = get_anomaly_detector()
+        
+        if preparsed is not None:
+            # Fichier déjà parsé et caractéristiques déjà calculées: seul le score reste à calculer
+            columns, features = preparsed
+            total_entries = row_count(columns)
+            progress(50, preparsed=True)
+        else:
+            # Copie locale du fichier (téléchargée si le stockage est distant)
+            file_path = await asyncio.to_thread(self._fetch_upload, metadata)
+            
+            # Mettre à jour la progression
+            progress(10)
+            
+            # Charger le contenu du fichier
+            logger.info(f"Chargement du fichier {file_path}")
+            entries = await read_file_content(file_path)
+            total_entries = len(entries)
+            
+            # Mêmes colonnes que la préparation: toutes les analyses passent par le détecteur colonnaire
+            columns = {FEC_FIELD_MAPPING.get(name, name): values
+                       for name, values in entries_to_columns(entries).items()}
+            features = None
+            
+            # Mettre à jour la progression
+            progress(30)
+        
+        # Analyse incrémentale (sur demande): reprise de l'analyse d'une version précédente du fichier
+        baseline, conditions, plan = None, None, None
+        if settings.INCREMENTAL_ANALYSIS_ENABLED and total_entries:
+            baseline = await asyncio.to_thread(build_baseline, columns)
+            conditions = _normalized({"analysis_type": analysis_type, "detection": detector.detection_settings()})
+            if options.get("incremental") or options.get("base_file_id"):
+                plan = await asyncio.to_thread(self._plan_increment, file_id, metadata, baseline, conditions,
+                                               options.get("base_file_id"))
+        
+        # Mettre à jour la progression
+        progress(50)
+        
+        if plan is not None:
+            logger.info(f"Analyse incrémentale du fichier {file_id} à partir de {plan.base_file_id}: "
+                        f"{len(plan.delta_rows)} entrées à analyser sur {total_entries}")
+            findings = await self._analyse_increment(detector, columns, features, plan)
+        else:
+            # Détecter les anomalies (toutes: la limite est appliquée après les contrôles entre fichiers)
+            logger.info(f"Détection d'anomalies sur {total_entries} entrées")
+            findings = await detector.detect_anomalies_columns(columns, features=features, limit=False)
+        
+        # Doublons entre fichiers et flux intragroupe (index des empreintes de tous les fichiers analysés)
+        cross_file = []
+        if settings.FINGERPRINT_INDEX_ENABLED:
+            if plan is not None:
+                # La version précédente du fichier est remplacée par celle-ci dans l'index
+                await asyncio.to_thread(remove_file_fingerprints, plan.base_file_id)
+            company = _company_key(metadata)
+            if company:
+                cross_file = await asyncio.to_thread(
+                    cross_file_anomalies, file_id, columns, company, metadata["filename"]
+                )
+            else:
+                # Sans société, un autre envoi du même FEC serait pris pour une autre société
+                logger.info(f"Contrôles entre fichiers ignorés pour le fichier {file_id}: "
+                            f"société inconnue (nom sans SIREN)")
+        
+        # Même consolidation et même limite (MAX_ANOMALIES) pour les anomalies du fichier et entre fichiers
+        anomalies = await detector._consolidate_anomalies(findings + cross_file)
+        
+        # Mettre à jour la progression
+        progress(80)
+        
+        # Enregistrer les anomalies au format colonnaire; les modèles
+        # Pydantic ne sont construits qu'à la lecture, page par page
+        writer = AnomalyColumnWriter(run_id=run_id)
+        writer.extend(anomalies)
+        store_key = self._anomaly_store_key(file_id)
+        store_path = self.blobs.local_path(store_key)
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+        writer.save(store_path, metadata={"file_id": file_id, "job_id": run_id})
+        self.blobs.put_file(store_key, store_path)
+        
+        # Créer le résultat (résumé sans la liste des anomalies)
+        processing_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+        result_dict = {
+            "file_id": file_id,
+            "filename": metadata["filename"],
+            "total_entries": total_entries,
+            "anomaly_count": len(anomalies),
+            "anomalies": [],
+            "anomaly_store": store_key.rpartition("/")[2],
+            "analysis_timestamp": datetime.now().isoformat(),
+            "processing_time_ms": processing_time_ms
+        }
+        
+        if plan is not None:
+            result_dict["incremental"] = plan.summary()
+        
+        # Sauvegarder le résultat et les empreintes de référence des prochaines analyses incrémentales
+        self._write_json(self._result_key(file_id), result_dict)
+        if baseline is not None:
+            await asyncio.to_thread(self._save_baseline, file_id, metadata, baseline, conditions, findings)
+        
+        # Ajouter l'analyse aux métadonnées du fichier (relues: la préparation a pu les modifier)
+        metadata = await self.get_file_metadata(file_id) or metadata
+        if plan is not None:
+            metadata["extends"] = plan.base_file_id
+        metadata["analyses"].append({
+            **(analysis_info or {"job_id": run_id}),
+            "analysis_type": analysis_type,
+            "timestamp": datetime.now().isoformat(),
+            "anomaly_count": len(anomalies)
+        })
+        
+        # Mettre à jour les métadonnées du fichier
+        self._write_json(self._meta_key(file_id), metadata)
+        
+        by_type: Dict[str, int] = {}
+        for anomaly in anomalies:
+            anomaly_type = getattr(anomaly.type, "value", anomaly.type)
+            by_type[anomaly_type] = by_type.get(anomaly_type, 0) + 1
+        
+        return {
+            "file_id": file_id,
+            "filename": metadata["filename"],
+            "total_entries": total_entries,
+            "anomaly_count": len(anomalies),
+            "anomalies_by_type": by_type,
+            "preparsed": preparsed is not None,
+            "incremental": plan.summary() if plan is not None else None,
+            "processing_time_ms": processing_time_ms
+        }
+    
+    def _plan_increment(self,
+                        file_id: str,
+                        metadata: Dict[str, Any],
+                        baseline: Dict[str, np.ndarray],
+                        conditions: Dict[str, Any],
+                        base_file_id: Optional[str] = None) -> Optional[IncrementPlan]:
+        """
+        Compare les écritures du fichier à celles de sa version précédente déjà analysée
+        
+        La version précédente est le fichier indiqué par base_file_id, sinon le
+        dernier fichier analysé de la même société (SIREN du nom de fichier)
+        uploadé avant celui-ci. Elle n'est reprise que si elle a été analysée
+        dans les mêmes conditions (type d'analyse, modèle, seuils) et si ses
+        écritures se retrouvent dans le nouveau fichier (INCREMENTAL_MIN_OVERLAP).
+        
+        Args:
+            file_id: Identifiant du fichier analysé
+            metadata: Métadonnées du fichier analysé
+            baseline: Empreintes de référence du fichier analysé
+            conditions: Type d'analyse et paramètres du détecteur de cette analyse
+            base_file_id: Version précédente imposée
+        
+        Returns:
+            Plan de l'analyse incrémentale, ou None pour une analyse complète
+        """
+        candidate = base_file_id
+        if not candidate:
+            company = _company_key(metadata)
+            latest = self._read_json(self._company_baseline_key(company)) if company else None
+            if latest is None or latest.get("upload_timestamp", "") > metadata.get("upload_timestamp", ""):
+                return None
+            candidate = latest["file_id"]
+        if candidate == file_id:
+            return None
+        
+        # Sans les anomalies non limitées de la version précédente, celles que MAX_ANOMALIES
+        # a écartées de ses résultats seraient perdues: analyse complète
+        if not (self.blobs.exists(self._baseline_key(candidate))
+                and self.blobs.exists(self._findings_key(candidate))):
+            logger.info(f"Analyse complète du fichier {file_id}: pas de résultats réutilisables pour {candidate}")
+            return None
+        try:
+            previous, info = load_columns(self.blobs.fetch(self._baseline_key(candidate)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Empreintes de référence du fichier {candidate} illisibles: {str(e)}")
+            return None
+        if info.get("conditions") != conditions:
+            logger.info(f"Analyse complète du fichier {file_id}: {candidate} a été analysé avec "
+                        f"un autre type d'analyse, modèle ou seuil")
+            return None
+        
+        plan = plan_increment(candidate, previous, baseline)
+        logger.info(f"Fichier {file_id} comparé à {candidate}: {plan.overlap:.0%} des écritures retrouvées")
+        return plan if plan.overlap >= settings.INCREMENTAL_MIN_OVERLAP else None
+    
+    async def _analyse_increment(self,
+                                 detector: AnomalyDetector,
+                                 columns: Dict[str, np.ndarray],
+                                 features: Optional[Dict[str, pd.DataFrame]],
+                                 plan: IncrementPlan) -> List[Any]:
+        """
+        Analyse les écritures nouvelles ou modifiées et reprend les anomalies des écritures inchangées
+        
+        Les anomalies reprises sont celles de la version précédente avant la
+        limite MAX_ANOMALIES (enregistrées avec ses empreintes de référence).
+        
+        Returns:
+            Anomalies du fichier complet, non limitées
+        """
+        previous = await asyncio.to_thread(
+            lambda: AnomalyColumns.load(self.blobs.fetch(self._findings_key(plan.base_file_id)))
+        )
+        carried = carry_over([previous.record(i) for i in range(len(previous))], plan)
+        
+        delta = []
+        if len(plan.delta_rows):
+            delta = await detector.detect_anomalies_columns(
+                subset_columns(columns, plan.delta_rows),
+                features=subset_features(features, plan.delta_rows),
+                limit=False
+            )
+            delta = remap_delta(delta, plan)
+        threshold = detector.detection_settings()["threshold_duplicate_similarity"]
+        boundary = await asyncio.to_thread(boundary_duplicates, columns, plan, threshold)
+        
+        plan.stats["carried_anomalies"] = len(carried)
+        return await detector._consolidate_anomalies(carried + delta + boundary, limit=False)
+    
+    def _save_baseline(self,
+                       file_id: str,
+                       metadata: Dict[str, Any],
+                       baseline: Dict[str, np.ndarray],
+                       conditions: Dict[str, Any],
+                       findings: List[Any]) -> None:
+        """
+        Enregistre les empreintes de référence d'un fichier analysé, les conditions de son
+        analyse et ses anomalies avant la limite MAX_ANOMALIES (reprises par l'analyse suivante)
+        """
+        writer = AnomalyColumnWriter()
+        writer.extend(findings)
+        key = self._findings_key(file_id)
+        path = self.blobs.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer.save(path, metadata={"file_id": file_id})
+        self.blobs.put_file(key, path)
+        
+        key = self._baseline_key(file_id)
+        path = self.blobs.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_columns(path, baseline, metadata={
+            "file_id": file_id,
+            "company": _company_key(metadata),
+            "conditions": conditions
+        })
+        self.blobs.put_file(key, path)
+        
+        # Dernier fichier analysé de la société: version reprise par la prochaine analyse incrémentale
+        company = _company_key(metadata)
+        if company:
+            company_key = self._company_baseline_key(company)
+            latest = self._read_json(company_key)
+            upload_timestamp = metadata.get("upload_timestamp", "")
+            if latest is None or latest.get("upload_timestamp", "") <= upload_timestamp:
+                self._write_json(company_key, {"file_id": file_id, "upload_timestamp": upload_timestamp})
+    
     async def get_analysis_job_status(self, job_id: str) -> Optional[AnalysisJobStatus]:
         """
         Récupère le statut d'une tâche d'analyse
@@ -307,14 +693,11 @@ class AnalysisService:
         Returns:
             Statut de la tâche ou None si introuvable
         """
-        job_path = os.path.join(self.jobs_dir, f"{job_id}.json")
+        job_data = self._read_json(self._job_key(job_id))
         
-        if not os.path.exists(job_path):
+        if job_data is None:
             return None
         
-        with open(job_path, "r", encoding="utf-8") as f:
-            job_data = json.load(f)
-        
         # Convertir les chaînes ISO en objets datetime
         created_at = datetime.fromisoformat(job_data["created_at"])
         started_at = datetime.fromisoformat(job_data["started_at"]) if job_data["started_at"] else None  
@@ -341,27 +724,196 @@ class AnalysisService:
             result_path=job_data["result_path"]
         )
     
-    async def get_analysis_results(self, file_id: str) -> Optional[AnomalyResponse]:
+    def _meta_key(self, file_id: str) -> str:
+        """Clé des métadonnées d'un fichier importé"""
+        return self._key(self.storage.uploads, file_id, f"{file_id}_meta.json")
+    
+    def _job_key(self, job_id: str) -> str:
+        """Clé d'une tâche d'analyse"""
+        return self._key(self.storage.jobs, job_id, f"{job_id}.json")
+    
+    def _result_key(self, file_id: str) -> str:
+        """Clé du récapitulatif des résultats d'un fichier analysé"""
+        return self._key(self.storage.results, file_id, f"{file_id}.json")
+    
+    def _parsed_key(self, file_id: str) -> str:
+        """Clé des écritures d'un fichier importé, parsées au format colonnaire"""
+        return self._key(self.storage.uploads, file_id, f"{file_id}_entries.npz")
+    
+    def _baseline_key(self, file_id: str) -> str:
+        """Clé des empreintes de référence d'un fichier analysé (analyse incrémentale)"""
+        return self._key(self.storage.results, file_id, f"{file_id}_baseline.npz")
+    
+    def _findings_key(self, file_id: str) -> str:
+        """Clé des anomalies non limitées d'un fichier analysé (analyse incrémentale)"""
+        return self._key(self.storage.results, file_id, f"{file_id}_findings.npz")
+    
+    def _company_baseline_key(self, company: str) -> str:
+        """Clé du dernier fichier analysé d'une société (analyse incrémentale)"""
+        return self._key(self.storage.results, company, f"company_{company}_baseline.json")
+    
+    def _anomaly_store_key(self, file_id: str, store_name: Optional[str] = None) -> str:
+        """Clé du fichier colonnaire des anomalies d'un fichier analysé"""
+        return self._key(self.storage.results, file_id, store_name or f"{file_id}_anomalies.npz")
+    
+    def _key(self, store: ShardedStore, key: str, name: str) -> str:
+        """Clé d'un fichier d'un répertoire découpé dans le stockage d'objets"""
+        return self.blobs.key_for(store.path(key, name))
+    
+    def _read_json(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lit un objet JSON du stockage (None s'il n'existe pas)"""
+        try:
+            return json_loads(self.blobs.get(key))
+        except FileNotFoundError:
+            return None
+    
+    def _write_json(self, key: str, data: Dict[str, Any]) -> None:
+        """Enregistre un objet JSON dans le stockage"""
+        self.blobs.put(key, json_dumps_bytes(data))
+    
+    def _fetch_upload(self, metadata: Dict[str, Any]) -> str:
+        """Chemin local d'un fichier importé, téléchargé depuis le stockage si nécessaire"""
+        file_key = metadata.get("file_key")
+        if file_key is None:
+            # Fichier importé avant le stockage d'objets
+            return metadata["file_path"]
+        return self.blobs.fetch(file_key)
+    
+    async def get_analysis_results(self, 
+                                   file_id: str, 
+                                   page: Optional[int] = None, 
+                                   page_size: Optional[int] = None) -> Optional[AnomalyResponse]:
         """
         Récupère les résultats d'analyse pour un fichier
         
         Args:
             file_id: Identifiant du fichier
+            page: Numéro de page des anomalies (commence à 1, toutes si None)
+            page_size: Nombre d'anomalies par page
             
         Returns:
             Résultats d'analyse ou None si introuvable
         """
-        result_path = os.path.join(self.results_dir, f"{file_id}.json")
+        result_json = self._read_json(self._result_key(file_id))
         
-        if not os.path.exists(result_path):
+        if result_json is None:
             return None
         
-        with open(result_path, "r", encoding="utf-8") as f:
-            result_json = json.load(f)
+        offset = (page - 1) * page_size if page and page_size else 0
+        limit = page_size if page and page_size else None
+        
+        store_name = result_json.pop("anomaly_store", None)
+        if store_name:
+            # Seules les anomalies de la page demandée sont matérialisées
+            store_key = self._anomaly_store_key(file_id, store_name)
+            result_json["anomalies"] = await asyncio.to_thread(
+                lambda: AnomalyColumns.load(self.blobs.fetch(store_key)).page(offset, limit)
+            )
+        elif limit is not None:
+            # Ancien format: anomalies complètes dans le JSON
+            result_json["anomalies"] = result_json["anomalies"][offset:offset + limit]
         
         # Convertir le JSON en objet AnomalyResponse
         return AnomalyResponse(**result_json)
     
+    def get_results_summary(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère le récapitulatif des résultats d'analyse, sans les anomalies
+        
+        Args:
+            file_id: Identifiant du fichier
+            
+        Returns:
+            Champs de AnomalyResponse hors anomalies, ou None si introuvable
+        """
+        result_json = self._read_json(self._result_key(file_id))
+        
+        if result_json is None:
+            return None
+        
+        result_json.pop("anomaly_store", None)
+        result_json.pop("anomalies", None)
+        return result_json
+    
+    def get_results_version(self, file_id: str) -> Optional[str]:
+        """
+        Récupère la version des résultats d'analyse d'un fichier
+        
+        La version change à chaque nouvelle analyse (les résultats sont réécrits).
+        
+        Args:
+            file_id: Identifiant du fichier
+        
+        Returns:
+            Version des résultats, ou None si le fichier n'a pas été analysé
+        """
+        info = self.blobs.stat(self._result_key(file_id))
+        
+        if info is None:
+            return None
+        
+        return f"{int(info.mtime * 1_000_000):x}-{info.size:x}"
+    
+    def iter_anomalies(self, file_id: str, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt les anomalies d'un fichier analysé sous forme de dictionnaires JSON
+        
+        Args:
+            file_id: Identifiant du fichier
+            fields: Champs des anomalies à conserver (tous si None)
+            
+        Yields:
+            Anomalies, dans l'ordre du stockage
+        """
+        result_json = self._read_json(self._result_key(file_id))
+        
+        if result_json is None:
+            raise ResourceNotFoundError("Résultats d'analyse", file_id)
+        
+        store_name = result_json.get("anomaly_store")
+        
+        if store_name is None:
+            # Ancien format: anomalies complètes dans le JSON
+            for anomaly in result_json.get("anomalies", []):
+                yield project_fields(anomaly, fields)
+            return
+        
+        store = AnomalyColumns.load(self.blobs.fetch(self._anomaly_store_key(file_id, store_name)))
+        yield from store.iter_dicts(fields=fields)
+    
+    def iter_analysis_results(self, 
+                              file_id: str, 
+                              fmt: str = "json", 
+                              fields: Optional[List[str]] = None) -> Optional[Iterator[bytes]]:
+        """
+        Produit les résultats d'analyse d'un fichier en flux
+        
+        Les anomalies sont encodées une à une depuis le stockage colonnaire,
+        sans construire ni la liste complète ni les modèles Pydantic.
+        
+        Args:
+            file_id: Identifiant du fichier
+            fmt: "json" (document complet) ou "ndjson" (une anomalie par ligne)
+            fields: Champs des anomalies à conserver (tous si None)
+            
+        Returns:
+            Itérateur de morceaux d'octets, ou None si les résultats n'existent pas
+        """
+        summary = self.get_results_summary(file_id)
+        
+        if summary is None:
+            return None
+        
+        anomalies = (json_dumps_bytes(anomaly) for anomaly in self.iter_anomalies(file_id, fields))
+        
+        if fmt == "ndjson":
+            return iter_ndjson(anomalies)
+        
+        # Même ordre de champs que AnomalyResponse
+        header = {key: summary.pop(key) for key in ("file_id", "filename", "total_entries", "anomaly_count") 
+                  if key in summary}
+        return iter_json_document(header, anomalies, footer=summary)
+    
     async def list_files(self, page: int = 1, page_size: int = 20) -> List[FileUploadResponse]:
         """
         Liste les fichiers uploadés avec pagination
@@ -375,24 +927,19 @@ class AnalysisService:
         """
         # Récupérer les fichiers de métadonnées
         files = []
-        for filename in os.listdir(self.uploads_dir):
-            if filename.endswith("_meta.json"):
-                file_path = os.path.join(self.uploads_dir, filename)
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        file_data = json.load(f)
-                        
-                        files.append(FileUploadResponse(
-                            file_id=file_data["file_id"],
-                            filename=file_data["filename"],
-                            size_bytes=file_data["file_size"],
-                            upload_timestamp=datetime.fromisoformat(file_data["upload_timestamp"]),
-                            content_type="application/octet-stream",  # À améliorer si nécessaire
-                            status=file_data["status"],
-                            message=""
-                        ))
-                except Exception as e:
-                    logger.error(f"Erreur lors de la lecture des métadonnées {file_path}: {str(e)}")
+        for file_data in self.iter_file_metadata():
+            try:
+                files.append(FileUploadResponse(
+                    file_id=file_data["file_id"],
+                    filename=file_data["filename"],
+                    size_bytes=file_data["file_size"],
+                    upload_timestamp=datetime.fromisoformat(file_data["upload_timestamp"]),
+                    content_type="application/octet-stream",  # À améliorer si nécessaire
+                    status=file_data["status"],
+                    message=""
+                ))
+            except Exception as e:
+                logger.error(f"Erreur lors de la lecture des métadonnées du fichier {file_data.get('file_id')}: {str(e)}")
         
         # Trier par date d'upload (plus récent d'abord)
         files.sort(key=lambda x: x.upload_timestamp, reverse=True)
@@ -403,6 +950,22 @@ class AnalysisService:
         
         return files[start_idx:end_idx]
     
+    def iter_file_metadata(self) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt les métadonnées de tous les fichiers uploadés
+        
+        Yields:
+            Métadonnées de chaque fichier (les métadonnées illisibles sont ignorées)
+        """
+        prefix = self.blobs.key_for(self.storage.uploads.base_dir) + "/"
+        for info in self.blobs.list(prefix):
+            if not info.key.endswith("_meta.json"):
+                continue
+            try:
+                yield json_loads(self.blobs.get(info.key))
+            except Exception as e:
+                logger.error(f"Erreur lors de la lecture des métadonnées {info.key}: {str(e)}")
+    
     async def delete_file(self, file_id: str) -> bool:
         """
         Supprime un fichier et ses analyses associées
@@ -414,36 +977,123 @@ class AnalysisService:
             True si la suppression a réussi
         """
         # Vérifier que le fichier existe
-        metadata_path = os.path.join(self.uploads_dir, f"{file_id}_meta.json")
-        
-        if not os.path.exists(metadata_path):
+        if not self.blobs.exists(self._meta_key(file_id)):
             raise ResourceNotFoundError("Fichier", file_id)
         
-        # Récupérer les métadonnées
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+        self.remove_file(file_id)
+        
+        logger.info(f"Fichier {file_id} et données associées supprimés")
+        return True
+    
+    def remove_file(self, file_id: str) -> int:
+        """
+        Supprime un fichier, ses métadonnées, ses résultats et ses tâches d'analyse
         
-        # Supprimer le fichier physique
-        file_path = metadata.get("file_path")
-        if file_path and os.path.exists(file_path):  # Correction ici: remplacé & par and
-            os.remove(file_path)
+        Args:
+            file_id: Identifiant du fichier
+            
+        Returns:
+            Nombre d'octets libérés
+        """
+        meta_key = self._meta_key(file_id)
+        metadata = self._read_json(meta_key) or {}
         
-        # Supprimer les métadonnées
-        os.remove(metadata_path)
+        # Fichier importé puis métadonnées
+        freed = 0
+        if metadata.get("file_key") is None:
+            # Fichier importé avant le stockage d'objets
+            freed += _remove_paths([metadata.get("file_path")])
+        keys = [metadata.get("file_key"), meta_key, self._parsed_key(file_id)]
+        get_feature_store().delete(f"upload_{file_id}")
+        remove_file_fingerprints(file_id)
         
-        # Supprimer les résultats d'analyse
-        result_path = os.path.join(self.results_dir, f"{file_id}.json")
-        if os.path.exists(result_path):
-            os.remove(result_path)
+        # Tâches d'analyse associées
+        keys.extend(self._job_key(job["job_id"])
+                    for job in metadata.get("analyses", []) if job.get("job_id"))
         
-        # Supprimer les tâches d'analyse associées
-        for job_id in [job.get("job_id") for job in metadata.get("analyses", [])]:
-            job_path = os.path.join(self.jobs_dir, f"{job_id}.json")
-            if os.path.exists(job_path):
-                os.remove(job_path)
+        return freed + delete_blobs(self.blobs, keys) + self.remove_results(file_id)
+    
+    def remove_results(self, file_id: str) -> int:
+        """
+        Supprime les résultats d'analyse d'un fichier
         
-        logger.info(f"Fichier {file_id} et données associées supprimés")
-        return True
+        Args:
+            file_id: Identifiant du fichier
+            
+        Returns:
+            Nombre d'octets libérés
+        """
+        return delete_blobs(self.blobs, [
+            self._result_key(file_id),
+            self._anomaly_store_key(file_id),
+            self._baseline_key(file_id),
+            self._findings_key(file_id)
+        ])
+
+
+def _company_key(metadata: Dict[str, Any]) -> Optional[str]:
+    """Société d'un fichier (SIREN du nom de fichier), None si elle est inconnue"""
+    return metadata.get("company") or fec_company_id(metadata["filename"])
+
+
+def _normalized(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie d'un dictionnaire telle que relue après enregistrement en JSON (listes au lieu de tuples)"""
+    return json_loads(json_dumps_bytes(data))
+
+
+def _preparse_job_id(file_id: str) -> str:
+    """Identifiant de la tâche de préparation d'un fichier"""
+    return f"preparse_{file_id}"
+
+
+def _entry_stats(columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Statistiques de base des écritures préparées (montants, période, nombre de valeurs distinctes)"""
+    stats: Dict[str, Any] = {}
+    
+    amounts = {}
+    for field in ("debit_montant", "credit_montant"):
+        if field in columns:
+            amounts[field] = pd.to_numeric(pd.Series(columns[field]), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    if amounts:
+        total_debit = float(amounts.get("debit_montant", np.zeros(1)).sum())
+        total_credit = float(amounts.get("credit_montant", np.zeros(1)).sum())
+        stats.update({
+            "total_debit": round(total_debit, 2),
+            "total_credit": round(total_credit, 2),
+            "balance": round(total_debit - total_credit, 2)
+        })
+    
+    if "ecr_date" in columns:
+        days = pd.Series(columns["ecr_date"], dtype=object).fillna("").astype(str).str[:10].str.replace("-", "", regex=False).str[:8]
+        days = days[days.str.fullmatch(r"\d{8}")]
+        if len(days):
+            stats["period_start"] = days.min()
+            stats["period_end"] = days.max()
+    
+    stats["distinct"] = {
+        field: int(pd.Series(columns[field]).nunique())
+        for field in ("journal_code", "ecr_num", "compte_num") if field in columns
+    }
+    stats["empty_values"] = {
+        field: int((pd.Series(columns[field], dtype=object).fillna("").astype(str) == "").sum())
+        for field in ("ecr_date", "compte_num", "ecriture_lib") if field in columns
+    }
+    return stats
+
+
+def _remove_paths(paths: List[Optional[str]]) -> int:
+    """Supprime des fichiers s'ils existent et retourne le nombre d'octets libérés"""
+    freed = 0
+    for path in paths:
+        if not path:
+            continue
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            continue
+    return freed
 
 
 @lru_cache()
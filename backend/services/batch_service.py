@@ -0,0 +1,351 @@
+"""
+Service d'analyse par lot de fichiers FEC.
+
+Un lot regroupe une liste de fichiers uploadés (ou ceux dont le nom correspond
+à un motif glob). Les fichiers sont analysés dans un pool de workers dédié,
+avec le détecteur d'anomalies du processus: les modèles sont chargés une seule
+fois et partagés par toutes les analyses.
+
+L'ordonnancement est équitable entre les lots: chaque worker libre prend le
+prochain fichier du lot suivant (tourniquet), de sorte qu'un petit lot n'attend
+pas la fin d'un lot volumineux soumis avant lui.
+"""
+import asyncio
+import fnmatch
+import logging
+import threading
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.core.config import get_settings
+from backend.core.errors import FileProcessingError, ResourceNotFoundError
+from backend.core.jobs import JobContext, JobManager, get_batch_job_manager
+from backend.models.anomaly_detector import get_anomaly_detector
+from backend.models.schemas import AnalysisType, BatchAnalysisStatus
+from backend.services.analysis_service import AnalysisService, get_analysis_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Nombre de fichiers détaillés dans la synthèse (les plus touchés par les anomalies)
+TOP_FILES_COUNT = 10
+
+FINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class BatchAnalysisService:
+    """Service d'analyse de plusieurs fichiers avec des modèles partagés"""
+
+    def __init__(self,
+                 analysis_service: Optional[AnalysisService] = None,
+                 job_manager: Optional[JobManager] = None):
+        """
+        Initialise le service d'analyse par lot
+
+        Args:
+            analysis_service: Service d'analyse des fichiers (optionnel)
+            job_manager: Pool de workers des lots (optionnel)
+        """
+        self.analysis_service = analysis_service or get_analysis_service()
+        self.job_manager = job_manager or get_batch_job_manager()
+
+        # État des lots de ce processus et files d'attente par lot (tourniquet)
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._queues: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve_files(self, file_ids: Optional[List[str]] = None, pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Détermine les fichiers d'un lot
+
+        Args:
+            file_ids: Identifiants des fichiers
+            pattern: Motif glob des noms de fichiers uploadés (si file_ids n'est pas fourni)
+
+        Returns:
+            Métadonnées des fichiers, dans l'ordre demandé (sans doublon)
+        """
+        if bool(file_ids) == bool(pattern):
+            raise FileProcessingError("Indiquer soit une liste de fichiers (file_ids), soit un motif (pattern)")
+
+        if pattern:
+            files = [metadata for metadata in self.analysis_service.iter_file_metadata()
+                     if fnmatch.fnmatch(metadata.get("filename", ""), pattern)]
+            files.sort(key=lambda metadata: metadata.get("upload_timestamp", ""))
+            if not files:
+                raise ResourceNotFoundError("Fichiers correspondant au motif", pattern)
+        else:
+            files = []
+            for file_id in dict.fromkeys(file_ids):
+                metadata = self.analysis_service._read_json(self.analysis_service._meta_key(file_id))
+                if metadata is None:
+                    raise ResourceNotFoundError("Fichier", file_id)
+                files.append(metadata)
+
+        if len(files) > settings.BATCH_MAX_FILES:
+            raise FileProcessingError(f"Lot trop volumineux: {len(files)} fichiers "
+                                      f"(maximum {settings.BATCH_MAX_FILES})")
+        return files
+
+    def create_batch(self,
+                     file_ids: Optional[List[str]] = None,
+                     pattern: Optional[str] = None,
+                     analysis_type: AnalysisType = AnalysisType.STANDARD,
+                     options: Optional[Dict[str, Any]] = None) -> BatchAnalysisStatus:
+        """
+        Crée un lot et planifie l'analyse de ses fichiers
+
+        Args:
+            file_ids: Identifiants des fichiers à analyser
+            pattern: Motif glob des noms de fichiers uploadés à analyser
+            analysis_type: Type d'analyse
+            options: Options supplémentaires pour l'analyse
+
+        Returns:
+            Statut initial du lot
+        """
+        files = self.resolve_files(file_ids, pattern)
+
+        # Charger les modèles avant le démarrage des workers, qui les partagent
+        get_anomaly_detector()
+
+        batch_id = str(uuid.uuid4())
+        batch = {
+            "batch_id": batch_id,
+            "status": "pending",
+            "analysis_type": analysis_type.value,
+            "pattern": pattern,
+            "options": options or {},
+            "file_ids": [metadata["file_id"] for metadata in files],
+            "files": {metadata["file_id"]: {
+                "file_id": metadata["file_id"],
+                "filename": metadata.get("filename"),
+                "status": "pending",
+                "progress": 0
+            } for metadata in files},
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "completed_at": None,
+            "summary": None
+        }
+
+        with self._lock:
+            self._batches[batch_id] = batch
+            self._queues[batch_id] = deque(batch["file_ids"])
+            self._save(batch)
+
+        # Un créneau par fichier: chaque créneau prend le prochain fichier au moment où il démarre
+        for index in range(len(files)):
+            self.job_manager.submit(f"{batch_id}:{index}", self._run_slot)
+
+        logger.info(f"Lot {batch_id} créé: {len(files)} fichiers à analyser")
+        return self._to_status(batch)
+
+    def get_batch(self, batch_id: str) -> Optional[BatchAnalysisStatus]:
+        """
+        Récupère le statut d'un lot
+
+        Args:
+            batch_id: Identifiant du lot
+
+        Returns:
+            Statut du lot ou None s'il est introuvable
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is not None:
+                return self._to_status(batch)
+
+        # Lot exécuté par un autre processus ou avant un redémarrage: dernier état enregistré
+        batch = self.analysis_service._read_json(self.analysis_service._job_key(batch_id))
+        if batch is None or "file_ids" not in batch:
+            return None
+        return self._to_status(batch)
+
+    def cancel_batch(self, batch_id: str) -> Optional[BatchAnalysisStatus]:
+        """
+        Annule les analyses d'un lot encore en attente
+
+        Les fichiers en cours d'analyse vont jusqu'au bout; le lot passe à
+        l'état cancelled lorsqu'ils sont terminés.
+
+        Args:
+            batch_id: Identifiant du lot
+
+        Returns:
+            Statut du lot ou None s'il est introuvable
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is not None:
+                batch["cancel_requested"] = True
+                for file_id in self._queues.pop(batch_id, ()):
+                    batch["files"][file_id]["status"] = "cancelled"
+                self._finish_if_done(batch)
+                self._save(batch)
+                logger.info(f"Annulation du lot {batch_id} demandée")
+                return self._to_status(batch)
+
+        # Lot terminé (retiré de la mémoire) ou inconnu de ce processus
+        return self.get_batch(batch_id)
+
+    def _next_file(self) -> Optional[Tuple[str, str]]:
+        """Prochain fichier à analyser, en alternant entre les lots; None si tout est pris"""
+        with self._lock:
+            while self._queues:
+                batch_id, queue = next(iter(self._queues.items()))
+                file_id = queue.popleft()
+                if queue:
+                    # Le lot passe en fin de tourniquet
+                    self._queues.move_to_end(batch_id)
+                else:
+                    del self._queues[batch_id]
+
+                batch = self._batches[batch_id]
+                if batch["started_at"] is None:
+                    batch["status"] = "processing"
+                    batch["started_at"] = datetime.now().isoformat()
+                    self._save(batch)
+                batch["files"][file_id]["status"] = "processing"
+                return batch_id, file_id
+        return None
+
+    def _run_slot(self, ctx: JobContext) -> Optional[Dict[str, Any]]:
+        """Analyse le prochain fichier en attente (exécuté dans le pool de workers)"""
+        item = self._next_file()
+        if item is None:
+            return None
+        batch_id, file_id = item
+        batch = self._batches[batch_id]
+        file_state = batch["files"][file_id]
+
+        def on_progress(progress: int, **extra: Any) -> None:
+            file_state["progress"] = progress
+
+        try:
+            summary = asyncio.run(self.analysis_service.analyse_file(
+                file_id,
+                run_id=batch_id,
+                analysis_type=batch["analysis_type"],
+                on_progress=on_progress,
+                analysis_info={"batch_id": batch_id},
+                options=batch["options"]
+            ))
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse du fichier {file_id} (lot {batch_id}): {str(e)}", exc_info=e)
+            summary = None
+            error = str(e)
+
+        with self._lock:
+            if summary is not None:
+                file_state.update(summary, status="completed", progress=100)
+            else:
+                file_state.update(status="failed", progress=100, error=error)
+            self._finish_if_done(batch)
+            self._save(batch)
+        return summary
+
+    def _finish_if_done(self, batch: Dict[str, Any]) -> None:
+        """Termine le lot si tous ses fichiers sont traités et calcule sa synthèse"""
+        files = batch["files"].values()
+        if any(state["status"] not in FINAL_STATUSES for state in files):
+            return
+
+        if batch.get("cancel_requested"):
+            batch["status"] = "cancelled"
+        elif all(state["status"] == "failed" for state in files):
+            batch["status"] = "failed"
+        else:
+            batch["status"] = "completed"
+        batch["completed_at"] = datetime.now().isoformat()
+        batch["summary"] = _summarize(batch)
+        logger.info(f"Lot {batch['batch_id']} terminé ({batch['status']}): "
+                    f"{batch['summary']['analyzed_files']} fichiers analysés, "
+                    f"{batch['summary']['files_per_minute']} fichiers/min")
+
+    def _save(self, batch: Dict[str, Any]) -> None:
+        """
+        Enregistre l'état du lot avec les tâches d'analyse (appelé sous verrou)
+
+        Un lot terminé est retiré de la mémoire: son état enregistré fait foi.
+        """
+        self.analysis_service._write_json(self.analysis_service._job_key(batch["batch_id"]), batch)
+        if batch["status"] in FINAL_STATUSES:
+            self._batches.pop(batch["batch_id"], None)
+            self._queues.pop(batch["batch_id"], None)
+
+    def _to_status(self, batch: Dict[str, Any]) -> BatchAnalysisStatus:
+        """Convertit l'état d'un lot en statut exposé par l'API"""
+        files = list(batch["files"].values())
+        done = sum(state["status"] in FINAL_STATUSES for state in files)
+        progress = sum(100 if state["status"] in FINAL_STATUSES else state["progress"] for state in files)
+
+        return BatchAnalysisStatus(
+            batch_id=batch["batch_id"],
+            status=batch["status"],
+            analysis_type=batch["analysis_type"],
+            progress=round(progress / len(files), 2) if files else 100,
+            file_count=len(files),
+            completed_files=done,
+            failed_files=sum(state["status"] == "failed" for state in files),
+            created_at=datetime.fromisoformat(batch["created_at"]),
+            started_at=datetime.fromisoformat(batch["started_at"]) if batch["started_at"] else None,
+            completed_at=datetime.fromisoformat(batch["completed_at"]) if batch["completed_at"] else None,
+            files=[{key: state.get(key) for key in (
+                "file_id", "filename", "status", "progress", "total_entries",
+                "anomaly_count", "processing_time_ms", "error"
+            )} for state in files],
+            summary=batch.get("summary")
+        )
+
+
+def _summarize(batch: Dict[str, Any]) -> Dict[str, Any]:
+    """Synthèse consolidée des fichiers analysés d'un lot et débit du lot"""
+    analyzed = [state for state in batch["files"].values() if state["status"] == "completed"]
+    total_entries = sum(state["total_entries"] for state in analyzed)
+    anomaly_count = sum(state["anomaly_count"] for state in analyzed)
+
+    by_type: Dict[str, int] = {}
+    for state in analyzed:
+        for anomaly_type, count in state.get("anomalies_by_type", {}).items():
+            by_type[anomaly_type] = by_type.get(anomaly_type, 0) + count
+
+    top_files = sorted(analyzed, key=lambda state: state["anomaly_count"] / max(state["total_entries"], 1),
+                       reverse=True)[:TOP_FILES_COUNT]
+
+    started = datetime.fromisoformat(batch["started_at"] or batch["created_at"])
+    elapsed = max((datetime.fromisoformat(batch["completed_at"]) - started).total_seconds(), 1e-6)
+
+    return {
+        "analyzed_files": len(analyzed),
+        "failed_files": [state["file_id"] for state in batch["files"].values() if state["status"] == "failed"],
+        "total_entries": total_entries,
+        "anomaly_count": anomaly_count,
+        "anomaly_rate": round(anomaly_count / total_entries, 6) if total_entries else 0.0,
+        "anomalies_by_type": dict(sorted(by_type.items(), key=lambda item: item[1], reverse=True)),
+        "top_files": [{
+            "file_id": state["file_id"],
+            "filename": state["filename"],
+            "total_entries": state["total_entries"],
+            "anomaly_count": state["anomaly_count"],
+            "anomaly_rate": round(state["anomaly_count"] / state["total_entries"], 6) if state["total_entries"] else 0.0
+        } for state in top_files],
+        "preparsed_files": sum(bool(state.get("preparsed")) for state in analyzed),
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_minute": round(len(analyzed) * 60 / elapsed, 2),
+        "entries_per_second": round(total_entries / elapsed, 1)
+    }
+
+
+@lru_cache()
+def get_batch_service() -> BatchAnalysisService:
+    """
+    Récupère l'instance unique du service d'analyse par lot
+
+    Returns:
+        Instance du service d'analyse par lot
+    """
+    return BatchAnalysisService()
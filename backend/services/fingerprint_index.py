@@ -0,0 +1,576 @@
+"""
+Index persistant des empreintes d'écritures de tous les fichiers analysés.
+
+Chaque écriture indexée est réduite à une empreinte de 64 bits (hachage de
+champs normalisés) associée à son fichier et à son numéro de ligne. L'index
+permet de retrouver, pour les écritures d'une nouvelle analyse, celles des
+autres fichiers qui ont la même empreinte:
+
+- doublons entre fichiers: même pièce, même montant, même compte auxiliaire
+  (piece_ref, montant, comp_aux_num), par exemple la même facture
+  comptabilisée dans les FEC de deux filiales;
+- flux intragroupe: une écriture sur un compte intragroupe doit avoir sa
+  contrepartie (même pièce, même montant, sens opposé) dans le FEC d'une
+  autre société du groupe.
+
+Organisation sur disque (un répertoire par index): les empreintes sont
+stockées dans des segments triés (tableaux NumPy .npy lus en mmap), la
+recherche se fait par dichotomie dans chaque segment (O(log n) par écriture).
+L'ajout d'un fichier écrit un nouveau segment; au-delà de
+FINGERPRINT_MAX_SEGMENTS segments, les plus petits sont fusionnés. La
+suppression d'un fichier est différée: ses lignes sont ignorées à la lecture
+puis éliminées lors des fusions. Le manifeste JSON décrit les segments et les
+fichiers indexés; il est remplacé de façon atomique.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import ContextManager, Dict, List, Any, Optional, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.core.config import get_settings
+from backend.models.anomaly_records import AnomalyRecord
+from backend.models.schemas import AnomalyType
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrou limité au processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MANIFEST_NAME = "manifest.json"
+
+# Index tenus à jour à chaque analyse
+INDEX_NAMES = ("duplicates", "intercompany")
+
+# Nombre maximal d'anomalies remontées par contrôle entre fichiers
+MAX_CROSS_FILE_ANOMALIES = 1000
+
+# Séparateur des champs hachés (absent des valeurs d'un FEC)
+_FIELD_SEP = "\x1f"
+
+# Une référence d'écriture: code du fichier (32 bits de poids fort) et numéro de ligne
+_LINE_BITS = 32
+_LINE_MASK = (1 << _LINE_BITS) - 1
+
+
+def hash_keys(*fields: pd.Series) -> np.ndarray:
+    """
+    Empreintes 64 bits de champs texte normalisés (espaces retirés, majuscules)
+
+    Le hachage est déterministe d'un processus à l'autre, les empreintes
+    peuvent donc être conservées sur disque.
+    """
+    key = fields[0].str.strip().str.upper()
+    for field in fields[1:]:
+        key = key + _FIELD_SEP + field.str.strip().str.upper()
+    return pd.util.hash_array(key.to_numpy(dtype=object), categorize=False)
+
+
+def _text_column(columns: Dict[str, np.ndarray], name: str, row_count: int) -> pd.Series:
+    """Colonne de texte (vide si absente)"""
+    if name not in columns:
+        return pd.Series([""] * row_count, dtype=object)
+    return pd.Series(columns[name], dtype=object).fillna("").astype(str)
+
+
+def _number_column(columns: Dict[str, np.ndarray], name: str, row_count: int) -> np.ndarray:
+    """Colonne de montants (virgule décimale acceptée, 0 si absente ou invalide)"""
+    if name not in columns:
+        return np.zeros(row_count)
+    if np.asarray(columns[name]).dtype.kind in "fiu":
+        return np.nan_to_num(np.asarray(columns[name], dtype=np.float64))
+    values = pd.Series(columns[name], dtype=object).astype(str).str.replace(",", ".", regex=False)
+    return pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+
+def entry_fingerprints(columns: Dict[str, np.ndarray],
+                       intercompany_prefixes: Optional[List[str]] = None) -> Dict[str, Tuple[np.ndarray, ...]]:
+    """
+    Calcule les empreintes des écritures d'un fichier
+
+    Args:
+        columns: Colonnes des écritures (format columnar)
+        intercompany_prefixes: Préfixes des comptes intragroupe (par défaut INTERCOMPANY_ACCOUNT_PREFIXES)
+
+    Returns:
+        Dictionnaire avec:
+        - "duplicates": (empreintes, lignes) des écritures avec pièce et compte auxiliaire
+        - "intercompany": (empreintes, empreintes de la contrepartie attendue, lignes)
+          des écritures sur un compte intragroupe
+    """
+    row_count = len(next(iter(columns.values()), []))
+    piece_ref = _text_column(columns, "piece_ref", row_count)
+    comp_aux_num = _text_column(columns, "comp_aux_num", row_count)
+    debit = _number_column(columns, "debit_montant", row_count)
+    credit = _number_column(columns, "credit_montant", row_count)
+    cents = pd.Series(np.rint(np.maximum(debit, credit) * 100).astype(np.int64)).astype(str)
+    lines = np.arange(1, row_count + 1, dtype=np.uint32)
+    has_piece = (piece_ref.str.strip() != "").to_numpy() & (cents != "0").to_numpy()
+
+    # Doublons: même pièce, même montant, même tiers
+    rows = np.flatnonzero(has_piece & (comp_aux_num.str.strip() != "").to_numpy())
+    duplicates = (hash_keys(piece_ref.iloc[rows], cents.iloc[rows], comp_aux_num.iloc[rows]), lines[rows])
+
+    # Flux intragroupe: même pièce, même montant, sens opposé chez la contrepartie
+    prefixes = tuple(intercompany_prefixes if intercompany_prefixes is not None
+                     else settings.INTERCOMPANY_ACCOUNT_PREFIXES)
+    is_intercompany = np.zeros(row_count, dtype=bool)
+    if prefixes:
+        is_intercompany = _text_column(columns, "compte_num", row_count).str.strip().str.startswith(prefixes).to_numpy()
+    rows = np.flatnonzero(has_piece & is_intercompany)
+    side = pd.Series(np.where(debit[rows] >= credit[rows], "D", "C"), dtype=object)
+    opposite = pd.Series(np.where(debit[rows] >= credit[rows], "C", "D"), dtype=object)
+    piece, amount = piece_ref.iloc[rows].reset_index(drop=True), cents.iloc[rows].reset_index(drop=True)
+    intercompany = (hash_keys(piece, amount, side), hash_keys(piece, amount, opposite), lines[rows])
+
+    return {"duplicates": duplicates, "intercompany": intercompany}
+
+
+class FingerprintIndex:
+    """Index persistant et incrémental d'empreintes d'écritures, découpé en segments triés"""
+
+    def __init__(self, index_dir: str, max_segments: Optional[int] = None):
+        """
+        Initialise l'index
+
+        Args:
+            index_dir: Répertoire de l'index
+            max_segments: Nombre de segments au-delà duquel les plus petits sont fusionnés
+                          (par défaut FINGERPRINT_MAX_SEGMENTS)
+        """
+        self.index_dir = index_dir
+        self.max_segments = max(2, max_segments or settings.FINGERPRINT_MAX_SEGMENTS)
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Réentrant: une recherche et l'indexation qui en dépend peuvent être faites sous exclusive()
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_mtime = None
+        self._segments: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    # --- Manifeste et verrou ---
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.index_dir, MANIFEST_NAME)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Verrou exclusif réentrant, partagé entre processus lorsque fcntl est disponible"""
+        with self._lock:
+            if fcntl is None or self._lock_depth:
+                # Le verrou de fichier est déjà tenu par ce thread
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(os.path.join(self.index_dir, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Manifeste courant, relu s'il a été modifié par un autre processus"""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._manifest is None or mtime != self._manifest_mtime:
+            if mtime is None:
+                self._manifest = {"next_code": 1, "next_segment": 1, "files": {}, "segments": [], "removed": []}
+            else:
+                with open(self._manifest_path, "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+            live = {segment["name"] for segment in self._manifest["segments"]}
+            self._segments = {name: arrays for name, arrays in self._segments.items() if name in live}
+        return self._manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Remplace le manifeste de façon atomique"""
+        tmp_path = f"{self._manifest_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest = manifest
+        self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+
+    # --- Segments ---
+
+    def _segment_paths(self, name: str) -> Tuple[str, str]:
+        return (os.path.join(self.index_dir, f"{name}.fp.npy"),
+                os.path.join(self.index_dir, f"{name}.ref.npy"))
+
+    def _open_segment(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Empreintes triées et références d'un segment, projetées en mémoire"""
+        arrays = self._segments.get(name)
+        if arrays is None:
+            fp_path, ref_path = self._segment_paths(name)
+            arrays = (np.load(fp_path, mmap_mode="r"), np.load(ref_path, mmap_mode="r"))
+            self._segments[name] = arrays
+        return arrays
+
+    def _write_segment(self, manifest: Dict[str, Any], fingerprints: np.ndarray, refs: np.ndarray,
+                       codes: List[int]) -> Dict[str, Any]:
+        """Trie et enregistre un segment; retourne sa description pour le manifeste"""
+        name = f"seg_{manifest['next_segment']:08d}"
+        manifest["next_segment"] += 1
+        fp_path, ref_path = self._segment_paths(name)
+
+        order = np.argsort(fingerprints, kind="stable")
+        for path, values in ((fp_path, fingerprints), (ref_path, refs)):
+            out = np.lib.format.open_memmap(f"{path}.tmp", mode="w+", dtype=np.uint64, shape=(len(order),))
+            np.take(values, order, out=out)
+            out.flush()
+            del out
+            os.replace(f"{path}.tmp", path)
+
+        return {"name": name, "count": int(len(order)), "files": sorted(codes)}
+
+    def _delete_segment(self, name: str) -> None:
+        self._segments.pop(name, None)
+        for path in self._segment_paths(name):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _merge_segments(self, manifest: Dict[str, Any], segments: List[Dict[str, Any]]) -> None:
+        """Fusionne des segments en un seul, en éliminant les fichiers supprimés"""
+        removed = set(manifest["removed"])
+        fingerprints, refs, codes = [], [], set()
+        for segment in segments:
+            fp, ref = self._open_segment(segment["name"])
+            if removed & set(segment["files"]):
+                keep = ~np.isin((ref >> _LINE_BITS).astype(np.int64), list(removed))
+                fp, ref = fp[keep], ref[keep]
+            fingerprints.append(fp)
+            refs.append(ref)
+            codes.update(segment["files"])
+
+        merged = self._write_segment(manifest, np.concatenate(fingerprints), np.concatenate(refs),
+                                     sorted(codes - removed))
+        names = {segment["name"] for segment in segments}
+        manifest["segments"] = [segment for segment in manifest["segments"] if segment["name"] not in names]
+        if merged["count"]:
+            manifest["segments"].append(merged)
+        else:
+            self._delete_segment(merged["name"])
+
+        # Un fichier supprimé n'est plus à ignorer lorsqu'aucun segment ne le contient
+        present = {code for segment in manifest["segments"] for code in segment["files"]}
+        manifest["removed"] = [code for code in manifest["removed"] if code in present]
+
+        self._save_manifest(manifest)
+        for name in names:
+            self._delete_segment(name)
+
+    def _maybe_merge(self, manifest: Dict[str, Any]) -> None:
+        """Fusionne les plus petits segments lorsque leur nombre dépasse max_segments"""
+        if len(manifest["segments"]) <= self.max_segments:
+            return
+        by_size = sorted(manifest["segments"], key=lambda segment: segment["count"])
+        merge_count = len(by_size) - self.max_segments // 2 + 1
+        start = time.time()
+        self._merge_segments(manifest, by_size[:merge_count])
+        logger.info(f"Index {self.index_dir}: {merge_count} segments fusionnés en {time.time() - start:.2f} s")
+
+    # --- API ---
+
+    def exclusive(self) -> ContextManager[None]:
+        """
+        Verrou exclusif de l'index (threads et processus)
+
+        À tenir entre une recherche et l'indexation du même fichier, pour que
+        deux fichiers analysés en même temps ne s'ignorent pas mutuellement.
+        """
+        return self._locked()
+
+    def add_file(self, file_id: str, fingerprints: np.ndarray, lines: np.ndarray,
+                 group: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Indexe les écritures d'un fichier (remplace celles d'une indexation précédente)
+
+        Args:
+            file_id: Identifiant du fichier
+            fingerprints: Empreintes des écritures (uint64)
+            lines: Numéros de ligne des écritures
+            group: Groupe du fichier (société): les recherches peuvent exclure un groupe
+            extra: Informations associées au fichier dans le manifeste
+
+        Returns:
+            Nombre d'écritures indexées
+        """
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        lines = np.asarray(lines, dtype=np.uint64)
+        with self._locked():
+            manifest = self._load_manifest()
+            self._remove_locked(manifest, file_id)
+
+            code = manifest["next_code"]
+            manifest["next_code"] += 1
+            manifest["files"][str(code)] = {
+                "file_id": file_id,
+                "group": group,
+                "count": int(len(fingerprints)),
+                "indexed_at": time.time(),
+                **(extra or {})
+            }
+            if len(fingerprints):
+                refs = (np.uint64(code) << np.uint64(_LINE_BITS)) | (lines & np.uint64(_LINE_MASK))
+                manifest["segments"].append(self._write_segment(manifest, fingerprints, refs, [code]))
+            self._save_manifest(manifest)
+            self._maybe_merge(manifest)
+        return len(fingerprints)
+
+    def remove_file(self, file_id: str) -> bool:
+        """
+        Retire les écritures d'un fichier de l'index
+
+        Args:
+            file_id: Identifiant du fichier
+
+        Returns:
+            True si le fichier était indexé
+        """
+        with self._locked():
+            manifest = self._load_manifest()
+            removed = self._remove_locked(manifest, file_id)
+            if removed:
+                self._save_manifest(manifest)
+        return removed
+
+    def _remove_locked(self, manifest: Dict[str, Any], file_id: str) -> bool:
+        codes = [code for code, info in manifest["files"].items() if info["file_id"] == file_id]
+        for code in codes:
+            del manifest["files"][code]
+            manifest["removed"].append(int(code))
+        return bool(codes)
+
+    def lookup(self, fingerprints: np.ndarray,
+               exclude_group: Optional[str] = None,
+               exclude_content: Optional[str] = None) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        Recherche des empreintes dans l'index
+
+        Args:
+            fingerprints: Empreintes recherchées (uint64)
+            exclude_group: Groupe dont les fichiers sont ignorés (la société du fichier analysé)
+            exclude_content: Empreinte de contenu dont les fichiers sont ignorés (nouveaux envois
+                des mêmes écritures)
+
+        Returns:
+            Tuple (rang de l'empreinte recherchée, identifiant du fichier, numéro de ligne)
+            pour chaque écriture indexée correspondante
+        """
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        with self._lock:
+            manifest = self._load_manifest()
+            segments = [self._open_segment(segment["name"]) for segment in manifest["segments"]]
+            files = dict(manifest["files"])
+            hidden = list(manifest["removed"])
+
+        if exclude_group is not None:
+            hidden.extend(int(code) for code, info in files.items() if info.get("group") == exclude_group)
+        if exclude_content is not None:
+            hidden.extend(int(code) for code, info in files.items() if info.get("content") == exclude_content)
+
+        # Recherche dans l'ordre des empreintes: accès séquentiels aux segments
+        order = np.argsort(fingerprints, kind="stable")
+        queries = fingerprints[order]
+
+        found_rank, found_ref = [], []
+        for fp, ref in segments:
+            lo = np.searchsorted(fp, queries, side="left")
+            hi = np.searchsorted(fp, queries, side="right")
+            counts = hi - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            hits = np.flatnonzero(counts)
+            starts = np.repeat(lo[hits] - (np.cumsum(counts[hits]) - counts[hits]), counts[hits])
+            positions = starts + np.arange(total)
+            found_rank.append(np.repeat(order[hits], counts[hits]))
+            found_ref.append(np.asarray(ref[positions]))
+
+        if not found_rank:
+            return np.empty(0, dtype=np.int64), [], np.empty(0, dtype=np.int64)
+
+        ranks = np.concatenate(found_rank)
+        refs = np.concatenate(found_ref)
+        codes = (refs >> np.uint64(_LINE_BITS)).astype(np.int64)
+        if hidden:
+            keep = ~np.isin(codes, hidden)
+            ranks, refs, codes = ranks[keep], refs[keep], codes[keep]
+
+        file_ids = [files[str(code)]["file_id"] for code in codes.tolist()]
+        return ranks, file_ids, (refs & np.uint64(_LINE_MASK)).astype(np.int64)
+
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        """Fichiers indexés, par identifiant"""
+        with self._lock:
+            manifest = self._load_manifest()
+        return {info["file_id"]: dict(info) for info in manifest["files"].values()}
+
+    def compact(self) -> None:
+        """Fusionne tous les segments et élimine les écritures des fichiers supprimés"""
+        with self._locked():
+            manifest = self._load_manifest()
+            if len(manifest["segments"]) > 1 or manifest["removed"]:
+                self._merge_segments(manifest, list(manifest["segments"]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Taille de l'index: écritures, fichiers, segments et octets sur disque"""
+        with self._lock:
+            manifest = self._load_manifest()
+        size = 0
+        for segment in manifest["segments"]:
+            for path in self._segment_paths(segment["name"]):
+                try:
+                    size += os.path.getsize(path)
+                except FileNotFoundError:
+                    pass
+        return {
+            "entries": sum(segment["count"] for segment in manifest["segments"]),
+            "files": len(manifest["files"]),
+            "segments": len(manifest["segments"]),
+            "removed_files": len(manifest["removed"]),
+            "size_bytes": size
+        }
+
+
+def cross_file_anomalies(file_id: str,
+                         columns: Dict[str, np.ndarray],
+                         group: str,
+                         filename: Optional[str] = None,
+                         max_anomalies: int = MAX_CROSS_FILE_ANOMALIES) -> List[AnomalyRecord]:
+    """
+    Compare les écritures d'un fichier à celles des autres sociétés, puis les indexe
+
+    Les fichiers dont les écritures sont identiques (même fichier envoyé sous un
+    autre nom) ne sont jamais comparés entre eux.
+
+    Args:
+        file_id: Identifiant du fichier analysé
+        columns: Colonnes des écritures du fichier
+        group: Société du fichier: les fichiers de la même société ne sont pas comparés
+        filename: Nom du fichier, enregistré dans l'index
+        max_anomalies: Nombre maximal d'anomalies remontées par contrôle
+
+    Returns:
+        Doublons entre fichiers et flux intragroupe sans contrepartie
+    """
+    start_time = time.time()
+    fingerprints = entry_fingerprints(columns)
+    duplicates_index = get_fingerprint_index("duplicates")
+    intercompany_index = get_fingerprint_index("intercompany")
+    row_count = len(next(iter(columns.values()), []))
+    text = {name: _text_column(columns, name, row_count).to_numpy() for name in ("piece_ref", "comp_aux_num", "compte_num")}
+    amounts = np.maximum(_number_column(columns, "debit_montant", row_count),
+                         _number_column(columns, "credit_montant", row_count))
+
+    def entry(line: int) -> Dict[str, Any]:
+        row = line - 1
+        return {**{name: values[row] for name, values in text.items()}, "montant": float(amounts[row])}
+
+    # Empreinte du contenu: indépendante de l'ordre des lignes et du nom du fichier
+    content = hashlib.sha256(np.sort(np.concatenate([
+        fingerprints["duplicates"][0], fingerprints["intercompany"][0]
+    ])).tobytes()).hexdigest()
+
+    anomalies: List[AnomalyRecord] = []
+
+    # Recherche et indexation sous le même verrou (toujours dans l'ordre de INDEX_NAMES):
+    # de deux fichiers analysés en même temps, le second voit toujours le premier
+    with duplicates_index.exclusive(), intercompany_index.exclusive():
+        # --- Doublons entre fichiers de sociétés différentes ---
+        dup_fps, dup_lines = fingerprints["duplicates"]
+        ranks, match_files, match_lines = duplicates_index.lookup(dup_fps, exclude_group=group,
+                                                                 exclude_content=content)
+        if len(ranks):
+            indexed = duplicates_index.files()
+            order = np.argsort(ranks, kind="stable")
+            ranks, match_lines = ranks[order], match_lines[order]
+            match_files = [match_files[i] for i in order.tolist()]
+            bounds = np.flatnonzero(np.diff(ranks)) + 1
+            for first, last in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(ranks)].tolist()):
+                line = int(dup_lines[ranks[first]])
+                matches = [{
+                    "file_id": match_files[i],
+                    "filename": indexed.get(match_files[i], {}).get("filename"),
+                    "line": int(match_lines[i])
+                } for i in range(first, min(last, first + 10))]
+                other_files = len({match_files[i] for i in range(first, last)})
+                anomalies.append(AnomalyRecord(
+                    type=AnomalyType.CROSS_FILE_DUPLICATE,
+                    description=f"Pièce déjà comptabilisée dans {other_files} fichier(s) d'une autre société",
+                    confidence_score=0.85,
+                    line_numbers=[line],
+                    related_data={**entry(line), "match_count": last - first, "matches": matches}
+                ))
+                if len(anomalies) >= max_anomalies:
+                    break
+
+        # --- Flux intragroupe sans contrepartie ---
+        own_fps, counterpart_fps, ic_lines = fingerprints["intercompany"]
+        other_groups = {info.get("group") for info in intercompany_index.files().values()
+                        if info.get("content") != content} - {group}
+        if len(counterpart_fps) and other_groups:
+            # Contrôle possible seulement si des fichiers d'autres sociétés ont été indexés
+            ranks, _, _ = intercompany_index.lookup(counterpart_fps, exclude_group=group,
+                                                      exclude_content=content)
+            unmatched = np.setdiff1d(np.arange(len(counterpart_fps)), ranks)
+            for rank in unmatched[:max_anomalies].tolist():
+                line = int(ic_lines[rank])
+                anomalies.append(AnomalyRecord(
+                    type=AnomalyType.UNMATCHED_INTERCOMPANY,
+                    description="Flux intragroupe sans écriture de contrepartie dans les FEC des autres sociétés",
+                    confidence_score=0.6,
+                    line_numbers=[line],
+                    related_data={**entry(line), "companies_checked": len(other_groups)}
+                ))
+
+        # Indexer le fichier (remplace une indexation précédente du même fichier)
+        extra = {"filename": filename, "content": content}
+        duplicates_index.add_file(file_id, dup_fps, dup_lines, group=group, extra=extra)
+        intercompany_index.add_file(file_id, own_fps, ic_lines, group=group, extra=extra)
+
+    logger.info(f"Contrôles entre fichiers: {len(anomalies)} anomalies en {time.time() - start_time:.2f} s "
+                f"({len(dup_fps)} empreintes de pièces, {len(own_fps)} flux intragroupe)")
+    return anomalies
+
+
+def remove_file_fingerprints(file_id: str) -> None:
+    """Retire les écritures d'un fichier des index d'empreintes"""
+    for name in INDEX_NAMES:
+        get_fingerprint_index(name).remove_file(file_id)
+
+
+@lru_cache()
+def get_fingerprint_index(name: str) -> FingerprintIndex:
+    """
+    Récupère l'instance unique d'un index d'empreintes
+
+    Args:
+        name: Nom de l'index ("duplicates" ou "intercompany"), répertoire DATA_DIR/index/<name>
+
+    Returns:
+        Instance de l'index
+    """
+    return FingerprintIndex(os.path.join(settings.DATA_DIR, "index", name))
@@ -1,137 +1,347 @@
 """Service pour la génération des données FEC"""
 import os
-import json
+import random
 import logging
 import asyncio
+from collections import Counter
+from contextlib import closing
+from concurrent.futures import Future
 from datetime import datetime
 import uuid
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, List, Optional
 from functools import lru_cache
 
 from backend.core.config import get_settings
-from backend.models.my_fec_generator import MyFECGenerator
-from backend.models.anomaly_detector import get_anomaly_detector
+from backend.core.jobs import JobContext, JobManager, get_job_manager
+from backend.models.generation_engine import GenerationConfig
+from backend.models.generation_pipeline import generate_and_detect
+from backend.models.anomaly_records import make_anomaly_id
+from backend.utils.json_utils import (
+    json_dumps_bytes, json_loads, read_json, write_json, project_fields, iter_json_document, iter_ndjson
+)
+from backend.models.anomaly_detector import MAX_ANOMALIES, get_anomaly_detector
+from backend.utils.storage import get_storage
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Nombre d'écritures générées, écrites et analysées par lot
+GENERATION_CHUNK_SIZE = 50_000
+
 
 class GenerationService:
     """Service pour la génération de données FEC"""
-    
-    def __init__(self):
-        """Initialise le service de génération"""
+
+    def __init__(self, job_manager: Optional[JobManager] = None):
+        """
+        Initialise le service de génération
+
+        Args:
+            job_manager: Gestionnaire de tâches à utiliser (optionnel)
+        """
         self.data_dir = settings.DATA_DIR
-        self.generation_dir = os.path.join(self.data_dir, "generated")
-        os.makedirs(self.generation_dir, exist_ok=True)
-    
-    async def generate_and_analyze(self, 
-                          count: int = 1000, 
-                          anomaly_rate: float = 0.05, 
+        self.store = get_storage().generated
+        self.generation_dir = self.store.base_dir
+        self.job_manager = job_manager or get_job_manager()
+
+    def get_csv_path(self, generation_id: str) -> str:
+        """Chemin du fichier CSV d'une génération"""
+        return self.store.path(generation_id, f"generated_{generation_id}.csv")
+
+    def get_result_path(self, generation_id: str) -> str:
+        """Chemin du fichier de résultats d'une génération"""
+        return self.store.path(generation_id, f"results_{generation_id}.json")
+
+    def get_anomalies_path(self, generation_id: str) -> str:
+        """Chemin du fichier NDJSON des anomalies d'une génération"""
+        return self.store.path(generation_id, f"anomalies_{generation_id}.ndjson")
+
+    def get_status_file(self, generation_id: str) -> str:
+        """Chemin du fichier de statut d'une génération"""
+        return self.store.path(generation_id, f"status_{generation_id}.json")
+
+    def start_generation(self,
+                         count: int = 1000,
+                         anomaly_rate: float = 0.05,
+                         options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Lance une génération (et son analyse) dans le pool de workers
+
+        Args:
+            count: Nombre d'écritures à générer
+            anomaly_rate: Taux d'anomalies à introduire (0-1)
+            options: Options supplémentaires pour la génération
+
+        Returns:
+            Identifiant de la génération
+        """
+        generation_id = str(uuid.uuid4())
+        self._submit(generation_id, count, anomaly_rate, options or {})
+        return generation_id
+
+    async def generate_and_analyze(self,
+                          count: int = 1000,
+                          anomaly_rate: float = 0.05,
                           options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Génère un jeu de données FEC et analyse les anomalies
-        
+        Génère un jeu de données FEC et analyse les anomalies, en attendant la fin du job
+
         Args:
             count: Nombre d'écritures à générer
             anomaly_rate: Taux d'anomalies à introduire (0-1)
             options: Options supplémentaires pour la génération
-            
+
+        Returns:
+            Récapitulatif de la génération
+        """
+        future = self._submit(str(uuid.uuid4()), count, anomaly_rate, options or {})
+        return await asyncio.wrap_future(future)
+
+    def _submit(self, generation_id: str, count: int, anomaly_rate: float, options: Dict[str, Any]) -> Future:
+        """Prépare les paramètres, initialise le statut et soumet le job au pool"""
+        seed = options.get("seed")
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+
+        config = GenerationConfig(
+            company_name=options.get("company_name", f"COMPANY_{generation_id[:8]}"),
+            start_date=options.get("start_date", "2023-01-01"),
+            end_date=options.get("end_date", "2023-12-31"),
+            count=count,
+            anomaly_rate=anomaly_rate,
+            seed=seed,
+            scenario=options.get("scenario", "standard")
+        )
+        analyze = options.get("analyze", True)
+        # Les fichiers de la génération sont regroupés dans son sous-répertoire
+        status_file = self.store.writable_path(generation_id, f"status_{generation_id}.json")
+
+        self._save_status(status_file, {
+            "job_id": generation_id,
+            "status": "initializing",
+            "progress": 0,
+            "step": None,
+            "message": "Génération en attente",
+            "start_time": datetime.now().isoformat(),
+            "end_time": None
+        })
+
+        future = self.job_manager.submit(
+            generation_id,
+            self._run_generation,
+            config,
+            analyze,
+            on_update=lambda state: self._save_status(status_file, state)
+        )
+
+        logger.info(f"Génération {generation_id} soumise au pool de workers ({count} écritures)")
+        return future
+
+    def get_status(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère le statut d'une génération
+
+        Args:
+            generation_id: Identifiant de la génération
+
+        Returns:
+            Statut du job ou None si introuvable
+        """
+        state = self.job_manager.get_state(generation_id)
+        if state is not None:
+            return state
+
+        status_file = self.get_status_file(generation_id)
+        if not os.path.exists(status_file):
+            return None
+
+        return read_json(status_file)
+
+    def iter_results(self,
+                     generation_id: str,
+                     fmt: str = "json",
+                     fields: Optional[List[str]] = None) -> Optional[Iterator[bytes]]:
+        """
+        Produit les résultats d'une génération en flux, à mémoire constante
+
+        Les anomalies sont relues ligne à ligne depuis le fichier NDJSON; sans
+        projection, les lignes sont transmises telles quelles.
+
+        Args:
+            generation_id: Identifiant de la génération
+            fmt: "json" (document complet) ou "ndjson" (une anomalie par ligne)
+            fields: Champs des anomalies à conserver (tous si None)
+
         Returns:
-            Dictionnaire des résultats
+            Itérateur de morceaux d'octets, ou None si les résultats n'existent pas
+        """
+        result_path = self.get_result_path(generation_id)
+        if not os.path.exists(result_path):
+            return None
+
+        results = read_json(result_path)
+        store_name = results.pop("anomaly_store", None)
+        legacy_anomalies = results.pop("anomalies", [])
+
+        def anomalies() -> Iterator[bytes]:
+            if store_name is None:
+                # Ancien format: anomalies incluses dans le fichier de résultats
+                for anomaly in legacy_anomalies:
+                    yield json_dumps_bytes(project_fields(anomaly, fields))
+                return
+            with open(self.store.path(generation_id, store_name), "rb") as f:
+                for line in f:
+                    line = line.rstrip(b"\n")
+                    if not line:
+                        continue
+                    yield line if fields is None else json_dumps_bytes(project_fields(json_loads(line), fields))
+
+        if fmt == "ndjson":
+            return iter_ndjson(anomalies())
+        header = {key: results.pop(key) for key in ("generation_id", "params") if key in results}
+        return iter_json_document(header, anomalies(), footer=results)
+
+    def cancel_generation(self, generation_id: str) -> bool:
+        """
+        Demande l'annulation d'une génération en cours
+
+        Args:
+            generation_id: Identifiant de la génération
+
+        Returns:
+            True si l'annulation a été prise en compte
+        """
+        return self.job_manager.cancel(generation_id)
+
+    def _run_generation(self,
+                        ctx: JobContext,
+                        config: GenerationConfig,
+                        analyze: bool) -> Dict[str, Any]:
+        """
+        Génère les écritures par lots en écrivant le CSV et les anomalies au fil de l'eau
+
+        Chaque lot est analysé directement au format colonnaire pendant que le
+        CSV est écrit par un thread d'arrière-plan (voir generation_pipeline).
+
+        Args:
+            ctx: Contexte du job (progression, annulation)
+            config: Configuration immuable de la génération
+            analyze: Lancer la détection d'anomalies sur chaque lot
+
+        Returns:
+            Récapitulatif de la génération
         """
-        options = options or {}
         start_time = time.time()
-        generation_id = str(uuid.uuid4())
-        
+        generation_id = ctx.job_id
+        count = config.count
+        csv_path = self.get_csv_path(generation_id)
+        result_path = self.get_result_path(generation_id)
+        anomalies_path = self.get_anomalies_path(generation_id)
+
+        detector = get_anomaly_detector() if analyze else None
+
+        logger.info(f"Génération de {count} écritures avec {config.anomaly_rate:.1%} d'anomalies "
+                    f"par lots de {GENERATION_CHUNK_SIZE}")
+
+        line_count = 0
+        injected_count = 0
+        # Anomalies les plus sûres de toute la génération: le détecteur limite chaque
+        # lot à MAX_ANOMALIES, la même limite est appliquée une fois sur l'ensemble des lots
+        kept = []
+        run_id = uuid.uuid4().hex[:12]
+        csv_tmp = f"{csv_path}.tmp"
+        anomalies_tmp = f"{anomalies_path}.tmp"
+
         try:
-            # Configurer le générateur
-            generator_params = {
-                "company_name": options.get("company_name", f"COMPANY_{generation_id[:8]}"),
-                "start_date": options.get("start_date", "2023-01-01"),
-                "end_date": options.get("end_date", "2023-12-31"),
-                "transaction_count": count,
-                "anomaly_rate": anomaly_rate
-            }
-            
-            # Créer le générateur
-            generator = MyFECGenerator(**generator_params)
-            
-            # Générer les données
-            logger.info(f"Génération de {count} écritures avec {anomaly_rate:.1%} d'anomalies")
-            entries = generator.generate_entries()
-            
-            # Sauvegarder les données générées au format CSV
-            csv_path = os.path.join(self.generation_dir, f"generated_{generation_id}.csv")
-            self._save_as_csv(entries, csv_path)
-            
-            # Analyser les anomalies
-            detector = get_anomaly_detector()
-            anomalies = await detector.detect_anomalies(entries)
-            
-            # Durée totale
-            duration_ms = (time.time() - start_time) * 1000
-            
-            # Préparer les résultats
-            results = {
+            with open(csv_tmp, "w", encoding="utf-8", newline="") as csv_file, \
+                 open(anomalies_tmp, "wb") as anomalies_file:
+
+                batches = generate_and_detect(config, csv_file, detector, batch_size=GENERATION_CHUNK_SIZE)
+                with closing(batches):
+                    for batch in batches:
+                        # Horodatage attribué par lot; même ordre que la consolidation du détecteur
+                        detected_at = datetime.now()
+                        kept.extend((anomaly, detected_at) for anomaly in batch.anomalies)
+                        kept.sort(key=lambda item: (-item[0].confidence_score, min(item[0].line_numbers, default=0)))
+                        del kept[MAX_ANOMALIES:]
+
+                        line_count += batch.line_count
+                        injected_count += int((batch.labels != "").sum())
+
+                        ctx.check_cancelled()
+                        ctx.update(
+                            progress=100 * (batch.index + 1) / batch.batch_count,
+                            message=f"Lot {batch.index + 1}/{batch.batch_count} généré et analysé",
+                            step="generation",
+                            lines=line_count,
+                            anomaly_count=len(kept)
+                        )
+
+                # Une ligne JSON par anomalie, identifiants attribués sans modèle Pydantic
+                anomaly_count = len(kept)
+                anomaly_types = Counter()
+                for index, (anomaly, detected_at) in enumerate(kept):
+                    anomaly_id = make_anomaly_id(run_id, index)
+                    anomalies_file.write(json_dumps_bytes(anomaly.to_dict(anomaly_id, detected_at)) + b"\n")
+                    anomaly_types[anomaly.type.value] += 1
+
+                duration_ms = (time.time() - start_time) * 1000
+                summary = {
+                    "generation_id": generation_id,
+                    "count": line_count,
+                    "anomaly_count": anomaly_count,
+                    "anomaly_types": dict(anomaly_types),
+                    "injected_anomaly_count": injected_count,
+                    "anomaly_rate": config.anomaly_rate,
+                    "scenario": config.scenario,
+                    "csv_path": csv_path,
+                    "result_path": result_path,
+                    "duration_ms": duration_ms,
+                    "generated_at": datetime.now().isoformat()
+                }
+
+            os.replace(csv_tmp, csv_path)
+            os.replace(anomalies_tmp, anomalies_path)
+
+            # Résultats: paramètres et récapitulatif; les anomalies restent dans le fichier NDJSON
+            write_json(result_path, {
                 "generation_id": generation_id,
-                "count": len(entries),
-                "anomaly_count": len(anomalies),
-                "anomaly_rate": anomaly_rate,
-                "csv_path": csv_path,
-                "duration_ms": duration_ms,
-                "generated_at": datetime.now().isoformat(),
-                "params": generator_params,
-                "anomalies": [anomaly.model_dump() for anomaly in anomalies]  # Correction ici: model_dump() au lieu de dict()
-            }
-            
-            # Sauvegarder les résultats
-            result_path = os.path.join(self.generation_dir, f"results_{generation_id}.json")
-            with open(result_path, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=2, default=self._json_serializer)
-            
-            results["result_path"] = result_path
-            
-            logger.info(f"Génération et analyse terminées: {len(anomalies)} anomalies trouvées")
-            return results
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la génération et analyse: {str(e)}", exc_info=True)
+                "params": config.to_dict(),
+                "anomaly_store": os.path.basename(anomalies_path),
+                **{key: value for key, value in summary.items() if key != "generation_id"}
+            })
+
+        except BaseException:
+            for path in (csv_tmp, anomalies_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
             raise
-    
-    def _save_as_csv(self, entries: List[Dict[str, Any]], file_path: str) -> None:
+
+        ctx.update(
+            message=f"Génération terminée: {line_count} lignes, {anomaly_count} anomalies",
+            lines=line_count,
+            anomaly_count=anomaly_count
+        )
+        logger.info(f"Génération et analyse terminées: {anomaly_count} anomalies trouvées")
+        return summary
+
+    def _save_status(self, status_file: str, status: Dict[str, Any]) -> None:
         """
-        Sauvegarde les entrées au format CSV
-        
+        Sauvegarde le statut dans un fichier JSON
+
         Args:
-            entries: Liste des écritures à sauvegarder
-            file_path: Chemin du fichier de sortie
-        """
-        import pandas as pd
-        
-        # Convertir en DataFrame
-        df = pd.DataFrame(entries)
-        
-        # Sauvegarder au format CSV avec pipe comme séparateur (format FEC)
-        df.to_csv(file_path, sep='|', index=False, encoding='utf-8')
-        
-        logger.info(f"Données sauvegardées dans {file_path}")
-    
-    def _json_serializer(self, obj):
-        """Fonction pour sérialiser les objets non JSON-sérialisables"""
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if hasattr(obj, "__dict__"):
-            return obj.__dict__
-        return str(obj)
+            status_file: Chemin du fichier de statut
+            status: Dictionnaire de statut
+        """
+        write_json(status_file, status)
 
 
 @lru_cache()
 def get_generation_service() -> GenerationService:
     """
     Récupère l'instance unique du service de génération
-    
+
     Returns:
         Instance du service de génération
     """
@@ -0,0 +1,278 @@
+"""
+Analyse incrémentale des FEC cumulés livrés période après période.
+
+Un client qui envoie chaque mois son FEC depuis le début de l'exercice
+renvoie pour l'essentiel des écritures déjà analysées. Chaque analyse
+enregistre une empreinte de référence du fichier (une empreinte par ligne,
+regroupée par écriture ecr_num); lorsqu'un nouveau fichier de la même société
+reprend la plupart des écritures d'un fichier déjà analysé, seules les
+écritures nouvelles ou modifiées passent par le détecteur:
+
+- une écriture (toutes les lignes d'un même ecr_num) est inchangée si ses
+  lignes sont identiques à celles de l'analyse précédente; ses anomalies
+  (contrôles par ligne, équilibre de l'écriture) sont reprises, avec leurs
+  numéros de ligne dans le nouveau fichier;
+- les écritures nouvelles ou modifiées sont analysées entières, ce qui
+  recalcule leur équilibre débit/crédit;
+- les doublons entre une ligne analysée et une ligne inchangée sont
+  recherchés comme par le détecteur (fenêtre de 100 lignes, même score de
+  similarité), parmi les seules lignes voisines d'une ligne analysée.
+
+Le coût de la détection est ainsi proportionnel aux écritures modifiées; le
+parsing et le hachage vectorisé du fichier restent linéaires.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.models.anomaly_records import AnomalyRecord
+from backend.models.schemas import AnomalyType
+from backend.models.trained_detector import (
+    DUPLICATE_WINDOW, duplicate_anomalies, duplicate_keys, find_duplicate_pairs
+)
+
+logger = logging.getLogger(__name__)
+
+# Anomalies recalculées sur le fichier entier à chaque analyse, jamais reprises
+RECOMPUTED_TYPES = {AnomalyType.CROSS_FILE_DUPLICATE, AnomalyType.UNMATCHED_INTERCOMPANY}
+
+# Constante distinguant les lignes sans ecr_num (chacune forme son propre groupe)
+_UNGROUPED_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _text(columns: Dict[str, np.ndarray], name: str, row_count: int) -> pd.Series:
+    """Colonne de texte (vide si absente)"""
+    if name not in columns:
+        return pd.Series([""] * row_count, dtype=object)
+    return pd.Series(columns[name], dtype=object).fillna("").astype(str)
+
+
+def _amounts(columns: Dict[str, np.ndarray], row_count: int) -> np.ndarray:
+    """Montant de chaque ligne (maximum du débit et du crédit)"""
+    values = []
+    for name in ("debit_montant", "credit_montant"):
+        column = columns.get(name)
+        if column is None:
+            values.append(np.zeros(row_count))
+        else:
+            series = pd.Series(column, dtype=object).astype(str).str.replace(",", ".", regex=False)
+            values.append(pd.to_numeric(series, errors="coerce").fillna(0).to_numpy(dtype=np.float64))
+    return np.maximum(*values)
+
+
+def build_baseline(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Empreintes de référence des lignes d'un fichier
+
+    Args:
+        columns: Colonnes des écritures
+
+    Returns:
+        Colonnes group_key (écriture ecr_num de la ligne) et row_hash (contenu de la ligne)
+    """
+    row_count = len(next(iter(columns.values()), []))
+    frame = pd.DataFrame({name: np.asarray(columns[name]) for name in sorted(columns)})
+    row_hash = pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+    ecr_num = _text(columns, "ecr_num", row_count).str.strip()
+    group_key = pd.util.hash_array(ecr_num.to_numpy(dtype=object), categorize=True)
+    ungrouped = (ecr_num == "").to_numpy()
+    group_key[ungrouped] = row_hash[ungrouped] ^ _UNGROUPED_SALT
+    return {"group_key": group_key, "row_hash": row_hash}
+
+
+def _group_signatures(baseline: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Signature de chaque écriture: nombre de lignes et somme des empreintes des lignes"""
+    keys = np.asarray(baseline["group_key"], dtype=np.uint64)
+    hashes = np.asarray(baseline["row_hash"], dtype=np.uint64)
+    if len(keys) == 0:
+        return pd.DataFrame({"count": [], "signature": []}, index=pd.Index([], dtype=np.uint64))
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    # Somme modulo 2^64: indépendante de l'ordre des lignes dans l'écriture
+    signatures = np.add.reduceat(hashes[order], starts)
+    counts = np.diff(np.r_[starts, len(keys)])
+    return pd.DataFrame({"count": counts, "signature": signatures}, index=sorted_keys[starts])
+
+
+@dataclass
+class IncrementPlan:
+    """Écritures à analyser et correspondance des lignes inchangées avec l'analyse précédente"""
+    base_file_id: str
+    delta_rows: np.ndarray  # Rangs (0-based) des lignes à analyser dans le nouveau fichier
+    unchanged_rows: np.ndarray  # Rangs des lignes inchangées
+    line_map: Dict[int, int]  # Ligne de l'analyse précédente -> ligne du nouveau fichier
+    overlap: float  # Part des écritures précédentes retrouvées dans le nouveau fichier
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        """Récapitulatif enregistré avec les résultats"""
+        return {"base_file_id": self.base_file_id, "overlap": round(self.overlap, 4), **self.stats}
+
+
+def plan_increment(base_file_id: str,
+                   previous: Dict[str, np.ndarray],
+                   current: Dict[str, np.ndarray]) -> IncrementPlan:
+    """
+    Compare les empreintes de deux versions d'un fichier
+
+    Args:
+        base_file_id: Identifiant du fichier de l'analyse précédente
+        previous: Empreintes de référence de l'analyse précédente
+        current: Empreintes de référence du nouveau fichier
+
+    Returns:
+        Plan de l'analyse incrémentale
+    """
+    before = _group_signatures(previous)
+    after = _group_signatures(current)
+    joined = after.join(before, how="left", rsuffix="_previous")
+    same = (joined["count"] == joined["count_previous"]) & (joined["signature"] == joined["signature_previous"])
+    unchanged_keys = joined.index[same.to_numpy()].to_numpy(dtype=np.uint64)
+
+    current_keys = np.asarray(current["group_key"], dtype=np.uint64)
+    is_unchanged = np.isin(current_keys, unchanged_keys)
+    delta_rows = np.flatnonzero(~is_unchanged)
+    unchanged_rows = np.flatnonzero(is_unchanged)
+
+    # Lignes inchangées: même écriture, même contenu, même rang parmi les lignes identiques
+    previous_keys = np.asarray(previous["group_key"], dtype=np.uint64)
+    previous_rows = np.flatnonzero(np.isin(previous_keys, unchanged_keys))
+    left = pd.DataFrame({"row_hash": np.asarray(previous["row_hash"])[previous_rows], "line": previous_rows + 1})
+    right = pd.DataFrame({"row_hash": np.asarray(current["row_hash"])[unchanged_rows], "new_line": unchanged_rows + 1})
+    left["rank"] = left.groupby("row_hash").cumcount()
+    right["rank"] = right.groupby("row_hash").cumcount()
+    mapping = left.merge(right, on=["row_hash", "rank"])
+    line_map = dict(zip(mapping["line"].tolist(), mapping["new_line"].tolist()))
+
+    found = joined["count_previous"].notna()
+    return IncrementPlan(
+        base_file_id=base_file_id,
+        delta_rows=delta_rows,
+        unchanged_rows=unchanged_rows,
+        line_map=line_map,
+        overlap=float(found.sum()) / max(len(before), 1),
+        stats={
+            "unchanged_groups": int(same.sum()),
+            "changed_groups": int((found & ~same).sum()),
+            "new_groups": int((~found).sum()),
+            "removed_groups": int(len(before) - found.sum()),
+            "unchanged_entries": int(len(unchanged_rows)),
+            "analysed_entries": int(len(delta_rows)),
+        }
+    )
+
+
+def _remap_related(related: Optional[Dict[str, Any]], mapping: Dict[int, int]) -> Optional[Dict[str, Any]]:
+    """Renumérote les lignes citées dans les données associées d'une anomalie de doublon"""
+    if not related:
+        return related
+    related = dict(related)
+    for key in ("first_entry", "second_entry"):
+        entry = related.get(key)
+        if isinstance(entry, dict) and entry.get("line") in mapping:
+            related[key] = {**entry, "line": mapping[entry["line"]]}
+    return related
+
+
+def carry_over(records: List[AnomalyRecord], plan: IncrementPlan) -> List[AnomalyRecord]:
+    """
+    Anomalies de l'analyse précédente portant uniquement sur des lignes inchangées
+
+    Args:
+        records: Anomalies de l'analyse précédente
+        plan: Plan de l'analyse incrémentale
+
+    Returns:
+        Anomalies reprises, avec les numéros de ligne du nouveau fichier
+    """
+    carried = []
+    for record in records:
+        if AnomalyType(record.type) in RECOMPUTED_TYPES or not record.line_numbers:
+            continue
+        if not all(line in plan.line_map for line in record.line_numbers):
+            continue
+        carried.append(AnomalyRecord(
+            type=record.type,
+            description=record.description,
+            confidence_score=record.confidence_score,
+            line_numbers=[plan.line_map[line] for line in record.line_numbers],
+            related_data=_remap_related(record.related_data, plan.line_map)
+        ))
+    return carried
+
+
+def remap_delta(records: List[AnomalyRecord], plan: IncrementPlan) -> List[AnomalyRecord]:
+    """
+    Replace les anomalies détectées sur les lignes à analyser dans le nouveau fichier
+
+    Les lignes analysées sont extraites du fichier: deux lignes éloignées y
+    deviennent voisines. Les doublons hors de la fenêtre du détecteur dans le
+    fichier complet sont donc écartés.
+    """
+    mapping = {rank + 1: int(row) + 1 for rank, row in enumerate(plan.delta_rows.tolist())}
+    remapped = []
+    for record in records:
+        lines = [mapping[line] for line in record.line_numbers if line in mapping]
+        if record.type == AnomalyType.DUPLICATE_ENTRY and len(lines) == 2 and \
+                abs(lines[1] - lines[0]) >= DUPLICATE_WINDOW:
+            continue
+        record.line_numbers = lines
+        record.related_data = _remap_related(record.related_data, mapping)
+        remapped.append(record)
+    return remapped
+
+
+def boundary_duplicates(columns: Dict[str, np.ndarray], plan: IncrementPlan, threshold: float) -> List[AnomalyRecord]:
+    """
+    Doublons entre une ligne analysée et une ligne inchangée du nouveau fichier
+
+    Même recherche que le détecteur (find_duplicate_pairs), limitée aux
+    lignes proches d'une ligne analysée.
+
+    Args:
+        columns: Colonnes du nouveau fichier
+        plan: Plan de l'analyse incrémentale
+        threshold: Seuil de similarité du détecteur (threshold_duplicate_similarity)
+    """
+    row_count = len(next(iter(columns.values()), []))
+    if not len(plan.delta_rows) or not len(plan.unchanged_rows):
+        return []
+
+    is_delta = np.zeros(row_count, dtype=bool)
+    is_delta[plan.delta_rows] = True
+    # Lignes à moins de DUPLICATE_WINDOW lignes d'une ligne analysée
+    near = np.zeros(row_count + 1, dtype=np.int64)
+    np.add.at(near, np.maximum(plan.delta_rows - DUPLICATE_WINDOW + 1, 0), 1)
+    np.add.at(near, np.minimum(plan.delta_rows + DUPLICATE_WINDOW, row_count), -1)
+    rows = np.flatnonzero(np.cumsum(near[:-1]) > 0)
+
+    amount = _amounts(columns, row_count)
+    dates = _text(columns, "ecr_date", row_count)
+    account = _text(columns, "compte_num", row_count)
+    keys = duplicate_keys(dates, account, _text(columns, "journal_code", row_count),
+                          _text(columns, "ecriture_lib", row_count))
+    pairs = find_duplicate_pairs(amount, keys, threshold, rows=rows,
+                                 keep=lambda i, j: is_delta[i] != is_delta[j])
+    if not pairs:
+        return []
+
+    return duplicate_anomalies(pairs, np.arange(row_count) + 1, account.to_numpy(dtype=object),
+                               dates.str[:8].to_numpy(dtype=object), amount,
+                               _text(columns, "ecriture_lib", row_count).to_numpy(dtype=object))
+
+
+def subset_columns(columns: Dict[str, np.ndarray], rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """Lignes sélectionnées de chaque colonne"""
+    return {name: np.asarray(values)[rows] for name, values in columns.items()}
+
+
+def subset_features(features: Optional[Dict[str, pd.DataFrame]], rows: np.ndarray) -> Optional[Dict[str, pd.DataFrame]]:
+    """Lignes sélectionnées de caractéristiques ML déjà calculées sur le fichier complet"""
+    if features is None:
+        return None
+    return {name: frame.iloc[rows].reset_index(drop=True) for name, frame in features.items()}
@@ -0,0 +1,127 @@
+"""
+Politique de cache des rapports générés.
+
+Un rapport est identifié par le fichier analysé, la version de ses résultats
+d'analyse, le type, le format et les options du rapport : une demande identique
+renvoie le rapport existant au lieu de le régénérer, et des demandes identiques
+simultanées partagent le même rendu, y compris entre processus (la réservation
+se fait dans l'index des rapports). Les rapports sont évincés à leur date
+d'expiration, puis du moins récemment utilisé au plus récent lorsque la taille
+totale dépasse la limite configurée.
+"""
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from backend.core.config import get_settings
+from backend.services.report_index import ReportIndex
+from backend.utils.blob_storage import BlobStorage, get_blob_storage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Au-delà de ce délai, un rendu en cours est considéré abandonné (processus arrêté)
+PENDING_TIMEOUT = timedelta(hours=1)
+
+
+class ReportCache:
+    """Cache des rapports, par clé de contenu"""
+
+    def __init__(self, index: ReportIndex, max_size: Optional[int] = None, blobs: Optional[BlobStorage] = None):
+        """
+        Initialise le cache de rapports
+
+        Args:
+            index: Index des rapports
+            max_size: Taille maximale des rapports en cache en octets (par défaut REPORT_CACHE_MAX_SIZE)
+            blobs: Stockage des fichiers de rapports (par défaut le stockage configuré)
+        """
+        self.index = index
+        self.blobs = blobs or get_blob_storage()
+        self.max_size = settings.REPORT_CACHE_MAX_SIZE if max_size is None else max_size
+
+    def make_key(self,
+                 file_id: str,
+                 result_version: str,
+                 report_type: str,
+                 report_format: str,
+                 options: Dict[str, Any]) -> str:
+        """
+        Calcule la clé d'un rapport
+
+        Args:
+            file_id: Identifiant du fichier analysé
+            result_version: Version des résultats d'analyse
+            report_type: Type de rapport
+            report_format: Format du rapport
+            options: Options du rapport
+
+        Returns:
+            Empreinte hexadécimale du rapport
+        """
+        payload = json.dumps(
+            {
+                "file_id": file_id,
+                "result_version": result_version,
+                "report_type": report_type,
+                "format": report_format,
+                "options": options or {}
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def reserve(self, metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retourne le rapport de même clé, ou enregistre le nouveau rapport à générer
+
+        Un rapport terminé ou en cours de rendu et non expiré est réutilisé ;
+        sinon metadata est ajouté à l'index et l'appelant doit générer le rapport.
+
+        Args:
+            metadata: Métadonnées du nouveau rapport (avec cache_key)
+
+        Returns:
+            Tuple (métadonnées du rapport, True si un rendu doit être lancé)
+        """
+        pending_since = (datetime.fromisoformat(metadata["created_at"]) - PENDING_TIMEOUT).isoformat()
+        return self.index.reserve(metadata, pending_since)
+
+    def evict(self) -> List[str]:
+        """
+        Supprime les rapports expirés, puis les moins récemment utilisés
+        jusqu'à respecter la taille maximale
+
+        Les rapports en cours de rendu ne sont jamais évincés.
+
+        Returns:
+            Identifiants des rapports supprimés
+        """
+        evicted = [report for report in self.index.expired(datetime.now().isoformat())]
+
+        total = self.index.total_size() - sum(report.get("file_size") or 0 for report in evicted
+                                               if report["status"] == "completed")
+        if total > self.max_size:
+            expired_ids = {report["report_id"] for report in evicted}
+            for report in self.index.completed_by_access():
+                if total <= self.max_size:
+                    break
+                if report["report_id"] in expired_ids:
+                    continue
+                evicted.append(report)
+                total -= report.get("file_size") or 0
+
+        for report in evicted:
+            self._remove(report)
+
+        if evicted:
+            logger.info(f"Cache de rapports: {len(evicted)} rapport(s) évincé(s)")
+        return [report["report_id"] for report in evicted]
+
+    def _remove(self, report: Dict[str, Any]) -> None:
+        """Supprime le fichier d'un rapport et son entrée dans l'index"""
+        self.blobs.delete(self.blobs.key_for(report["file_path"]))
+        self.index.delete(report["report_id"])
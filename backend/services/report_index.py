@@ -0,0 +1,286 @@
+"""
+Index persistant des rapports générés.
+
+Les métadonnées des rapports sont stockées dans une base SQLite (mode WAL)
+partagée par tous les processus workers de l'API : l'état d'un rapport est
+le même quel que soit le processus qui traite la requête. Les recherches par
+identifiant, fichier analysé, statut et clé de cache sont indexées.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from backend.core.config import get_settings
+from backend.utils.json_utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Colonnes de la table des rapports (ordre de création)
+REPORT_COLUMNS = (
+    "report_id", "file_id", "report_type", "format", "options", "cache_key", "status",
+    "created_at", "completed_at", "expires_at", "last_access", "file_path", "file_size", "error", "url"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    report_type TEXT NOT NULL,
+    format TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    cache_key TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    expires_at TEXT NOT NULL,
+    last_access REAL NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size INTEGER,
+    error TEXT,
+    url TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_file_id ON reports (file_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_status ON reports (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_cache_key ON reports (cache_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_expires_at ON reports (expires_at);
+"""
+
+
+class ReportIndex:
+    """Table SQLite des métadonnées de rapports"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialise l'index des rapports
+
+        Args:
+            db_path: Chemin de la base (par défaut DATA_DIR/reports/reports.db)
+        """
+        self.db_path = db_path or os.path.join(settings.DATA_DIR, "reports", "reports.db")
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion propre au thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transaction en écriture exclusive entre processus (BEGIN IMMEDIATE)
+
+        Yields:
+            Connexion à utiliser dans la transaction
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_row(metadata: Dict[str, Any]) -> Tuple:
+        """Valeurs des colonnes d'un rapport"""
+        values = dict(metadata)
+        values["options"] = json_dumps(values.get("options") or {})
+        values.setdefault("last_access", time.time())
+        return tuple(values.get(column) for column in REPORT_COLUMNS)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        """Métadonnées d'un rapport à partir d'une ligne de la table"""
+        metadata = dict(row)
+        metadata["options"] = json_loads(metadata["options"]) if metadata["options"] else {}
+        return metadata
+
+    def insert(self, metadata: Dict[str, Any], conn: Optional[sqlite3.Connection] = None) -> None:
+        """
+        Ajoute ou remplace un rapport
+
+        Args:
+            metadata: Métadonnées du rapport
+            conn: Connexion d'une transaction en cours (optionnel)
+        """
+        placeholders = ", ".join("?" for _ in REPORT_COLUMNS)
+        (conn or self._connection()).execute(
+            f"INSERT OR REPLACE INTO reports ({', '.join(REPORT_COLUMNS)}) VALUES ({placeholders})",
+            self._to_row(metadata)
+        )
+
+    def update(self, report_id: str, updates: Dict[str, Any]) -> bool:
+        """
+        Met à jour des champs d'un rapport
+
+        Args:
+            report_id: Identifiant du rapport
+            updates: Champs à mettre à jour
+
+        Returns:
+            True si le rapport existe
+        """
+        updates = {name: value for name, value in updates.items() if name in REPORT_COLUMNS}
+        if "options" in updates:
+            updates["options"] = json_dumps(updates["options"] or {})
+        if not updates:
+            return self.get(report_id) is not None
+
+        assignments = ", ".join(f"{name} = ?" for name in updates)
+        cursor = self._connection().execute(
+            f"UPDATE reports SET {assignments} WHERE report_id = ?",
+            (*updates.values(), report_id)
+        )
+        return cursor.rowcount > 0
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère un rapport par son identifiant
+
+        Args:
+            report_id: Identifiant du rapport
+
+        Returns:
+            Métadonnées du rapport ou None si introuvable
+        """
+        row = self._connection().execute(
+            "SELECT * FROM reports WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find(self,
+             file_id: Optional[str] = None,
+             status: Optional[str] = None,
+             limit: Optional[int] = None,
+             offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Liste les rapports, du plus récent au plus ancien
+
+        Args:
+            file_id: Filtre sur le fichier analysé
+            status: Filtre sur le statut
+            limit: Nombre maximal de rapports (tous si None)
+            offset: Nombre de rapports à ignorer
+
+        Returns:
+            Métadonnées des rapports
+        """
+        where, params = self._filters(file_id, status)
+        query = f"SELECT * FROM reports{where} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        rows = self._connection().execute(query, (*params, -1 if limit is None else limit, offset)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, file_id: Optional[str] = None, status: Optional[str] = None) -> int:
+        """Nombre de rapports correspondant aux filtres"""
+        where, params = self._filters(file_id, status)
+        return self._connection().execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(file_id: Optional[str], status: Optional[str]) -> Tuple[str, Tuple]:
+        """Clause WHERE et paramètres des filtres de liste"""
+        clauses, params = [], []
+        if file_id:
+            clauses.append("file_id = ?")
+            params.append(file_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), tuple(params)
+
+    def reserve(self, metadata: Dict[str, Any], pending_since: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retourne le rapport de même clé de cache, ou ajoute le nouveau rapport
+
+        La recherche et l'ajout sont faits dans une même transaction exclusive :
+        deux processus qui réservent la même clé obtiennent le même rapport.
+        Sont réutilisés les rapports terminés non expirés et les rapports en
+        cours de génération depuis pending_since.
+
+        Args:
+            metadata: Métadonnées du nouveau rapport (avec cache_key)
+            pending_since: Date (ISO) au-delà de laquelle un rendu en cours est considéré abandonné
+
+        Returns:
+            Tuple (métadonnées du rapport, True si le nouveau rapport a été ajouté)
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM reports WHERE cache_key = ? AND expires_at > ? "
+                "AND (status = 'completed' OR (status = 'pending' AND created_at > ?)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (metadata["cache_key"], metadata["created_at"], pending_since)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE reports SET last_access = ? WHERE report_id = ?", (now, row["report_id"]))
+                return self._to_dict(row), False
+
+            self.insert(dict(metadata, last_access=now), conn)
+            return metadata, True
+
+    def expired(self, now: str) -> List[Dict[str, Any]]:
+        """Rapports terminés dont la date d'expiration est passée"""
+        rows = self._connection().execute(
+            "SELECT * FROM reports WHERE expires_at <= ? AND status != 'pending'", (now,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def completed_by_access(self) -> List[Dict[str, Any]]:
+        """Rapports terminés, du moins récemment utilisé au plus récent"""
+        rows = self._connection().execute(
+            "SELECT * FROM reports WHERE status = 'completed' ORDER BY last_access"
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def total_size(self) -> int:
+        """Taille totale des rapports terminés (octets)"""
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(file_size), 0) FROM reports WHERE status = 'completed'"
+        ).fetchone()
+        return int(row[0])
+
+    def delete(self, report_id: str) -> bool:
+        """
+        Supprime un rapport de l'index
+
+        Args:
+            report_id: Identifiant du rapport
+
+        Returns:
+            True si le rapport existait
+        """
+        cursor = self._connection().execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+@lru_cache()
+def get_report_index() -> ReportIndex:
+    """
+    Récupère l'instance unique de l'index des rapports
+
+    Returns:
+        Instance de l'index des rapports
+    """
+    return ReportIndex()
@@ -0,0 +1,420 @@
+"""
+Rendu des rapports d'analyse (Excel, CSV, HTML, JSON).
+
+Les anomalies sont consommées une à une depuis un itérateur et écrites au fil
+de l'eau : la mémoire utilisée ne dépend pas du nombre de lignes du rapport.
+Le classeur Excel est produit par un écrivain XLSX en écriture seule
+(chaînes en ligne, sans table de chaînes partagées), sans dépendance externe.
+"""
+import csv
+import html
+import logging
+import os
+import re
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from backend.models.schemas import ReportFormat, ReportType
+from backend.utils.json_utils import json_dumps, json_dumps_bytes, iter_json_document
+
+logger = logging.getLogger(__name__)
+
+# Colonnes des anomalies dans les rapports tabulaires (champ, intitulé)
+ANOMALY_COLUMNS = [
+    ("id", "Identifiant"),
+    ("type", "Type"),
+    ("description", "Description"),
+    ("confidence_score", "Confiance"),
+    ("line_numbers", "Lignes"),
+    ("detected_at", "Détectée le"),
+]
+RELATED_DATA_COLUMN = ("related_data", "Données associées")
+
+# Nombre d'anomalies par page des rapports HTML
+DEFAULT_HTML_PAGE_SIZE = 500
+
+# Taille des blocs écrits dans les fichiers
+_WRITE_BUFFER_SIZE = 256 * 1024
+
+
+def report_columns(report_type: ReportType, options: Optional[Dict[str, Any]] = None) -> List[tuple]:
+    """
+    Colonnes des anomalies d'un rapport
+
+    Les données associées ne sont incluses que dans les rapports détaillés ou
+    avec l'option include_raw_data.
+    """
+    options = options or {}
+    if report_type == ReportType.DETAILED or options.get("include_raw_data"):
+        return ANOMALY_COLUMNS + [RELATED_DATA_COLUMN]
+    return list(ANOMALY_COLUMNS)
+
+
+def _cell_text(field: str, value: Any) -> str:
+    """Représentation textuelle d'une valeur d'anomalie"""
+    if value is None:
+        return ""
+    if field == "line_numbers":
+        return ", ".join(map(str, value))
+    if field == "related_data":
+        return json_dumps(value) if value else ""
+    return str(value)
+
+
+def _summary_rows(summary: Dict[str, Any]) -> List[tuple]:
+    """Lignes (intitulé, valeur) du récapitulatif d'un rapport"""
+    rows = [
+        ("Fichier", summary.get("filename") or summary.get("file_id", "")),
+        ("Identifiant du fichier", summary.get("file_id", "")),
+        ("Écritures analysées", summary.get("total_entries", 0)),
+        ("Anomalies détectées", summary.get("anomaly_count", 0)),
+        ("Date de l'analyse", summary.get("analysis_timestamp", "")),
+        ("Durée de l'analyse (ms)", summary.get("processing_time_ms") or ""),
+    ]
+    for anomaly_type, count in sorted((summary.get("anomaly_types") or {}).items(), key=lambda x: -x[1]):
+        rows.append((f"Anomalies - {anomaly_type}", count))
+    return rows
+
+
+class _BufferedWriter:
+    """Accumule des fragments et les écrit par blocs dans un flux binaire"""
+
+    def __init__(self, stream, size: int = _WRITE_BUFFER_SIZE):
+        self.stream = stream
+        self.size = size
+        self._parts: List[bytes] = []
+        self._pending = 0
+
+    def write(self, data: bytes) -> None:
+        self._parts.append(data)
+        self._pending += len(data)
+        if self._pending >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            self.stream.write(b"".join(self._parts))
+            self._parts = []
+            self._pending = 0
+
+
+class XlsxStreamWriter:
+    """
+    Écrivain XLSX en écriture seule
+
+    Chaque feuille est écrite en flux dans l'archive ; seules les
+    métadonnées des feuilles sont conservées en mémoire. Une feuille qui
+    dépasse la limite d'Excel (1 048 576 lignes) est continuée sur une
+    nouvelle feuille.
+    """
+
+    MAX_ROWS = 1_048_576
+    MAX_CELL_LENGTH = 32_767
+
+    # Caractères interdits dans un document XML 1.0
+    _ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+    _NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    _NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    _NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Chemin du classeur à créer
+        """
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._sheets: List[str] = []
+
+    def __enter__(self) -> "XlsxStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+
+    @staticmethod
+    def _column_letter(index: int) -> str:
+        """Lettre de colonne Excel (0 -> A, 26 -> AA)"""
+        letters = ""
+        index += 1
+        while index:
+            index, remainder = divmod(index - 1, 26)
+            letters = chr(65 + remainder) + letters
+        return letters
+
+    def _cell(self, ref: str, value: Any, style: int = 0) -> str:
+        """Fragment XML d'une cellule"""
+        style_attr = f' s="{style}"' if style else ""
+        if isinstance(value, bool):
+            return f'<c r="{ref}" t="b"{style_attr}><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)) and value == value and value not in (float("inf"), float("-inf")):
+            return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+        text = self._ILLEGAL_XML.sub("", str(value))[:self.MAX_CELL_LENGTH]
+        return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+    def add_sheet(self, name: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Écrit une feuille (et ses suites si la limite de lignes est atteinte)
+
+        Args:
+            name: Nom de la feuille (31 caractères au plus)
+            header: Intitulés des colonnes (ligne en gras)
+            rows: Lignes de valeurs
+
+        Returns:
+            Nombre de lignes de données écrites
+        """
+        letters = [self._column_letter(i) for i in range(len(header))]
+        rows = iter(rows)
+        written = 0
+        part = 1
+
+        while True:
+            sheet_name = name[:31] if part == 1 else f"{name[:26]} ({part})"
+            sheet_index = len(self._sheets) + 1
+            self._sheets.append(sheet_name)
+
+            exhausted = True
+            with self._zip.open(f"xl/worksheets/sheet{sheet_index}.xml", "w", force_zip64=True) as stream:
+                out = _BufferedWriter(stream)
+                out.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                          f'<worksheet xmlns="{self._NS_MAIN}"><sheetData>'.encode("utf-8"))
+                out.write(self._row_xml(1, letters, header, style=1))
+                row_number = 1
+                for row in rows:
+                    row_number += 1
+                    out.write(self._row_xml(row_number, letters, row))
+                    written += 1
+                    if row_number >= self.MAX_ROWS:
+                        exhausted = False
+                        break
+                out.write(b"</sheetData></worksheet>")
+                out.flush()
+
+            if exhausted:
+                return written
+            part += 1
+
+    def _row_xml(self, row_number: int, letters: List[str], values: Sequence[Any], style: int = 0) -> bytes:
+        """Fragment XML d'une ligne"""
+        cells = "".join(
+            self._cell(f"{letter}{row_number}", value, style)
+            for letter, value in zip(letters, values) if value is not None and value != ""
+        )
+        return f'<row r="{row_number}">{cells}</row>'.encode("utf-8")
+
+    def close(self) -> None:
+        """Écrit les parties communes du classeur et ferme l'archive"""
+        sheet_count = len(self._sheets)
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, sheet_count + 1)
+        )
+        self._zip.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'
+        ))
+        self._zip.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{self._NS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{self._NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        sheets = "".join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(self._sheets, start=1)
+        )
+        self._zip.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{self._NS_MAIN}" xmlns:r="{self._NS_REL}"><sheets>{sheets}</sheets></workbook>'
+        ))
+        relationships = "".join(
+            f'<Relationship Id="rId{i}" Type="{self._NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, sheet_count + 1)
+        )
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{self._NS_PKG_REL}">{relationships}'
+            f'<Relationship Id="rId{sheet_count + 1}" Type="{self._NS_REL}/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        self._zip.writestr("xl/styles.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<styleSheet xmlns="{self._NS_MAIN}">'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+            '</styleSheet>'
+        ))
+        self._zip.close()
+
+
+def render_excel(path: str, summary: Dict[str, Any], anomalies: Iterable[Dict[str, Any]], columns: List[tuple]) -> None:
+    """Rapport Excel: feuille de récapitulatif puis feuille(s) des anomalies"""
+    with XlsxStreamWriter(path) as workbook:
+        workbook.add_sheet("Résumé", ["Indicateur", "Valeur"], _summary_rows(summary))
+        rows = (
+            [anomaly.get(field) if field == "confidence_score" else _cell_text(field, anomaly.get(field))
+             for field, _ in columns]
+            for anomaly in anomalies
+        )
+        workbook.add_sheet("Anomalies", [label for _, label in columns], rows)
+
+
+def render_csv(path: str, summary: Dict[str, Any], anomalies: Iterable[Dict[str, Any]], columns: List[tuple]) -> None:
+    """
+    Rapport CSV: une ligne par anomalie
+
+    Les champs sont échappés par le module csv (guillemets doublés, champs
+    contenant séparateur ou saut de ligne entre guillemets). Le BOM UTF-8
+    permet à Excel de reconnaître l'encodage.
+    """
+    with open(path, "w", encoding="utf-8-sig", newline="", buffering=_WRITE_BUFFER_SIZE) as f:
+        writer = csv.writer(f, delimiter=",", quoting=csv.QUOTE_MINIMAL)
+        writer.writerow([field for field, _ in columns])
+        for anomaly in anomalies:
+            writer.writerow([_cell_text(field, anomaly.get(field)) for field, _ in columns])
+
+
+def render_html(path: str,
+                summary: Dict[str, Any],
+                anomalies: Iterable[Dict[str, Any]],
+                columns: List[tuple],
+                report_type: ReportType,
+                page_size: int = DEFAULT_HTML_PAGE_SIZE) -> None:
+    """
+    Rapport HTML paginé
+
+    Les anomalies sont réparties en pages (un tbody par page) écrites au fil de
+    l'eau ; un court script n'affiche qu'une page à la fois. Sans JavaScript,
+    toutes les pages restent visibles.
+    """
+    page_size = max(1, page_size)
+    escape_html = html.escape
+    with open(path, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as f:
+        f.write("<!DOCTYPE html>\n<html lang=\"fr\"><head><meta charset=\"utf-8\">"
+                "<title>Rapport d'analyse</title><style>"
+                "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;width:100%}"
+                "th,td{border:1px solid #ccc;padding:4px 6px;text-align:left;vertical-align:top}"
+                "th{background:#f0f0f0}.js tbody.page{display:none}.js tbody.page.current{display:table-row-group}"
+                "nav{margin:1em 0}</style></head><body>\n")
+        f.write(f"<h1>Rapport d'analyse - {escape_html(ReportType(report_type).value)}</h1>\n<table class=\"summary\">\n")
+        for label, value in _summary_rows(summary):
+            f.write(f"<tr><th>{escape_html(str(label))}</th><td>{escape_html(str(value))}</td></tr>\n")
+        f.write("</table>\n<h2>Liste des anomalies</h2>\n"
+                "<nav><button id=\"prev\">&laquo;</button> Page <span id=\"page\">1</span> / "
+                "<span id=\"pages\">1</span> <button id=\"next\">&raquo;</button></nav>\n"
+                "<table class=\"anomalies\"><thead><tr>")
+        f.write("".join(f"<th>{escape_html(label)}</th>" for _, label in columns))
+        f.write("</tr></thead>\n")
+
+        page = 0
+        for index, anomaly in enumerate(anomalies):
+            if index % page_size == 0:
+                if page:
+                    f.write("</tbody>\n")
+                page += 1
+                f.write(f"<tbody class=\"page\" id=\"page-{page}\">\n")
+            cells = "".join(f"<td>{escape_html(_cell_text(field, anomaly.get(field)))}</td>" for field, _ in columns)
+            f.write(f"<tr>{cells}</tr>\n")
+        if page:
+            f.write("</tbody>\n")
+
+        f.write("</table>\n<script>\n"
+                f"(function(){{var pages={page},current=1;"
+                "if(!pages)return;document.body.className='js';"
+                "function show(n){var el=document.getElementById('page-'+current);if(el)el.className='page';"
+                "current=Math.min(Math.max(1,n),pages);document.getElementById('page-'+current).className='page current';"
+                "document.getElementById('page').textContent=current;}"
+                "document.getElementById('pages').textContent=pages;"
+                "document.getElementById('prev').onclick=function(){show(current-1)};"
+                "document.getElementById('next').onclick=function(){show(current+1)};show(1);})();\n"
+                "</script>\n</body></html>\n")
+
+
+def render_json(path: str, summary: Dict[str, Any], anomalies: Iterable[Dict[str, Any]]) -> None:
+    """Rapport JSON: même document que les résultats d'analyse, écrit en flux"""
+    summary = dict(summary)
+    summary.pop("anomaly_types", None)
+    header = {key: summary.pop(key) for key in ("file_id", "filename", "total_entries", "anomaly_count") if key in summary}
+    with open(path, "wb") as f:
+        for chunk in iter_json_document(header, (json_dumps_bytes(a) for a in anomalies), footer=summary):
+            f.write(chunk)
+
+
+def render_pdf(path: str, summary: Dict[str, Any], report_type: ReportType) -> None:
+    """Rapport PDF (implémentation factice pour l'instant)"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Contenu du rapport PDF pour le type {report_type}\n")
+        f.write(f"Anomalies trouvées: {summary.get('anomaly_count', 0)}\n")
+
+
+def render_report(path: str,
+                  report_format: ReportFormat,
+                  report_type: ReportType,
+                  summary: Dict[str, Any],
+                  anomalies: Iterable[Dict[str, Any]],
+                  options: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Produit un rapport dans le format demandé
+
+    L'écriture se fait dans un fichier temporaire renommé une fois complet.
+
+    Args:
+        path: Chemin du rapport
+        report_format: Format du rapport
+        report_type: Type de rapport
+        summary: Récapitulatif de l'analyse (avec anomaly_types)
+        anomalies: Anomalies sous forme de dictionnaires JSON, consommées une fois
+        options: Options du rapport (include_raw_data, html_page_size)
+
+    Returns:
+        Taille du rapport en octets
+    """
+    options = options or {}
+    columns = report_columns(report_type, options)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    start = datetime.now()
+
+    try:
+        if report_format == ReportFormat.EXCEL:
+            render_excel(tmp_path, summary, anomalies, columns)
+        elif report_format == ReportFormat.CSV:
+            render_csv(tmp_path, summary, anomalies, columns)
+        elif report_format == ReportFormat.HTML:
+            page_size = int(options.get("html_page_size", DEFAULT_HTML_PAGE_SIZE))
+            render_html(tmp_path, summary, anomalies, columns, report_type, page_size)
+        elif report_format == ReportFormat.JSON:
+            render_json(tmp_path, summary, anomalies)
+        elif report_format == ReportFormat.PDF:
+            render_pdf(tmp_path, summary, report_type)
+        else:
+            raise ValueError(f"Format de rapport non supporté: {report_format}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    size = os.path.getsize(path)
+    logger.info(f"Rapport {ReportFormat(report_format).value} rendu en "
+                f"{(datetime.now() - start).total_seconds():.2f} s ({size} octets)")
+    return size
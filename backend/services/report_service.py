@@ -1,113 +1,201 @@
+import os
 import logging
+import sqlite3
 import uuid
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta
 
-from backend.models.schemas import ReportResponse
+from backend.core.config import get_settings
 from backend.core.errors import ResourceNotFoundError
+from backend.models.schemas import ReportType, ReportFormat
+from backend.services.report_cache import ReportCache
+from backend.services.report_index import ReportIndex, get_report_index
+from backend.utils.blob_storage import BlobStorage, get_blob_storage
+from backend.utils.json_utils import read_json
+from backend.utils.storage import ShardedStore
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class ReportService:
-    """Service de génération et gestion des rapports"""
+    """Service de gestion des rapports générés"""
     
-    def __init__(self):
-        """Initialisation du service"""
-        self._reports = {}  # Stockage en mémoire des rapports (à remplacer par une BDD)
+    def __init__(self,
+                 index: Optional[ReportIndex] = None,
+                 reports_dir: Optional[str] = None,
+                 blobs: Optional[BlobStorage] = None):
+        """
+        Initialisation du service
+        
+        Args:
+            index: Index des rapports (par défaut l'index partagé)
+            reports_dir: Répertoire des rapports générés (par défaut DATA_DIR/reports)
+            blobs: Stockage des fichiers de rapports (par défaut le stockage configuré)
+        """
+        self.reports_dir = reports_dir or os.path.join(settings.DATA_DIR, "reports")
+        self.store = ShardedStore(self.reports_dir)
+        self.blobs = blobs or get_blob_storage()
+        
+        self.index = index or get_report_index()
+        self.cache = ReportCache(self.index, blobs=self.blobs)
+        self._import_legacy_metadata()
     
-    async def generate_report(
-        self, file_id: str, report_type: str, options: Dict[str, Any] = None
-    ) -> ReportResponse:
+    def report_path(self, report_id: str, report_format: ReportFormat) -> str:
+        """Chemin du fichier d'un rapport"""
+        return self.store.writable_path(report_id, f"{report_id}.{report_format.value.lower()}")
+    
+    def report_key(self, report: Dict[str, Any]) -> str:
+        """Clé du fichier d'un rapport dans le stockage d'objets"""
+        return self.blobs.key_for(report["file_path"])
+    
+    def create_report(
+        self,
+        file_id: str,
+        result_version: str,
+        report_type: ReportType,
+        report_format: ReportFormat,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], bool]:
         """
-        Génère un nouveau rapport
+        Enregistre un nouveau rapport à générer, ou retrouve un rapport identique
         
         Args:
             file_id: ID du fichier analysé
-            report_type: Type de rapport (pdf, excel, etc.)
+            result_version: Version des résultats d'analyse
+            report_type: Type de rapport
+            report_format: Format du rapport
             options: Options de génération supplémentaires
-            
+        
         Returns:
-            Les détails du rapport généré
+            Tuple (métadonnées du rapport, True si le rapport doit être généré)
         """
         report_id = str(uuid.uuid4())
         now = datetime.now()
-        download_url = f"/api/v1/reports/{report_id}/download"
-        
-        # Simulation de génération de rapport
-        report = ReportResponse(
-            report_id=report_id,
-            file_id=file_id,
-            report_type=report_type,
-            creation_timestamp=now,
-            download_url=download_url,
-            status="completed",
-            message="Rapport généré avec succès"
-        )
+        options = options or {}
         
-        # Stocker le rapport
-        self._reports[report_id] = report.dict()
+        metadata = {
+            "report_id": report_id,
+            "file_id": file_id,
+            "report_type": report_type.value,
+            "format": report_format.value,
+            "options": options,
+            "cache_key": self.cache.make_key(file_id, result_version, report_type.value, report_format.value, options),
+            "status": "pending",
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(days=settings.REPORT_TTL_DAYS)).isoformat(),
+            "file_path": self.report_path(report_id, report_format),
+            "url": f"/api/v1/reports/download/{report_id}"
+        }
         
-        logger.info(f"Rapport {report_id} généré pour le fichier {file_id}, type: {report_type}")
+        report, created = self.cache.reserve(metadata)
+        if not created and report["status"] == "completed" and not self.blobs.exists(self.report_key(report)):
+            # Rapport indexé mais supprimé du disque
+            self.index.delete(report["report_id"])
+            report, created = self.cache.reserve(metadata)
         
-        return report
+        if created:
+            logger.info(f"Rapport {report_id} créé pour le fichier {file_id}, type: {report_type.value}")
+        return report, created
     
-    async def get_report(self, report_id: str) -> Optional[ReportResponse]:
+    def update_report(self, report_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Récupère un rapport par son ID
+        Met à jour les métadonnées d'un rapport
         
         Args:
             report_id: ID du rapport
-            
+            updates: Champs à mettre à jour
+        
         Returns:
-            Le rapport ou None s'il n'existe pas
+            Métadonnées mises à jour, ou None si le rapport n'existe pas
         """
-        if report_id not in self._reports:
+        if not self.index.update(report_id, updates):
             return None
-        
-        return ReportResponse(**self._reports[report_id])
+        return self.index.get(report_id)
     
-    async def list_reports(self, file_id: Optional[str] = None) -> List[ReportResponse]:
+    def get_report(self, report_id: str) -> Optional[Dict[str, Any]]:
         """
-        Liste les rapports disponibles
+        Récupère un rapport par son ID
         
         Args:
-            file_id: Optionnel, filtre par ID de fichier
-            
+            report_id: ID du rapport
+        
         Returns:
-            Liste des rapports
+            Métadonnées du rapport ou None s'il n'existe pas
         """
-        result = []
+        return self.index.get(report_id)
+    
+    def list_reports(
+        self,
+        file_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Liste les rapports, du plus récent au plus ancien
         
-        for report_data in self._reports.values():
-            # Filtrer par file_id si spécifié
-            if file_id and report_data["file_id"] != file_id:
-                continue
-            
-            result.append(ReportResponse(**report_data))
+        Args:
+            file_id: Optionnel, filtre par ID de fichier
+            status: Optionnel, filtre par statut
+            limit: Nombre maximal de rapports
+            offset: Nombre de rapports à ignorer
         
-        return result
+        Returns:
+            Métadonnées des rapports
+        """
+        return self.index.find(file_id=file_id, status=status, limit=limit, offset=offset)
     
-    async def delete_report(self, report_id: str) -> bool:
+    def delete_report(self, report_id: str) -> bool:
         """
-        Supprime un rapport
+        Supprime un rapport et son fichier
         
         Args:
             report_id: ID du rapport à supprimer
-            
+        
         Returns:
-            True si supprimé, False sinon
-            
+            True si supprimé
+        
         Raises:
             ResourceNotFoundError: Si le rapport n'existe pas
         """
-        if report_id not in self._reports:
+        report = self.index.get(report_id)
+        if report is None:
             raise ResourceNotFoundError("Rapport", report_id)
         
-        del self._reports[report_id]
+        self.blobs.delete(self.report_key(report))
+        self.index.delete(report_id)
         logger.info(f"Rapport {report_id} supprimé")
         
         return True
+    
+    def evict_reports(self) -> int:
+        """
+        Supprime les rapports expirés ou évincés du cache
+        
+        Returns:
+            Nombre de rapports supprimés
+        """
+        return len(self.cache.evict())
+    
+    def _import_legacy_metadata(self) -> None:
+        """Importe dans l'index les métadonnées des rapports stockées en fichiers JSON"""
+        imported = 0
+        for filename in os.listdir(self.reports_dir):
+            if not filename.endswith("_meta.json"):
+                continue
+            path = os.path.join(self.reports_dir, filename)
+            try:
+                metadata = read_json(path)
+                if self.index.get(metadata["report_id"]) is None:
+                    self.index.insert(metadata)
+                    imported += 1
+                os.remove(path)
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                logger.warning(f"Métadonnées de rapport illisibles {filename}: {e}")
+        
+        if imported:
+            logger.info(f"{imported} rapport(s) importé(s) dans l'index des rapports")
 
 
 # Instance globale singleton du service
@@ -0,0 +1,489 @@
+"""
+Rétention et nettoyage des données de l'application.
+
+Un thread d'arrière-plan parcourt périodiquement les catégories de données
+(fichiers importés, résultats, tâches, rapports, données générées, journaux
+et statistiques) et supprime les éléments qui dépassent la politique de leur
+catégorie : âge maximal, puis nombre et taille totale (du plus ancien au plus
+récent). Chaque passe supprime au plus RETENTION_BATCH_SIZE éléments par
+catégorie, ne touche pas aux éléments en cours de traitement et passe par les
+services propriétaires (analyse, rapports) pour garder leurs index cohérents.
+Les octets récupérés sont enregistrés dans DATA_DIR/stats/retention.json et
+exposés par le healthcheck.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Any, Optional, Set, Tuple
+
+from backend.core.config import get_settings
+from backend.core.jobs import get_job_manager
+from backend.services.analysis_service import get_analysis_service
+from backend.services.report_service import get_report_service
+from backend.utils.json_utils import json_loads, read_json, write_json
+from backend.utils.blob_storage import BlobInfo, get_blob_storage
+from backend.utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Catégories de données, dans l'ordre de traitement
+CATEGORIES = ("jobs", "results", "uploads", "reports", "generated", "logs", "stats")
+
+# Statuts des tâches encore en cours (leurs données ne sont jamais supprimées)
+ACTIVE_STATUSES = {"initializing", "pending", "processing", "running"}
+
+# Fichiers de résultats d'un fichier analysé ({file_id}<suffixe>), en plus de {file_id}.json
+_RESULT_SUFFIXES = ("_anomalies.npz", "_baseline.npz", "_findings.npz")
+
+
+class RetentionPolicy:
+    """Politique de rétention d'une catégorie de données"""
+
+    __slots__ = ("max_age_days", "max_size", "max_count")
+
+    def __init__(self,
+                 max_age_days: Optional[float] = None,
+                 max_size: Optional[int] = None,
+                 max_count: Optional[int] = None):
+        """
+        Args:
+            max_age_days: Âge maximal des éléments en jours
+            max_size: Taille totale maximale de la catégorie en octets
+            max_count: Nombre maximal d'éléments
+        """
+        self.max_age_days = max_age_days
+        self.max_size = max_size
+        self.max_count = max_count
+
+    def __repr__(self) -> str:
+        return (f"RetentionPolicy(max_age_days={self.max_age_days}, max_size={self.max_size}, "
+                f"max_count={self.max_count})")
+
+    def select(self, items: List[Tuple[str, float, int]], now: float) -> List[Tuple[str, float, int]]:
+        """
+        Sélectionne les éléments à supprimer
+
+        Args:
+            items: Éléments (clé, date de modification, taille en octets)
+            now: Date de référence (timestamp Unix)
+
+        Returns:
+            Éléments à supprimer, les expirés puis les plus anciens
+        """
+        items = sorted(items, key=lambda item: item[1])
+        if self.max_age_days is not None:
+            cutoff = now - self.max_age_days * 86400
+            expired = [item for item in items if item[1] < cutoff]
+            items = items[len(expired):]
+        else:
+            expired = []
+
+        count = len(items)
+        total = sum(size for _, _, size in items)
+        selected = []
+        for item in items:
+            over_count = self.max_count is not None and count > self.max_count
+            over_size = self.max_size is not None and total > self.max_size
+            if not (over_count or over_size):
+                break
+            selected.append(item)
+            count -= 1
+            total -= item[2]
+        return expired + selected
+
+
+class RetentionService:
+    """Nettoyage périodique des données selon les politiques de rétention"""
+
+    def __init__(self,
+                 policies: Optional[Dict[str, Dict[str, Any]]] = None,
+                 interval: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        """
+        Initialise le service de rétention
+
+        Args:
+            policies: Politiques par catégorie (par défaut RETENTION_POLICIES)
+            interval: Secondes entre deux passes (par défaut RETENTION_INTERVAL)
+            batch_size: Suppressions maximales par catégorie et par passe (par défaut RETENTION_BATCH_SIZE)
+        """
+        policies = settings.RETENTION_POLICIES if policies is None else policies
+        self.policies = {category: RetentionPolicy(**policies.get(category, {})) for category in CATEGORIES}
+        self.interval = settings.RETENTION_INTERVAL if interval is None else interval
+        self.batch_size = settings.RETENTION_BATCH_SIZE if batch_size is None else batch_size
+
+        self.data_dir = settings.DATA_DIR
+        self.stats_path = os.path.join(self.data_dir, "stats", "retention.json")
+        os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _dir(self, name: str) -> str:
+        """Chemin d'un sous-répertoire de données"""
+        return os.path.join(self.data_dir, name)
+
+    # Cycle de vie
+
+    def start(self) -> None:
+        """Démarre le thread de nettoyage périodique"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        logger.info(f"Service de rétention démarré (passe toutes les {self.interval} s)")
+
+    def stop(self) -> None:
+        """Arrête le thread de nettoyage après la suppression en cours"""
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        """Boucle du thread de nettoyage"""
+        while not self._stop_event.is_set():
+            # Plusieurs processus workers peuvent exécuter ce service: une passe récente suffit
+            last_run = self.get_stats().get("last_run")
+            if last_run is None or time.time() - datetime.fromisoformat(last_run).timestamp() >= self.interval / 2:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Erreur lors de la passe de rétention: {str(e)}", exc_info=True)
+            self._stop_event.wait(self.interval)
+
+    # Passe de nettoyage
+
+    def run_once(self) -> Dict[str, Dict[str, int]]:
+        """
+        Exécute une passe de nettoyage sur toutes les catégories
+
+        Returns:
+            Pour chaque catégorie, nombre d'éléments supprimés et octets libérés
+        """
+        with self._lock:
+            now = time.time()
+            active_files, active_jobs = self._active_jobs()
+            collectors = {
+                "jobs": lambda: self._job_items(active_jobs),
+                "results": lambda: self._result_items(active_files),
+                "uploads": lambda: self._upload_items(active_files),
+                "reports": self._report_items,
+                "generated": lambda: self._task_items("generated", _generated_key),
+                "logs": lambda: self._task_items("logs", _log_key),
+            }
+
+            summary = {}
+            for category in CATEGORIES:
+                if self._stop_event.is_set():
+                    break
+                if category == "stats":
+                    freed = self._trim_stats(self.policies["stats"], now)
+                    summary[category] = {"deleted": 0, "reclaimed_bytes": freed}
+                    continue
+
+                deleted, freed = 0, 0
+                if category == "reports":
+                    # Rapports expirés ou évincés du cache (expires_at, REPORT_CACHE_MAX_SIZE)
+                    freed += self._evict_reports()
+
+                selected = self.policies[category].select(collectors[category](), now)
+                for key, _, size in selected[:self.batch_size]:
+                    if self._stop_event.is_set():
+                        break
+                    try:
+                        freed += self._remove(category, key, size)
+                        deleted += 1
+                    except Exception as e:
+                        logger.warning(f"Rétention: impossible de supprimer {category}/{key}: {str(e)}")
+                summary[category] = {"deleted": deleted, "reclaimed_bytes": freed}
+
+            self._record(summary)
+            reclaimed = sum(item["reclaimed_bytes"] for item in summary.values())
+            if reclaimed:
+                logger.info(f"Rétention: {reclaimed} octets libérés "
+                            f"({sum(item['deleted'] for item in summary.values())} éléments supprimés)")
+            return summary
+
+    def _active_jobs(self) -> Tuple[Set[str], Set[str]]:
+        """Fichiers en cours d'analyse et tâches d'analyse en cours"""
+        active_files, active_jobs = set(), set()
+        blobs = get_blob_storage()
+        for name, info in _list_blobs("jobs"):
+            if not name.endswith(".json"):
+                continue
+            try:
+                job = json_loads(blobs.get(info.key))
+            except (OSError, ValueError):
+                continue
+            if job.get("status") in ACTIVE_STATUSES:
+                active_jobs.add(name[:-len(".json")])
+                active_files.add(job.get("file_id"))
+                # Analyses par lot
+                active_files.update(job.get("file_ids", []))
+        return active_files, active_jobs
+
+    # Collecte des éléments par catégorie: (clé, date de modification, taille)
+
+    def _job_items(self, active_jobs: Set[str]) -> List[Tuple[str, float, int]]:
+        items = []
+        for name, info in _list_blobs("jobs"):
+            job_id = name[:-len(".json")]
+            if name.endswith(".json") and job_id not in active_jobs:
+                items.append((job_id, info.mtime, info.size))
+        return items
+
+    def _result_items(self, active_files: Set[str]) -> List[Tuple[str, float, int]]:
+        sizes: Dict[str, Tuple[float, int]] = {}
+        for name, info in _list_blobs("results"):
+            if name.startswith("company_"):
+                # Dernier fichier analysé d'une société (company_<siren>_baseline.json): pas un résultat
+                continue
+            suffix = next((suffix for suffix in _RESULT_SUFFIXES if name.endswith(suffix)), None)
+            if suffix:
+                file_id = name[:-len(suffix)]
+            elif name.endswith(".json"):
+                file_id = name[:-len(".json")]
+            else:
+                continue
+            mtime, size = sizes.get(file_id, (0.0, 0))
+            sizes[file_id] = (max(mtime, info.mtime), size + info.size)
+        return [(file_id, mtime, size) for file_id, (mtime, size) in sizes.items() if file_id not in active_files]
+
+    def _upload_items(self, active_files: Set[str]) -> List[Tuple[str, float, int]]:
+        items = []
+        sizes: Dict[str, int] = {}
+        for name, info in _list_blobs("uploads"):
+            if name.endswith("_meta.json"):
+                file_id = name[:-len("_meta.json")]
+                if file_id not in active_files:
+                    items.append((file_id, info.mtime))
+            else:
+                # Fichier importé ({file_id}_{nom d'origine})
+                file_id = name.partition("_")[0]
+            sizes[file_id] = sizes.get(file_id, 0) + info.size
+        return [(file_id, mtime, sizes[file_id]) for file_id, mtime in items]
+
+    def _report_items(self) -> List[Tuple[str, float, int]]:
+        items = []
+        for report in get_report_service().list_reports():
+            if report["status"] == "pending":
+                continue
+            created_at = datetime.fromisoformat(report["created_at"]).timestamp()
+            items.append((report["report_id"], created_at, report.get("file_size") or 0))
+        return items
+
+    def _task_items(self, directory: str, key_func) -> List[Tuple[str, float, int]]:
+        """Éléments regroupés par identifiant de tâche (génération, entraînement)"""
+        groups: Dict[str, Tuple[float, int]] = {}
+        for entry in _scan(self._dir(directory)):
+            key = key_func(entry.name)
+            stat = entry.stat()
+            mtime, size = groups.get(key, (0.0, 0))
+            groups[key] = (max(mtime, stat.st_mtime), size + stat.st_size)
+
+        items = []
+        job_manager = get_job_manager()
+        for key, (mtime, size) in groups.items():
+            task_id = key.partition("_")[2] if directory == "logs" else key
+            if job_manager.is_running(task_id) or self._task_status(directory, key) in ACTIVE_STATUSES:
+                continue
+            items.append((key, mtime, size))
+        return items
+
+    def _task_status(self, directory: str, key: str) -> Optional[str]:
+        """Statut enregistré d'une génération ou d'un entraînement"""
+        if directory == "generated":
+            path = get_storage().generated.path(key, f"status_{key}.json")
+        else:
+            path = os.path.join(self._dir(directory), f"{key}_status.json")
+        try:
+            return read_json(path).get("status")
+        except (OSError, ValueError):
+            return None
+
+    # Suppression
+
+    def _remove(self, category: str, key: str, size: int) -> int:
+        """Supprime un élément et retourne le nombre d'octets libérés"""
+        if category == "uploads":
+            freed = get_analysis_service().remove_file(key)
+            # Les rapports du fichier ne peuvent plus être régénérés
+            report_service = get_report_service()
+            for report in report_service.list_reports(file_id=key):
+                if report["status"] != "pending":
+                    report_service.delete_report(report["report_id"])
+                    freed += report.get("file_size") or 0
+            return freed
+        if category == "results":
+            return get_analysis_service().remove_results(key)
+        if category == "reports":
+            get_report_service().delete_report(key)
+            return size
+        if category == "jobs":
+            blobs = get_blob_storage()
+            return blobs.delete(blobs.key_for(get_storage().jobs.path(key, f"{key}.json")))
+        if category == "generated":
+            store = get_storage().generated
+            return _remove_matching([store.shard_dir(key), store.base_dir], lambda name: _generated_key(name) == key)
+        if category == "logs":
+            return _remove_matching([self._dir("logs")], lambda name: _log_key(name) == key)
+        raise ValueError(f"Catégorie de rétention inconnue: {category}")
+
+    def _evict_reports(self) -> int:
+        """Supprime les rapports expirés ou évincés du cache et retourne les octets libérés"""
+        report_service = get_report_service()
+        before = report_service.index.total_size()
+        evicted = report_service.evict_reports()
+        return max(0, before - report_service.index.total_size()) if evicted else 0
+
+    def _trim_stats(self, policy: RetentionPolicy, now: float) -> int:
+        """
+        Réduit le fichier de statistiques de détection (JSON Lines)
+
+        Les lignes plus anciennes que max_age_days sont retirées, puis les
+        plus anciennes jusqu'à respecter max_size.
+
+        Returns:
+            Nombre d'octets libérés
+        """
+        path = os.path.join(self._dir("stats"), "detection_stats.jsonl")
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+        cutoff = None
+        if policy.max_age_days is not None:
+            cutoff = datetime.fromtimestamp(now - policy.max_age_days * 86400).isoformat()
+
+        # Les lignes sont ajoutées dans l'ordre: rien à faire si la première est récente
+        if policy.max_size is None or size <= policy.max_size:
+            if cutoff is None or _first_timestamp(path) >= cutoff:
+                return 0
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for line in src:
+                if cutoff is not None:
+                    try:
+                        if json_loads(line).get("timestamp", "") < cutoff:
+                            continue
+                    except ValueError:
+                        continue
+                dst.write(line)
+
+        kept = os.path.getsize(tmp_path)
+        if policy.max_size is not None and kept > policy.max_size:
+            # Conserver la fin du fichier, à partir d'un début de ligne
+            with open(tmp_path, "rb") as f:
+                f.seek(kept - policy.max_size)
+                f.readline()
+                tail = f.read()
+            with open(tmp_path, "wb") as f:
+                f.write(tail)
+
+        os.replace(tmp_path, path)
+        return max(0, size - os.path.getsize(path))
+
+    # Statistiques
+
+    def _record(self, summary: Dict[str, Dict[str, int]]) -> None:
+        """Cumule les résultats d'une passe dans le fichier de statistiques"""
+        stats = self.get_stats()
+        stats["runs"] = stats.get("runs", 0) + 1
+        stats["last_run"] = datetime.now().isoformat()
+        categories = stats.setdefault("categories", {})
+        for category, result in summary.items():
+            totals = categories.setdefault(category, {"deleted": 0, "reclaimed_bytes": 0})
+            totals["deleted"] += result["deleted"]
+            totals["reclaimed_bytes"] += result["reclaimed_bytes"]
+            totals["last_reclaimed_bytes"] = result["reclaimed_bytes"]
+        stats["reclaimed_bytes"] = sum(totals["reclaimed_bytes"] for totals in categories.values())
+        write_json(self.stats_path, stats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Statistiques cumulées du nettoyage (tous processus confondus)
+
+        Returns:
+            Nombre de passes, date de la dernière passe, octets libérés au total et par catégorie
+        """
+        try:
+            return read_json(self.stats_path)
+        except (OSError, ValueError):
+            return {"runs": 0, "last_run": None, "reclaimed_bytes": 0, "categories": {}}
+
+
+def _scan(directory: str, recursive: bool = True) -> List[os.DirEntry]:
+    """Fichiers d'un répertoire, sous-répertoires compris si recursive (vide s'il n'existe pas)"""
+    files, stack = [], [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif not entry.name.endswith(".tmp"):
+                        files.append(entry)
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _list_blobs(category: str) -> Iterator[Tuple[str, BlobInfo]]:
+    """Objets d'une catégorie du stockage, avec leur nom de fichier"""
+    blobs = get_blob_storage()
+    for info in blobs.list(f"{category}/"):
+        yield info.key.rpartition("/")[2], info
+
+
+def _first_timestamp(path: str) -> str:
+    """Horodatage de la première ligne d'un fichier JSON Lines ("" si illisible)"""
+    with open(path, "rb") as f:
+        line = f.readline()
+    try:
+        return json_loads(line).get("timestamp", "")
+    except ValueError:
+        return ""
+
+
+def _generated_key(name: str) -> str:
+    """Identifiant de génération d'un fichier de DATA_DIR/generated (generated_<id>.csv, status_<id>.json...)"""
+    return name.partition("_")[2].rsplit(".", 1)[0] or name
+
+
+def _log_key(name: str) -> str:
+    """Clé d'un fichier de DATA_DIR/logs (train_<id> pour train_<id>.log et train_<id>_status.json)"""
+    if name.endswith("_status.json"):
+        return name[:-len("_status.json")]
+    return name.rsplit(".", 1)[0]
+
+
+def _remove_matching(directories: List[str], predicate) -> int:
+    """Supprime les fichiers des répertoires dont le nom vérifie predicate et retourne les octets libérés"""
+    freed = 0
+    for entry in (entry for directory in directories for entry in _scan(directory, recursive=False)):
+        if predicate(entry.name):
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                freed += size
+            except FileNotFoundError:
+                continue
+    return freed
+
+
+@lru_cache()
+def get_retention_service() -> RetentionService:
+    """
+    Récupère l'instance unique du service de rétention
+
+    Returns:
+        Instance du service de rétention
+    """
+    return RetentionService()
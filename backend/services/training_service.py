@@ -0,0 +1,182 @@
+"""
+Service pour l'exécution des entraînements de modèles dans le processus de l'API.
+"""
+import os
+import asyncio
+import logging
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+from backend.core.config import get_settings
+from backend.core.jobs import JobContext, JobManager, get_job_manager
+from backend.training.pipeline import TrainingOptions, run_training
+from backend.utils.json_utils import read_json, write_json
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class _ThreadLogFilter(logging.Filter):
+    """Ne conserve que les messages émis par un thread donné"""
+
+    def __init__(self, thread_id: int):
+        super().__init__()
+        self.thread_id = thread_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.thread == self.thread_id
+
+
+class TrainingService:
+    """Service de gestion des jobs d'entraînement"""
+
+    def __init__(self, job_manager: Optional[JobManager] = None):
+        """
+        Initialise le service d'entraînement
+
+        Args:
+            job_manager: Gestionnaire de tâches à utiliser (optionnel)
+        """
+        self.job_manager = job_manager or get_job_manager()
+        self.logs_dir = os.path.join(settings.DATA_DIR, "logs")
+        os.makedirs(self.logs_dir, exist_ok=True)
+
+    def get_status_file(self, job_id: str) -> str:
+        """Chemin du fichier de statut d'un job"""
+        return os.path.join(self.logs_dir, f"train_{job_id}_status.json")
+
+    def get_log_file(self, job_id: str) -> str:
+        """Chemin du fichier de log d'un job"""
+        return os.path.join(self.logs_dir, f"train_{job_id}.log")
+
+    def start_training(self, options: TrainingOptions, job_id: Optional[str] = None) -> str:
+        """
+        Lance un entraînement dans le pool de workers
+
+        Args:
+            options: Paramètres de l'entraînement
+            job_id: Identifiant du job (généré si absent)
+
+        Returns:
+            Identifiant du job d'entraînement
+        """
+        job_id = job_id or str(uuid.uuid4())
+        self._submit(options, job_id)
+        return job_id
+
+    async def run_training(self, options: TrainingOptions, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lance un entraînement et attend sa fin sans bloquer la boucle asyncio
+
+        Args:
+            options: Paramètres de l'entraînement
+            job_id: Identifiant du job (généré si absent)
+
+        Returns:
+            Récapitulatif de l'entraînement
+        """
+        future = self._submit(options, job_id or str(uuid.uuid4()))
+        return await asyncio.wrap_future(future)
+
+    def _submit(self, options: TrainingOptions, job_id: str) -> Future:
+        """Initialise le fichier de statut et soumet le job au pool"""
+        status_file = self.get_status_file(job_id)
+
+        self._save_status(status_file, {
+            "job_id": job_id,
+            "status": "initializing",
+            "progress": 0,
+            "step": None,
+            "message": "Initialisation de l'entraînement",
+            "start_time": datetime.now().isoformat(),
+            "end_time": None
+        })
+
+        future = self.job_manager.submit(
+            job_id,
+            self._run_job,
+            options,
+            on_update=lambda state: self._save_status(status_file, state)
+        )
+
+        logger.info(f"Entraînement {job_id} soumis au pool de workers")
+        return future
+
+    def cancel_training(self, job_id: str) -> bool:
+        """
+        Demande l'annulation d'un entraînement en cours
+
+        Args:
+            job_id: Identifiant du job
+
+        Returns:
+            True si l'annulation a été prise en compte
+        """
+        cancelled = self.job_manager.cancel(job_id)
+        if cancelled:
+            logger.info(f"Annulation demandée pour l'entraînement {job_id}")
+        return cancelled
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère le statut d'un entraînement
+
+        Args:
+            job_id: Identifiant du job
+
+        Returns:
+            Statut du job ou None si introuvable
+        """
+        state = self.job_manager.get_state(job_id)
+        if state is not None:
+            return state
+
+        status_file = self.get_status_file(job_id)
+        if not os.path.exists(status_file):
+            return None
+
+        return read_json(status_file)
+
+    def _run_job(self, ctx: JobContext, options: TrainingOptions) -> Dict[str, Any]:
+        """Exécute l'entraînement en capturant ses logs dans un fichier dédié"""
+        handler = logging.FileHandler(self.get_log_file(ctx.job_id), mode="w", encoding="utf-8")
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handler.addFilter(_ThreadLogFilter(threading.get_ident()))
+
+        root_logger = logging.getLogger()
+        root_logger.addHandler(handler)
+
+        try:
+            logger.info(f"Démarrage de l'entraînement pour le job {ctx.job_id}")
+            result = run_training(options, ctx=ctx)
+            ctx.update(message="Entraînement terminé avec succès", version=result["version"])
+            logger.info(f"Entraînement terminé pour le job {ctx.job_id}")
+            return result
+        finally:
+            root_logger.removeHandler(handler)
+            handler.close()
+
+    def _save_status(self, status_file: str, status: Dict[str, Any]) -> None:
+        """
+        Sauvegarde le statut dans un fichier JSON
+
+        Args:
+            status_file: Chemin du fichier de statut
+            status: Dictionnaire de statut
+        """
+        write_json(status_file, status)
+
+
+@lru_cache()
+def get_training_service() -> TrainingService:
+    """
+    Récupère l'instance unique du service d'entraînement
+
+    Returns:
+        Instance du service d'entraînement
+    """
+    return TrainingService()
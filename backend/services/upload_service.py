@@ -0,0 +1,429 @@
+"""
+Uploads par morceaux, reprenables, des fichiers volumineux.
+
+Le client ouvre un upload (taille totale, taille des morceaux, empreinte
+optionnelle du fichier), envoie les morceaux dans n'importe quel ordre et en
+parallèle avec l'empreinte SHA-256 de chacun, puis termine l'upload. Chaque
+morceau est vérifié et écrit directement à sa position dans le fichier en
+cours d'assemblage ; l'empreinte du fichier complet est calculée au fil de
+l'eau sur les morceaux contigus. À la fin de l'upload le fichier est donc
+prêt : il est déplacé dans le répertoire des fichiers importés sans recopie.
+
+L'état des uploads (morceaux reçus) est conservé dans une base SQLite
+partagée par les processus de l'API : un upload interrompu reprend en
+n'envoyant que les morceaux manquants, quel que soit le processus qui les reçoit.
+"""
+import os
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from backend.core.config import get_settings
+from backend.core.errors import FileProcessingError, ResourceNotFoundError
+from backend.utils.blob_storage import get_blob_storage
+from backend.utils.compression import compression_of, has_signature
+from backend.utils.file_handling import ALLOWED_EXTENSIONS, is_allowed_file
+from backend.utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bornes de la taille des morceaux (le dernier morceau peut être plus petit)
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Taille des lectures pour le calcul de l'empreinte des morceaux déjà écrits
+_HASH_READ_SIZE = 4 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    total_size INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    sha256 TEXT,
+    description TEXT,
+    status TEXT NOT NULL,
+    file_id TEXT,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    upload_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (upload_id, chunk_index)
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_expires_at ON uploads (expires_at);
+"""
+
+
+class _FileHash:
+    """Empreinte du fichier en cours d'assemblage, sur les morceaux contigus reçus"""
+
+    __slots__ = ("lock", "digest", "next_index")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.digest = hashlib.sha256()
+        self.next_index = 0
+
+
+class ChunkedUploadService:
+    """Service des uploads par morceaux"""
+
+    def __init__(self, work_dir: Optional[str] = None):
+        """
+        Initialise le service
+
+        Args:
+            work_dir: Répertoire des fichiers en cours d'assemblage (par défaut DATA_DIR/temp/chunked)
+        """
+        self.work_dir = work_dir or os.path.join(settings.DATA_DIR, "temp", "chunked")
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.db_path = os.path.join(self.work_dir, "uploads.db")
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+        # Empreintes en cours de calcul dans ce processus
+        self._hashes: Dict[str, _FileHash] = {}
+        self._hashes_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion propre au thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaction en écriture exclusive entre processus"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def part_path(self, upload_id: str) -> str:
+        """Chemin du fichier en cours d'assemblage"""
+        return os.path.join(self.work_dir, f"{upload_id}.part")
+
+    def create_upload(self,
+                      filename: str,
+                      total_size: int,
+                      chunk_size: Optional[int] = None,
+                      sha256: Optional[str] = None,
+                      description: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ouvre un upload par morceaux
+
+        Args:
+            filename: Nom du fichier
+            total_size: Taille totale en octets
+            chunk_size: Taille des morceaux (par défaut CHUNKED_UPLOAD_CHUNK_SIZE)
+            sha256: Empreinte attendue du fichier complet (optionnelle)
+            description: Description du fichier
+
+        Returns:
+            État de l'upload
+
+        Raises:
+            FileProcessingError: Si le fichier ou les paramètres sont refusés
+        """
+        if not is_allowed_file(filename):
+            raise FileProcessingError(
+                f"Format de fichier non supporté. Formats acceptés : {', '.join(ALLOWED_EXTENSIONS)}",
+                {"filename": filename}
+            )
+        if total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise FileProcessingError(
+                f"Taille du fichier ({total_size} octets) supérieure à la limite de "
+                f"{settings.CHUNKED_UPLOAD_MAX_SIZE} octets",
+                {"max_size": settings.CHUNKED_UPLOAD_MAX_SIZE, "received_size": total_size}
+            )
+        chunk_size = chunk_size or settings.CHUNKED_UPLOAD_CHUNK_SIZE
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise FileProcessingError(
+                f"Taille de morceau invalide: {chunk_size} (entre {MIN_CHUNK_SIZE} et {MAX_CHUNK_SIZE} octets)",
+                {"chunk_size": chunk_size}
+            )
+
+        self.cleanup_expired()
+
+        upload_id = str(uuid.uuid4())
+        now = datetime.now()
+        upload = {
+            "upload_id": upload_id,
+            "filename": os.path.basename(filename),
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "chunk_count": -(-total_size // chunk_size),
+            "sha256": sha256.lower() if sha256 else None,
+            "description": description or "",
+            "status": "uploading",
+            "file_id": None,
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(hours=settings.CHUNKED_UPLOAD_TTL_HOURS)).isoformat()
+        }
+
+        # Fichier creux à la taille finale: chaque morceau est écrit à sa position
+        with open(self.part_path(upload_id), "wb") as f:
+            f.truncate(total_size)
+
+        columns = ", ".join(upload)
+        placeholders = ", ".join("?" for _ in upload)
+        self._connection().execute(f"INSERT INTO uploads ({columns}) VALUES ({placeholders})", tuple(upload.values()))
+
+        logger.info(f"Upload par morceaux {upload_id} ouvert: {upload['filename']}, {total_size} octets, "
+                    f"{upload['chunk_count']} morceaux")
+        return self.get_upload(upload_id)
+
+    def get_upload(self, upload_id: str) -> Dict[str, Any]:
+        """
+        État d'un upload, avec les morceaux reçus
+
+        Raises:
+            ResourceNotFoundError: Si l'upload n'existe pas
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        if row is None:
+            raise ResourceNotFoundError("Upload", upload_id)
+
+        upload = dict(row)
+        chunks = conn.execute(
+            "SELECT chunk_index, size FROM upload_chunks WHERE upload_id = ? ORDER BY chunk_index", (upload_id,)
+        ).fetchall()
+        upload["received_chunks"] = [chunk["chunk_index"] for chunk in chunks]
+        upload["received_bytes"] = sum(chunk["size"] for chunk in chunks)
+        return upload
+
+    def expected_chunk_size(self, upload: Dict[str, Any], index: int) -> int:
+        """Taille attendue d'un morceau (le dernier peut être plus petit)"""
+        if not 0 <= index < upload["chunk_count"]:
+            raise FileProcessingError(
+                f"Numéro de morceau invalide: {index} (0 à {upload['chunk_count'] - 1})",
+                {"chunk_index": index}
+            )
+        return min(upload["chunk_size"], upload["total_size"] - index * upload["chunk_size"])
+
+    def write_chunk(self, upload_id: str, index: int, data: bytes, checksum: str) -> Dict[str, Any]:
+        """
+        Vérifie un morceau et l'écrit à sa position dans le fichier
+
+        Un morceau déjà reçu peut être renvoyé (il est réécrit).
+
+        Args:
+            upload_id: Identifiant de l'upload
+            index: Numéro du morceau (à partir de 0)
+            data: Contenu du morceau
+            checksum: Empreinte SHA-256 du morceau (hexadécimale)
+
+        Returns:
+            État de l'upload
+
+        Raises:
+            ResourceNotFoundError: Si l'upload n'existe pas
+            FileProcessingError: Si le morceau est invalide ou corrompu
+        """
+        upload = self.get_upload(upload_id)
+        if upload["status"] != "uploading":
+            raise FileProcessingError(f"L'upload {upload_id} est terminé", {"status": upload["status"]})
+
+        expected = self.expected_chunk_size(upload, index)
+        if len(data) != expected:
+            raise FileProcessingError(
+                f"Taille du morceau {index} incorrecte: {len(data)} octets au lieu de {expected}",
+                {"chunk_index": index, "expected_size": expected, "received_size": len(data)}
+            )
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != checksum.strip().lower():
+            raise FileProcessingError(
+                f"Empreinte du morceau {index} incorrecte",
+                {"chunk_index": index, "expected_sha256": checksum, "received_sha256": digest}
+            )
+        if index == 0:
+            _validate_head(upload["filename"], data)
+
+        # Un descripteur par écriture: les morceaux reçus en parallèle ne
+        # partagent pas de position de lecture
+        with open(self.part_path(upload_id), "r+b") as part:
+            part.seek(index * upload["chunk_size"])
+            part.write(data)
+
+        self._connection().execute(
+            "INSERT OR REPLACE INTO upload_chunks (upload_id, chunk_index, size, sha256) VALUES (?, ?, ?, ?)",
+            (upload_id, index, len(data), digest)
+        )
+
+        upload = self.get_upload(upload_id)
+        self._advance_hash(upload)
+        return upload
+
+    def _advance_hash(self, upload: Dict[str, Any]) -> _FileHash:
+        """Étend l'empreinte du fichier aux morceaux contigus reçus"""
+        with self._hashes_lock:
+            state = self._hashes.setdefault(upload["upload_id"], _FileHash())
+
+        received = set(upload["received_chunks"])
+        with state.lock:
+            if state.next_index in received:
+                with open(self.part_path(upload["upload_id"]), "rb") as f:
+                    f.seek(state.next_index * upload["chunk_size"])
+                    while state.next_index in received:
+                        remaining = self.expected_chunk_size(upload, state.next_index)
+                        while remaining:
+                            block = f.read(min(_HASH_READ_SIZE, remaining))
+                            if not block:
+                                break
+                            state.digest.update(block)
+                            remaining -= len(block)
+                        state.next_index += 1
+        return state
+
+    def complete_upload(self, upload_id: str) -> Tuple[Dict[str, Any], str, str]:
+        """
+        Termine un upload: vérifie le fichier complet et le place avec les fichiers importés
+
+        Args:
+            upload_id: Identifiant de l'upload
+
+        Returns:
+            Tuple (état de l'upload, identifiant du fichier, chemin du fichier)
+
+        Raises:
+            ResourceNotFoundError: Si l'upload n'existe pas
+            FileProcessingError: S'il manque des morceaux ou si l'empreinte ne correspond pas
+        """
+        upload = self.get_upload(upload_id)
+        if upload["status"] != "uploading":
+            raise FileProcessingError(f"L'upload {upload_id} est déjà terminé", {"file_id": upload["file_id"]})
+
+        missing = sorted(set(range(upload["chunk_count"])) - set(upload["received_chunks"]))
+        if missing:
+            raise FileProcessingError(
+                f"{len(missing)} morceau(x) manquant(s)",
+                {"missing_chunks": missing[:100]}
+            )
+
+        # Les morceaux reçus par d'autres processus sont lus depuis le fichier
+        sha256 = self._advance_hash(upload).digest.hexdigest()
+        if upload["sha256"] and sha256 != upload["sha256"]:
+            raise FileProcessingError(
+                "Empreinte du fichier incorrecte",
+                {"expected_sha256": upload["sha256"], "received_sha256": sha256}
+            )
+
+        file_id = str(uuid.uuid4())
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE uploads SET status = 'completed', file_id = ?, sha256 = ? "
+                "WHERE upload_id = ? AND status = 'uploading'",
+                (file_id, sha256, upload_id)
+            )
+            if cursor.rowcount == 0:
+                raise FileProcessingError(f"L'upload {upload_id} est déjà terminé")
+
+        # Déplacement (sans recopie) dans le répertoire des fichiers importés
+        file_path = get_storage().uploads.writable_path(file_id, f"{file_id}_{upload['filename']}")
+        os.replace(self.part_path(upload_id), file_path)
+        blobs = get_blob_storage()
+        blobs.put_file(blobs.key_for(file_path), file_path)
+
+        self._connection().execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+        with self._hashes_lock:
+            self._hashes.pop(upload_id, None)
+
+        logger.info(f"Upload par morceaux {upload_id} terminé: fichier {file_id}, sha256 {sha256}")
+        upload = self.get_upload(upload_id)
+        return upload, file_id, file_path
+
+    def abort_upload(self, upload_id: str) -> None:
+        """
+        Abandonne un upload et supprime le fichier en cours d'assemblage
+
+        Raises:
+            ResourceNotFoundError: Si l'upload n'existe pas
+        """
+        self.get_upload(upload_id)
+        self._remove(upload_id)
+        logger.info(f"Upload par morceaux {upload_id} abandonné")
+
+    def cleanup_expired(self) -> int:
+        """
+        Supprime les uploads expirés (inachevés) et l'état des uploads terminés expirés
+
+        Returns:
+            Nombre d'uploads supprimés
+        """
+        rows = self._connection().execute(
+            "SELECT upload_id FROM uploads WHERE expires_at <= ?", (datetime.now().isoformat(),)
+        ).fetchall()
+        for row in rows:
+            self._remove(row["upload_id"])
+        if rows:
+            logger.info(f"{len(rows)} upload(s) par morceaux expiré(s) supprimé(s)")
+        return len(rows)
+
+    def _remove(self, upload_id: str) -> None:
+        """Supprime l'état et le fichier en cours d'assemblage d'un upload"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+            conn.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+        with self._hashes_lock:
+            self._hashes.pop(upload_id, None)
+        try:
+            os.remove(self.part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+
+def _validate_head(filename: str, data: bytes) -> None:
+    """
+    Vérifie le début du fichier dès la réception du premier morceau
+
+    Raises:
+        FileProcessingError: Si le contenu ne correspond pas au format annoncé
+    """
+    compression = compression_of(filename)
+    if compression:
+        if not has_signature(compression, data):
+            raise FileProcessingError(f"Fichier .{compression} invalide ou corrompu")
+        return
+
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "xlsx" and not data.startswith(b"PK\x03\x04"):
+        raise FileProcessingError("Fichier XLSX invalide ou corrompu")
+    if extension == "xls" and not data.startswith(b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"):
+        raise FileProcessingError("Fichier XLS invalide ou corrompu")
+    if extension in ("csv", "txt"):
+        header = data.split(b"\n", 1)[0]
+        if b"\x00" in header or not any(delimiter in header for delimiter in (b";", b",", b"\t", b"|")):
+            raise FileProcessingError("En-tête FEC introuvable dans le premier morceau")
+
+
+@lru_cache()
+def get_upload_service() -> ChunkedUploadService:
+    """
+    Récupère l'instance unique du service des uploads par morceaux
+
+    Returns:
+        Instance du service
+    """
+    return ChunkedUploadService()
@@ -0,0 +1,232 @@
+"""
+Cache disque des corpus synthétiques d'entraînement.
+
+Un corpus est identifié par la version du générateur, ses paramètres et la
+graine utilisée : une génération seedée étant déterministe, le même corpus peut
+être relu depuis le disque au lieu d'être régénéré. Les corpus sont stockés au
+format colonnaire et les moins récemment utilisés sont supprimés lorsque la
+taille totale du cache dépasse la limite configurée.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+import faker
+import numpy as np
+
+from backend.core.config import get_settings
+from backend.models.my_fec_generator import MyFECGenerator
+from backend.utils.columnar import COLUMNAR_EXTENSION, save_columns, load_columns, entries_to_columns, columns_to_entries
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Colonne stockant la vérité terrain des anomalies injectées
+_LABEL_COLUMN = "__anomaly_label"
+
+
+class CorpusCache:
+    """Cache des corpus générés, indexé par (version du générateur, paramètres, graine)"""
+
+    def __init__(self, base_dir: Optional[str] = None, max_size: Optional[int] = None):
+        """
+        Initialise le cache de corpus
+
+        Args:
+            base_dir: Répertoire de stockage (par défaut DATA_DIR/corpora)
+            max_size: Taille maximale du cache en octets (par défaut CORPUS_CACHE_MAX_SIZE)
+        """
+        self.base_dir = base_dir or os.path.join(settings.DATA_DIR, "corpora")
+        self.max_size = settings.CORPUS_CACHE_MAX_SIZE if max_size is None else max_size
+        self._lock = threading.Lock()
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def make_key(self, params: Dict[str, Any], seed: int) -> str:
+        """
+        Calcule la clé d'un corpus
+
+        La version de Faker fait partie de la clé car elle influe sur les
+        noms et références générés pour une même graine.
+
+        Args:
+            params: Paramètres du générateur (MyFECGenerator.get_params)
+            seed: Graine de génération
+
+        Returns:
+            Empreinte hexadécimale du corpus
+        """
+        payload = json.dumps(
+            {"params": params, "seed": seed, "faker_version": faker.VERSION},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Chemin du fichier d'un corpus"""
+        return os.path.join(self.base_dir, f"{key}{COLUMNAR_EXTENSION}")
+
+    def get(self, params: Dict[str, Any], seed: int) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        Charge un corpus depuis le cache
+
+        Args:
+            params: Paramètres du générateur
+            seed: Graine de génération
+
+        Returns:
+            Tuple (écritures, étiquettes d'anomalies) ou None si absent du cache
+        """
+        path = self._path(self.make_key(params, seed))
+        try:
+            columns, _ = load_columns(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corpus en cache illisible {path}, suppression: {str(e)}")
+            self._remove(path)
+            return None
+
+        # Marquer le corpus comme récemment utilisé pour l'éviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        labels = columns.pop(_LABEL_COLUMN).astype(object)
+        return columns_to_entries(columns), labels
+
+    def put(self, params: Dict[str, Any], seed: int, entries: List[Dict[str, Any]], labels: np.ndarray) -> str:
+        """
+        Enregistre un corpus dans le cache
+
+        Args:
+            params: Paramètres du générateur
+            seed: Graine de génération
+            entries: Écritures générées
+            labels: Étiquettes d'anomalies des écritures
+
+        Returns:
+            Clé du corpus
+        """
+        key = self.make_key(params, seed)
+        if not entries:
+            return key
+
+        columns = entries_to_columns(entries)
+        columns[_LABEL_COLUMN] = labels
+        size = save_columns(self._path(key), columns, {"params": params, "seed": seed})
+        logger.info(f"Corpus {key[:12]} mis en cache ({len(entries)} écritures, {size} octets)")
+        self.evict()
+        return key
+
+    def get_or_generate(self, generator: MyFECGenerator, count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Retourne le corpus d'un générateur seedé, en le générant s'il est absent du cache
+
+        Args:
+            generator: Générateur configuré (avec une graine)
+            count: Nombre d'écritures à générer (transaction_count si None)
+
+        Returns:
+            Écritures du corpus
+        """
+        entries, _ = self.get_or_generate_labeled(generator, count=count)
+        return entries
+
+    def get_or_generate_labeled(self,
+                                generator: MyFECGenerator,
+                                count: Optional[int] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Comme get_or_generate, en retournant aussi les étiquettes des anomalies injectées
+
+        Args:
+            generator: Générateur configuré (avec une graine)
+            count: Nombre d'écritures à générer (transaction_count si None)
+
+        Returns:
+            Tuple (écritures, étiquettes d'anomalies)
+        """
+        if generator.seed is None:
+            return generator.generate_labeled_entries(count=count)
+
+        params = generator.get_params()
+        if count is not None:
+            params["transaction_count"] = count
+
+        cached = self.get(params, generator.seed)
+        if cached is not None:
+            logger.info(f"Corpus chargé depuis le cache ({len(cached[0])} écritures)")
+            return cached
+
+        entries, labels = generator.generate_labeled_entries(count=count)
+        self.put(params, generator.seed, entries, labels)
+        return entries, labels
+
+    def total_size(self) -> int:
+        """Taille totale des corpus en cache (octets)"""
+        return sum(size for _, size, _ in self._list_files())
+
+    def evict(self) -> int:
+        """
+        Supprime les corpus les moins récemment utilisés jusqu'à respecter la taille maximale
+
+        Returns:
+            Nombre d'octets libérés
+        """
+        with self._lock:
+            files = self._list_files()
+            total = sum(size for _, size, _ in files)
+            freed = 0
+
+            # Du moins récemment utilisé au plus récent
+            for path, size, _ in sorted(files, key=lambda f: f[2]):
+                if total <= self.max_size:
+                    break
+                if self._remove(path):
+                    total -= size
+                    freed += size
+
+            if freed:
+                logger.info(f"Cache de corpus: {freed} octets libérés")
+            return freed
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        for path, _, _ in self._list_files():
+            self._remove(path)
+
+    def _list_files(self) -> List[tuple]:
+        """Liste les fichiers du cache sous la forme (chemin, taille, date d'accès)"""
+        files = []
+        for filename in os.listdir(self.base_dir):
+            if not filename.endswith(COLUMNAR_EXTENSION):
+                continue
+            path = os.path.join(self.base_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _remove(self, path: str) -> bool:
+        """Supprime un fichier du cache"""
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+@lru_cache()
+def get_corpus_cache() -> CorpusCache:
+    """
+    Récupère l'instance unique du cache de corpus
+
+    Returns:
+        Instance du cache de corpus
+    """
+    return CorpusCache()
@@ -0,0 +1,186 @@
+"""
+Cache des matrices de caractéristiques utilisées pour l'entraînement.
+
+Les caractéristiques extraites d'un jeu de données (jeu synthétique d'un
+entraînement, fichier uploadé et analysé) sont stockées au format colonnaire
+sous une clé de source, afin qu'un réentraînement n'ait à extraire que les
+caractéristiques des nouvelles données.
+"""
+import os
+import re
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+import pandas as pd
+
+from backend.core.config import get_settings
+from backend.utils.blob_storage import BlobStorage, LocalBlobStorage, get_blob_storage
+from backend.utils.columnar import COLUMNAR_EXTENSION, save_columns, load_columns, read_metadata
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Séparateur entre le groupe de caractéristiques et le nom de colonne
+_GROUP_SEPARATOR = "."
+
+
+class FeatureStore:
+    """Cache disque des caractéristiques par source de données"""
+
+    def __init__(self, base_dir: Optional[str] = None, blobs: Optional[BlobStorage] = None):
+        """
+        Initialise le cache de caractéristiques
+
+        Args:
+            base_dir: Répertoire de stockage (par défaut DATA_DIR/features)
+            blobs: Stockage des fichiers (par défaut le stockage configuré, ou
+                   base_dir lui-même si un répertoire est fourni)
+        """
+        self.base_dir = base_dir or os.path.join(settings.DATA_DIR, "features")
+        os.makedirs(self.base_dir, exist_ok=True)
+        if blobs is None:
+            blobs = get_blob_storage() if base_dir is None else LocalBlobStorage(self.base_dir)
+        self.blobs = blobs
+
+    def _path(self, source: str) -> str:
+        """Chemin local du fichier d'une source"""
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", source)
+        return os.path.join(self.base_dir, f"{safe_name}{COLUMNAR_EXTENSION}")
+
+    def _key(self, source: str) -> str:
+        """Clé du fichier d'une source dans le stockage"""
+        return self.blobs.key_for(self._path(source))
+
+    def _fetch(self, source: str) -> Optional[str]:
+        """Chemin local du fichier d'une source, ou None si absente du cache"""
+        try:
+            return self.blobs.fetch(self._key(source))
+        except FileNotFoundError:
+            return None
+
+    def has(self, source: str) -> bool:
+        """Indique si les caractéristiques d'une source sont en cache"""
+        return self.blobs.exists(self._key(source))
+
+    def save(self, source: str, features: Dict[str, pd.DataFrame], metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Enregistre les caractéristiques d'une source
+
+        Args:
+            source: Clé de la source (ex: "synthetic_20240101_120000", "upload_<file_id>")
+            features: Caractéristiques par groupe (sortie de AnomalyDetectorTrainer._extract_features)
+            metadata: Métadonnées supplémentaires
+
+        Returns:
+            Taille du fichier écrit en octets
+        """
+        columns = {}
+        groups = {}
+        for group, frame in features.items():
+            groups[group] = list(frame.columns)
+            for column in frame.columns:
+                columns[f"{group}{_GROUP_SEPARATOR}{column}"] = frame[column].to_numpy(dtype="float64")
+
+        meta = dict(metadata or {})
+        meta.update({
+            "source": source,
+            "groups": groups,
+            "created_at": datetime.now().isoformat(),
+        })
+
+        path = self._path(source)
+        size = save_columns(path, columns, meta)
+        self.blobs.put_file(self._key(source), path)
+        logger.info(f"Caractéristiques de la source {source} mises en cache ({size} octets)")
+        return size
+
+    def load(self, source: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Charge les caractéristiques d'une source
+
+        Args:
+            source: Clé de la source
+
+        Returns:
+            Caractéristiques par groupe ou None si absentes du cache
+        """
+        path = self._fetch(source)
+        if path is None:
+            return None
+
+        columns, meta = load_columns(path)
+        features = {}
+        for group, names in meta["groups"].items():
+            features[group] = pd.DataFrame(
+                {name: columns[f"{group}{_GROUP_SEPARATOR}{name}"] for name in names},
+                columns=names
+            )
+        return features
+
+    def get_metadata(self, source: str) -> Optional[Dict[str, Any]]:
+        """Métadonnées d'une source ou None si absente"""
+        path = self._fetch(source)
+        if path is None:
+            return None
+        return read_metadata(path)["metadata"]
+
+    def list_sources(self, prefix: str = "") -> List[str]:
+        """
+        Liste les sources en cache
+
+        Args:
+            prefix: Ne retourner que les sources commençant par ce préfixe
+
+        Returns:
+            Clés des sources triées
+        """
+        directory = self._key(prefix).rpartition("/")[0]
+        sources = []
+        for info in self.blobs.list(f"{directory}/" if directory else ""):
+            filename = info.key.rpartition("/")[2]
+            if filename.endswith(COLUMNAR_EXTENSION) and filename.startswith(prefix):
+                sources.append(filename[:-len(COLUMNAR_EXTENSION)])
+        return sorted(sources)
+
+    def delete(self, source: str) -> bool:
+        """Supprime une source du cache"""
+        return self.blobs.delete(self._key(source)) > 0
+
+
+def concat_features(feature_sets: List[Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """
+    Concatène plusieurs ensembles de caractéristiques groupe par groupe
+
+    Args:
+        feature_sets: Ensembles de caractéristiques à concaténer
+
+    Returns:
+        Caractéristiques concaténées
+    """
+    if not feature_sets:
+        return {}
+    groups = feature_sets[0].keys()
+    return {
+        group: pd.concat([features[group] for features in feature_sets], ignore_index=True)
+        for group in groups
+    }
+
+
+def feature_row_count(features: Dict[str, pd.DataFrame]) -> int:
+    """Nombre de lignes d'un ensemble de caractéristiques"""
+    for frame in features.values():
+        return len(frame)
+    return 0
+
+
+@lru_cache()
+def get_feature_store() -> FeatureStore:
+    """
+    Récupère l'instance unique du cache de caractéristiques
+
+    Returns:
+        Instance du cache de caractéristiques
+    """
+    return FeatureStore()
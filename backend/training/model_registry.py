@@ -5,6 +5,7 @@ Ce module permet d'enregistrer, activer et récupérer les modèles ML.
 import os
 import json
 import logging
+import threading
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from functools import lru_cache
@@ -22,6 +23,9 @@ class ModelRegistry:
         self.models_dir = os.path.join(settings.DATA_DIR, "models")
         self.registry_file = os.path.join(self.models_dir, "registry.json")
         
+        # Verrou pour les modifications concurrentes (entraînements en arrière-plan)
+        self._lock = threading.RLock()
+        
         # Créer le répertoire models s'il n'existe pas
         os.makedirs(self.models_dir, exist_ok=True)
         
@@ -48,32 +52,33 @@ class ModelRegistry:
             True si l'enregistrement a réussi
         """
         try:
-            # Charger le registre
-            registry = self._load_registry()
+            with self._lock:
+                # Charger le registre
+                registry = self._load_registry()
             
-            # Vérifier si cette version existe déjà
-            if any(model["version"] == version for model in registry["models"]):
-                logger.warning(f"Un modèle avec la version {version} existe déjà")
-                return False
+                # Vérifier si cette version existe déjà
+                if any(model["version"] == version for model in registry["models"]):
+                    logger.warning(f"Un modèle avec la version {version} existe déjà")
+                    return False
             
-            # Créer l'entrée du modèle
-            model_entry = {
-                "version": version,
-                "created_at": datetime.now().isoformat(),
-                "files": model_files,
-                "metrics": metrics or {},
-                "metadata": metadata or {},
-                "is_active": False
-            }
+                # Créer l'entrée du modèle
+                model_entry = {
+                    "version": version,
+                    "created_at": datetime.now().isoformat(),
+                    "files": model_files,
+                    "metrics": metrics or {},
+                    "metadata": metadata or {},
+                    "is_active": False
+                }
             
-            # Ajouter au registre
-            registry["models"].append(model_entry)
+                # Ajouter au registre
+                registry["models"].append(model_entry)
             
-            # Sauvegarder le registre
-            self._save_registry(registry)
+                # Sauvegarder le registre
+                self._save_registry(registry)
             
-            logger.info(f"Modèle version {version} enregistré avec succès")
-            return True
+                logger.info(f"Modèle version {version} enregistré avec succès")
+                return True
             
         except Exception as e:
             logger.error(f"Erreur lors de l'enregistrement du modèle: {str(e)}", exc_info=True)
@@ -90,32 +95,33 @@ class ModelRegistry:
             True si l'activation a réussi
         """
         try:
-            # Charger le registre
-            registry = self._load_registry()
+            with self._lock:
+                # Charger le registre
+                registry = self._load_registry()
             
-            # Rechercher le modèle
-            model_found = False
+                # Rechercher le modèle
+                model_found = False
             
-            # Désactiver tous les modèles et activer celui spécifié
-            for model in registry["models"]:
-                if model["version"] == version:
-                    model["is_active"] = True
-                    model_found = True
-                else:
-                    model["is_active"] = False
+                # Désactiver tous les modèles et activer celui spécifié
+                for model in registry["models"]:
+                    if model["version"] == version:
+                        model["is_active"] = True
+                        model_found = True
+                    else:
+                        model["is_active"] = False
             
-            if not model_found:
-                logger.warning(f"Modèle version {version} introuvable")
-                return False
+                if not model_found:
+                    logger.warning(f"Modèle version {version} introuvable")
+                    return False
             
-            # Mettre à jour la version active
-            registry["active_version"] = version
+                # Mettre à jour la version active
+                registry["active_version"] = version
             
-            # Sauvegarder le registre
-            self._save_registry(registry)
+                # Sauvegarder le registre
+                self._save_registry(registry)
             
-            logger.info(f"Modèle version {version} activé avec succès")
-            return True
+                logger.info(f"Modèle version {version} activé avec succès")
+                return True
             
         except Exception as e:
             logger.error(f"Erreur lors de l'activation du modèle: {str(e)}", exc_info=True)
@@ -150,6 +156,30 @@ class ModelRegistry:
             logger.error(f"Erreur lors de la récupération du modèle actif: {str(e)}", exc_info=True)
             return None
     
+    def get_model_info(self, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère les informations d'un modèle spécifique
+        
+        Args:
+            version: Version du modèle
+            
+        Returns:
+            Informations du modèle ou None si non trouvé
+        """
+        try:
+            registry = self._load_registry()
+            
+            for model in registry["models"]:
+                if model["version"] == version:
+                    return model
+            
+            logger.warning(f"Modèle version {version} introuvable")
+            return None
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération du modèle: {str(e)}", exc_info=True)
+            return None
+    
     def get_model_files(self, version: str) -> Optional[Dict[str, str]]:
         """
         Récupère les chemins des fichiers d'un modèle spécifique
@@ -0,0 +1,465 @@
+"""
+Pipeline d'entraînement du détecteur d'anomalies.
+Regroupe la génération des données, l'extraction des caractéristiques,
+l'entraînement, l'évaluation et l'enregistrement des modèles afin de pouvoir
+l'exécuter dans le processus de l'API comme depuis la ligne de commande.
+"""
+import os
+import json
+import time
+import random
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import joblib
+import numpy as np
+
+from backend.core.config import get_settings
+from backend.core.jobs import JobContext
+from backend.models.my_fec_generator import MyFECGenerator, derive_seed
+from backend.training.corpus_cache import get_corpus_cache
+from backend.training.feature_store import FeatureStore, get_feature_store, concat_features, feature_row_count
+from backend.training.model_registry import get_model_registry
+from backend.training.train_detector import AnomalyDetectorTrainer
+from backend.utils.fec_parser import FECParser
+from backend.utils.blob_storage import get_blob_storage
+from backend.utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bornes de progression (en %) de chaque étape du pipeline
+PROGRESS_GENERATION = (0, 30)
+PROGRESS_FEATURES = (30, 40)
+PROGRESS_FIT = (40, 75)
+PROGRESS_EVALUATION = (75, 90)
+PROGRESS_REGISTRATION = (90, 100)
+
+# Modes d'entraînement
+MODE_FULL = "full"
+MODE_INCREMENTAL = "incremental"
+
+# Correspondance entre les colonnes d'un fichier FEC et les champs utilisés par l'extraction
+FEC_FIELD_MAPPING = {
+    "JournalCode": "journal_code",
+    "EcritureNum": "ecr_num",
+    "EcritureDate": "ecr_date",
+    "CompteNum": "compte_num",
+    "CompAuxNum": "comp_aux_num",
+    "PieceRef": "piece_ref",
+    "EcritureLib": "ecriture_lib",
+    "Debit": "debit_montant",
+    "Credit": "credit_montant",
+}
+
+
+@dataclass
+class TrainingOptions:
+    """Paramètres d'un entraînement"""
+    num_sets: int = 10
+    entries_per_set: int = 500
+    evaluate: bool = True
+    test_size: int = 500
+    version: Optional[str] = None
+    description: Optional[str] = None
+    activate: bool = False
+    command_line: Optional[str] = None
+    # Entraînement incrémental
+    mode: str = MODE_FULL
+    base_version: Optional[str] = None  # Version de départ (par défaut le modèle actif)
+    warm_start: bool = True  # Ajouter des arbres (True) ou réentraîner sur toutes les données (False)
+    extra_estimators: int = 50
+    include_uploads: bool = True  # Réutiliser les fichiers uploadés déjà analysés
+    # Reproductibilité
+    seed: Optional[int] = None  # Graine des corpus synthétiques (tirée au hasard si absente)
+    use_corpus_cache: bool = True
+
+
+def _report(ctx: Optional[JobContext], bounds: tuple, fraction: float, message: str, step: str) -> None:
+    """Publie la progression d'une étape et vérifie l'annulation"""
+    if ctx is None:
+        return
+    ctx.check_cancelled()
+    start, end = bounds
+    ctx.update(progress=start + (end - start) * fraction, message=message, step=step)
+
+
+def default_anomaly_rates(num_sets: int) -> List[float]:
+    """Taux d'anomalies croissants utilisés pour les jeux d'entraînement"""
+    return [0.05 + (i * 0.02) for i in range(num_sets)]
+
+
+def generate_training_data(num_sets: int = 10,
+                           entries_per_set: int = 1000,
+                           anomaly_rates: Optional[List[float]] = None,
+                           ctx: Optional[JobContext] = None,
+                           seed: Optional[int] = None,
+                           use_cache: bool = True) -> List[Dict[str, Any]]:
+    """
+    Génère plusieurs jeux de données pour l'entraînement
+
+    Avec une graine, chaque jeu reçoit une graine dérivée et la génération est
+    reproductible ; les jeux déjà générés sont alors relus depuis le cache.
+
+    Args:
+        num_sets: Nombre de jeux de données à générer
+        entries_per_set: Nombre d'écritures par jeu de données
+        anomaly_rates: Liste des taux d'anomalies à utiliser
+        ctx: Contexte de la tâche pour publier la progression
+        seed: Graine de génération (non reproductible si None)
+        use_cache: Utiliser le cache de corpus
+
+    Returns:
+        Liste des écritures générées
+    """
+    if anomaly_rates is None:
+        anomaly_rates = default_anomaly_rates(num_sets)
+
+    logger.info(f"Génération de {num_sets} jeux de données d'entraînement")
+    cache = get_corpus_cache() if use_cache and seed is not None else None
+    all_entries = []
+
+    for i, rate in enumerate(anomaly_rates[:num_sets]):
+        _report(ctx, PROGRESS_GENERATION, i / num_sets,
+                f"Génération du jeu de données {i+1}/{num_sets}", "data_generation")
+
+        generator = MyFECGenerator(
+            company_name=f"TRAINING_SET_{i+1}",
+            start_date="2023-01-01",
+            end_date="2023-12-31",
+            transaction_count=entries_per_set,
+            anomaly_rate=rate,
+            seed=derive_seed(seed, "train", i) if seed is not None else None
+        )
+        entries = cache.get_or_generate(generator) if cache else generator.generate_entries()
+        all_entries.extend(entries)
+
+        logger.info(f"Jeu {i+1}/{num_sets} généré avec {len(entries)} écritures (taux d'anomalies: {rate:.2f})")
+
+    logger.info(f"Total des entrées générées: {len(all_entries)}")
+    return all_entries
+
+
+def detection_metrics(flagged: np.ndarray, labels: np.ndarray) -> Dict[str, float]:
+    """
+    Précision et rappel d'une détection par rapport à la vérité terrain
+
+    Args:
+        flagged: Booléens indiquant les lignes signalées
+        labels: Étiquettes d'anomalies injectées ("" pour une ligne normale)
+
+    Returns:
+        Dictionnaire avec precision, recall et f1
+    """
+    truth = labels != ""
+    true_positives = int(np.sum(flagged & truth))
+    precision = true_positives / int(np.sum(flagged)) if np.any(flagged) else 0.0
+    recall = true_positives / int(np.sum(truth)) if np.any(truth) else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def evaluate_model(trainer: AnomalyDetectorTrainer,
+                   test_entries: List[Dict[str, Any]],
+                   labels: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """
+    Évalue les performances du modèle sur un jeu de test
+
+    Args:
+        trainer: Trainer avec modèles entraînés
+        test_entries: Jeu de données de test
+        labels: Étiquettes des anomalies injectées (ajoute précision et rappel)
+
+    Returns:
+        Dictionnaire des métriques
+    """
+    logger.info(f"Évaluation des performances sur {len(test_entries)} entrées de test")
+    metrics = {}
+    flagged_any = np.zeros(len(test_entries), dtype=bool)
+
+    features = trainer._extract_features(test_entries)
+
+    for name, model in trainer.models.items():
+        try:
+            X = trainer.scalers[name].transform(features[name])
+            predictions = model.predict(X)
+            anomaly_count = int(np.sum(predictions == -1))
+            scores = model.score_samples(X)
+
+            metrics[f"{name}_anomaly_rate"] = anomaly_count / len(test_entries)
+            metrics[f"{name}_score_mean"] = float(np.mean(scores))
+            metrics[f"{name}_score_std"] = float(np.std(scores))
+
+            if labels is not None:
+                flagged_any |= predictions == -1
+                for key, value in detection_metrics(predictions == -1, labels).items():
+                    metrics[f"{name}_{key}"] = value
+
+            logger.info(f"Modèle {name}: {anomaly_count} anomalies détectées sur {len(test_entries)} entrées")
+            logger.info(f"Score moyen: {metrics[f'{name}_score_mean']:.4f}, Écart-type: {metrics[f'{name}_score_std']:.4f}")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'évaluation du modèle {name}: {str(e)}")
+
+    if labels is not None:
+        for key, value in detection_metrics(flagged_any, labels).items():
+            metrics[f"detector_{key}"] = value
+        logger.info(f"Détecteur combiné: précision {metrics['detector_precision']:.3f}, rappel {metrics['detector_recall']:.3f}")
+
+    return metrics
+
+
+def save_trainer_models(trainer: AnomalyDetectorTrainer, version: str) -> Dict[str, str]:
+    """
+    Sauvegarde les modèles et scalers d'un trainer sous une version donnée
+
+    Args:
+        trainer: Trainer avec modèles entraînés
+        version: Version du modèle
+
+    Returns:
+        Chemins des fichiers sauvegardés, au format attendu par le registre
+    """
+    model_dir = os.path.join(settings.DATA_DIR, "models")
+    os.makedirs(model_dir, exist_ok=True)
+
+    model_files = {}
+    for name in trainer.models.keys():
+        model_path = os.path.join(model_dir, f"{name}_model_{version}.joblib")
+        scaler_path = os.path.join(model_dir, f"{name}_scaler_{version}.joblib")
+
+        joblib.dump(trainer.models[name], model_path)
+        joblib.dump(trainer.scalers[name], scaler_path)
+
+        model_files[f"{name}_model"] = model_path
+        model_files[f"{name}_scaler"] = scaler_path
+
+    return model_files
+
+
+def read_upload_entries(file_path: str) -> List[Dict[str, Any]]:
+    """Lit un fichier FEC uploadé et renomme ses colonnes pour l'extraction"""
+    entries = FECParser(file_path).parse()
+    return [
+        {FEC_FIELD_MAPPING.get(key, key): value for key, value in entry.items()}
+        for entry in entries
+    ]
+
+
+def collect_upload_features(trainer: AnomalyDetectorTrainer,
+                            store: FeatureStore,
+                            exclude: Optional[set] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Récupère les caractéristiques des fichiers uploadés déjà analysés
+
+    Les caractéristiques d'un fichier ne sont extraites qu'une fois puis lues
+    depuis le cache lors des entraînements suivants.
+
+    Args:
+        trainer: Trainer utilisé pour l'extraction
+        store: Cache des caractéristiques
+        exclude: Sources à ignorer (déjà consommées par le modèle de base)
+
+    Returns:
+        Caractéristiques indexées par clé de source
+    """
+    exclude = exclude or set()
+    collected = {}
+    blobs = get_blob_storage()
+    prefix = blobs.key_for(get_storage().uploads.base_dir) + "/"
+    for meta_key in sorted(info.key for info in blobs.list(prefix) if info.key.endswith("_meta.json")):
+        try:
+            metadata = json.loads(blobs.get(meta_key))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Métadonnées illisibles {meta_key}: {str(e)}")
+            continue
+
+        source = f"upload_{metadata.get('file_id')}"
+        if source in exclude or not metadata.get("analyses"):
+            continue
+
+        features = store.load(source)
+        if features is None:
+            file_path = metadata.get("file_path")
+            if metadata.get("file_key"):
+                try:
+                    file_path = blobs.fetch(metadata["file_key"])
+                except FileNotFoundError:
+                    continue
+            if not file_path or not os.path.exists(file_path):
+                continue
+            try:
+                entries = read_upload_entries(file_path)
+            except Exception as e:
+                logger.warning(f"Fichier {file_path} ignoré pour l'entraînement: {str(e)}")
+                continue
+            if not entries:
+                continue
+            features = trainer._extract_features(entries)
+            store.save(source, features, {"file_id": metadata.get("file_id"), "filename": metadata.get("filename")})
+
+        collected[source] = features
+
+    return collected
+
+
+def run_training(options: TrainingOptions, ctx: Optional[JobContext] = None) -> Dict[str, Any]:
+    """
+    Exécute un entraînement complet ou incrémental
+
+    En mode incrémental, seules les caractéristiques des nouvelles sources sont
+    extraites ; les autres sont relues depuis le cache colonnaire. Les forêts du
+    modèle de base sont soit enrichies de nouveaux arbres (warm_start), soit
+    réentraînées sur l'ensemble des caractéristiques en cache.
+
+    Args:
+        options: Paramètres de l'entraînement
+        ctx: Contexte de la tâche pour publier la progression et gérer l'annulation
+
+    Returns:
+        Récapitulatif de l'entraînement (version, métriques)
+    """
+    start_time = time.time()
+    registry = get_model_registry()
+    store = get_feature_store()
+    trainer = AnomalyDetectorTrainer()
+    version = options.version or datetime.now().strftime("%Y%m%d_%H%M%S")
+    seed = options.seed if options.seed is not None else random.randrange(2 ** 31)
+    logger.info(f"Graine de génération: {seed}")
+
+    base_info = None
+    consumed_sources: List[str] = []
+    if options.mode == MODE_INCREMENTAL:
+        base_info = registry.get_model_info(options.base_version) if options.base_version else registry.get_active_model_info()
+        if not base_info:
+            raise ValueError("Aucun modèle de base disponible pour un entraînement incrémental")
+        consumed_sources = base_info.get("metadata", {}).get("feature_sources", [])
+    elif options.mode != MODE_FULL:
+        raise ValueError(f"Mode d'entraînement inconnu: {options.mode}")
+
+    # 1. Génération des données
+    new_sources: Dict[str, Dict[str, Any]] = {}
+    if options.num_sets > 0:
+        entries = generate_training_data(
+            num_sets=options.num_sets,
+            entries_per_set=options.entries_per_set,
+            ctx=ctx,
+            seed=seed,
+            use_cache=options.use_corpus_cache
+        )
+
+        # 2. Extraction des caractéristiques
+        _report(ctx, PROGRESS_FEATURES, 0, f"Extraction des caractéristiques de {len(entries)} écritures", "feature_extraction")
+        synthetic_source = f"synthetic_{version}"
+        new_sources[synthetic_source] = trainer._extract_features(entries)
+        store.save(synthetic_source, new_sources[synthetic_source], {
+            "num_sets": options.num_sets,
+            "entries_per_set": options.entries_per_set,
+            "seed": seed,
+        })
+
+    if options.mode == MODE_INCREMENTAL and options.include_uploads:
+        _report(ctx, PROGRESS_FEATURES, 0.5, "Récupération des caractéristiques des fichiers analysés", "feature_extraction")
+        new_sources.update(collect_upload_features(trainer, store, exclude=set(consumed_sources)))
+
+    if not new_sources:
+        raise ValueError("Aucune nouvelle donnée disponible pour l'entraînement")
+
+    # 3. Entraînement de chaque modèle
+    def on_model_start(name: str, index: int, total: int) -> None:
+        _report(ctx, PROGRESS_FIT, index / total, f"Entraînement du modèle '{name}' ({index+1}/{total})", f"fit_{name}")
+
+    if options.mode == MODE_INCREMENTAL and options.warm_start:
+        features = concat_features(list(new_sources.values()))
+        trainer.load_models(base_info["files"])
+        logger.info(f"Enrichissement du modèle {base_info['version']} sur {feature_row_count(features)} écritures...")
+        trainer.grow(features, extra_estimators=options.extra_estimators, on_model_start=on_model_start)
+    else:
+        # Réentraînement complet sur les sources du modèle de base présentes en cache
+        cached, missing = [], []
+        for source in consumed_sources:
+            if source in new_sources:
+                continue
+            source_features = store.load(source)
+            if source_features is None:
+                missing.append(source)
+            else:
+                cached.append(source_features)
+        if missing:
+            # Les sources absentes du cache ne font pas partie des données du nouveau modèle
+            logger.warning(f"{len(missing)} source(s) du modèle de base absente(s) du cache des caractéristiques, "
+                           f"ignorée(s): {', '.join(missing)}")
+            consumed_sources = [source for source in consumed_sources if source not in missing]
+        features = concat_features(cached + list(new_sources.values()))
+        logger.info(f"Entraînement du détecteur sur {feature_row_count(features)} écritures...")
+        trainer.train([], features=features, on_model_start=on_model_start)
+
+    feature_sources = sorted(set(consumed_sources) | set(new_sources))
+    training_samples = feature_row_count(features)
+    training_time = time.time() - start_time
+
+    metrics = {
+        "training_time": training_time,
+        "training_samples": training_samples,
+        "training_date": datetime.now().isoformat()
+    }
+    # 4. Évaluation
+    if options.evaluate:
+        _report(ctx, PROGRESS_EVALUATION, 0, "Évaluation des modèles", "evaluation")
+        test_generator = MyFECGenerator(
+            company_name="TEST_SET",
+            anomaly_rate=0.1,  # 10% d'anomalies dans le jeu de test
+            seed=derive_seed(seed, "test")
+        )
+        test_count = options.test_size or 500
+        if options.use_corpus_cache:
+            test_entries, test_labels = get_corpus_cache().get_or_generate_labeled(test_generator, count=test_count)
+        else:
+            test_entries, test_labels = test_generator.generate_labeled_entries(count=test_count)
+        metrics.update(evaluate_model(trainer, test_entries, test_labels))
+
+    # 5. Enregistrement
+    _report(ctx, PROGRESS_REGISTRATION, 0, f"Enregistrement du modèle version {version}", "registration")
+    model_files = save_trainer_models(trainer, version)
+
+    registered = registry.register_model(
+        version=version,
+        model_files=model_files,
+        metrics=metrics,
+        metadata={
+            "description": options.description or "Modèle de détection d'anomalies",
+            "anomaly_rates": default_anomaly_rates(options.num_sets),
+            "command_line": options.command_line or "",
+            "mode": options.mode,
+            "base_version": base_info["version"] if base_info else None,
+            "feature_sources": feature_sources,
+            "seed": seed,
+        }
+    )
+    if not registered:
+        raise RuntimeError(f"Échec de l'enregistrement du modèle version {version}")
+
+    # Définir comme modèle actif si demandé ou s'il n'y a pas de modèle actif
+    current_active = registry.get_active_model_info()
+    activated = False
+    if options.activate or not current_active:
+        registry.set_active_model(version)
+        activated = True
+
+        # Forcer le rechargement du détecteur avec le nouveau modèle
+        import backend.models.trained_detector
+        backend.models.trained_detector._detector = None
+        logger.info(f"Modèle version {version} défini comme actif")
+
+    logger.info(f"Modèle entraîné et sauvegardé avec succès, version: {version}")
+    logger.info("Récapitulatif de l'entraînement:")
+    logger.info(f"- Version: {version}")
+    logger.info(f"- Échantillons d'entraînement: {training_samples}")
+    logger.info(f"- Temps d'entraînement: {training_time:.2f} secondes")
+
+    return {
+        "version": version,
+        "activated": activated,
+        "metrics": metrics
+    }
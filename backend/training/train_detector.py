@@ -2,9 +2,11 @@
 Module d'entraînement pour les détecteurs d'anomalies.
 Permet d'entraîner des modèles de machine learning pour détecter différents types d'anomalies.
 """
+import copy
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Tuple, Optional
+import joblib
+from typing import Dict, List, Any, Tuple, Optional, Callable
 from datetime import datetime, timedelta
 import logging
 from sklearn.ensemble import IsolationForest
@@ -21,23 +23,32 @@ class AnomalyDetectorTrainer:
         self.scalers = {}
         self.feature_names = {}
     
-    def train(self, entries: List[Dict[str, Any]]) -> None:
+    def train(self,
+              entries: List[Dict[str, Any]],
+              features: Optional[Dict[str, pd.DataFrame]] = None,
+              on_model_start: Optional[Callable[[str, int, int], None]] = None) -> None:
         """
         Entraîne les modèles de détection d'anomalies
         
         Args:
             entries: Liste des écritures comptables pour l'entraînement
+            features: Caractéristiques déjà extraites (évite une seconde extraction)
+            on_model_start: Fonction appelée avant l'entraînement de chaque modèle
+                avec (nom du modèle, index, nombre de modèles)
         """
-        if not entries:
+        if not entries and features is None:
             raise ValueError("Aucune donnée fournie pour l'entraînement")
         
-        logger.info(f"Début de l'entraînement sur {len(entries)} écritures")
-        
         # Extraction des caractéristiques
-        features = self._extract_features(entries)
+        if features is None:
+            logger.info(f"Début de l'entraînement sur {len(entries)} écritures")
+            features = self._extract_features(entries)
         
         # Pour chaque type de caractéristiques, entraîner un modèle spécifique
-        for name, X in features.items():
+        for index, (name, X) in enumerate(features.items()):
+            if on_model_start:
+                on_model_start(name, index, len(features))
+            
             # Normalisation des données
             scaler = StandardScaler()
             X_scaled = scaler.fit_transform(X)
@@ -62,6 +73,141 @@ class AnomalyDetectorTrainer:
             
         logger.info(f"Entraînement terminé: {len(self.models)} modèles entraînés")
     
+    def load_models(self, model_files: Dict[str, str]) -> None:
+        """
+        Charge les modèles et scalers d'une version existante
+        
+        Args:
+            model_files: Chemins des fichiers, au format du registre
+                ({nom}_model et {nom}_scaler)
+        """
+        for key, path in model_files.items():
+            if key.endswith('_model'):
+                name = key[:-len('_model')]
+                self.models[name] = joblib.load(path)
+                self.scalers[name] = joblib.load(model_files[f"{name}_scaler"])
+                self.feature_names[name] = list(getattr(self.models[name], 'feature_names_in_', []))
+        
+        logger.info(f"{len(self.models)} modèles chargés pour un entraînement incrémental")
+    
+    def grow(self,
+             features: Dict[str, pd.DataFrame],
+             extra_estimators: int = 50,
+             on_model_start: Optional[Callable[[str, int, int], None]] = None) -> None:
+        """
+        Enrichit les forêts existantes avec des arbres entraînés sur de nouvelles données
+        
+        Les arbres existants sont conservés (warm_start) et les scalers restent
+        figés pour que les nouveaux arbres partagent l'espace des anciens.
+        
+        Args:
+            features: Caractéristiques des nouvelles données
+            extra_estimators: Nombre d'arbres à ajouter à chaque forêt
+            on_model_start: Fonction appelée avant l'enrichissement de chaque modèle
+                avec (nom du modèle, index, nombre de modèles)
+        """
+        if not self.models:
+            raise ValueError("Aucun modèle chargé à enrichir")
+        
+        for index, (name, X) in enumerate(features.items()):
+            if on_model_start:
+                on_model_start(name, index, len(features))
+            
+            if name not in self.models:
+                raise ValueError(f"Modèle '{name}' absent de la version de base")
+            
+            # Copie pour ne pas modifier le modèle de base éventuellement en mémoire
+            model = copy.deepcopy(self.models[name])
+            model.set_params(
+                warm_start=True,
+                n_estimators=model.n_estimators + extra_estimators
+            )
+            
+            X_scaled = self.scalers[name].transform(X)
+            logger.info(f"Ajout de {extra_estimators} arbres au modèle '{name}' sur {len(X)} échantillons")
+            model.fit(X_scaled)
+            
+            self.models[name] = model
+            self.feature_names[name] = list(X.columns) if hasattr(X, 'columns') else []
+        
+        logger.info(f"Enrichissement terminé: {len(features)} modèles mis à jour")
+    
+    def _extract_column_features(self, columns: Dict[str, np.ndarray]) -> Dict[str, pd.DataFrame]:
+        """
+        Version vectorisée de _extract_features pour des écritures au format colonnaire.
+        Produit les mêmes caractéristiques sans matérialiser une liste de dictionnaires.
+        
+        Args:
+            columns: Colonnes des écritures (format de generation_engine / columnar)
+        
+        Returns:
+            Dictionnaire de matrices de caractéristiques
+        """
+        row_count = len(next(iter(columns.values()))) if columns else 0
+        
+        def numeric(name: str) -> np.ndarray:
+            values = columns.get(name)
+            if values is None:
+                return np.zeros(row_count)
+            return pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        
+        # --- Caractéristiques liées aux montants ---
+        debit = numeric('debit_montant')
+        credit = numeric('credit_montant')
+        amount = np.maximum(debit, credit)
+        
+        amount_df = pd.DataFrame({
+            'amount': amount,
+            'amount_log': np.where(amount > 0, np.log1p(np.maximum(amount, 0)), 0.0),
+            'amount_round': np.mod(amount, 1),
+            'amount_mod10': np.mod(amount, 10),
+            'amount_mod100': np.mod(amount, 100),
+        })
+        
+        # --- Caractéristiques liées aux dates ---
+        # Formats ISO (avec heure) et %Y%m%d ; date courante si non interprétable
+        raw_dates = pd.Series(columns.get('ecr_date', np.full(row_count, '20240101', dtype=object)), dtype=object)
+        is_iso = raw_dates.str.contains('T', regex=False, na=False)
+        dates = pd.Series(pd.NaT, index=raw_dates.index, dtype="datetime64[ns]")
+        if is_iso.any():
+            dates[is_iso] = pd.to_datetime(raw_dates[is_iso], format="ISO8601", errors="coerce")
+        if (~is_iso).any():
+            dates[~is_iso] = pd.to_datetime(raw_dates[~is_iso], format="%Y%m%d", errors="coerce")
+        dates = dates.fillna(pd.Timestamp(datetime.now()))
+        
+        weekday = dates.dt.weekday.to_numpy()
+        hour = dates.dt.hour.to_numpy()
+        date_df = pd.DataFrame({
+            'weekday': weekday,
+            'day': dates.dt.day.to_numpy(),
+            'month': dates.dt.month.to_numpy(),
+            'hour': hour,
+            'minute': dates.dt.minute.to_numpy(),
+            'is_weekend': (weekday >= 5).astype(np.int64),
+            'is_business_hours': ((hour >= 8) & (hour <= 18)).astype(np.int64),
+        }).astype(np.float64)
+        
+        # --- Caractéristiques liées au solde ---
+        accounts = pd.Series(columns.get('compte_num', np.full(row_count, '', dtype=object)), dtype=object)
+        first_char = accounts.fillna('').astype(str).str[:1]
+        account_class = pd.to_numeric(first_char.where(first_char.str.isdigit(), '0')).to_numpy()
+        
+        balance_df = pd.DataFrame({
+            'balance_diff': debit - credit,
+            'total_amount': debit + credit,
+            'account_class': account_class,
+            'is_asset': np.isin(account_class, [1, 2, 3]),
+            'is_liability': np.isin(account_class, [4, 5]),
+            'is_expense': account_class == 6,
+            'is_revenue': account_class == 7,
+        }).astype(np.float64)
+        
+        return {
+            'amount': amount_df,
+            'date_patterns': date_df,
+            'balance': balance_df
+        }
+    
     def _extract_features(self, entries: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
         """
         Extrait les caractéristiques pertinentes des écritures comptables.
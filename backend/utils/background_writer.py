@@ -0,0 +1,120 @@
+"""
+Écriture de lots colonnaires au format CSV depuis un thread dédié.
+
+Le producteur (génération, détection) dépose les lots dans une file bornée et
+continue son travail pendant que le thread d'écriture sérialise les lots
+précédents. La taille de la file limite la mémoire retenue lorsque le disque
+est plus lent que le producteur.
+"""
+import queue
+import logging
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Marqueur de fin de flux
+_STOP = object()
+
+
+class BackgroundCSVWriter:
+    """Écrit des lots colonnaires dans un fichier CSV depuis un thread d'arrière-plan"""
+
+    def __init__(self, file: TextIO, sep: str = '|', max_pending: int = 2):
+        """
+        Démarre le thread d'écriture
+
+        Args:
+            file: Fichier texte ouvert en écriture (l'appelant le ferme)
+            sep: Séparateur de champs
+            max_pending: Nombre maximal de lots en attente d'écriture
+        """
+        self.file = file
+        self.sep = sep
+        self.rows_written = 0
+        self.write_time = 0.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending))
+        self._error: Optional[BaseException] = None
+        self._aborted = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Ajoute un lot à écrire (bloque si la file est pleine)
+
+        Args:
+            columns: Colonnes du lot, toutes de même longueur
+
+        Raises:
+            Exception: Erreur survenue lors de l'écriture d'un lot précédent
+        """
+        self._raise_error()
+        if self._closed:
+            raise RuntimeError("Écrivain CSV déjà fermé")
+        self._queue.put(columns)
+
+    def close(self) -> None:
+        """
+        Attend l'écriture des lots en attente et arrête le thread
+
+        Raises:
+            Exception: Erreur survenue lors de l'écriture
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def abort(self) -> None:
+        """Arrête le thread sans écrire les lots en attente"""
+        if self._closed:
+            return
+        self._aborted = True
+        self._closed = True
+        # Libérer la file pour que le marqueur de fin puisse y être déposé
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "BackgroundCSVWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _raise_error(self) -> None:
+        """Propage dans le thread appelant une erreur du thread d'écriture"""
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        """Boucle du thread d'écriture"""
+        while True:
+            columns = self._queue.get()
+            if columns is _STOP:
+                break
+            if self._error is not None or self._aborted:
+                # Vider la file sans écrire pour ne pas bloquer le producteur
+                continue
+            try:
+                start = time.perf_counter()
+                pd.DataFrame(columns).to_csv(self.file, sep=self.sep, index=False, header=(self.rows_written == 0))
+                self.write_time += time.perf_counter() - start
+                self.rows_written += len(next(iter(columns.values()), []))
+            except BaseException as e:
+                logger.error(f"Erreur lors de l'écriture CSV en arrière-plan: {str(e)}")
+                self._error = e
@@ -0,0 +1,457 @@
+"""
+Stockage des données sous forme d'objets (blobs) identifiés par une clé.
+
+Les clés sont des chemins relatifs au répertoire de données, par exemple
+uploads/3/f/{file_id}_meta.json. Deux implémentations sont disponibles :
+
+- LocalBlobStorage : fichiers sous DATA_DIR (comportement historique) ;
+- S3BlobStorage : bucket compatible S3 (AWS, MinIO, moto_server...), partagé
+  par plusieurs instances de l'API. Les gros fichiers sont envoyés en
+  multipart et téléchargés par intervalles en parallèle.
+
+Les traitements qui ont besoin d'un fichier local (parseurs, fichiers
+colonnaires) passent par fetch(), qui renvoie le fichier du répertoire de
+données en le téléchargeant si la copie locale est absente ou périmée.
+"""
+import os
+import shutil
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional
+
+from backend.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Taille des morceaux lus en flux
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Taille minimale des parties d'un envoi multipart S3 (hors dernière partie)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class BlobInfo(NamedTuple):
+    """Description d'un objet stocké"""
+    key: str
+    size: int
+    mtime: float
+
+
+class BlobStorage(ABC):
+    """Interface commune des stockages d'objets"""
+
+    def __init__(self, local_root: str):
+        """
+        Args:
+            local_root: Répertoire local correspondant à la racine des clés
+        """
+        self.local_root = local_root
+
+    def local_path(self, key: str) -> str:
+        """Chemin local d'un objet (fichier stocké ou copie locale)"""
+        return os.path.join(self.local_root, *key.split("/"))
+
+    def key_for(self, path: str) -> str:
+        """
+        Clé d'un fichier du répertoire local
+
+        Raises:
+            ValueError: Si le chemin est hors du répertoire local
+        """
+        relative = os.path.relpath(path, self.local_root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            raise ValueError(f"Chemin hors du stockage: {path}")
+        return relative.replace(os.sep, "/")
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> int:
+        """Enregistre un objet et retourne sa taille"""
+
+    @abstractmethod
+    def put_file(self, key: str, path: str) -> int:
+        """Enregistre le contenu d'un fichier local et retourne sa taille"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """
+        Lit un objet complet
+
+        Raises:
+            FileNotFoundError: Si l'objet n'existe pas
+        """
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        """Lit length octets d'un objet à partir de start"""
+
+    @abstractmethod
+    def stream(self,
+               key: str,
+               start: int = 0,
+               length: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """Lit un objet (ou un intervalle d'octets) par morceaux"""
+
+    @abstractmethod
+    def download(self, key: str, path: str) -> int:
+        """Copie un objet dans un fichier local et retourne sa taille"""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        """Description d'un objet, ou None s'il n'existe pas"""
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> Iterator[BlobInfo]:
+        """Objets dont la clé commence par prefix"""
+
+    @abstractmethod
+    def delete(self, key: str) -> int:
+        """Supprime un objet s'il existe et retourne le nombre d'octets libérés"""
+
+    def exists(self, key: str) -> bool:
+        """Indique si un objet existe"""
+        return self.stat(key) is not None
+
+    def fetch(self, key: str) -> str:
+        """
+        Chemin d'un fichier local au contenu de l'objet
+
+        La copie locale est réutilisée tant qu'elle a la taille de l'objet et
+        n'est pas plus ancienne que lui.
+
+        Raises:
+            FileNotFoundError: Si l'objet n'existe pas
+        """
+        info = self.stat(key)
+        if info is None:
+            raise FileNotFoundError(key)
+        path = self.local_path(key)
+        try:
+            stat = os.stat(path)
+            if stat.st_size == info.size and stat.st_mtime >= info.mtime:
+                return path
+        except FileNotFoundError:
+            pass
+        self.download(key, path)
+        return path
+
+
+class LocalBlobStorage(BlobStorage):
+    """Objets stockés en fichiers sous un répertoire local"""
+
+    def put(self, key: str, data: bytes) -> int:
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def put_file(self, key: str, path: str) -> int:
+        target = self.local_path(key)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return os.path.getsize(target)
+
+    def get(self, key: str) -> bytes:
+        with open(self.local_path(key), "rb") as f:
+            return f.read()
+
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        with open(self.local_path(key), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    def stream(self,
+               key: str,
+               start: int = 0,
+               length: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.local_path(key), "rb") as f:
+            if start:
+                f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def download(self, key: str, path: str) -> int:
+        source = self.local_path(key)
+        if os.path.abspath(path) != os.path.abspath(source):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(source, path)
+        return os.path.getsize(path)
+
+    def fetch(self, key: str) -> str:
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(key)
+        return path
+
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        try:
+            stat = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return BlobInfo(key, stat.st_size, stat.st_mtime)
+
+    def list(self, prefix: str = "") -> Iterator[BlobInfo]:
+        directory = prefix.rpartition("/")[0]
+        stack = [self.local_path(directory) if directory else self.local_root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        key = self.key_for(entry.path)
+                        if key.startswith(prefix):
+                            stat = entry.stat()
+                            yield BlobInfo(key, stat.st_size, stat.st_mtime)
+            except FileNotFoundError:
+                continue
+
+    def delete(self, key: str) -> int:
+        path = self.local_path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+
+class S3BlobStorage(BlobStorage):
+    """Objets stockés dans un bucket compatible S3, avec copie locale sous local_root"""
+
+    def __init__(self,
+                 bucket: str,
+                 prefix: str = "",
+                 local_root: Optional[str] = None,
+                 endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None,
+                 access_key_id: Optional[str] = None,
+                 secret_access_key: Optional[str] = None,
+                 part_size: Optional[int] = None,
+                 max_concurrency: Optional[int] = None):
+        """
+        Args:
+            bucket: Nom du bucket
+            prefix: Préfixe ajouté aux clés dans le bucket
+            local_root: Répertoire des copies locales (par défaut DATA_DIR)
+            endpoint_url: URL d'un serveur compatible S3 (AWS par défaut)
+            region: Région du bucket
+            access_key_id: Identifiant d'accès (par défaut la configuration boto3)
+            secret_access_key: Clé secrète
+            part_size: Taille des parties des envois multipart et des téléchargements parallèles
+            max_concurrency: Nombre de parties transférées simultanément
+        """
+        super().__init__(local_root or settings.DATA_DIR)
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("Le stockage S3 nécessite le paquet boto3 (pip install boto3)") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.part_size = max(part_size or settings.S3_PART_SIZE, S3_MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency or settings.S3_MAX_CONCURRENCY
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(max_pool_connections=self.max_concurrency, retries={"max_attempts": 5, "mode": "standard"})
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _get_object(self, key: str, **kwargs):
+        """get_object, objets absents signalés par FileNotFoundError"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key), **kwargs)
+        except self.client.exceptions.NoSuchKey as e:
+            raise FileNotFoundError(key) from e
+
+    def _touch(self, path: str, key: str) -> None:
+        """Aligne la date de la copie locale sur celle de l'objet (copie à jour)"""
+        info = self.stat(key)
+        if info is not None and os.path.exists(path):
+            os.utime(path, (info.mtime, info.mtime))
+
+    def put(self, key: str, data: bytes) -> int:
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data)
+        return len(data)
+
+    def put_file(self, key: str, path: str) -> int:
+        size = os.path.getsize(path)
+        if size <= self.part_size:
+            with open(path, "rb") as f:
+                self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=f)
+        else:
+            self._put_multipart(key, path, size)
+        if os.path.abspath(path) == os.path.abspath(self.local_path(key)):
+            self._touch(path, key)
+        return size
+
+    def _put_multipart(self, key: str, path: str, size: int) -> None:
+        """Envoi multipart, les parties étant envoyées en parallèle"""
+        object_key = self._object_key(key)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key)["UploadId"]
+        offsets = range(0, size, self.part_size)
+        fd = os.open(path, os.O_RDONLY)
+
+        def upload_part(index: int) -> dict:
+            body = os.pread(fd, self.part_size, offsets[index])
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=index + 1, Body=body
+            )
+            return {"PartNumber": index + 1, "ETag": response["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                parts = list(executor.map(upload_part, range(len(offsets))))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+        finally:
+            os.close(fd)
+        logger.info(f"Objet {key} envoyé en {len(offsets)} parties ({size} octets)")
+
+    def get(self, key: str) -> bytes:
+        return self._get_object(key)["Body"].read()
+
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        return self._get_object(key, Range=f"bytes={start}-{start + length - 1}")["Body"].read()
+
+    def stream(self,
+               key: str,
+               start: int = 0,
+               length: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        kwargs = {}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            kwargs["Range"] = f"bytes={start}-{end}"
+        body = self._get_object(key, **kwargs)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def download(self, key: str, path: str) -> int:
+        info = self.stat(key)
+        if info is None:
+            raise FileNotFoundError(key)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if info.size <= self.part_size:
+                with open(tmp_path, "wb") as f:
+                    for chunk in self.stream(key):
+                        f.write(chunk)
+            else:
+                self._download_ranges(key, tmp_path, info.size)
+            os.utime(tmp_path, (info.mtime, info.mtime))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return info.size
+
+    def _download_ranges(self, key: str, path: str, size: int) -> None:
+        """Téléchargement par intervalles en parallèle, écrits à leur position dans le fichier"""
+        with open(path, "wb") as f:
+            f.truncate(size)
+        fd = os.open(path, os.O_WRONLY)
+
+        def download_range(offset: int) -> None:
+            position = offset
+            for chunk in self.stream(key, offset, min(self.part_size, size - offset)):
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                list(executor.map(download_range, range(0, size, self.part_size)))
+        finally:
+            os.close(fd)
+
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return BlobInfo(key, response["ContentLength"], response["LastModified"].timestamp())
+
+    def list(self, prefix: str = "") -> Iterator[BlobInfo]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield BlobInfo(item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp())
+
+    def delete(self, key: str) -> int:
+        info = self.stat(key)
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        # Copie locale éventuelle
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+        return info.size if info else 0
+
+
+def delete_blobs(blobs: BlobStorage, keys: List[Optional[str]]) -> int:
+    """Supprime des objets s'ils existent et retourne le nombre d'octets libérés"""
+    return sum(blobs.delete(key) for key in keys if key)
+
+
+@lru_cache()
+def get_blob_storage() -> BlobStorage:
+    """
+    Récupère le stockage d'objets configuré (STORAGE_BACKEND)
+
+    Returns:
+        Instance du stockage d'objets
+    """
+    if settings.STORAGE_BACKEND == "s3":
+        logger.info(f"Stockage S3: bucket {settings.S3_BUCKET}, préfixe '{settings.S3_PREFIX}'")
+        return S3BlobStorage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY
+        )
+    if settings.STORAGE_BACKEND != "local":
+        raise ValueError(f"STORAGE_BACKEND inconnu: {settings.STORAGE_BACKEND}")
+    return LocalBlobStorage(settings.DATA_DIR)
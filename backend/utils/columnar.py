@@ -0,0 +1,183 @@
+"""
+Stockage colonnaire binaire des données tabulaires (écritures, caractéristiques).
+
+Chaque fichier est une archive NumPy (.npz) contenant une colonne par tableau.
+Les colonnes de texte sont encodées par dictionnaire (codes entiers + valeurs
+distinctes), ce qui réduit fortement la taille des colonnes répétitives
+(journaux, comptes, libellés). Les métadonnées sont stockées en JSON dans
+l'archive elle-même.
+"""
+import os
+import json
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_EXTENSION = ".npz"
+
+# Clés réservées dans l'archive
+_META_KEY = "__meta__"
+_CODES_SUFFIX = "__codes"
+_VALUES_SUFFIX = "__values"
+
+
+def _encode_strings(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode une colonne de texte en (codes, valeurs distinctes)"""
+    # Factorisation par table de hachage: évite le tri et la conversion en
+    # chaînes de largeur fixe de toute la colonne
+    codes, uniques = pd.factorize(values.astype(object) if values.dtype.kind != "O" else values)
+    code_dtype = np.int32 if len(uniques) < 2 ** 31 else np.int64
+    return codes.astype(code_dtype), np.asarray(uniques, dtype=str)
+
+
+def save_columns(path: str, columns: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Enregistre un ensemble de colonnes dans un fichier colonnaire
+
+    L'écriture est atomique : le fichier final n'apparaît qu'une fois complet.
+
+    Args:
+        path: Chemin du fichier (.npz)
+        columns: Colonnes à enregistrer (nom -> tableau ou liste)
+        metadata: Métadonnées JSON-sérialisables associées
+
+    Returns:
+        Taille du fichier écrit en octets
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    string_columns = []
+    row_count = None
+
+    for name, values in columns.items():
+        array = np.asarray(values)
+        if row_count is None:
+            row_count = len(array)
+        elif len(array) != row_count:
+            raise ValueError(f"La colonne '{name}' contient {len(array)} lignes au lieu de {row_count}")
+
+        if array.dtype.kind in ("U", "S", "O"):
+            codes, uniques = _encode_strings(array)
+            arrays[f"{name}{_CODES_SUFFIX}"] = codes
+            arrays[f"{name}{_VALUES_SUFFIX}"] = uniques
+            string_columns.append(name)
+        else:
+            arrays[name] = array
+
+    meta = {
+        "columns": list(columns.keys()),
+        "string_columns": string_columns,
+        "row_count": row_count or 0,
+        "metadata": metadata or {},
+    }
+    arrays[_META_KEY] = np.array(json.dumps(meta, ensure_ascii=False, default=str))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+    return os.path.getsize(path)
+
+
+def _read_meta(archive: Any) -> Dict[str, Any]:
+    """Lit le bloc de métadonnées d'une archive ouverte"""
+    return json.loads(str(archive[_META_KEY]))
+
+
+def read_metadata(path: str) -> Dict[str, Any]:
+    """
+    Lit les métadonnées d'un fichier colonnaire sans charger les colonnes
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        Dictionnaire avec les clés columns, string_columns, row_count et metadata
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        return _read_meta(archive)
+
+
+def load_columns(path: str, names: Optional[Iterable[str]] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Charge tout ou partie des colonnes d'un fichier colonnaire
+
+    Args:
+        path: Chemin du fichier
+        names: Colonnes à charger (toutes si None)
+
+    Returns:
+        Tuple (colonnes, métadonnées utilisateur)
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        meta = _read_meta(archive)
+        wanted = list(names) if names is not None else meta["columns"]
+        string_columns = set(meta["string_columns"])
+
+        columns: Dict[str, np.ndarray] = {}
+        for name in wanted:
+            if name in string_columns:
+                codes = archive[f"{name}{_CODES_SUFFIX}"]
+                uniques = archive[f"{name}{_VALUES_SUFFIX}"]
+                columns[name] = uniques[codes]
+            elif name in meta["columns"]:
+                columns[name] = archive[name]
+            else:
+                raise KeyError(f"Colonne '{name}' absente de {path}")
+
+    return columns, meta["metadata"]
+
+
+def row_count(columns: Dict[str, np.ndarray]) -> int:
+    """Nombre de lignes d'un ensemble de colonnes"""
+    for values in columns.values():
+        return len(values)
+    return 0
+
+
+def entries_to_columns(entries: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Convertit une liste d'écritures (dictionnaires) en colonnes
+
+    Les champs entièrement numériques deviennent des colonnes float64, les
+    autres des colonnes de texte (les valeurs absentes deviennent "").
+
+    Args:
+        entries: Liste des écritures
+        fields: Champs à convertir (par défaut, ceux de la première écriture)
+
+    Returns:
+        Colonnes indexées par nom de champ
+    """
+    if fields is None:
+        fields = list(entries[0].keys()) if entries else []
+
+    columns: Dict[str, np.ndarray] = {}
+    for field in fields:
+        values = [entry.get(field) for entry in entries]
+        if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            columns[field] = np.asarray(values, dtype=np.float64)
+        else:
+            # None et NaN (cellules vides lues par pandas) sont des valeurs absentes
+            columns[field] = np.asarray(["" if v is None or v != v else str(v) for v in values], dtype=str)
+    return columns
+
+
+def columns_to_entries(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Convertit des colonnes en liste d'écritures (dictionnaires)
+
+    Args:
+        columns: Colonnes indexées par nom de champ
+
+    Returns:
+        Liste des écritures
+    """
+    names = list(columns.keys())
+    lists = [np.asarray(columns[name]).tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*lists)]
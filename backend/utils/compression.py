@@ -0,0 +1,110 @@
+"""
+Lecture des fichiers FEC compressés (gzip, zstandard, zip).
+
+Les fichiers compressés sont conservés tels quels dans le stockage ; ils sont
+décompressés à la volée lors de la lecture, sans copie décompressée sur disque.
+Le format est déterminé par l'extension (export.txt.gz, export.zst, export.zip)
+et contrôlé par la signature du fichier.
+
+La prise en charge de zstandard est optionnelle (paquet zstandard).
+"""
+import io
+import gzip
+import zipfile
+import logging
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Extensions des formats compressés -> signature du fichier
+COMPRESSION_SIGNATURES = {
+    "gz": b"\x1f\x8b",
+    "zst": b"\x28\xb5\x2f\xfd",
+    "zip": b"PK\x03\x04",
+}
+COMPRESSED_EXTENSIONS = set(COMPRESSION_SIGNATURES)
+
+# Extensions acceptées pour le fichier contenu dans une archive
+COMPRESSIBLE_EXTENSIONS = {"csv", "txt"}
+
+# Taille du tampon de lecture des données décompressées
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def compression_of(filename: str) -> Optional[str]:
+    """Format de compression d'un fichier d'après son extension (None si non compressé)"""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if extension in COMPRESSED_EXTENSIONS else None
+
+
+def strip_compression(filename: str) -> str:
+    """Nom du fichier sans l'extension de compression (export.txt.gz -> export.txt)"""
+    return filename.rsplit(".", 1)[0] if compression_of(filename) else filename
+
+
+def is_compression_available(compression: str) -> bool:
+    """Indique si un format de compression peut être lu dans cet environnement"""
+    if compression != "zst":
+        return compression in COMPRESSED_EXTENSIONS
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def has_signature(compression: str, head: bytes) -> bool:
+    """Vérifie que le début d'un fichier correspond au format de compression annoncé"""
+    return head.startswith(COMPRESSION_SIGNATURES[compression])
+
+
+def _zip_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    """Fichier FEC contenu dans une archive zip (le premier fichier texte)"""
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    for info in members:
+        if info.filename.rsplit(".", 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS:
+            return info
+    if len(members) == 1:
+        return members[0]
+    raise ValueError("Archive zip sans fichier FEC (.csv ou .txt)")
+
+
+@contextmanager
+def open_stream(path: str) -> Iterator[BinaryIO]:
+    """
+    Ouvre un fichier en lecture binaire, décompressé à la volée s'il est compressé
+
+    Args:
+        path: Chemin du fichier
+
+    Yields:
+        Flux binaire des données décompressées
+    """
+    compression = compression_of(path)
+    if compression is None:
+        with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+            yield f
+    elif compression == "gz":
+        with gzip.open(path, "rb") as raw:
+            yield io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE)
+    elif compression == "zip":
+        with zipfile.ZipFile(path) as archive:
+            member = _zip_member(archive)
+            logger.debug(f"Lecture de {member.filename} dans l'archive {path}")
+            with archive.open(member) as raw:
+                yield io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE)
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Le paquet zstandard est requis pour lire les fichiers .zst")
+        with open(path, "rb") as f:
+            with zstandard.ZstdDecompressor().stream_reader(f, read_size=READ_BUFFER_SIZE) as raw:
+                yield io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE)
+
+
+def read_sample(path: str, size: int = 1024) -> bytes:
+    """Premiers octets (décompressés) d'un fichier, pour détecter l'encodage et le délimiteur"""
+    with open_stream(path) as f:
+        return f.read(size)
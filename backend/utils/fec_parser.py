@@ -4,6 +4,8 @@ import logging
 from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 
+from backend.utils.compression import open_stream, read_sample
+
 logger = logging.getLogger(__name__)
 
 class FECParser:
@@ -16,9 +18,10 @@ class FECParser:
         Initialise le parser FEC
         
         Args:
-            file_path: Chemin du fichier FEC à parser
+            file_path: Chemin du fichier FEC à parser (éventuellement compressé: .gz, .zst, .zip)
         """
         self.file_path = file_path
+        self._sample = read_sample(file_path, 4096)
         self.encoding = self._detect_encoding()
         self.delimiter = self._detect_delimiter()
         
@@ -33,8 +36,7 @@ class FECParser:
         
         for enc in encodings:
             try:
-                with codecs.open(self.file_path, 'r', encoding=enc) as f:
-                    f.read(1024)
+                codecs.getincrementaldecoder(enc)().decode(self._sample)
                 logger.info(f"Encodage détecté: {enc}")
                 return enc
             except UnicodeDecodeError:
@@ -50,9 +52,8 @@ class FECParser:
         Returns:
             Le délimiteur détecté
         """
-        with codecs.open(self.file_path, 'r', encoding=self.encoding) as f:
-            sample = f.read(1024)
-            
+        sample = codecs.getincrementaldecoder(self.encoding)().decode(self._sample)[:1024]
+        
         # Vérifier les délimiteurs courants
         delimiters = [';', ',', '\t', '|']
         counts = {delim: sample.count(delim) for delim in delimiters}
@@ -86,42 +87,44 @@ class FECParser:
         
         # Utiliser pandas pour lire efficacement les fichiers volumineux
         try:
-            chunks = pd.read_csv(
-                self.file_path,
-                sep=self.delimiter,
-                encoding=self.encoding,
-                chunksize=chunksize,
-                low_memory=False,
-                dtype=str,  # Tout lire comme des chaînes pour éviter les inférences de type
-                na_filter=False  # Pas de conversion des valeurs manquantes
-            )
-            
-            result = []
-            total_rows = 0
-            
-            for chunk in chunks:
-                # Nettoyer les noms de colonnes
-                chunk.columns = [col.strip() for col in chunk.columns]
-                
-                # Convertir certaines colonnes si nécessaire
-                numeric_columns = ['Debit', 'Credit', 'Montantdevise']
-                for col in numeric_columns:
-                    if col in chunk.columns:
-                        # Remplacer les virgules par des points pour les valeurs décimales
-                        chunk[col] = chunk[col].str.replace(',', '.', regex=False)
-                        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
-                
-                # Convertir les données en dictionnaires
-                chunk_dict = chunk.to_dict('records')
-                result.extend(chunk_dict)
+            # Les fichiers compressés sont décompressés à la volée, sans copie sur disque
+            with open_stream(self.file_path) as stream:
+                chunks = pd.read_csv(
+                    stream,
+                    sep=self.delimiter,
+                    encoding=self.encoding,
+                    chunksize=chunksize,
+                    low_memory=False,
+                    dtype=str,  # Tout lire comme des chaînes pour éviter les inférences de type
+                    na_filter=False  # Pas de conversion des valeurs manquantes
+                )
                 
-                total_rows += len(chunk_dict)
-                logger.info(f"Chargé {len(chunk_dict)} lignes, total: {total_rows}")
+                result = []
+                total_rows = 0
                 
-                # Pour les fichiers énormes, limiter le nombre de lignes traitées
-                if total_rows >= 1000000:
-                    logger.warning("Limite de 1 million de lignes atteinte, traitement partiel")
-                    break
+                for chunk in chunks:
+                    # Nettoyer les noms de colonnes
+                    chunk.columns = [col.strip() for col in chunk.columns]
+                    
+                    # Convertir certaines colonnes si nécessaire
+                    numeric_columns = ['Debit', 'Credit', 'Montantdevise']
+                    for col in numeric_columns:
+                        if col in chunk.columns:
+                            # Remplacer les virgules par des points pour les valeurs décimales
+                            chunk[col] = chunk[col].str.replace(',', '.', regex=False)
+                            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
+                    
+                    # Convertir les données en dictionnaires
+                    chunk_dict = chunk.to_dict('records')
+                    result.extend(chunk_dict)
+                    
+                    total_rows += len(chunk_dict)
+                    logger.info(f"Chargé {len(chunk_dict)} lignes, total: {total_rows}")
+                    
+                    # Pour les fichiers énormes, limiter le nombre de lignes traitées
+                    if total_rows >= 1000000:
+                        logger.warning("Limite de 1 million de lignes atteinte, traitement partiel")
+                        break
             
             logger.info(f"Parsing terminé: {total_rows} lignes chargées")
             return result
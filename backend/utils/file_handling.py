@@ -1,7 +1,9 @@
 import os
+import re
 import shutil
 import logging
 import csv
+import codecs
 import aiofiles
 import asyncio
 import tempfile
@@ -10,11 +12,21 @@ from fastapi import UploadFile
 import pandas as pd
 import io
 
+from backend.utils.blob_storage import get_blob_storage
+from backend.utils.compression import (
+    COMPRESSED_EXTENSIONS, COMPRESSIBLE_EXTENSIONS, compression_of, strip_compression,
+    is_compression_available, has_signature, open_stream, read_sample
+)
+from backend.utils.storage import ShardedStore
+
 logger = logging.getLogger(__name__)
 
 # Taille de bloc pour la lecture des fichiers volumineux (16 Mo)
 CHUNK_SIZE = 16 * 1024 * 1024
 
+# Taille des morceaux envoyés lors d'un téléchargement (256 Ko par connexion)
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
 # Liste des en-têtes attendus pour un fichier FEC
 FEC_EXPECTED_HEADERS = [
     "JournalCode", "JournalLib", "EcritureNum", "EcritureDate", 
@@ -24,12 +36,33 @@ FEC_EXPECTED_HEADERS = [
     "Idevise"
 ]
 
-ALLOWED_EXTENSIONS = {'csv', 'txt', 'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'csv', 'txt', 'xlsx', 'xls'} | COMPRESSED_EXTENSIONS
+
+# Nom réglementaire d'un FEC: SIREN (9 chiffres) + "FEC" + date de clôture (AAAAMMJJ)
+FEC_FILENAME_PATTERN = re.compile(r"^(\d{9})FEC(\d{8})", re.IGNORECASE)
+
+def fec_company_id(filename: str) -> Optional[str]:
+    """SIREN de la société d'après le nom réglementaire du fichier FEC (None si non conforme)"""
+    match = FEC_FILENAME_PATTERN.match(os.path.basename(strip_compression(filename)))
+    return match.group(1) if match else None
 
 def is_allowed_file(filename: str) -> bool:
-    """Vérifie si l'extension du fichier est autorisée"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    """
+    Vérifie si l'extension du fichier est autorisée
+
+    Les fichiers compressés (.gz, .zst) doivent contenir un fichier FEC texte
+    (export.txt.gz) ; le contenu d'une archive .zip est contrôlé à la lecture.
+    """
+    if '.' not in filename:
+        return False
+    compression = compression_of(filename)
+    if compression is None:
+        return filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    if not is_compression_available(compression):
+        return False
+    inner = strip_compression(filename)
+    return compression == 'zip' or '.' not in inner or \
+           inner.rsplit('.', 1)[1].lower() in COMPRESSIBLE_EXTENSIONS
 
 async def validate_file(file: UploadFile) -> Tuple[bool, Optional[str]]:
     """
@@ -48,6 +81,15 @@ async def validate_file(file: UploadFile) -> Tuple[bool, Optional[str]]:
     if not is_allowed_file(file.filename):
         return False, f"Format de fichier non supporté. Formats acceptés : {', '.join(ALLOWED_EXTENSIONS)}"
     
+    # Pour les fichiers compressés, on vérifie la signature du format
+    compression = compression_of(file.filename)
+    if compression:
+        content = await file.read(16)
+        await file.seek(0)
+        if not has_signature(compression, content):
+            return False, f"Fichier .{compression} invalide ou corrompu"
+        return True, None
+    
     # Pour les xlsx/xls, on vérifie si c'est un fichier Excel valide
     if file.filename.endswith(('.xlsx', '.xls')):
         try:
@@ -85,11 +127,9 @@ async def save_upload_file(upload_file: UploadFile, file_id: str, base_dir: str)
     Returns:
         Le chemin complet du fichier sauvegardé
     """
-    upload_dir = os.path.join(base_dir, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Créer un chemin pour le nouveau fichier
-    file_path = os.path.join(upload_dir, f"{file_id}_{upload_file.filename}")
+    # Créer un chemin pour le nouveau fichier, dans le sous-répertoire de son identifiant
+    uploads = ShardedStore(os.path.join(base_dir, "uploads"))
+    file_path = uploads.writable_path(file_id, f"{file_id}_{upload_file.filename}")
     
     # Lire et écrire le fichier de manière asynchrone
     try:
@@ -101,6 +141,10 @@ async def save_upload_file(upload_file: UploadFile, file_id: str, base_dir: str)
             # Lire le fichier par morceaux pour économiser la mémoire
             while content := await upload_file.read(1024 * 1024):  # Lire 1 MB à la fois
                 await out_file.write(content)
+        
+        # Enregistrer le fichier dans le stockage d'objets (sans effet en stockage local)
+        blobs = get_blob_storage()
+        await asyncio.to_thread(blobs.put_file, blobs.key_for(file_path), file_path)
                 
         logger.info(f"Fichier sauvegardé: {file_path}")
         return file_path
@@ -140,16 +184,15 @@ async def read_fec_file(file_path: str, batch_size: int = 10000) -> List[Dict[st
         encoding = None
         delimiter = None
         
-        # Essayer d'abord avec utf-8
+        # Essayer d'abord avec utf-8 (échantillon décompressé si le fichier est compressé)
+        raw_sample = read_sample(file_path)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                encoding = 'utf-8'
+            sample = codecs.getincrementaldecoder('utf-8')().decode(raw_sample)
+            encoding = 'utf-8'
         except UnicodeDecodeError:
             # Essayer avec ISO-8859-1
-            with open(file_path, 'r', encoding='ISO-8859-1') as f:
-                sample = f.read(1024)
-                encoding = 'ISO-8859-1'
+            sample = raw_sample.decode('ISO-8859-1')
+            encoding = 'ISO-8859-1'
         
         # Détecter le délimiteur
         try:
@@ -165,38 +208,40 @@ async def read_fec_file(file_path: str, batch_size: int = 10000) -> List[Dict[st
                 delimiter = ';'  # Par défaut pour les FEC
         
         # Utiliser pandas pour la lecture par lots (optimisé pour les fichiers volumineux)
-        # Créer un générateur de lots
-        chunks = pd.read_csv(
-            file_path, 
-            sep=delimiter, 
-            encoding=encoding, 
-            chunksize=batch_size,
-            low_memory=True,
-            dtype=str  # Pour éviter les inférences de type qui peuvent être lentes
-        )
-        
-        # Lire chaque lot et convertir en dictionnaires
-        total_rows = 0
-        for chunk in chunks:
-            # Convertir les noms de colonnes pour correspondre aux schémas
-            chunk.columns = [col.strip() for col in chunk.columns]
+        # Les fichiers compressés sont décompressés à la volée, sans copie sur disque
+        with open_stream(file_path) as stream:
+            # Créer un générateur de lots
+            chunks = pd.read_csv(
+                stream, 
+                sep=delimiter, 
+                encoding=encoding, 
+                chunksize=batch_size,
+                low_memory=True,
+                dtype=str  # Pour éviter les inférences de type qui peuvent être lentes
+            )
             
-            # Convertir les valeurs numériques
-            for col in ['Debit', 'Credit', 'Montantdevise']:
-                if col in chunk.columns:
-                    chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
-            
-            # Ajouter ce lot aux résultats
-            chunk_dicts = chunk.to_dict('records')
-            result.extend(chunk_dicts)
-            
-            total_rows += len(chunk_dicts)
-            logger.info(f"Lot chargé: {len(chunk_dicts)} lignes, total: {total_rows}")
-            
-            # Pour des fichiers extrêmement volumineux, on pourrait limiter le nombre total de lignes
-            if total_rows >= 1000000:  # Par exemple, limiter à 1 million de lignes
-                logger.warning(f"Limite de 1 million de lignes atteinte. Traitement partiel du fichier.")
-                break
+            # Lire chaque lot et convertir en dictionnaires
+            total_rows = 0
+            for chunk in chunks:
+                # Convertir les noms de colonnes pour correspondre aux schémas
+                chunk.columns = [col.strip() for col in chunk.columns]
+                
+                # Convertir les valeurs numériques
+                for col in ['Debit', 'Credit', 'Montantdevise']:
+                    if col in chunk.columns:
+                        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
+                
+                # Ajouter ce lot aux résultats
+                chunk_dicts = chunk.to_dict('records')
+                result.extend(chunk_dicts)
+                
+                total_rows += len(chunk_dicts)
+                logger.info(f"Lot chargé: {len(chunk_dicts)} lignes, total: {total_rows}")
+                
+                # Pour des fichiers extrêmement volumineux, on pourrait limiter le nombre total de lignes
+                if total_rows >= 1000000:  # Par exemple, limiter à 1 million de lignes
+                    logger.warning(f"Limite de 1 million de lignes atteinte. Traitement partiel du fichier.")
+                    break
         
         logger.info(f"Fichier FEC chargé: {total_rows} lignes au total")
         return result
@@ -288,11 +333,100 @@ async def create_temp_file() -> Tuple[str, BinaryIO]:
     return temp_path, temp_file
 
 
-async def stream_file(file_path: str):
+async def stream_file(file_path: str,
+                      start: int = 0,
+                      length: Optional[int] = None,
+                      chunk_size: int = CHUNK_SIZE):
     """
     Générateur asynchrone pour streamer un fichier par morceaux.
     Utile pour les téléchargements de fichiers volumineux.
+    
+    Args:
+        file_path: Chemin du fichier
+        start: Position du premier octet à envoyer
+        length: Nombre d'octets à envoyer (jusqu'à la fin du fichier si None)
+        chunk_size: Taille des morceaux lus
     """
     async with aiofiles.open(file_path, 'rb') as f:
-        while chunk := await f.read(CHUNK_SIZE):
-            yield chunk
\ No newline at end of file
+        if start:
+            await f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = await f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range_header(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interprète un en-tête HTTP Range portant sur un intervalle d'octets
+    
+    Les en-têtes absents, mal formés ou demandant plusieurs intervalles sont
+    ignorés (le fichier complet est alors envoyé).
+    
+    Args:
+        range_header: Valeur de l'en-tête Range, par exemple "bytes=0-1023" ou "bytes=-500"
+        file_size: Taille du fichier en octets
+    
+    Returns:
+        Tuple (premier octet, dernier octet inclus) ou None pour envoyer tout le fichier
+    
+    Raises:
+        ValueError: Si l'intervalle demandé n'est pas satisfaisable
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    
+    if start is None:
+        # Suffixe: les N derniers octets
+        if not end:
+            raise ValueError(f"Intervalle non satisfaisable: {range_header}")
+        start, end = max(0, file_size - end), file_size - 1
+    elif end is None:
+        end = file_size - 1
+    
+    if start >= file_size:
+        raise ValueError(f"Intervalle non satisfaisable: {range_header}")
+    if start > end:
+        return None
+    return start, min(end, file_size - 1)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indique si un en-tête If-None-Match désigne l'ETag donné (comparaison faible)
+    
+    Args:
+        if_none_match: Valeur de l'en-tête If-None-Match
+        etag: ETag courant, entre guillemets
+    
+    Returns:
+        True si le client possède déjà cette version
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
\ No newline at end of file
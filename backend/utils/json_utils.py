@@ -1,29 +1,49 @@
-"""Utilitaires pour manipuler des données JSON"""
+"""
+Utilitaires pour manipuler des données JSON
+
+La sérialisation utilise orjson lorsqu'il est installé (datetime, UUID,
+énumérations et tableaux NumPy sont alors gérés nativement) et se rabat sur
+le module json standard sinon. Les fichiers lus par l'application (tâches,
+métadonnées, résultats) sont écrits en JSON compact. Les gros résultats sont
+servis en flux (document JSON ou NDJSON) par morceaux de taille bornée.
+"""
 import json
-from datetime import datetime, date
+import os
+import threading
 import logging
-from typing import Any
+from datetime import datetime, date
 from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from uuid import UUID
 
+import numpy as np
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
-class CustomJSONEncoder(json.JSONEncoder):
-    """Encodeur JSON personnalisé pour gérer les types spéciaux"""
-    def default(self, obj: Any) -> Any:
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        try:
-            # Pour les objets Pydantic ou autres avec une méthode dict()
-            if hasattr(obj, 'dict'):
-                return obj.dict()
-            # Pour les autres objets qui peuvent être convertis en dict
-            return dict(obj)
-        except Exception:
-            # Retour à l'encodage par défaut
-            return super().default(obj)
-
-def json_serial(obj):
+HAS_ORJSON = orjson is not None
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+else:
+    _ORJSON_OPTIONS = 0
+
+# Formats de sortie des résultats en flux
+STREAM_FORMATS = ("json", "ndjson")
+STREAM_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+# Taille cible des morceaux envoyés au client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def json_serial(obj: Any) -> Any:
     """Convertisseur JSON pour les types non sérialisables par défaut"""
     if isinstance(obj, (datetime, date)):
         return obj.isoformat()
@@ -31,40 +51,211 @@ def json_serial(obj):
         return str(obj)
     if isinstance(obj, Decimal):
         return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
     raise TypeError(f"Type {type(obj)} non sérialisable")
 
+
+def json_dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Sérialise un objet en JSON UTF-8
+
+    Args:
+        obj: Objet à sérialiser
+        pretty: Indenter la sortie (compacte par défaut)
+
+    Returns:
+        Document JSON encodé en UTF-8
+    """
+    if HAS_ORJSON:
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if pretty else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=json_serial, option=options)
+    if pretty:
+        return json.dumps(obj, default=json_serial, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, default=json_serial, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
 def json_dumps(obj: Any, **kwargs) -> str:
-    """Sérialise un objet en JSON en utilisant l'encodeur personnalisé"""
+    """
+    Sérialise un objet en JSON
+
+    Sans argument autre que indent/ensure_ascii, la sérialisation rapide est
+    utilisée ; sinon les arguments sont transmis à json.dumps.
+    """
+    if HAS_ORJSON and set(kwargs) <= {"indent", "ensure_ascii"} and not kwargs.get("ensure_ascii"):
+        return json_dumps_bytes(obj, pretty=bool(kwargs.get("indent"))).decode("utf-8")
     kwargs.setdefault('default', json_serial)
-    return json.dumps(obj, cls=CustomJSONEncoder, **kwargs)
+    return json.dumps(obj, **kwargs)
+
 
 def json_dump(obj: Any, fp, **kwargs) -> None:
-    """Écrit un objet en JSON dans un fichier en utilisant l'encodeur personnalisé"""
-    kwargs.setdefault('default', json_serial)
-    json.dump(obj, fp, cls=CustomJSONEncoder, **kwargs)
+    """Écrit un objet en JSON dans un fichier texte"""
+    fp.write(json_dumps(obj, **kwargs))
+
 
 def json_load(fp, **kwargs):
     """
     Charge un objet JSON depuis un fichier
-    
+
     Args:
-        fp: Fichier ou descripteur de fichier
+        fp: Fichier ou descripteur de fichier (texte ou binaire)
         **kwargs: Arguments supplémentaires pour json.load
-        
+
     Returns:
         Objet Python
     """
+    if HAS_ORJSON and not kwargs:
+        return orjson.loads(fp.read())
     return json.load(fp, **kwargs)
 
+
 def json_loads(s, **kwargs):
     """
     Parse une chaîne JSON
-    
+
     Args:
-        s: Chaîne JSON
+        s: Chaîne JSON (str ou bytes)
         **kwargs: Arguments supplémentaires pour json.loads
-        
+
     Returns:
         Objet Python
     """
+    if HAS_ORJSON and not kwargs:
+        return orjson.loads(s)
     return json.loads(s, **kwargs)
+
+
+def read_json(path: str) -> Any:
+    """
+    Lit un fichier JSON
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        Objet Python
+    """
+    with open(path, "rb") as f:
+        return json_loads(f.read())
+
+
+def write_json(path: str, obj: Any, pretty: bool = False) -> int:
+    """
+    Écrit un fichier JSON de façon atomique (fichier temporaire puis os.replace)
+
+    Args:
+        path: Chemin du fichier
+        obj: Objet à sérialiser
+        pretty: Indenter la sortie (compacte par défaut)
+
+    Returns:
+        Taille du fichier écrit en octets
+    """
+    data = json_dumps_bytes(obj, pretty=pretty)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON sérialisée par json_dumps_bytes (orjson si disponible)"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps_bytes(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Analyse une liste de champs séparés par des virgules (projection)
+
+    Args:
+        fields: Paramètre de requête, par exemple "id,type,line_numbers"
+
+    Returns:
+        Liste des champs, ou None pour conserver tous les champs
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return names or None
+
+
+def project_fields(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Ne conserve que les champs demandés d'un dictionnaire (tous si fields est None)"""
+    if fields is None:
+        return item
+    return {name: item[name] for name in fields if name in item}
+
+
+def _buffered(parts: Iterable[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Regroupe des fragments d'octets en morceaux d'environ chunk_size octets"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_json_document(header: Dict[str, Any],
+                       items: Iterable[bytes],
+                       footer: Optional[Dict[str, Any]] = None,
+                       key: str = "anomalies") -> Iterator[bytes]:
+    """
+    Produit un document JSON {header..., key: [items...], footer...} par morceaux
+
+    Args:
+        header: Champs placés avant la liste
+        items: Éléments de la liste, déjà encodés en JSON
+        footer: Champs placés après la liste
+        key: Nom du champ contenant la liste
+
+    Yields:
+        Morceaux du document
+    """
+    def parts() -> Iterator[bytes]:
+        yield b"{"
+        for name, value in header.items():
+            yield json_dumps_bytes(name) + b":" + json_dumps_bytes(value) + b","
+        yield json_dumps_bytes(key) + b":["
+        for i, item in enumerate(items):
+            yield b"," + item if i else item
+        yield b"]"
+        for name, value in (footer or {}).items():
+            yield b"," + json_dumps_bytes(name) + b":" + json_dumps_bytes(value)
+        yield b"}"
+
+    return _buffered(parts())
+
+
+def iter_ndjson(items: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Produit un flux NDJSON (un élément JSON par ligne) par morceaux
+
+    Args:
+        items: Éléments déjà encodés en JSON, sans saut de ligne
+
+    Yields:
+        Morceaux du flux
+    """
+    return _buffered(item + b"\n" for item in items)
+
+
+def streaming_json_response(chunks: Iterable[bytes], fmt: str = "json", **kwargs) -> StreamingResponse:
+    """Réponse HTTP en flux (transfert par morceaux) pour un document JSON ou NDJSON"""
+    return StreamingResponse(chunks, media_type=STREAM_MEDIA_TYPES[fmt], **kwargs)
@@ -3,6 +3,7 @@ import os
 import platform
 import shutil
 import logging
+import threading
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -66,3 +67,28 @@ def ensure_directory(path: str) -> bool:
     except Exception as e:
         logger.error(f"Error creating directory {path}: {str(e)}")
         return False
+
+def lower_thread_priority(increment: int) -> bool:
+    """
+    Lower the scheduling priority of the calling thread.
+    
+    On Linux the nice value is per thread, so only the current worker thread is
+    affected. Elsewhere this is a no-op. The increment is relative to the current
+    value: call it once per thread (e.g. as a pool initializer), not once per task.
+    
+    Args:
+        increment: Nice increment (0-19)
+        
+    Returns:
+        True if the priority was lowered, False otherwise
+    """
+    if increment <= 0 or platform.system() != "Linux":
+        return False
+    try:
+        thread_id = threading.get_native_id()
+        current = os.getpriority(os.PRIO_PROCESS, thread_id)
+        os.setpriority(os.PRIO_PROCESS, thread_id, min(19, current + increment))
+        return True
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Could not lower thread priority: {str(e)}")
+        return False
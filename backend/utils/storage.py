@@ -0,0 +1,177 @@
+"""
+Organisation sur disque des répertoires de données.
+
+Les fichiers d'un même élément (fichier importé, résultats, tâche, rapport,
+génération) sont regroupés dans un sous-répertoire à deux niveaux dérivé de
+l'identifiant de l'élément, par exemple uploads/3/f/{file_id}_meta.json.
+Chaque répertoire reste ainsi petit quel que soit le nombre d'éléments.
+
+Les fichiers de l'ancienne organisation à plat restent lisibles : un chemin
+est d'abord cherché dans son sous-répertoire, puis à la racine. Le script
+scripts/migrate_storage_layout.py déplace les fichiers existants.
+"""
+import os
+import hashlib
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
+
+from backend.core.config import get_settings
+
+settings = get_settings()
+
+# Nombre de caractères hexadécimaux par niveau de sous-répertoire (16 sous-répertoires
+# par niveau: 256 répertoires feuilles sur deux niveaux, sans multiplier les répertoires
+# presque vides qui ralentissent le parcours complet)
+SHARD_WIDTH = 1
+
+
+def id_prefix_key(name: str) -> str:
+    """Identifiant en tête du nom de fichier ({id}_meta.json, {id}.json, {id}_anomalies.npz)"""
+    for i, char in enumerate(name):
+        if char in "_.":
+            return name[:i]
+    return name
+
+
+def id_suffix_key(name: str) -> str:
+    """Identifiant en fin de nom de fichier (generated_{id}.csv, status_{id}.json)"""
+    return name.partition("_")[2].rsplit(".", 1)[0] or name
+
+
+class ShardedStore:
+    """Répertoire de données découpé en sous-répertoires selon l'identifiant des éléments"""
+
+    def __init__(self,
+                 base_dir: str,
+                 key_of: Callable[[str], str] = id_prefix_key,
+                 levels: Optional[int] = None):
+        """
+        Args:
+            base_dir: Répertoire racine
+            key_of: Fonction retournant l'identifiant de l'élément d'un nom de fichier
+            levels: Nombre de niveaux de sous-répertoires (0 pour une organisation à plat,
+                    par défaut STORAGE_SHARD_LEVELS)
+        """
+        self.base_dir = base_dir
+        self.key_of = key_of
+        self.levels = settings.STORAGE_SHARD_LEVELS if levels is None else levels
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def shard_dir(self, key: str) -> str:
+        """Sous-répertoire des fichiers d'un élément"""
+        if not self.levels:
+            return self.base_dir
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        parts = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(self.levels)]
+        return os.path.join(self.base_dir, *parts)
+
+    def path(self, key: str, name: str) -> str:
+        """
+        Chemin d'un fichier d'un élément, pour la lecture
+
+        Args:
+            key: Identifiant de l'élément
+            name: Nom du fichier
+
+        Returns:
+            Chemin dans le sous-répertoire de l'élément, ou à la racine si le
+            fichier n'existe que dans l'ancienne organisation à plat
+        """
+        path = os.path.join(self.shard_dir(key), name)
+        if self.levels and not os.path.exists(path):
+            legacy_path = os.path.join(self.base_dir, name)
+            if os.path.exists(legacy_path):
+                return legacy_path
+        return path
+
+    def writable_path(self, key: str, name: str) -> str:
+        """
+        Chemin d'un fichier d'un élément, pour l'écriture (le sous-répertoire est créé)
+
+        Args:
+            key: Identifiant de l'élément
+            name: Nom du fichier
+
+        Returns:
+            Chemin du fichier
+        """
+        path = self.path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def iter_files(self, suffix: Optional[str] = None) -> Iterator[os.DirEntry]:
+        """
+        Parcourt les fichiers du répertoire, sous-répertoires compris
+
+        Args:
+            suffix: Ne produire que les fichiers dont le nom se termine ainsi
+
+        Yields:
+            Entrées des fichiers (temporaires exclus)
+        """
+        stack = [self.base_dir]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(".tmp"):
+                            continue
+                        elif suffix is None or entry.name.endswith(suffix):
+                            yield entry
+            except FileNotFoundError:
+                continue
+
+    def remove(self, key: str, name: str) -> int:
+        """
+        Supprime un fichier d'un élément s'il existe
+
+        Returns:
+            Nombre d'octets libérés
+        """
+        path = self.path(key, name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+
+class DataStorage:
+    """Répertoires de données de l'application"""
+
+    def __init__(self, data_dir: Optional[str] = None, levels: Optional[int] = None):
+        """
+        Args:
+            data_dir: Répertoire de données (par défaut DATA_DIR)
+            levels: Nombre de niveaux de sous-répertoires (par défaut STORAGE_SHARD_LEVELS)
+        """
+        self.data_dir = data_dir or settings.DATA_DIR
+        self.uploads = ShardedStore(os.path.join(self.data_dir, "uploads"), id_prefix_key, levels)
+        self.results = ShardedStore(os.path.join(self.data_dir, "results"), id_prefix_key, levels)
+        self.jobs = ShardedStore(os.path.join(self.data_dir, "jobs"), id_prefix_key, levels)
+        self.reports = ShardedStore(os.path.join(self.data_dir, "reports"), id_prefix_key, levels)
+        self.generated = ShardedStore(os.path.join(self.data_dir, "generated"), id_suffix_key, levels)
+
+    def stores(self):
+        """Répertoires découpés, par nom"""
+        return {
+            "uploads": self.uploads,
+            "results": self.results,
+            "jobs": self.jobs,
+            "reports": self.reports,
+            "generated": self.generated,
+        }
+
+
+@lru_cache()
+def get_storage() -> DataStorage:
+    """
+    Récupère l'instance unique des répertoires de données
+
+    Returns:
+        Instance des répertoires de données
+    """
+    return DataStorage()
@@ -464,7 +464,9 @@ function getAnomalyTypeText(type) {
         'date_inconsistency': 'Incohérence de date',
         'balance_mismatch': 'Déséquilibre comptable',
         'unusual_account_activity': 'Activité inhabituelle',
-        'other': 'Autre anomalie'
+        'other': 'Autre anomalie',
+        'cross_file_duplicate': 'Doublon entre sociétés',
+        'unmatched_intercompany': 'Flux intragroupe sans contrepartie'
     };
     
     return typeMap[type] || type;
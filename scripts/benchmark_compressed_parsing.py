@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Benchmark de la lecture des fichiers FEC compressés.
+
+Le script compresse un fichier FEC aux formats acceptés à l'upload (gzip,
+zip et zstandard si le paquet est installé), puis mesure pour chaque format
+la taille du fichier et le débit du parsing (FECParser) par rapport au
+fichier non compressé. Le fichier d'entrée peut être répété pour obtenir un
+volume représentatif.
+"""
+import os
+import sys
+import gzip
+import time
+import shutil
+import zipfile
+import logging
+import argparse
+import tempfile
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.compression import is_compression_available
+from backend.utils.fec_parser import FECParser
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de la lecture des fichiers FEC compressés")
+
+    parser.add_argument("file", type=str, help="Fichier FEC de référence (non compressé)")
+
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Nombre de répétitions des lignes du fichier (défaut: 1)")
+
+    parser.add_argument("--runs", type=int, default=3,
+                        help="Nombre de mesures par format, la meilleure est retenue (défaut: 3)")
+
+    return parser.parse_args()
+
+
+def build_source(path: str, repeat: int, target: str) -> None:
+    """Fichier FEC de test: en-tête puis lignes du fichier de référence répétées"""
+    with open(path, "rb") as f:
+        header = f.readline()
+        body = f.read()
+    if body and not body.endswith(b"\n"):
+        body += b"\n"
+    with open(target, "wb") as f:
+        f.write(header)
+        for _ in range(repeat):
+            f.write(body)
+
+
+def compress(source: str, compression: str) -> str:
+    """Compresse le fichier de test; retourne le chemin du fichier compressé"""
+    target = f"{source}.{compression}"
+    if compression == "gz":
+        with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    elif compression == "zip":
+        with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.write(source, os.path.basename(source))
+    else:
+        import zstandard
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    return target
+
+
+def measure(path: str, runs: int):
+    """Meilleure durée de parsing sur plusieurs mesures; retourne (durée, nombre de lignes)"""
+    best, rows = None, 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = len(FECParser(path).parse())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    args = parse_args()
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, "fec.txt")
+        build_source(args.file, args.repeat, source)
+        raw_size = os.path.getsize(source)
+
+        reference, rows = measure(source, args.runs)
+        logger.info(f"Non compressé: {raw_size / 1e6:.1f} Mo, {rows} lignes, "
+                    f"{reference:.2f} s ({raw_size / 1e6 / reference:.0f} Mo/s)")
+
+        for compression in ("gz", "zip", "zst"):
+            if not is_compression_available(compression):
+                logger.info(f".{compression}: non disponible (paquet manquant)")
+                continue
+            path = compress(source, compression)
+            size = os.path.getsize(path)
+            elapsed, parsed = measure(path, args.runs)
+            assert parsed == rows, f".{compression}: {parsed} lignes au lieu de {rows}"
+            logger.info(f".{compression}: {size / 1e6:.1f} Mo (ratio {raw_size / size:.1f}x), "
+                        f"{elapsed:.2f} s ({raw_size / 1e6 / elapsed:.0f} Mo/s), "
+                        f"écart {(elapsed / reference - 1) * 100:+.1f} %")
+
+
+if __name__ == "__main__":
+    main()
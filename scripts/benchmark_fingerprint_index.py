@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark de l'index des empreintes d'écritures (doublons entre fichiers).
+
+Le script alimente un index vide fichier par fichier avec des empreintes
+aléatoires (comme le ferait une suite d'analyses), puis mesure à intervalles
+réguliers la taille de l'index sur disque et la latence de recherche: par
+écriture pour une analyse complète (recherche groupée) et pour une écriture
+isolée. La moitié des empreintes recherchées sont présentes dans l'index.
+
+Exemple (100 millions d'écritures en 100 fichiers) :
+    python scripts/benchmark_fingerprint_index.py --entries 100000000 --files 100
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.fingerprint_index import FingerprintIndex
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de l'index des empreintes d'écritures")
+
+    parser.add_argument("--entries", type=int, default=100_000_000,
+                        help="Nombre total d'écritures indexées (défaut: 100 000 000)")
+
+    parser.add_argument("--files", type=int, default=100,
+                        help="Nombre de fichiers indexés (défaut: 100)")
+
+    parser.add_argument("--queries", type=int, default=1_000_000,
+                        help="Nombre d'empreintes par recherche groupée (défaut: 1 000 000)")
+
+    parser.add_argument("--checkpoints", type=int, default=4,
+                        help="Nombre de mesures pendant l'alimentation de l'index (défaut: 4)")
+
+    parser.add_argument("--max-segments", type=int, default=None,
+                        help="Segments au-delà desquels les plus petits sont fusionnés (défaut: configuration)")
+
+    parser.add_argument("--dir", type=str, default=None,
+                        help="Répertoire de l'index (défaut: répertoire temporaire supprimé à la fin)")
+
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire")
+
+    return parser.parse_args()
+
+
+def measure_lookups(index: FingerprintIndex, known: np.ndarray, queries: int, rng: np.random.Generator) -> dict:
+    """Latence de recherche groupée (par écriture) et isolée (p50, p99)"""
+    present = rng.choice(known, size=min(queries // 2, len(known)), replace=False)
+    absent = rng.integers(0, 2 ** 63, size=queries - len(present), dtype=np.uint64)
+    batch = np.concatenate([present, absent])
+    rng.shuffle(batch)
+
+    start = time.perf_counter()
+    ranks, _, _ = index.lookup(batch)
+    batch_time = time.perf_counter() - start
+
+    single = []
+    for fingerprint in batch[:1000]:
+        start = time.perf_counter()
+        index.lookup(np.array([fingerprint], dtype=np.uint64))
+        single.append(time.perf_counter() - start)
+
+    return {
+        "batch_us_per_entry": batch_time / len(batch) * 1e6,
+        "batch_seconds": batch_time,
+        "matches": len(np.unique(ranks)),
+        "single_p50_us": float(np.percentile(single, 50)) * 1e6,
+        "single_p99_us": float(np.percentile(single, 99)) * 1e6,
+    }
+
+
+def main():
+    args = parse_args()
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    rng = np.random.default_rng(args.seed)
+
+    index_dir = args.dir or tempfile.mkdtemp(prefix="fingerprints_")
+    index = FingerprintIndex(index_dir, max_segments=args.max_segments)
+    per_file = args.entries // args.files
+    checkpoints = {round(args.files * (i + 1) / args.checkpoints) for i in range(args.checkpoints)}
+
+    # Échantillon des empreintes indexées, pour les recherches d'empreintes présentes
+    sample = []
+    add_time = 0.0
+    try:
+        for i in range(1, args.files + 1):
+            fingerprints = rng.integers(0, 2 ** 63, size=per_file, dtype=np.uint64)
+            sample.append(fingerprints[:max(1, args.queries // args.files)])
+
+            start = time.perf_counter()
+            index.add_file(f"file_{i}", fingerprints, np.arange(1, per_file + 1), group=f"company_{i}")
+            add_time += time.perf_counter() - start
+
+            if i not in checkpoints:
+                continue
+            stats = index.stats()
+            result = measure_lookups(index, np.concatenate(sample), args.queries, rng)
+            logger.info(
+                f"{stats['entries']:,} écritures, {stats['files']} fichiers, {stats['segments']} segments: "
+                f"{stats['size_bytes'] / 1e6:,.0f} Mo ({stats['size_bytes'] / max(stats['entries'], 1):.1f} octets/écriture), "
+                f"indexation {stats['entries'] / add_time / 1e6:.1f} M écritures/s | "
+                f"recherche groupée {result['batch_us_per_entry']:.2f} µs/écriture "
+                f"({args.queries:,} en {result['batch_seconds']:.2f} s, {result['matches']:,} trouvées) | "
+                f"recherche isolée p50 {result['single_p50_us']:.0f} µs, p99 {result['single_p99_us']:.0f} µs"
+            )
+
+        start = time.perf_counter()
+        index.compact()
+        logger.info(f"Compaction complète en {time.perf_counter() - start:.1f} s")
+        result = measure_lookups(index, np.concatenate(sample), args.queries, rng)
+        logger.info(f"Après compaction ({index.stats()['segments']} segment): "
+                    f"recherche groupée {result['batch_us_per_entry']:.2f} µs/écriture, "
+                    f"isolée p50 {result['single_p50_us']:.0f} µs, p99 {result['single_p99_us']:.0f} µs")
+    finally:
+        if args.dir is None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark de la sérialisation JSON des résultats d'analyse.
+
+Compare, sur un document de résultats de N anomalies, l'ancien chemin
+(model_dump + json.dump indenté) et la couche backend.utils.json_utils
+(orjson si installé, JSON compact).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.anomaly_records import AnomalyRecord, make_anomaly_id
+from backend.models.schemas import AnomalyResponse, AnomalyType
+from backend.utils.json_utils import HAS_ORJSON, json_dumps_bytes, json_loads
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de la sérialisation JSON des résultats")
+
+    parser.add_argument("--count", type=int, default=100_000,
+                        help="Nombre d'anomalies du document (défaut: 100 000)")
+
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Nombre de répétitions, le meilleur temps est retenu (défaut: 3)")
+
+    return parser.parse_args()
+
+
+def build_results(count: int) -> dict:
+    """Construit un document de résultats de count anomalies"""
+    detected_at = datetime.now()
+    anomalies = [
+        AnomalyRecord(
+            type=AnomalyType.SUSPICIOUS_PATTERN,
+            description=f"Montant suspicieusement rond: {1000.0 * (i % 50 + 1)}",
+            confidence_score=0.8,
+            line_numbers=[i + 1],
+            related_data={
+                "amount": 1000.0 * (i % 50 + 1),
+                "is_exact_round": True,
+                "journal_code": "ACH",
+                "ecriture_lib": "Facture fournisseur électricité"
+            }
+        ).to_dict(make_anomaly_id("bench", i), detected_at)
+        for i in range(count)
+    ]
+    return {
+        "file_id": "benchmark",
+        "filename": "benchmark.csv",
+        "total_entries": count * 20,
+        "anomaly_count": count,
+        "anomalies": anomalies,
+        "analysis_timestamp": detected_at.isoformat(),
+        "processing_time_ms": 0
+    }
+
+
+def best_time(func, repeat: int) -> float:
+    """Meilleur temps d'exécution de func sur repeat essais"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    args = parse_args()
+    results = build_results(args.count)
+    response = AnomalyResponse(**results)
+
+    legacy = json.dumps(response.model_dump(), indent=2, ensure_ascii=False, default=str).encode("utf-8")
+    compact = json_dumps_bytes(response.model_dump(mode="json"))
+
+    timings = {
+        "model_dump + json.dumps (indent=2)": best_time(
+            lambda: json.dumps(response.model_dump(), indent=2, ensure_ascii=False, default=str), args.repeat),
+        "model_dump(mode=json) + json_dumps_bytes": best_time(
+            lambda: json_dumps_bytes(response.model_dump(mode="json")), args.repeat),
+        "json_dumps_bytes (dictionnaires)": best_time(
+            lambda: json_dumps_bytes(results), args.repeat),
+        "json.loads": best_time(lambda: json.loads(legacy), args.repeat),
+        "json_loads": best_time(lambda: json_loads(compact), args.repeat),
+    }
+
+    logger.info(f"{args.count} anomalies, orjson {'disponible' if HAS_ORJSON else 'absent (repli sur json)'}")
+    logger.info(f"Taille: {len(legacy) / 1e6:.1f} Mo indenté, {len(compact) / 1e6:.1f} Mo compact")
+    for name, duration in timings.items():
+        logger.info(f"- {name}: {duration * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
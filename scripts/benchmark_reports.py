@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark du rendu des rapports par format.
+
+Chaque format est rendu dans un processus dédié à partir d'anomalies
+synthétiques produites à la volée ; le script affiche la durée, le débit, la
+taille du fichier et le pic de mémoire résidente du processus.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.schemas import ReportFormat, ReportType
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark du rendu des rapports par format")
+
+    parser.add_argument("--rows", type=int, default=1_000_000,
+                        help="Nombre d'anomalies du rapport (défaut: 1 000 000)")
+
+    parser.add_argument("--formats", type=str, default="excel,csv,html,json",
+                        help="Formats à mesurer, séparés par des virgules (défaut: excel,csv,html,json)")
+
+    parser.add_argument("--detailed", action="store_true",
+                        help="Rapport détaillé (avec les données associées)")
+
+    return parser.parse_args()
+
+
+def synthetic_anomalies(rows: int):
+    """Anomalies synthétiques produites à la volée"""
+    detected_at = datetime.now().isoformat()
+    for i in range(rows):
+        yield {
+            "id": f"anom-bench-{i}",
+            "type": "suspicious_pattern" if i % 3 else "duplicate_entry",
+            "description": f"Montant suspicieusement rond: {1000.0 * (i % 50 + 1)}, \"libellé\"; ligne {i + 1}",
+            "confidence_score": 0.6 + (i % 4) / 10,
+            "line_numbers": [i + 1] if i % 3 else [i + 1, i + 2],
+            "detected_at": detected_at,
+            "related_data": {"amount": 1000.0 * (i % 50 + 1), "journal_code": "ACH"}
+        }
+
+
+def _render(report_format: str, rows: int, detailed: bool, path: str, queue) -> None:
+    """Rend un rapport et renvoie (durée, taille, pic RSS en Mo) au processus parent"""
+    import resource
+    from backend.services.report_renderer import render_report
+
+    summary = {
+        "file_id": "benchmark",
+        "filename": "benchmark.csv",
+        "total_entries": rows * 20,
+        "anomaly_count": rows,
+        "analysis_timestamp": datetime.now().isoformat(),
+        "processing_time_ms": 0,
+        "anomaly_types": {"suspicious_pattern": rows - rows // 3, "duplicate_entry": rows // 3}
+    }
+    report_type = ReportType.DETAILED if detailed else ReportType.SUMMARY
+
+    start = time.perf_counter()
+    size = render_report(path, ReportFormat(report_format), report_type, summary, synthetic_anomalies(rows))
+    duration = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((duration, size, peak_kb / 1024))
+
+
+def main():
+    args = parse_args()
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    context = multiprocessing.get_context("spawn")
+
+    logger.info(f"Rendu de {args.rows} anomalies ({'détaillé' if args.detailed else 'résumé'})")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for report_format in formats:
+            path = os.path.join(tmp_dir, f"report.{report_format}")
+            queue = context.Queue()
+            process = context.Process(target=_render, args=(report_format, args.rows, args.detailed, path, queue))
+            process.start()
+            duration, size, peak_mb = queue.get()
+            process.join()
+            os.remove(path)
+
+            logger.info(f"- {report_format}: {duration:.1f} s, {args.rows / duration:,.0f} lignes/s, "
+                        f"{size / 1e6:.1f} Mo, pic RSS {peak_mb:.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
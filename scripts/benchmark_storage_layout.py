@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark de l'organisation des répertoires de données.
+
+Le script crée le même nombre de fichiers importés (métadonnées et données)
+dans une organisation à plat puis en sous-répertoires, et mesure pour chacune
+la durée de création, le parcours complet des métadonnées (liste des
+fichiers), la recherche d'un fichier par identifiant et la taille du plus
+grand répertoire.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import logging
+import argparse
+import tempfile
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.storage import ShardedStore
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de l'organisation des répertoires de données")
+
+    parser.add_argument("--files", type=int, default=100_000,
+                        help="Nombre de fichiers importés (défaut: 100 000)")
+
+    parser.add_argument("--lookups", type=int, default=10_000,
+                        help="Nombre de recherches par identifiant (défaut: 10 000)")
+
+    parser.add_argument("--levels", type=str, default="0,2",
+                        help="Niveaux de sous-répertoires à comparer, séparés par des virgules (défaut: 0,2)")
+
+    return parser.parse_args()
+
+
+def largest_directory(base_dir: str) -> int:
+    """Nombre d'entrées du plus grand répertoire"""
+    return max(len(os.listdir(root)) for root, _, _ in os.walk(base_dir))
+
+
+def measure(base_dir: str, levels: int, file_ids, lookups: int):
+    """Mesure une organisation; retourne les durées (s) et la taille du plus grand répertoire"""
+    store = ShardedStore(base_dir, levels=levels)
+
+    start = time.perf_counter()
+    for file_id in file_ids:
+        for name in (f"{file_id}_meta.json", f"{file_id}_export.txt"):
+            with open(store.writable_path(file_id, name), "w") as f:
+                f.write("{}")
+    create_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    listed = sum(1 for _ in store.iter_files(suffix="_meta.json"))
+    list_time = time.perf_counter() - start
+    assert listed == len(file_ids), f"{listed} métadonnées listées sur {len(file_ids)}"
+
+    sample = random.Random(0).choices(file_ids, k=lookups)
+    start = time.perf_counter()
+    for file_id in sample:
+        assert os.path.exists(store.path(file_id, f"{file_id}_meta.json"))
+    lookup_time = time.perf_counter() - start
+
+    return create_time, list_time, lookup_time, largest_directory(base_dir)
+
+
+def main():
+    args = parse_args()
+    file_ids = [str(uuid.uuid4()) for _ in range(args.files)]
+
+    logger.info(f"{args.files} fichiers importés ({2 * args.files} fichiers), {args.lookups} recherches")
+    for levels in (int(level) for level in args.levels.split(",")):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            create_time, list_time, lookup_time, largest = measure(
+                os.path.join(tmp_dir, "uploads"), levels, file_ids, args.lookups
+            )
+        label = "à plat" if levels == 0 else f"{levels} niveau(x)"
+        logger.info(f"- {label}: création {create_time:.1f} s, liste {list_time * 1000:.0f} ms, "
+                    f"recherche {lookup_time / args.lookups * 1e6:.1f} µs, "
+                    f"plus grand répertoire {largest} entrées")
+
+
+if __name__ == "__main__":
+    main()
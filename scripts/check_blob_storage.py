@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Vérification d'un stockage d'objets (local ou compatible S3).
+
+Le script enregistre, relit, lit par intervalles, liste et supprime des
+objets sous un préfixe temporaire, puis envoie et télécharge un gros fichier
+(multipart et téléchargement parallèle pour S3) en contrôlant son empreinte.
+
+Exemple contre un serveur S3 local (moto_server ou MinIO) :
+    moto_server -p 5000 &
+    python scripts/check_blob_storage.py --backend s3 --endpoint-url http://127.0.0.1:5000
+"""
+import os
+import sys
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+import tempfile
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.blob_storage import LocalBlobStorage, S3BlobStorage
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Vérification d'un stockage d'objets")
+
+    parser.add_argument("--backend", choices=["local", "s3"], default="local",
+                        help="Stockage à vérifier (défaut: local)")
+
+    parser.add_argument("--endpoint-url", type=str, default=None,
+                        help="URL du serveur compatible S3 (défaut: AWS)")
+
+    parser.add_argument("--bucket", type=str, default="audit-tool-check",
+                        help="Bucket S3 (créé s'il n'existe pas, défaut: audit-tool-check)")
+
+    parser.add_argument("--size-mb", type=int, default=64,
+                        help="Taille du gros fichier en Mo (défaut: 64)")
+
+    return parser.parse_args()
+
+
+def sha256_file(path: str) -> str:
+    """Empreinte d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_storage(args, root: str):
+    """Stockage à vérifier, avec ses copies locales sous root"""
+    if args.backend == "local":
+        return LocalBlobStorage(root)
+
+    blobs = S3BlobStorage(
+        bucket=args.bucket,
+        prefix=f"check-{uuid.uuid4().hex[:8]}",
+        local_root=root,
+        endpoint_url=args.endpoint_url,
+        region="us-east-1",
+        access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "test"),
+        secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "test")
+    )
+    try:
+        blobs.client.head_bucket(Bucket=args.bucket)
+    except Exception:
+        blobs.client.create_bucket(Bucket=args.bucket)
+    return blobs
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        blobs = make_storage(args, root)
+
+        # Petits objets
+        data = os.urandom(100_000)
+        blobs.put("uploads/a/b/small.bin", data)
+        blobs.put("uploads/a/c/other.bin", b"x")
+        assert blobs.get("uploads/a/b/small.bin") == data
+        assert blobs.get_range("uploads/a/b/small.bin", 1000, 500) == data[1000:1500]
+        assert b"".join(blobs.stream("uploads/a/b/small.bin", 99_000, chunk_size=256)) == data[99_000:]
+        assert blobs.stat("uploads/a/b/small.bin").size == len(data)
+        assert sorted(info.key for info in blobs.list("uploads/a/")) == ["uploads/a/b/small.bin",
+                                                                         "uploads/a/c/other.bin"]
+        assert blobs.delete("uploads/a/c/other.bin") == 1
+        assert not blobs.exists("uploads/a/c/other.bin")
+        try:
+            blobs.get("uploads/a/c/other.bin")
+            raise AssertionError("objet supprimé encore lisible")
+        except FileNotFoundError:
+            pass
+        logger.info("Lecture, écriture, intervalles, liste et suppression: OK")
+
+        # Gros fichier
+        source = os.path.join(root, "source.bin")
+        with open(source, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        expected = sha256_file(source)
+
+        start = time.perf_counter()
+        blobs.put_file("results/big.bin", source)
+        upload_time = time.perf_counter() - start
+
+        target = os.path.join(root, "download", "big.bin")
+        start = time.perf_counter()
+        blobs.download("results/big.bin", target)
+        download_time = time.perf_counter() - start
+        assert sha256_file(target) == expected
+
+        # La copie locale est réutilisée tant que l'objet ne change pas
+        local_path = blobs.fetch("results/big.bin")
+        assert sha256_file(local_path) == expected
+        mtime = os.path.getmtime(local_path)
+        assert blobs.fetch("results/big.bin") == local_path and os.path.getmtime(local_path) == mtime
+
+        blobs.delete("results/big.bin")
+        blobs.delete("uploads/a/b/small.bin")
+        logger.info(f"Fichier de {args.size_mb} Mo: envoi {args.size_mb / upload_time:.0f} Mo/s, "
+                    f"téléchargement {args.size_mb / download_time:.0f} Mo/s, empreinte OK")
+
+
+if __name__ == "__main__":
+    main()
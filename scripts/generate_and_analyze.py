@@ -32,6 +32,9 @@ async def generate_and_analyze(args):
             options["end_date"] = args.end_date
         if args.company_name:
             options["company_name"] = args.company_name
+        if args.seed is not None:
+            options["seed"] = args.seed
+        options["scenario"] = args.scenario
         
         # Générer et analyser
         results = await generation_service.generate_and_analyze(
@@ -44,6 +47,7 @@ async def generate_and_analyze(args):
         logger.info(f"\n===== Résumé de la génération =====")
         logger.info(f"ID de génération: {results['generation_id']}")
         logger.info(f"Écritures générées: {results['count']}")
+        logger.info(f"Anomalies injectées: {results['injected_anomaly_count']}")
         logger.info(f"Anomalies détectées: {results['anomaly_count']}")
         logger.info(f"Taux d'anomalies effectif: {results['anomaly_count'] / results['count'] * 100:.2f}%")
         logger.info(f"Durée de l'analyse: {results['duration_ms']:.2f} ms")
@@ -51,18 +55,12 @@ async def generate_and_analyze(args):
         logger.info(f"Fichier de résultats: {results['result_path']}")
         
         # Si verbose, afficher les types d'anomalies
-        if args.verbose:
-            anomalies = results["analysis_result"].anomalies
-            anomaly_types = {}
-            
-            for anomaly in anomalies:
-                if anomaly.type not in anomaly_types:
-                    anomaly_types[anomaly.type] = 0
-                anomaly_types[anomaly.type] += 1
+        if args.verbose and results["anomaly_count"]:
+            anomaly_types = results["anomaly_types"]
             
             logger.info(f"\n===== Types d'anomalies détectées =====")
             for type_name, count in sorted(anomaly_types.items(), key=lambda x: x[1], reverse=True):
-                logger.info(f"- {type_name}: {count} ({count/len(anomalies)*100:.1f}%)")
+                logger.info(f"- {type_name}: {count} ({count/results['anomaly_count']*100:.1f}%)")
             
         return results
         
@@ -89,6 +87,12 @@ def parse_arguments():
     parser.add_argument("--company-name", type=str,
                         help="Nom de l'entreprise")
     
+    parser.add_argument("--seed", type=int,
+                        help="Graine de génération (reproductible si définie)")
+    
+    parser.add_argument("--scenario", type=str, default="standard",
+                        help="Scénario de génération (standard, ledger, retail, fraud)")
+    
     parser.add_argument("--output", type=str,
                         help="Chemin du fichier de sortie pour les résultats")
     
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Génère de gros fichiers FEC synthétiques (jeux de test de charge) en parallèle.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.sharded_generation import generate_sharded
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Génère des données FEC synthétiques en parallèle")
+
+    parser.add_argument("output", type=str,
+                        help="Fichier CSV de sortie (préfixe des fichiers si --partitioned)")
+
+    parser.add_argument("--count", type=int, default=1_000_000,
+                        help="Nombre d'écritures à générer (défaut: 1 000 000)")
+
+    parser.add_argument("--anomaly-rate", type=float, default=0.05,
+                        help="Taux d'anomalies à introduire (défaut: 0.05)")
+
+    parser.add_argument("--start-date", type=str, default="2023-01-01",
+                        help="Date de début au format YYYY-MM-DD")
+
+    parser.add_argument("--end-date", type=str, default="2023-12-31",
+                        help="Date de fin au format YYYY-MM-DD")
+
+    parser.add_argument("--company-name", type=str, default="EMPRESA_TEST",
+                        help="Nom de l'entreprise")
+
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Graine globale (génération reproductible)")
+
+    parser.add_argument("--scenario", type=str, default="standard",
+                        help="Scénario de génération (standard, ledger, retail, fraud)")
+
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Nombre de fragments (défaut: un fragment par 250 000 écritures)")
+
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Nombre de processus (défaut: nombre de cœurs)")
+
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Conserver un fichier par fragment au lieu d'un fichier unique")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    summary = generate_sharded(
+        output_path=args.output,
+        count=args.count,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        anomaly_rate=args.anomaly_rate,
+        company_name=args.company_name,
+        seed=args.seed,
+        scenario=args.scenario,
+        shards=args.shards,
+        workers=args.workers,
+        partitioned=args.partitioned
+    )
+
+    summary.pop("shards")
+    logger.info(json.dumps(summary, indent=2, ensure_ascii=False))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Migration des répertoires de données vers l'organisation en sous-répertoires.
+
+Les fichiers de l'ancienne organisation à plat (uploads, results, jobs,
+reports, generated) sont déplacés dans le sous-répertoire de leur élément, puis
+les chemins enregistrés dans les métadonnées (fichiers importés, tâches,
+générations) et dans l'index des rapports sont mis à jour. La migration peut
+être relancée sans risque : seuls les fichiers encore à la racine sont traités.
+Les fichiers à plat restent lisibles par l'application tant qu'ils ne sont pas
+migrés.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Ajouter le répertoire parent au PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.report_index import ReportIndex
+from backend.utils.json_utils import read_json, write_json
+from backend.utils.storage import DataStorage
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Fichiers laissés à la racine de leur répertoire (index SQLite des rapports)
+ROOT_FILES = ("reports.db", "reports.db-wal", "reports.db-shm")
+
+# Répertoires dont les fichiers JSON enregistrent des chemins de fichiers
+METADATA_STORES = ("uploads", "jobs", "generated")
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Migration des données vers l'organisation en sous-répertoires")
+
+    parser.add_argument("--data-dir", type=str, default=None,
+                        help="Répertoire de données (défaut: DATA_DIR)")
+
+    parser.add_argument("--levels", type=int, default=None,
+                        help="Nombre de niveaux de sous-répertoires (défaut: STORAGE_SHARD_LEVELS)")
+
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Afficher les déplacements sans les effectuer")
+
+    return parser.parse_args()
+
+
+def move_flat_files(store, dry_run: bool):
+    """
+    Déplace les fichiers à la racine d'un répertoire dans leurs sous-répertoires
+
+    Returns:
+        Correspondance ancien chemin -> nouveau chemin
+    """
+    moved = {}
+    with os.scandir(store.base_dir) as entries:
+        flat = [entry.name for entry in entries
+                if entry.is_file() and entry.name not in ROOT_FILES and not entry.name.endswith(".tmp")]
+
+    for name in flat:
+        old_path = os.path.join(store.base_dir, name)
+        new_path = os.path.join(store.shard_dir(store.key_of(name)), name)
+        if not dry_run:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.replace(old_path, new_path)
+        moved[os.path.abspath(old_path)] = new_path
+    return moved
+
+
+def rewrite_paths(value, moved):
+    """Remplace les chemins déplacés dans une valeur JSON; retourne (valeur, modifiée)"""
+    if isinstance(value, str):
+        new_path = moved.get(os.path.abspath(value)) if value else None
+        return (new_path, True) if new_path else (value, False)
+    if isinstance(value, dict):
+        changed = False
+        for key, item in value.items():
+            value[key], item_changed = rewrite_paths(item, moved)
+            changed = changed or item_changed
+        return value, changed
+    if isinstance(value, list):
+        changed = False
+        for i, item in enumerate(value):
+            value[i], item_changed = rewrite_paths(item, moved)
+            changed = changed or item_changed
+        return value, changed
+    return value, False
+
+
+def main():
+    args = parse_args()
+    storage = DataStorage(args.data_dir, args.levels)
+    if not storage.uploads.levels:
+        logger.error("STORAGE_SHARD_LEVELS vaut 0: organisation à plat, rien à migrer")
+        sys.exit(1)
+
+    start_time = time.time()
+    moved = {}
+    for name, store in storage.stores().items():
+        store_moved = move_flat_files(store, args.dry_run)
+        moved.update(store_moved)
+        logger.info(f"{name}: {len(store_moved)} fichier(s) {'à déplacer' if args.dry_run else 'déplacé(s)'}")
+
+    if args.dry_run:
+        logger.info(f"Simulation terminée: {len(moved)} fichier(s) à déplacer")
+        return
+
+    # Chemins enregistrés dans les métadonnées
+    rewritten = 0
+    for name in METADATA_STORES:
+        for entry in storage.stores()[name].iter_files(suffix=".json"):
+            try:
+                metadata = read_json(entry.path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Métadonnées illisibles {entry.path}: {e}")
+                continue
+            metadata, changed = rewrite_paths(metadata, moved)
+            if changed:
+                write_json(entry.path, metadata)
+                rewritten += 1
+
+    # Chemins des rapports dans l'index
+    index = ReportIndex(os.path.join(storage.reports.base_dir, "reports.db"))
+    reports = 0
+    for report in index.find():
+        new_path = moved.get(os.path.abspath(report["file_path"]))
+        if new_path:
+            index.update(report["report_id"], {"file_path": new_path})
+            reports += 1
+
+    logger.info(f"Migration terminée en {time.time() - start_time:.1f} s: {len(moved)} fichier(s) déplacé(s), "
+                f"{rewritten} fichier(s) de métadonnées et {reports} rapport(s) mis à jour")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from backend.models.my_fec_generator import get_my_fec_generator
 from backend.models.trained_detector import get_trained_detector
 from backend.utils.json_utils import json_dump
 from backend.models.schemas import AnomalyResponse
+from backend.models.anomaly_records import AnomalyColumnWriter
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -31,11 +32,14 @@ async def analyze_custom_data(count: int = 1000, output_file: str = None):
     anomalies = await detector.detect_anomalies(entries)
     
     # Créer la réponse d'analyse
+    writer = AnomalyColumnWriter()
+    writer.extend(anomalies)
     result = AnomalyResponse(
-        anomalies=anomalies,
-        total_count=len(anomalies),
+        anomalies=writer.view().page(),
         file_id="custom_analysis",
-        analysis_duration_ms=0
+        total_entries=len(entries),
+        anomaly_count=len(anomalies),
+        processing_time_ms=0
     )
     
     # Afficher les résultats
@@ -49,7 +53,7 @@ async def analyze_custom_data(count: int = 1000, output_file: str = None):
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_file, "w", encoding="utf-8") as f:
-            json_dump(result.dict(), f, ensure_ascii=False, indent=2)
+            json_dump(result.model_dump(mode="json"), f, ensure_ascii=False, indent=2)
         logger.info(f"Résultats sauvegardés dans {output_file}")
     
     # Analyse des types d'anomalies
@@ -1,18 +1,20 @@
-import asyncio
 import sys
 import os
 import logging
 from datetime import datetime
 import json
 from pathlib import Path
+from contextlib import closing
 
 # Ajouter le répertoire parent au PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.models.my_fec_generator import get_my_fec_generator, MyFECGenerator
+from backend.models.generation_engine import GenerationConfig
+from backend.models.generation_pipeline import generate_and_detect
 from backend.models.trained_detector import get_trained_detector
 from backend.utils.json_utils import json_dump
 from backend.models.schemas import AnomalyResponse
+from backend.models.anomaly_records import AnomalyColumnWriter
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, 
@@ -20,9 +22,11 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-async def test_detector_with_generator(count: int = 1000, output_file: str = None, anomaly_rate: float = 0.05):
+def test_detector_with_generator(count: int = 1000, output_file: str = None, anomaly_rate: float = 0.05):
     """
-    Génère des données avec le générateur personnalisé et les analyse avec le détecteur
+    Génère des données avec le moteur de génération et les analyse avec le détecteur
+    
+    Les lots générés sont analysés directement au format colonnaire.
     
     Args:
         count: Nombre d'écritures à générer
@@ -31,39 +35,43 @@ async def test_detector_with_generator(count: int = 1000, output_file: str = Non
     """
     logger.info(f"Génération de {count} écritures comptables avec un taux d'anomalie de {anomaly_rate*100}%...")
     
-    # Créer une instance directe du générateur pour plus de contrôle
-    generator = MyFECGenerator(
+    config = GenerationConfig(
         company_name="TEST DETECTION SAS",
         start_date="2023-01-01",
         end_date="2023-12-31",
-        transaction_count=count,
+        count=count,
         anomaly_rate=anomaly_rate
     )
     
-    # Générer les écritures
-    entries = generator.generate_entries(count=count)
-    
-    # Utiliser le détecteur d'anomalies entraîné
-    logger.info("Analyse des données avec le détecteur...")
+    # Générer et analyser les écritures avec le détecteur d'anomalies entraîné
+    logger.info("Génération et analyse des données avec le détecteur...")
     start_time = datetime.now()
     detector = get_trained_detector()
-    anomalies = await detector.detect_anomalies(entries)
+    anomalies = []
+    writer = AnomalyColumnWriter()
+    line_count = 0
+    with closing(generate_and_detect(config, detector=detector)) as batches:
+        for batch in batches:
+            anomalies.extend(batch.anomalies)
+            writer.extend(batch.anomalies)
+            line_count += batch.line_count
     end_time = datetime.now()
     duration_ms = (end_time - start_time).total_seconds() * 1000
     
     # Compiler les résultats
     result = AnomalyResponse(
-        anomalies=anomalies,
-        total_count=len(anomalies),
+        anomalies=writer.view().page(),
         file_id="generator_test",
-        analysis_duration_ms=duration_ms
+        total_entries=line_count,
+        anomaly_count=len(anomalies),
+        processing_time_ms=int(duration_ms)
     )
     
     # Afficher les résultats
     logger.info(f"\nRésultats de l'analyse :")
-    logger.info(f"Nombre total d'écritures : {len(entries)}")
+    logger.info(f"Nombre total de lignes : {line_count}")
     logger.info(f"Nombre d'anomalies détectées : {len(anomalies)}")
-    logger.info(f"Durée de l'analyse : {duration_ms:.2f} ms")
+    logger.info(f"Durée de la génération et de l'analyse : {duration_ms:.2f} ms")
     
     # Sauvegarder les résultats
     if output_file:
@@ -71,7 +79,7 @@ async def test_detector_with_generator(count: int = 1000, output_file: str = Non
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_file, "w", encoding="utf-8") as f:
-            json_dump(result.dict(), f, ensure_ascii=False, indent=2)
+            json_dump(result.model_dump(mode="json"), f, ensure_ascii=False, indent=2)
         logger.info(f"Résultats sauvegardés dans {output_file}")
     
     # Analyse des types d'anomalies
@@ -116,4 +124,4 @@ if __name__ == "__main__":
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, f"detection_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
     
-    asyncio.run(test_detector_with_generator(count=count, output_file=output_file, anomaly_rate=anomaly_rate))
+    test_detector_with_generator(count=count, output_file=output_file, anomaly_rate=anomaly_rate)
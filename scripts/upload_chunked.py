@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Upload par morceaux d'un fichier FEC volumineux.
+
+Le script ouvre un upload (ou reprend un upload interrompu avec --upload-id),
+envoie en parallèle les morceaux manquants avec leur empreinte SHA-256, puis
+termine l'upload. Un morceau refusé ou en erreur est renvoyé jusqu'à
+--retries fois.
+
+Exemple :
+    python scripts/upload_chunked.py export_fec.txt --url http://localhost:8000/api/v1 --workers 4
+"""
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description="Upload par morceaux d'un fichier FEC")
+
+    parser.add_argument("file", type=str, help="Fichier à envoyer")
+
+    parser.add_argument("--url", type=str, default="http://localhost:8000/api/v1",
+                        help="URL de l'API (défaut: http://localhost:8000/api/v1)")
+
+    parser.add_argument("--chunk-size-mb", type=int, default=None,
+                        help="Taille des morceaux en Mo (défaut: celle du serveur)")
+
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Nombre de morceaux envoyés en parallèle (défaut: 4)")
+
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Nombre d'essais par morceau (défaut: 3)")
+
+    parser.add_argument("--upload-id", type=str, default=None,
+                        help="Reprendre un upload interrompu")
+
+    parser.add_argument("--description", type=str, default=None,
+                        help="Description du fichier")
+
+    return parser.parse_args()
+
+
+def sha256_file(path: str) -> str:
+    """Empreinte d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def send_chunk(session: requests.Session, url: str, path: str, upload: dict, index: int, retries: int) -> int:
+    """Envoie un morceau; retourne sa taille"""
+    with open(path, "rb") as f:
+        f.seek(index * upload["chunk_size"])
+        data = f.read(upload["chunk_size"])
+    checksum = hashlib.sha256(data).hexdigest()
+
+    for attempt in range(1, retries + 1):
+        try:
+            response = session.put(f"{url}/analysis/uploads/{upload['upload_id']}/chunks/{index}",
+                                   data=data, headers={"X-Chunk-SHA256": checksum}, timeout=300)
+            response.raise_for_status()
+            return len(data)
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"Morceau {index}: essai {attempt} en échec ({e}), nouvel essai")
+            time.sleep(attempt)
+
+
+def main():
+    args = parse_args()
+    session = requests.Session()
+
+    if args.upload_id:
+        response = session.get(f"{args.url}/analysis/uploads/{args.upload_id}")
+    else:
+        logger.info(f"Calcul de l'empreinte de {args.file}")
+        response = session.post(f"{args.url}/analysis/uploads", json={
+            "filename": os.path.basename(args.file),
+            "total_size": os.path.getsize(args.file),
+            "chunk_size": args.chunk_size_mb * 1024 * 1024 if args.chunk_size_mb else None,
+            "sha256": sha256_file(args.file),
+            "description": args.description
+        })
+    response.raise_for_status()
+    upload = response.json()
+
+    received = set(upload["received_chunks"])
+    missing = [index for index in range(upload["chunk_count"]) if index not in received]
+    logger.info(f"Upload {upload['upload_id']}: {len(missing)} morceau(x) à envoyer sur {upload['chunk_count']}")
+
+    start_time = time.time()
+    sent = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(send_chunk, session, args.url, args.file, upload, index, args.retries)
+                       for index in missing]
+            for future in futures:
+                sent += future.result()
+    except requests.RequestException as e:
+        logger.error(f"Upload interrompu: {e}. Reprendre avec --upload-id {upload['upload_id']}")
+        sys.exit(1)
+
+    response = session.post(f"{args.url}/analysis/uploads/{upload['upload_id']}/complete")
+    response.raise_for_status()
+    elapsed = time.time() - start_time
+    logger.info(f"Fichier uploadé, ID: {response.json()['file_id']} "
+                f"({sent / 1024 / 1024:.0f} Mo en {elapsed:.1f} s, {sent / 1024 / 1024 / max(elapsed, 1e-6):.0f} Mo/s)")
+
+
+if __name__ == "__main__":
+    main()